@@ -85,7 +85,29 @@ class SimpleYOLODetector:
         except Exception as e:
             logger.error(f"推理失败: {e}")
             return None, []
-    
+
+    def infer_batch(self, images):
+        """
+        批量推理（一次前向计算处理多帧）
+        Args:
+            images: 输入图像列表 (BGR格式)
+        Returns:
+            List[Tuple[原始结果, 标准化结果]]，与输入顺序一致
+        """
+        try:
+            results = self.model(list(images), conf=0.25, iou=0.45, device=self.device)
+
+            # 按帧拆分，保持与单帧推理相同的结果格式
+            outputs = []
+            for i, image in enumerate(images):
+                frame_results = results[i:i + 1]
+                outputs.append((frame_results, self._to_standard_results(frame_results, image.shape)))
+            return outputs
+
+        except Exception as e:
+            logger.error(f"批量推理失败: {e}")
+            return [(None, []) for _ in images]
+
     def _to_standard_results(self, results, image_shape):
         """
         转换为标准化结果
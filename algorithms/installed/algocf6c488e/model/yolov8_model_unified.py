@@ -3,9 +3,9 @@ YOLOv8统一模型实现
 - 继承BaseModel基类
 - 实现标准化的模型接口
 - 支持自动预热和资源管理
+- 预处理使用预分配缓冲区的预处理引擎，支持批量推理
 """
 
-import cv2
 import numpy as np
 import torch
 import os
@@ -17,6 +17,7 @@ from typing import Dict, List, Any, Tuple
 import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 from base_classes import BaseModel
+from preprocess_engine import PreprocessEngine, PreprocessMeta
 
 logger = logging.getLogger(__name__)
 
@@ -36,11 +37,22 @@ class YOLOv8UnifiedModel(BaseModel):
             'iou_thres': 0.45,
             'max_det': 20,
             'model_file': 'yolov8n.pt',
+            'preprocess_mode': 'letterbox',
+            'half_precision': False,
+            'batch_size': 1,
         }
         
         # 合并配置
         merged_config = {**self.default_config, **model_config}
         super().__init__(merged_config)
+        
+        # 预处理引擎：按分辨率复用输出缓冲区，融合缩放/填充/通道重排/归一化
+        self.preprocessor = PreprocessEngine(
+            img_size=self.config['img_size'],
+            mode=self.config['preprocess_mode'],
+            half=bool(self.config['half_precision']) and self.device != 'cpu',
+            max_batch_size=self.config['batch_size']
+        )
     
     def _load_model(self):
         """加载YOLOv8模型"""
@@ -80,73 +92,24 @@ class YOLOv8UnifiedModel(BaseModel):
         except Exception as e:
             logger.warning(f"YOLOv8模型预热失败: {e}")
     
-    def _preprocess(self, image: np.ndarray) -> Tuple[np.ndarray, float, int, int, Tuple[int, int]]:
+    def _preprocess(self, images: List[np.ndarray]) -> Tuple[torch.Tensor, List[PreprocessMeta]]:
         """
         图像预处理
         Args:
-            image: 输入图像 (BGR格式)
+            images: 输入图像列表 (BGR格式)
         Returns:
-            Tuple[预处理图像, 缩放比例, 填充宽度, 填充高度, 原始尺寸]
+            Tuple[模型输入张量(N, 3, H, W)，每帧几何信息]
         """
-        if image is None or image.size == 0:
-            raise ValueError("输入图像为空")
-        
-        # BGR转RGB
-        if image.shape[-1] == 3:
-            img_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        else:
-            img_rgb = image
-        
-        # letterbox处理
-        img_padded, ratio, padw, padh = self._letterbox(
-            img_rgb, 
-            (self.config['img_size'], self.config['img_size'])
-        )
-        
-        return img_padded, ratio, padw, padh, img_rgb.shape[:2]
+        batch, metas = self.preprocessor.process(images)
+        # 零拷贝包装为张量，ultralytics对张量输入不再重复letterbox和归一化
+        return torch.from_numpy(batch), metas
     
-    def _letterbox(self, img: np.ndarray, new_shape: Tuple[int, int] = (640, 640), color: Tuple[int, int, int] = (114, 114, 114)) -> Tuple[np.ndarray, float, int, int]:
-        """
-        Letterbox处理
-        Args:
-            img: 输入图像
-            new_shape: 目标尺寸
-            color: 填充颜色
-        Returns:
-            Tuple[处理后图像, 缩放比例, 填充宽度, 填充高度]
-        """
-        shape = img.shape[:2]  # 当前尺寸 [height, width]
-        ratio = min(new_shape[0] / shape[0], new_shape[1] / shape[1])
-        new_unpad = (int(round(shape[1] * ratio)), int(round(shape[0] * ratio)))
-        
-        # 缩放图像
-        img_resized = cv2.resize(img, new_unpad, interpolation=cv2.INTER_LINEAR)
-        
-        # 计算填充
-        dw, dh = new_shape[1] - new_unpad[0], new_shape[0] - new_unpad[1]
-        dw /= 2
-        dh /= 2
-        
-        top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
-        left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
-        
-        # 添加填充
-        img_padded = cv2.copyMakeBorder(
-            img_resized, top, bottom, left, right, 
-            cv2.BORDER_CONSTANT, value=color
-        )
-        
-        return img_padded, ratio, left, top
-    
-    def _to_standard_results(self, results, ratio: float, padw: int, padh: int, orig_shape: Tuple[int, int]) -> List[Dict]:
+    def _to_standard_results(self, results, meta: PreprocessMeta) -> List[Dict]:
         """
         转换为标准化结果
         Args:
-            results: YOLOv8原始结果
-            ratio: 缩放比例
-            padw: 填充宽度
-            padh: 填充高度
-            orig_shape: 原始图像尺寸
+            results: YOLOv8原始结果（单帧）
+            meta: 预处理几何信息
         Returns:
             标准化结果列表
         """
@@ -161,18 +124,8 @@ class YOLOv8UnifiedModel(BaseModel):
                     # 获取边界框坐标
                     xyxy = boxes.xyxy[i].cpu().numpy()
                     
-                    # 坐标反变换（从填充图像坐标转换回原图坐标）
-                    x1, y1, x2, y2 = xyxy
-                    x1 = (x1 - padw) / ratio
-                    y1 = (y1 - padh) / ratio
-                    x2 = (x2 - padw) / ratio
-                    y2 = (y2 - padh) / ratio
-                    
-                    # 确保坐标在有效范围内
-                    x1 = max(0, min(x1, orig_shape[1]))
-                    y1 = max(0, min(y1, orig_shape[0]))
-                    x2 = max(0, min(x2, orig_shape[1]))
-                    y2 = max(0, min(y2, orig_shape[0]))
+                    # 坐标反变换（从模型输入坐标转换回原图坐标，并限制在有效范围内）
+                    x1, y1, x2, y2 = meta.to_original(*xyxy)
                     
                     # 获取置信度和类别
                     conf = float(boxes.conf[i].cpu().numpy())
@@ -201,31 +154,50 @@ class YOLOv8UnifiedModel(BaseModel):
         Returns:
             Tuple[原始结果, 标准化结果列表]
         """
+        if image is None or image.size == 0:
+            logger.error("YOLOv8推理失败: 输入图像为空")
+            return None, []
+        return self.infer_batch([image])[0]
+    
+    def infer_batch(self, images: List[np.ndarray]) -> List[Tuple[Any, List[Dict]]]:
+        """
+        批量推理（一次前向计算处理多帧）
+        Args:
+            images: 输入图像列表 (BGR格式)
+        Returns:
+            List[Tuple[原始结果, 标准化结果列表]]，与输入顺序一致
+        """
         if not self.model:
             logger.error("模型未加载")
-            return None, []
+            return [(None, []) for _ in images]
         
         try:
             # 预处理
-            img_padded, ratio, padw, padh, orig_shape = self._preprocess(image)
+            batch, metas = self._preprocess(images)
             
             # 执行推理
             results = self.model(
-                img_padded,
+                batch,
                 conf=self.config['conf_thres'],
                 iou=self.config['iou_thres'],
                 device=self.device,
                 max_det=self.config['max_det']
             )
             
-            # 转换为标准化结果
-            standard_results = self._to_standard_results(results, ratio, padw, padh, orig_shape)
-            
-            return results, standard_results
+            # 按帧拆分并转换为标准化结果
+            outputs = []
+            for i, meta in enumerate(metas):
+                frame_results = results[i:i + 1]
+                outputs.append((frame_results, self._to_standard_results(frame_results, meta)))
+            return outputs
             
         except Exception as e:
             logger.error(f"YOLOv8推理失败: {e}")
-            return None, []
+            return [(None, []) for _ in images]
+    
+    def get_preprocess_stats(self) -> Dict[str, Any]:
+        """获取预处理各阶段耗时统计"""
+        return self.preprocessor.get_stats()
 
 
 def create_model(model_config: Dict[str, Any]) -> YOLOv8UnifiedModel:
@@ -0,0 +1,231 @@
+"""
+模型输入预处理引擎
+- 按源分辨率缓存letterbox几何参数和缩放中间缓冲区，热路径不再分配新数组
+- 输出张量(N, 3, H, W)按批大小预分配，填充区域只在槽位几何变化时重写
+- 缩放后一次遍历完成BGR→RGB、HWC→CHW和归一化，直接写入输出张量
+- 支持多帧批量输入，与模型的批量推理接口配合
+- 记录各阶段耗时（缩放/打包/填充/总计），用于校验预处理配置文件中的性能预期
+"""
+
+import time
+import logging
+from collections import deque
+from typing import Any, Dict, List, NamedTuple, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 预处理方式：letterbox保持宽高比并填充，resize直接拉伸，crop中心裁剪为正方形后缩放
+PREPROCESS_MODES = ('letterbox', 'resize', 'crop')
+
+# 各阶段耗时保留的最近样本数
+TIMING_WINDOW = 512
+
+# 计时阶段
+STAGES = ('resize', 'pack', 'pad', 'total')
+
+
+class PreprocessMeta(NamedTuple):
+    """单帧预处理几何信息，用于把模型输出坐标映射回原图"""
+    ratio_x: float
+    ratio_y: float
+    pad_x: int
+    pad_y: int
+    crop_x: int
+    crop_y: int
+    orig_shape: Tuple[int, int]
+
+    def to_original(self, x1, y1, x2, y2):
+        """模型输入坐标 → 原图坐标（已裁剪到原图范围内）"""
+        height, width = self.orig_shape
+        x1 = min(max((x1 - self.pad_x) / self.ratio_x + self.crop_x, 0), width)
+        y1 = min(max((y1 - self.pad_y) / self.ratio_y + self.crop_y, 0), height)
+        x2 = min(max((x2 - self.pad_x) / self.ratio_x + self.crop_x, 0), width)
+        y2 = min(max((y2 - self.pad_y) / self.ratio_y + self.crop_y, 0), height)
+        return x1, y1, x2, y2
+
+
+class _Geometry:
+    """某一源分辨率下的几何参数与缩放缓冲区"""
+    __slots__ = ('crop', 'new_w', 'new_h', 'top', 'left', 'meta', 'resized')
+
+    def __init__(self, src_shape, size, mode):
+        src_h, src_w = src_shape
+        crop_x = crop_y = 0
+        if mode == 'crop':
+            side = min(src_h, src_w)
+            crop_x, crop_y = (src_w - side) // 2, (src_h - side) // 2
+            src_h = src_w = side
+        self.crop = (crop_y, crop_y + src_h, crop_x, crop_x + src_w)
+
+        if mode == 'letterbox':
+            ratio = min(size / src_h, size / src_w)
+            self.new_w, self.new_h = int(round(src_w * ratio)), int(round(src_h * ratio))
+            dw, dh = (size - self.new_w) / 2, (size - self.new_h) / 2
+            self.top, self.left = int(round(dh - 0.1)), int(round(dw - 0.1))
+            ratio_x = ratio_y = ratio
+        else:
+            self.new_w = self.new_h = size
+            self.top = self.left = 0
+            ratio_x, ratio_y = size / src_w, size / src_h
+
+        self.meta = PreprocessMeta(ratio_x, ratio_y, self.left, self.top, crop_x, crop_y, tuple(src_shape))
+        # 源尺寸与目标尺寸一致时无需缩放
+        self.resized = None
+        if (src_h, src_w) != (self.new_h, self.new_w):
+            self.resized = np.empty((self.new_h, self.new_w, 3), dtype=np.uint8)
+
+
+class PreprocessEngine:
+    """预处理引擎（每个模型实例独占一个，非线程安全）"""
+
+    def __init__(self, img_size: int = 640, mode: str = 'letterbox', normalize: bool = True,
+                 half: bool = False, pad_value: int = 114, max_batch_size: int = 1):
+        """
+        初始化预处理引擎
+        Args:
+            img_size: 模型输入边长
+            mode: 预处理方式，见PREPROCESS_MODES
+            normalize: 是否归一化到[0,1]
+            half: 输出float16张量（减半拷贝量，模型以FP16推理时使用）
+            pad_value: letterbox填充像素值
+            max_batch_size: 预分配的批大小，超出时按需扩容
+        """
+        if mode not in PREPROCESS_MODES:
+            raise ValueError(f"未知预处理方式: {mode}")
+        self.img_size = int(img_size)
+        self.mode = mode
+        self.dtype = np.dtype(np.float16 if half else np.float32)
+        self.scale = self.dtype.type(1.0 / 255.0 if normalize else 1.0)
+        self.pad_value = pad_value * self.scale
+        # float16没有原生乘法内核，按256项查表转换更快
+        self._lut = (np.arange(256) * self.scale).astype(self.dtype) if half else None
+
+        self._geometries: Dict[Tuple[int, int], _Geometry] = {}
+        self._output = None
+        # 每个批槽位当前填充区对应的几何，几何不变时填充区无需重写
+        self._slot_geometry: List = []
+        self._allocate(max(1, int(max_batch_size)))
+
+        self._timings = {stage: deque(maxlen=TIMING_WINDOW) for stage in STAGES}
+        self.frames = 0
+
+    def _allocate(self, batch_size):
+        """（重新）分配输出张量"""
+        self._output = np.full((batch_size, 3, self.img_size, self.img_size), self.pad_value, dtype=self.dtype)
+        self._slot_geometry = [None] * batch_size
+        logger.debug(f"预处理输出张量已分配: {self._output.shape}, {self._output.dtype}")
+
+    def _geometry(self, src_shape) -> _Geometry:
+        geometry = self._geometries.get(src_shape)
+        if geometry is None:
+            geometry = _Geometry(src_shape, self.img_size, self.mode)
+            self._geometries[src_shape] = geometry
+        return geometry
+
+    def _fill_padding(self, index, geometry):
+        """按几何重写槽位的填充区（只在槽位几何变化时执行）"""
+        out = self._output[index]
+        top, left = geometry.top, geometry.left
+        bottom, right = top + geometry.new_h, left + geometry.new_w
+        out[:, :top, :] = self.pad_value
+        out[:, bottom:, :] = self.pad_value
+        out[:, top:bottom, :left] = self.pad_value
+        out[:, top:bottom, right:] = self.pad_value
+        self._slot_geometry[index] = geometry
+
+    def _process_one(self, index, image) -> PreprocessMeta:
+        if image is None or image.size == 0:
+            raise ValueError("输入图像为空")
+        if image.ndim == 2:
+            image = image[:, :, None]
+        geometry = self._geometry(image.shape[:2])
+
+        t0 = time.perf_counter()
+        y0, y1, x0, x1 = geometry.crop
+        src = image[y0:y1, x0:x1]
+        # 单通道按灰度复制到三个通道；三通道及以上按BGR(A)取前三个通道
+        channels = (0, 0, 0) if src.shape[2] == 1 else (2, 1, 0)
+        if geometry.resized is not None:
+            if src.shape[2] not in (1, 3):
+                src = np.ascontiguousarray(src[:, :, :3])
+                channels = (2, 1, 0)
+            resized = cv2.resize(src, (geometry.new_w, geometry.new_h),
+                                 dst=geometry.resized if src.shape[2] == 3 else None,
+                                 interpolation=cv2.INTER_LINEAR)
+            if resized.ndim == 2:
+                resized = resized[:, :, None]
+            src = resized
+        t1 = time.perf_counter()
+
+        # 一次遍历：通道重排(BGR→RGB) + 布局转换(HWC→CHW) + 归一化，直接写入输出张量
+        top, left = geometry.top, geometry.left
+        region = self._output[index, :, top:top + geometry.new_h, left:left + geometry.new_w]
+        for c, src_c in enumerate(channels):
+            if self._lut is not None:
+                np.take(self._lut, src[:, :, src_c], out=region[c])
+            else:
+                np.multiply(src[:, :, src_c], self.scale, out=region[c], casting='unsafe')
+        t2 = time.perf_counter()
+
+        if self._slot_geometry[index] is not geometry:
+            self._fill_padding(index, geometry)
+        t3 = time.perf_counter()
+
+        self._record('resize', t1 - t0)
+        self._record('pack', t2 - t1)
+        self._record('pad', t3 - t2)
+        return geometry.meta
+
+    def _record(self, stage, seconds):
+        self._timings[stage].append(seconds * 1000.0)
+
+    def process(self, images: Sequence[np.ndarray]) -> Tuple[np.ndarray, List[PreprocessMeta]]:
+        """
+        批量预处理
+        Args:
+            images: BGR图像列表（尺寸可各不相同）
+        Returns:
+            (输出张量(N, 3, H, W)，每帧几何信息)；输出张量是引擎内部缓冲区的视图，
+            下一次调用会覆盖其内容，调用方须在此之前用完
+        """
+        start = time.perf_counter()
+        count = len(images)
+        if count > len(self._output):
+            self._allocate(count)
+        metas = [self._process_one(i, image) for i, image in enumerate(images)]
+        self.frames += count
+        self._record('total', time.perf_counter() - start)
+        return self._output[:count], metas
+
+    def process_one(self, image: np.ndarray) -> Tuple[np.ndarray, PreprocessMeta]:
+        """单帧预处理，返回(输出张量(1, 3, H, W)，几何信息)"""
+        tensor, metas = self.process([image])
+        return tensor, metas[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取各阶段耗时统计(毫秒)：次数、平均、p50、p95、最大"""
+        stats = {}
+        for stage, samples in self._timings.items():
+            if not samples:
+                stats[stage] = {'count': 0, 'avg_ms': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0}
+                continue
+            values = np.fromiter(samples, dtype=np.float64)
+            stats[stage] = {
+                'count': len(values),
+                'avg_ms': round(float(values.mean()), 3),
+                'p50_ms': round(float(np.percentile(values, 50)), 3),
+                'p95_ms': round(float(np.percentile(values, 95)), 3),
+                'max_ms': round(float(values.max()), 3),
+            }
+        stats['frames'] = self.frames
+        stats['resolutions'] = len(self._geometries)
+        return stats
+
+    def reset_stats(self):
+        """清空耗时样本"""
+        for samples in self._timings.values():
+            samples.clear()
+        self.frames = 0
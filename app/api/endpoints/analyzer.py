@@ -9,10 +9,13 @@ AI分析器API端点 - 专注AI分析业务
 """
 
 from fastapi import APIRouter, HTTPException, Depends, Query, Path, Body, BackgroundTasks
+from fastapi.responses import FileResponse, Response
+from sqlalchemy import String, tuple_, type_coerce
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Any
 import logging
 import json
+import os
 import uuid
 from datetime import datetime
 
@@ -24,8 +27,17 @@ from ...schemas.analyzer import (
     AnalyzerStatus
 )
 from ...core.analyzer.analyzer_service import get_analyzer_service
+from ...core.analyzer.event_bus import Event
+from ...core.alarm_media_cache import alarm_media_cache
+from ...core.auth_cache import auth_cache
+from ...core.menu_cache import menu_cache
+from ...core.org_hierarchy import org_hierarchy
 from ...utils.utils import success_response, error_response, get_current_active_user, generate_unique_id as utils_generate_id
 from ...db.database import get_db
+from ...db.connection import get_pool_stats
+from ...db.pagination import (
+    COUNT_EXACT, COUNT_MODES, COUNT_NONE, CountCache, decode_cursor, next_cursor
+)
 from ...db.models import Task, VideoStream, Algorithm, Alarm
 from ...schemas.task import TaskCreate as TaskCreateModel, TaskResponse
 from ...schemas.alarm import AlarmCreate, AlarmResponse
@@ -39,6 +51,9 @@ router = APIRouter()
 # 获取服务实例
 analyzer_service = get_analyzer_service()
 
+# 告警列表总数缓存（cached/estimate模式）
+alarm_count_cache = CountCache()
+
 # ============================================================================
 # 系统控制接口
 # ============================================================================
@@ -340,9 +355,16 @@ def update_task_alarm_config(
     config = json.loads(task.config) if task.config else {}
     config["alarm_config"] = alarm_config
     task.config = json.dumps(config)
+    task.alarm_config = json.dumps(alarm_config)
     
     db.commit()
     
+    # 通知告警模块重新编译该任务的告警规则
+    analyzer_service.event_bus.publish(Event("task.updated", "api", {
+        "task_id": task_id,
+        "fields": ["alarm_config"]
+    }))
+    
     return {
         "code": 200,
         "data": {"task_id": task_id, "alarm_config": alarm_config},
@@ -372,6 +394,22 @@ def get_system_status(current_user = Depends(get_current_active_user)):
         logger.error(f"获取系统状态异常: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/system/database", response_model=Dict[str, Any])
+def get_database_stats(current_user = Depends(get_current_active_user)):
+    """获取数据库连接池统计（连接等待时间、语句执行耗时）"""
+    return {"pools": get_pool_stats()}
+
+@router.get("/system/cache", response_model=Dict[str, Any])
+def get_cache_stats(current_user = Depends(get_current_active_user)):
+    """获取缓存命中统计（认证缓存、告警媒体缓存、告警总数缓存、组织树缓存、菜单缓存）"""
+    return {
+        "auth": auth_cache.get_stats(),
+        "alarm_media": alarm_media_cache.get_stats(),
+        "alarm_count": alarm_count_cache.get_stats(),
+        "organizations": org_hierarchy.get_stats(),
+        "menu": menu_cache.get_stats()
+    }
+
 @router.get("/system/performance", response_model=Dict[str, Any])
 def get_performance_stats(
     time_range: str = Query("1h", description="时间范围"),
@@ -425,12 +463,23 @@ async def get_alarm_list(
     task_id: Optional[str] = Query(None, description="任务ID"),
     stream_id: Optional[str] = Query(None, description="流ID"),
     status: Optional[str] = Query(None, description="状态"),
-    page: int = Query(1, ge=1, description="页码"),
+    page: int = Query(1, ge=1, description="页码（未传cursor时使用）"),
     page_size: int = Query(20, ge=1, le=100, description="每页数量"),
+    cursor: Optional[str] = Query(None, description="游标，传入上一页返回的next_cursor时按游标分页，忽略page"),
+    count_mode: str = Query(COUNT_EXACT, description="总数统计模式：exact、cached、estimate、none"),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
-    """获取报警列表"""
+    """获取报警列表（页码分页或(created_at, alarm_id)游标分页）"""
+    if count_mode not in COUNT_MODES:
+        raise HTTPException(status_code=400, detail=f"不支持的总数统计模式: {count_mode}")
+    try:
+        cursor_key = decode_cursor(cursor) if cursor else None
+        if cursor_key and cursor_key[0]:
+            datetime.fromisoformat(cursor_key[0])
+    except ValueError:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+    
     try:
         # 构建查询
         query = db.query(Alarm)
@@ -442,13 +491,26 @@ async def get_alarm_list(
         if status:
             query = query.filter(Alarm.processed == (status == "processed"))
         
-        # 计算总数
-        total = query.count()
+        # 计算总数（cached/estimate模式在有效期内复用精确计数）
+        if count_mode == COUNT_NONE:
+            total = None
+        elif count_mode == COUNT_EXACT:
+            total = query.count()
+        else:
+            total = alarm_count_cache.get((task_id, stream_id, status), query.count)
         
-        # 分页查询
-        alarms = query.order_by(Alarm.created_at.desc()).offset(
-            (page - 1) * page_size
-        ).limit(page_size).all()
+        # 分页查询（排序与复合索引一致）
+        # 游标携带库中原始的created_at文本并按文本绑定：SQLite按文本比较，
+        # 解析成datetime再绑定会多出微秒部分，与func.now()写入的秒级时间比较时游标无法前进
+        stored_created_at = type_coerce(Alarm.created_at, String)
+        query = query.add_columns(stored_created_at).order_by(Alarm.created_at.desc(), Alarm.alarm_id.desc())
+        if cursor_key:
+            query = query.filter(tuple_(stored_created_at, Alarm.alarm_id) <
+                                 tuple_(type_coerce(cursor_key[0], String), cursor_key[1]))
+        else:
+            query = query.offset((page - 1) * page_size)
+        rows = query.limit(page_size).all()
+        alarms = [row[0] for row in rows]
         
         # 构造响应数据
         alarm_list = []
@@ -473,8 +535,10 @@ async def get_alarm_list(
             "data": {
                 "alarms": alarm_list,
                 "total": total,
-                "page": page,
-                "page_size": page_size
+                "page": None if cursor_key else page,
+                "page_size": page_size,
+                "next_cursor": next_cursor(rows, page_size, lambda row: row[1],
+                                           lambda row: row[0].alarm_id)
             },
             "msg": "获取报警列表成功"
         }
@@ -591,6 +655,40 @@ async def get_alarm_media(
         logger.error(f"获取告警媒体文件异常: {e}")
         raise HTTPException(status_code=500, detail=f"获取告警媒体文件失败: {str(e)}")
 
+# 下载接口的媒体类型与告警记录字段（缩略图只在媒体缓存中）
+ALARM_MEDIA_FIELDS = {
+    "original": "original_image",
+    "processed": "processed_image",
+    "original_thumb": None,
+    "processed_thumb": None,
+    "original_image": "original_image",
+    "processed_image": "processed_image",
+    "video_clip": "video_clip"
+}
+
+@router.get("/alarms/{alarm_id}/download/{kind}")
+async def download_alarm_media(
+    alarm_id: str = Path(..., description="报警ID"),
+    kind: str = Path(..., description="媒体类型：original/processed/original_thumb/processed_thumb/video_clip"),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
+    """下载告警媒体文件（优先从告警媒体缓存返回，缓存未命中时读取告警记录中的文件）"""
+    if kind not in ALARM_MEDIA_FIELDS:
+        raise HTTPException(status_code=400, detail=f"不支持的媒体类型: {kind}")
+    
+    data = alarm_media_cache.get(alarm_id, kind.replace("_image", ""))
+    if data is not None:
+        return Response(content=data, media_type="image/jpeg",
+                        headers={"Cache-Control": "private, max-age=86400"})
+    
+    field = ALARM_MEDIA_FIELDS[kind]
+    alarm = db.query(Alarm).filter(Alarm.alarm_id == alarm_id).first() if field else None
+    path = getattr(alarm, field, None) if alarm else None
+    if not path or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="告警媒体文件不存在")
+    return FileResponse(path)
+
 # ============================================================================
 # 输出管理接口 (保持原有功能)
 # ============================================================================
@@ -14,6 +14,7 @@ from app.db.models import User, BlacklistedToken
 from app.schemas.auth import LoginParams, LoginResponse, TokenPayload, RefreshTokenResponse, Token
 from app.utils.logger import user_logger
 from app.utils.utils import get_current_user, oauth2_scheme
+from app.core.auth_cache import auth_cache
 
 router = APIRouter()
 
@@ -200,6 +201,7 @@ def refresh_token(
     db_token = BlacklistedToken(token=refresh_token)
     db.add(db_token)
     db.commit()
+    auth_cache.blacklist(refresh_token)
     
     user_logger.info(f"用户刷新令牌: {user.username}")
     
@@ -225,6 +227,7 @@ def logout(
         db_token = BlacklistedToken(token=token)
         db.add(db_token)
         db.commit()
+        auth_cache.blacklist(token)
         
         user_logger.info(f"用户登出: {current_user.username}")
         
@@ -3,15 +3,15 @@
 提供组织的完整CRUD操作、层级管理和绑定管理
 """
 
-from typing import Any, List, Optional
+from typing import Any, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_
 
+from app.core.org_hierarchy import get_streams, list_organizations, move_subtree_paths, org_hierarchy
 from app.db.database import get_db
-from app.db.models import Organization, OrganizationBinding, VideoStream
+from app.db.models import Organization, OrganizationBinding
 from app.schemas.organization import (
-    OrganizationCreate, OrganizationUpdate, OrganizationInfo, OrganizationNode,
+    OrganizationCreate, OrganizationUpdate, OrganizationInfo,
     OrganizationTreeResponse, OrganizationListResponse, OrganizationOperationResponse,
     OrganizationMoveRequest, OrganizationQueryParams, OrganizationStreamsResponse
 )
@@ -20,33 +20,6 @@ from app.utils.utils import get_current_user, get_current_active_superuser, gene
 router = APIRouter()
 
 
-def build_organization_tree(organizations: List[Organization], parent_id: Optional[str] = None) -> List[OrganizationNode]:
-    """构建组织树"""
-    tree = []
-    for org in organizations:
-        if org.parent_id == parent_id:
-            # 统计绑定的视频流数量
-            stream_count = len(org.bindings) if hasattr(org, 'bindings') else 0
-            
-            node = OrganizationNode(
-                org_id=org.org_id,
-                name=org.name,
-                parent_id=org.parent_id,
-                path=org.path,
-                description=org.description,
-                status=org.status,
-                sort_order=org.sort_order,
-                created_at=org.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-                stream_count=stream_count,
-                children=build_organization_tree(organizations, org.org_id)
-            )
-            tree.append(node)
-    
-    # 按排序顺序排列
-    tree.sort(key=lambda x: x.sort_order)
-    return tree
-
-
 def update_organization_path(db: Session, org: Organization, new_parent_id: Optional[str] = None):
     """更新组织路径"""
     if new_parent_id:
@@ -63,21 +36,20 @@ def update_organization_path(db: Session, org: Organization, new_parent_id: Opti
 
 @router.get("/tree", response_model=OrganizationTreeResponse)
 def get_organization_tree(
+    root_id: Optional[str] = Query(None, description="子树根组织ID，不传返回整棵树"),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ) -> Any:
     """
-    获取组织树结构
+    获取组织树结构（内存缓存，组织变更时重建）
     """
-    # 查询所有组织
-    organizations = db.query(Organization).all()
-    
-    # 构建树结构
-    tree = build_organization_tree(organizations)
+    tree, total = org_hierarchy.get_tree(db, root_id)
+    if root_id is not None and not tree:
+        raise HTTPException(status_code=404, detail="组织不存在")
     
     return OrganizationTreeResponse(
         organizations=tree,
-        total=len(organizations)
+        total=total
     )
 
 
@@ -90,58 +62,14 @@ def get_organizations_list(
     """
     获取组织列表（平铺结构）
     """
-    # 基本查询
-    query = db.query(Organization)
-    
-    # 关键词搜索
-    if params.keyword:
-        search_filter = or_(
-            Organization.name.ilike(f"%{params.keyword}%"),
-            Organization.description.ilike(f"%{params.keyword}%")
-        )
-        query = query.filter(search_filter)
-    
-    # 状态过滤
-    if params.status:
-        query = query.filter(Organization.status == params.status)
-    
-    # 父组织过滤
-    if params.parent_id:
-        query = query.filter(Organization.parent_id == params.parent_id)
-    
-    # 计算总数
-    total = query.count()
-    
-    # 分页查询
-    organizations = query.order_by(Organization.sort_order).offset(
-        (params.current - 1) * params.size
-    ).limit(params.size).all()
-    
-    # 构造响应数据
-    org_items = []
-    for org in organizations:
-        # 获取父组织名称
-        parent_name = None
-        if org.parent_id:
-            parent = db.query(Organization).filter(Organization.org_id == org.parent_id).first()
-            parent_name = parent.name if parent else None
-        
-        # 统计绑定的视频流数量
-        stream_count = db.query(OrganizationBinding).filter(
-            OrganizationBinding.org_id == org.org_id
-        ).count()
-        
-        org_items.append({
-            "org_id": org.org_id,
-            "name": org.name,
-            "parent_id": org.parent_id,
-            "parent_name": parent_name,
-            "description": org.description,
-            "status": org.status,
-            "sort_order": org.sort_order,
-            "stream_count": stream_count,
-            "created_at": org.created_at.strftime("%Y-%m-%d %H:%M:%S")
-        })
+    org_items, total = list_organizations(
+        db,
+        keyword=params.keyword,
+        status=params.status,
+        parent_id=params.parent_id,
+        offset=(params.current - 1) * params.size,
+        limit=params.size
+    )
     
     return OrganizationListResponse(
         organizations=org_items,
@@ -320,18 +248,15 @@ def move_organization(
             raise HTTPException(status_code=400, detail="不能将组织移动到其子组织下")
     
     # 更新组织路径
+    old_path = organization.path
     update_organization_path(db, organization, move_data.new_parent_id)
     
-    # 如果需要更新子组织路径
+    # 如果需要更新子组织路径（一条UPDATE替换路径前缀）
     if move_data.update_children_path:
-        children = db.query(Organization).filter(Organization.path.like(f"{organization.path}%")).all()
-        for child in children:
-            if child.org_id != organization.org_id:
-                # 重新构建子组织路径
-                relative_path = child.path[len(organization.path):]
-                child.path = f"{organization.path}{relative_path}"
+        move_subtree_paths(db, old_path, organization.path)
     
     db.commit()
+    org_hierarchy.invalidate()
     
     return OrganizationOperationResponse(
         success=True,
@@ -345,6 +270,7 @@ def move_organization(
 @router.get("/{org_id}/streams", response_model=OrganizationStreamsResponse)
 def get_organization_streams(
     org_id: str,
+    include_children: bool = Query(False, description="是否包含下级组织绑定的视频流"),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ) -> Any:
@@ -355,19 +281,7 @@ def get_organization_streams(
     if not organization:
         raise HTTPException(status_code=404, detail="组织不存在")
     
-    # 查询绑定的视频流
-    bindings = db.query(OrganizationBinding).filter(OrganizationBinding.org_id == org_id).all()
-    stream_ids = [binding.stream_id for binding in bindings]
-    
-    if not stream_ids:
-        return OrganizationStreamsResponse(
-            org_id=org_id,
-            org_name=organization.name,
-            streams=[],
-            total=0
-        )
-    
-    streams = db.query(VideoStream).filter(VideoStream.stream_id.in_(stream_ids)).all()
+    streams = get_streams(db, organization, include_children)
     
     stream_items = []
     for stream in streams:
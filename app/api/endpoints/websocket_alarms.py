@@ -1,122 +1,103 @@
 """
 WebSocket报警触发接口
-用于实时触发报警视频保存
+用于实时触发报警视频保存，并转发告警进程推送的告警通知
+- 告警通知：元数据为JSON文本帧，图片为独立二进制帧（见core.alarm_protocol）
+- 客户端通过连接参数media或set_media_mode消息协商图片模式：full/thumbnail/url
+- 连接由统一WebSocket管理器管理，发送经各连接的发送队列，慢客户端不阻塞接收循环
+- 告警进程以role=producer连接，登记为单独的连接类型，不接收告警广播（它从不读取连接，否则会被当作慢客户端断开）
 """
 
 from fastapi import WebSocket, WebSocketDisconnect, APIRouter
-from typing import Dict, List
+from typing import Dict, Optional
 import json
 import logging
-import asyncio
 from datetime import datetime
 
 from app.core.video_recorder import video_recorder
+from app.core.alarm_media_cache import alarm_media_cache
+from app.core.websocket_manager import unified_ws_manager, WebSocketType
+from core.alarm_protocol import PRODUCER_ROLE, AlarmAssembler
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-class AlarmWebSocketManager:
-    """报警WebSocket管理器"""
-    
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        self.stream_connections: Dict[str, List[WebSocket]] = {}
-    
-    async def connect(self, websocket: WebSocket, stream_id: str = None, accept_connection: bool = True):
-        """连接WebSocket"""
-        if accept_connection:
-            await websocket.accept()
-        
-        self.active_connections.append(websocket)
-        
-        if stream_id:
-            if stream_id not in self.stream_connections:
-                self.stream_connections[stream_id] = []
-            self.stream_connections[stream_id].append(websocket)
-        
-        logger.info(f"WebSocket连接建立，总连接数: {len(self.active_connections)}")
-    
-    def disconnect(self, websocket: WebSocket, stream_id: str = None):
-        """断开WebSocket连接"""
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-        
-        if stream_id and stream_id in self.stream_connections:
-            if websocket in self.stream_connections[stream_id]:
-                self.stream_connections[stream_id].remove(websocket)
-        
-        logger.info(f"WebSocket连接断开，总连接数: {len(self.active_connections)}")
-    
-    async def send_personal_message(self, message: str, websocket: WebSocket):
-        """发送个人消息"""
-        try:
-            await websocket.send_text(message)
-        except Exception as e:
-            logger.error(f"发送个人消息失败: {e}")
-            self.disconnect(websocket)
-    
-    async def broadcast(self, message: str):
-        """广播消息"""
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except Exception as e:
-                logger.error(f"广播消息失败: {e}")
-                disconnected.append(connection)
-        
-        # 清理断开的连接
-        for connection in disconnected:
-            self.disconnect(connection)
-    
-    async def broadcast_to_stream(self, message: str, stream_id: str):
-        """向特定流广播消息"""
-        if stream_id not in self.stream_connections:
-            return
-        
-        disconnected = []
-        for connection in self.stream_connections[stream_id]:
-            try:
-                await connection.send_text(message)
-            except Exception as e:
-                logger.error(f"向流广播消息失败: {e}")
-                disconnected.append(connection)
-        
-        # 清理断开的连接
-        for connection in disconnected:
-            self.disconnect(connection, stream_id)
-
-# 全局WebSocket管理器
-alarm_ws_manager = AlarmWebSocketManager()
-
 @router.websocket("/alarms")
 async def alarm_websocket(websocket: WebSocket):
     """报警WebSocket连接"""
-    await alarm_ws_manager.connect(websocket)
+    if websocket.query_params.get("role") == PRODUCER_ROLE:
+        ws_type = WebSocketType.ALARM_PRODUCER.value
+    else:
+        ws_type = WebSocketType.ALARMS.value
+    if not await unified_ws_manager.connect(websocket, ws_type,
+                                            media_mode=websocket.query_params.get("media")):
+        return
+    # 告警进程推送的告警：元数据文本帧之后跟随图片二进制帧
+    assembler = AlarmAssembler()
     
     try:
         while True:
-            # 接收客户端消息
-            data = await websocket.receive_text()
-            message = json.loads(data)
+            # 接收客户端消息（文本或二进制帧）
+            data = await websocket.receive()
+            if data["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(data.get("code", 1000))
+            if data.get("bytes") is not None:
+                await handle_alarm_media(data["bytes"], assembler, websocket)
+                continue
+            message = json.loads(data["text"])
             
             # 处理不同类型的消息
-            if message["type"] == "alarm_detected":
+            if message["type"] == "alarm":
+                await handle_alarm_notification(message, assembler, websocket)
+            elif message["type"] == "set_media_mode":
+                await handle_set_media_mode(message, websocket)
+            elif message["type"] == "alarm_detected":
                 await handle_alarm_detected(message, websocket)
             elif message["type"] == "subscribe_stream":
                 await handle_subscribe_stream(message, websocket)
             elif message["type"] == "ping":
-                await alarm_ws_manager.send_personal_message(
+                await unified_ws_manager.send_personal_message(
                     json.dumps({"type": "pong", "timestamp": datetime.now().isoformat()}),
                     websocket
                 )
                 
     except WebSocketDisconnect:
-        alarm_ws_manager.disconnect(websocket)
+        unified_ws_manager.disconnect(websocket)
         logger.info("报警WebSocket连接断开")
     except Exception as e:
         logger.error(f"报警WebSocket异常: {e}")
-        alarm_ws_manager.disconnect(websocket)
+        unified_ws_manager.disconnect(websocket)
+
+async def publish_alarm(metadata: Dict, media: Dict[str, bytes], source: Optional[WebSocket] = None):
+    """缓存告警图片并按各客户端的媒体模式广播"""
+    alarm_media_cache.put(metadata["alarm_id"], media)
+    sent = await unified_ws_manager.broadcast_alarm(metadata, media, exclude=source)
+    logger.info(f"告警通知已转发: {metadata['alarm_id']}, 客户端数: {sent}")
+
+async def handle_alarm_notification(message: Dict, assembler: AlarmAssembler, websocket: WebSocket):
+    """处理告警进程推送的告警元数据，图片声明为空时直接广播"""
+    if not message.get("alarm_id"):
+        return
+    completed = assembler.begin(message)
+    if completed:
+        await publish_alarm(*completed, source=websocket)
+
+async def handle_alarm_media(frame: bytes, assembler: AlarmAssembler, websocket: WebSocket):
+    """处理告警图片二进制帧，收齐后广播"""
+    try:
+        completed = assembler.add(frame)
+    except ValueError as e:
+        logger.warning(f"忽略无效的告警二进制帧: {e}")
+        return
+    if completed:
+        await publish_alarm(*completed, source=websocket)
+
+async def handle_set_media_mode(message: Dict, websocket: WebSocket):
+    """处理告警图片媒体模式协商"""
+    media_mode = unified_ws_manager.set_media_mode(websocket, message.get("mode"))
+    await unified_ws_manager.send_personal_message(
+        json.dumps({"type": "media_mode_set", "mode": media_mode}),
+        websocket
+    )
 
 async def handle_alarm_detected(message: Dict, websocket: WebSocket):
     """处理报警检测消息"""
@@ -129,7 +110,7 @@ async def handle_alarm_detected(message: Dict, websocket: WebSocket):
         logger.info(f"WebSocket报警检测: stream_id={stream_id}, alarm_id={alarm_id}")
         
         if not stream_id or not alarm_id:
-            await alarm_ws_manager.send_personal_message(
+            await unified_ws_manager.send_personal_message(
                 json.dumps({
                     "type": "error",
                     "message": "缺少必要参数：stream_id 或 alarm_id"
@@ -168,14 +149,8 @@ async def handle_alarm_detected(message: Dict, websocket: WebSocket):
                 "saved_time": datetime.now().isoformat()
             }
             
-            # 向所有连接广播
-            await alarm_ws_manager.broadcast(json.dumps(success_message))
-            
-            # 向特定流广播
-            await alarm_ws_manager.broadcast_to_stream(
-                json.dumps(success_message), 
-                stream_id
-            )
+            # 向所有报警连接广播（流订阅者也是报警连接，只发送一次）
+            await unified_ws_manager.broadcast_to_type(success_message, WebSocketType.ALARMS.value)
             
             logger.info(f"报警视频保存成功: {alarm_id} -> {video_path}")
         else:
@@ -187,7 +162,7 @@ async def handle_alarm_detected(message: Dict, websocket: WebSocket):
                 "error": "保存报警视频失败"
             }
             
-            await alarm_ws_manager.send_personal_message(
+            await unified_ws_manager.send_personal_message(
                 json.dumps(error_message),
                 websocket
             )
@@ -196,7 +171,7 @@ async def handle_alarm_detected(message: Dict, websocket: WebSocket):
             
     except Exception as e:
         logger.error(f"处理报警检测消息失败: {e}")
-        await alarm_ws_manager.send_personal_message(
+        await unified_ws_manager.send_personal_message(
             json.dumps({
                 "type": "error",
                 "message": f"处理报警检测消息失败: {str(e)}"
@@ -210,7 +185,7 @@ async def handle_subscribe_stream(message: Dict, websocket: WebSocket):
         stream_id = message.get("stream_id")
         
         if not stream_id:
-            await alarm_ws_manager.send_personal_message(
+            await unified_ws_manager.send_personal_message(
                 json.dumps({
                     "type": "error",
                     "message": "缺少必要参数：stream_id"
@@ -219,12 +194,11 @@ async def handle_subscribe_stream(message: Dict, websocket: WebSocket):
             )
             return
         
-        # 重新连接WebSocket到特定流（不重复accept）
-        alarm_ws_manager.disconnect(websocket)
-        await alarm_ws_manager.connect(websocket, stream_id, accept_connection=False)
+        # 订阅特定流（已订阅其他流时先取消，保留媒体模式）
+        await unified_ws_manager.subscribe_to_stream(websocket, stream_id)
         
         # 发送订阅成功消息
-        await alarm_ws_manager.send_personal_message(
+        await unified_ws_manager.send_personal_message(
             json.dumps({
                 "type": "stream_subscribed",
                 "stream_id": stream_id,
@@ -237,7 +211,7 @@ async def handle_subscribe_stream(message: Dict, websocket: WebSocket):
         
     except Exception as e:
         logger.error(f"处理订阅流消息失败: {e}")
-        await alarm_ws_manager.send_personal_message(
+        await unified_ws_manager.send_personal_message(
             json.dumps({
                 "type": "error",
                 "message": f"处理订阅流消息失败: {str(e)}"
@@ -270,9 +244,8 @@ async def trigger_alarm_video_save(stream_id: str, alarm_id: str,
                 "saved_time": datetime.now().isoformat()
             }
             
-            # 广播消息
-            await alarm_ws_manager.broadcast(json.dumps(message))
-            await alarm_ws_manager.broadcast_to_stream(json.dumps(message), stream_id)
+            # 向所有报警连接广播（流订阅者也是报警连接，只发送一次）
+            await unified_ws_manager.broadcast_to_type(message, WebSocketType.ALARMS.value)
             
             logger.info(f"触发报警视频保存成功: {alarm_id} -> {video_path}")
             return video_path
@@ -1,6 +1,9 @@
 """
 WebSocket状态更新接口
 用于实时推送系统状态和任务状态
+- 连接建立时发送全量状态（initial_status，与get_task_status()结构一致，另带序号seq与streams）
+- 之后由状态推送服务按task.*/stream.*事件推送增量（status_delta），各连接共享同一次计算结果
+- 客户端发现seq不连续时发送request_status获取全量状态
 """
 
 from fastapi import WebSocket, WebSocketDisconnect, APIRouter
@@ -12,10 +15,25 @@ from datetime import datetime
 
 from app.core.websocket_manager import unified_ws_manager, WebSocketType
 from app.core.analyzer.analyzer_service import AnalyzerService
+from app.core.analyzer.event_bus import get_event_bus
+from app.core.status_publisher import StatusPublisher, build_status_snapshot
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+def _has_status_subscribers() -> bool:
+    return bool(unified_ws_manager.connections_by_type.get(WebSocketType.STATUS.value))
+
+async def _broadcast_status(message: Dict) -> int:
+    return await unified_ws_manager.broadcast_to_type(message, WebSocketType.STATUS.value)
+
+# 全局状态推送服务
+status_publisher = StatusPublisher(
+    snapshot=lambda: build_status_snapshot(AnalyzerService.get_instance()),
+    broadcast=_broadcast_status,
+    has_subscribers=_has_status_subscribers
+)
+
 @router.websocket("/status")
 async def status_websocket(websocket: WebSocket):
     """状态WebSocket连接"""
@@ -31,11 +49,8 @@ async def status_websocket(websocket: WebSocket):
         return
     
     try:
-        # 获取分析器服务实例
-        analyzer_service = AnalyzerService.get_instance()
-        
-        # 发送初始状态
-        initial_status = analyzer_service.get_task_status()
+        # 发送初始状态（与增量推送共享同一份快照）
+        initial_status = await status_publisher.current_snapshot()
         initial_message = {
             "type": "initial_status",
             "data": initial_status,
@@ -71,8 +86,8 @@ async def status_websocket(websocket: WebSocket):
                     )
                     
                 elif message.get("type") == "request_status":
-                    # 请求当前状态
-                    current_status = analyzer_service.get_task_status()
+                    # 请求当前全量状态
+                    current_status = await status_publisher.current_snapshot()
                     status_message = {
                         "type": "status_update",
                         "data": current_status,
@@ -86,7 +101,7 @@ async def status_websocket(websocket: WebSocket):
                     
                 elif message.get("type") == "request_stats":
                     # 请求连接统计
-                    stats = unified_ws_manager.get_connection_stats()
+                    stats = {**unified_ws_manager.get_connection_stats(), "publisher": status_publisher.get_stats()}
                     stats_message = {
                         "type": "connection_stats",
                         "data": stats,
@@ -145,34 +160,16 @@ async def broadcast_status_update(status_data: Dict):
         logger.error(f"状态更新广播失败: {e}")
         return 0
 
-# 系统状态定时广播任务
+# 系统状态推送任务
 async def status_broadcast_task():
-    """定时广播系统状态的后台任务"""
+    """状态推送后台任务：订阅任务/流事件，按事件推送状态增量"""
     logger.info("状态广播任务启动")
-    
-    while True:
-        try:
-            # 检查是否有状态WebSocket连接
-            stats = unified_ws_manager.get_connection_stats()
-            status_connections = stats["connections_by_type"].get(WebSocketType.STATUS.value, 0)
-            
-            if status_connections > 0:
-                # 获取当前状态
-                analyzer_service = AnalyzerService.get_instance()
-                current_status = analyzer_service.get_task_status()
-                
-                # 广播状态更新
-                await broadcast_status_update(current_status)
-            
-            # 等待5秒后下次广播
-            await asyncio.sleep(5)
-            
-        except asyncio.CancelledError:
-            logger.info("状态广播任务被取消")
-            break
-        except Exception as e:
-            logger.error(f"状态广播任务异常: {e}", exc_info=True)
-            await asyncio.sleep(5)  # 错误后休眠
+    event_bus = get_event_bus()
+    status_publisher.attach(event_bus)
+    try:
+        await status_publisher.run()
+    finally:
+        status_publisher.detach(event_bus)
 
 # 连接统计广播（可选）
 async def broadcast_connection_stats():
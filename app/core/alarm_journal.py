@@ -0,0 +1,260 @@
+"""
+告警写入日志（write-behind）
+- 每个数据库文件一个写线程，持有一条长连接（WAL模式），告警的插入/更新在写线程中分组提交
+- 每隔batch_interval或攒满batch_size条语句提交一次事务，告警风暴时每批只有一次fsync
+- 调用方提交语句后立即拿到Future，不等待数据库；需要读到最新数据时先调用flush()
+- 单条语句失败（如主键冲突）只影响该语句的Future，同批其余语句照常提交
+- 写线程空闲超过idle_timeout后关闭连接退出，下次提交时自动重启
+"""
+
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, Sequence
+
+from ..db.connection import open_connection
+
+logger = logging.getLogger(__name__)
+
+# 默认分组提交参数
+DEFAULT_BATCH_INTERVAL = 0.05  # 一批最长等待时间(秒)
+DEFAULT_BATCH_SIZE = 200       # 一批最多语句数
+DEFAULT_IDLE_TIMEOUT = 30.0    # 写线程空闲退出时间(秒)
+
+
+class _Barrier:
+    """flush()插入的屏障，写线程处理到屏障时立即提交当前批次"""
+
+    __slots__ = ("future",)
+
+    def __init__(self):
+        self.future = Future()
+
+
+class AlarmJournal:
+    """单个数据库文件的告警写入日志（线程安全）"""
+
+    def __init__(self, db_path: str, batch_interval: float = DEFAULT_BATCH_INTERVAL,
+                 batch_size: int = DEFAULT_BATCH_SIZE, idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
+        """
+        Args:
+            db_path: 数据库文件路径
+            batch_interval: 一批最长等待时间(秒)
+            batch_size: 一批最多语句数
+            idle_timeout: 写线程空闲退出时间(秒)
+        """
+        self.db_path = db_path
+        self.batch_interval = batch_interval
+        self.batch_size = max(1, batch_size)
+        self.idle_timeout = idle_timeout
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self.stats = {"submitted": 0, "committed": 0, "failed": 0, "batches": 0,
+                      "max_batch": 0, "last_batch_ms": 0.0}
+
+    def submit(self, sql: str, params: Sequence[Any] = ()) -> Future:
+        """
+        提交一条写语句
+        Returns:
+            Future，提交事务后结果为影响行数，语句失败时为对应异常
+        """
+        future = Future()
+        self._queue.put((sql, tuple(params), future))
+        with self._lock:
+            self.stats["submitted"] += 1
+            self._ensure_writer()
+        return future
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """立即提交之前提交的全部语句并等待完成，超时返回False"""
+        barrier = _Barrier()
+        self._queue.put(barrier)
+        with self._lock:
+            self._ensure_writer()
+        try:
+            barrier.future.result(timeout)
+            return True
+        except Exception:
+            logger.warning(f"告警写入日志刷新超时: {self.db_path}")
+            return False
+
+    def close(self, timeout: float = 5.0) -> None:
+        """提交剩余语句并停止写线程（再次提交时自动重启）"""
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._stopping = True
+        self._queue.put(None)
+        thread.join(timeout)
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取写入统计"""
+        with self._lock:
+            return {**self.stats, "pending": self._queue.qsize(), "running": self._thread is not None}
+
+    def _ensure_writer(self) -> None:
+        # 调用方持有self._lock
+        if self._thread is None:
+            self._stopping = False
+            self._thread = threading.Thread(target=self._writer, name="alarm-journal", daemon=True)
+            self._thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        # 与连接池相同的PRAGMA（WAL、忙等待），自动提交模式下显式开启事务
+        return open_connection(self.db_path, isolation_level=None)
+
+    def _writer(self) -> None:
+        """写线程：收集一批语句，一个事务提交"""
+        conn = None
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.idle_timeout)
+                except queue.Empty:
+                    with self._lock:
+                        if self._queue.empty():
+                            self._thread = None
+                            return
+                    continue
+
+                batch, barriers, stop = [], [], False
+                deadline = time.monotonic() + self.batch_interval
+                while True:
+                    if item is None:
+                        stop = True
+                    elif isinstance(item, _Barrier):
+                        barriers.append(item)
+                    else:
+                        batch.append(item)
+                    if stop or barriers or len(batch) >= self.batch_size:
+                        break
+                    remaining = deadline - time.monotonic()
+                    try:
+                        item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+
+                if batch:
+                    if conn is None:
+                        try:
+                            conn = self._connect()
+                        except Exception as e:
+                            logger.error(f"告警写入日志连接数据库失败: {e}")
+                            self._fail(batch, e)
+                            batch = []
+                    if batch:
+                        conn = self._commit(conn, batch)
+                for barrier in barriers:
+                    barrier.future.set_result(True)
+                if stop or self._stopping:
+                    with self._lock:
+                        if self._queue.empty():
+                            self._thread = None
+                            return
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _commit(self, conn: sqlite3.Connection, batch) -> Optional[sqlite3.Connection]:
+        """在一个事务中执行一批语句，返回可继续使用的连接（提交失败时丢弃连接）"""
+        start = time.perf_counter()
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for sql, params, future in batch:
+                try:
+                    results.append((future, conn.execute(sql, params).rowcount, None))
+                except sqlite3.Error as e:
+                    results.append((future, None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            logger.error(f"告警写入日志提交失败: {e}")
+            try:
+                conn.close()
+            except Exception:
+                pass
+            self._fail(batch, e)
+            return None
+
+        failed = 0
+        for future, rowcount, error in results:
+            if error is None:
+                future.set_result(rowcount)
+            else:
+                failed += 1
+                logger.error(f"告警写入语句失败: {error}")
+                future.set_exception(error)
+        with self._lock:
+            self.stats["batches"] += 1
+            self.stats["committed"] += len(batch) - failed
+            self.stats["failed"] += failed
+            self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+            self.stats["last_batch_ms"] = round((time.perf_counter() - start) * 1000.0, 3)
+        return conn
+
+    def _fail(self, batch, error: Exception) -> None:
+        for _, _, future in batch:
+            future.set_exception(error)
+        with self._lock:
+            self.stats["failed"] += len(batch)
+
+
+# 按数据库文件索引的告警写入日志
+_journals: Dict[str, AlarmJournal] = {}
+_journals_lock = threading.Lock()
+
+
+def _journal_settings() -> Dict[str, Any]:
+    """读取应用配置中的分组提交参数，配置不可用时使用默认值"""
+    try:
+        from .config import CONFIG
+        section = CONFIG.get("alarm_journal") or {}
+    except Exception:
+        section = {}
+    return {
+        "batch_interval": section.get("batch_interval_ms", DEFAULT_BATCH_INTERVAL * 1000.0) / 1000.0,
+        "batch_size": section.get("batch_size", DEFAULT_BATCH_SIZE),
+        "idle_timeout": section.get("idle_timeout", DEFAULT_IDLE_TIMEOUT),
+    }
+
+
+def get_alarm_journal(db_path: str, create: bool = True) -> Optional[AlarmJournal]:
+    """
+    获取数据库文件对应的告警写入日志
+    Args:
+        db_path: 数据库文件路径（同一文件的不同写法共用一个写线程）
+        create: 不存在时是否创建，为False时返回None
+    """
+    key = os.path.abspath(db_path)
+    with _journals_lock:
+        journal = _journals.get(key)
+        if journal is None and create:
+            journal = AlarmJournal(key, **_journal_settings())
+            _journals[key] = journal
+        return journal
+
+
+def flush_alarm_journal(db_path: str, timeout: Optional[float] = 5.0) -> bool:
+    """提交数据库文件上待写入的告警语句（读取告警前调用，保证读到最新写入）"""
+    journal = get_alarm_journal(db_path, create=False)
+    return journal.flush(timeout) if journal is not None else True
+
+
+def close_alarm_journals() -> None:
+    """提交并停止全部告警写入日志（应用关闭时调用）"""
+    with _journals_lock:
+        journals = list(_journals.values())
+    for journal in journals:
+        journal.close()
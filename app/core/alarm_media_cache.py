@@ -0,0 +1,63 @@
+"""
+告警媒体内存缓存
+- 告警进程推送的图片字节按告警ID缓存，媒体下载接口优先从缓存返回，不再读磁盘
+- 按总字节数上限做最近使用淘汰，淘汰后下载接口退回到数据库记录的文件路径
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 默认缓存上限（字节）
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class AlarmMediaCache:
+    """告警媒体缓存（线程安全）"""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._items: 'OrderedDict[str, Dict[str, bytes]]' = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evicted': 0}
+
+    def put(self, alarm_id: str, media: Dict[str, bytes]) -> None:
+        """缓存告警的全部图片"""
+        size = sum(len(data) for data in media.values())
+        if not media or size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(alarm_id, None)
+            if old:
+                self._size -= sum(len(data) for data in old.values())
+            self._items[alarm_id] = dict(media)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= sum(len(data) for data in evicted.values())
+                self.stats['evicted'] += 1
+
+    def get(self, alarm_id: str, kind: str) -> Optional[bytes]:
+        """获取告警的某类图片，不在缓存中返回None"""
+        with self._lock:
+            media = self._items.get(alarm_id)
+            data = media.get(kind) if media else None
+            if data is None:
+                self.stats['misses'] += 1
+                return None
+            self._items.move_to_end(alarm_id)
+            self.stats['hits'] += 1
+            return data
+
+    def get_stats(self) -> Dict:
+        """获取缓存统计"""
+        with self._lock:
+            return {**self.stats, 'alarms': len(self._items), 'bytes': self._size}
+
+
+# 全局告警媒体缓存实例
+alarm_media_cache = AlarmMediaCache()
@@ -3,7 +3,7 @@
 - 处理AI检测结果，自动判断是否需要告警
 - 自动保存告警相关媒体文件（前后N秒视频+检测图片）
 - 发送实时通知
-- 记录告警到数据库
+- 记录告警到数据库（经告警写入日志分组提交，不阻塞检测结果处理）
 """
 
 import os
@@ -17,19 +17,57 @@ from pathlib import Path
 
 from .video_recorder import video_recorder
 from .websocket_manager import websocket_manager
-from ..db.database import SessionLocal
+from .alarm_journal import get_alarm_journal
+from ..db.database import SessionLocal, engine
 from ..db.models import Alarm, Task
 from ..utils.utils import generate_unique_id
 from ..core.analyzer.utils.id_generator import generate_unique_id as analyzer_generate_id
 
 logger = logging.getLogger(__name__)
 
+# 告警写入字段（与Alarm模型一致）
+ALARM_INSERT_SQL = (
+    "INSERT INTO alarms (alarm_id, task_id, alarm_type, confidence, bbox, level, status, "
+    "severity, processed, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+ALARM_MEDIA_UPDATE_SQL = (
+    "UPDATE alarms SET original_image = ?, processed_image = ?, video_clip = ? WHERE alarm_id = ?"
+)
+
+
+def _format_db_time(value) -> str:
+    """
+    转换为与SQLAlchemy DateTime列一致的存储格式
+    支持datetime、Unix时间戳(int/float)和ISO格式字符串，为空时取当前时间；
+    其他值抛出ValueError，不写入ORM无法读回的行
+    """
+    if not value:
+        value = datetime.now()
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = datetime.fromtimestamp(value)
+    elif isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            raise ValueError(f"无效的告警时间: {value!r}")
+    elif not isinstance(value, datetime):
+        raise ValueError(f"无效的告警时间类型: {type(value).__name__}")
+    return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def _log_write_failure(future):
+    """告警写入失败时记录日志（写入日志的写线程中回调）"""
+    if future.exception() is not None:
+        logger.error(f"告警写入数据库失败: {future.exception()}")
+
+
 class AlarmProcessor:
     """告警处理器"""
     
     def __init__(self):
         self.alarm_base_path = "alarms"
         self.cooldown_cache = {}  # 告警冷却缓存
+        self.db_path = engine.url.database  # 告警写入日志使用的数据库文件
         
         # 确保告警目录存在
         os.makedirs(self.alarm_base_path, exist_ok=True)
@@ -143,29 +181,22 @@ class AlarmProcessor:
             detections = detection_result.get("detections", [])
             main_detection = detections[0] if detections else {}
             
-            # 创建告警记录
-            db = SessionLocal()
-            try:
-                alarm = Alarm(
-                    alarm_id=alarm_id,
-                    task_id=task_id,
-                    alarm_type=main_detection.get("class", "unknown"),
-                    confidence=main_detection.get("confidence", 0.0),
-                    bbox=json.dumps(main_detection.get("bbox", [])),
-                    # 使用新的字段格式
-                    level="medium",      # 新字段：low, medium, high, critical
-                    status="new",        # 新字段：new, processed, ignored
-                    # 兼容性字段（保留旧字段以防其他地方还在使用）
-                    severity="medium",   # 兼容性字段
-                    processed=False,     # 兼容性字段
-                    created_at=detection_result.get("timestamp", datetime.now())
-                )
-                
-                db.add(alarm)
-                db.commit()
-                db.refresh(alarm)
-            finally:
-                db.close()
+            # 创建告警记录（提交到告警写入日志后立即返回告警ID）
+            future = get_alarm_journal(self.db_path).submit(ALARM_INSERT_SQL, (
+                alarm_id,
+                task_id,
+                main_detection.get("class", "unknown"),
+                main_detection.get("confidence", 0.0),
+                json.dumps(main_detection.get("bbox", [])),
+                # 使用新的字段格式
+                "medium",      # level：low, medium, high, critical
+                "new",         # status：new, processed, ignored
+                # 兼容性字段（保留旧字段以防其他地方还在使用）
+                "medium",      # severity
+                False,         # processed
+                _format_db_time(detection_result.get("timestamp"))
+            ))
+            future.add_done_callback(_log_write_failure)
             
             logger.info(f"创建告警记录成功: {alarm_id}")
             return alarm_id
@@ -268,25 +299,19 @@ class AlarmProcessor:
             return None
     
     async def _update_alarm_media_paths(self, alarm_id: str, media_paths: Dict[str, str]):
-        """更新数据库中的媒体文件路径"""
-        db = SessionLocal()
+        """更新数据库中的媒体文件路径（与创建记录同一写入日志，按提交顺序执行）"""
         try:
-            alarm = db.query(Alarm).filter(Alarm.alarm_id == alarm_id).first()
-            
-            if alarm:
-                # 更新媒体文件路径
-                alarm.original_image = media_paths.get("original_image")
-                alarm.processed_image = media_paths.get("processed_image")
-                alarm.video_clip = media_paths.get("video_clip")
-                
-                db.commit()
-                logger.info(f"更新告警 {alarm_id} 媒体文件路径成功")
+            future = get_alarm_journal(self.db_path).submit(ALARM_MEDIA_UPDATE_SQL, (
+                media_paths.get("original_image"),
+                media_paths.get("processed_image"),
+                media_paths.get("video_clip"),
+                alarm_id
+            ))
+            future.add_done_callback(_log_write_failure)
+            logger.info(f"更新告警 {alarm_id} 媒体文件路径已提交")
             
         except Exception as e:
             logger.error(f"更新告警媒体文件路径失败: {e}")
-            db.rollback()
-        finally:
-            db.close()
     
     async def _send_alarm_notification(self, alarm_id: str, detection_result: Dict):
         """发送实时告警通知"""
@@ -3,6 +3,8 @@
 - 处理告警事件
 - 告警数据存储与检索
 - 告警推送机制
+- 任务告警规则编译后按task_id缓存，任务更新事件触发失效；一帧结果的全部对象一次向量化判断
+- 告警插入/更新交给告警写入日志分组提交，查询前先刷新日志
 """
 
 import os
@@ -11,17 +13,116 @@ import time
 import threading
 import queue
 import json
-import sqlite3
 import logging
 import uuid
 from datetime import datetime
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+import numpy as np
 
 # 导入事件总线
 from .event_bus import get_event_bus, Event
+# 导入数据库连接池
+from ...db.connection import connect as db_connect
+from ...db.pagination import decode_cursor
+# 导入告警写入日志
+from ..alarm_journal import get_alarm_journal, flush_alarm_journal
 
 logger = logging.getLogger(__name__)
 
+# 默认告警冷却时间（秒），任务未配置时相同告警在此时间内不重复触发
+DEFAULT_ALARM_COOLDOWN = 60
+# 默认置信度阈值
+DEFAULT_CONFIDENCE_THRESHOLD = 0.5
+# 告警规则缓存的兜底有效期（秒），覆盖绕过事件总线直接修改数据库的情况
+DEFAULT_RULE_TTL = 300
+# 使告警规则缓存失效的任务事件
+RULE_INVALIDATION_EVENTS = ("task.created", "task.updated", "task.deleted")
+
+class AlarmRule:
+    """编译后的任务告警规则（阈值、类别集合、冷却时间）"""
+    
+    __slots__ = ("enabled", "confidence_threshold", "classes", "cooldown")
+    
+    def __init__(self, alarm_config: Optional[Dict] = None, default_cooldown: float = DEFAULT_ALARM_COOLDOWN):
+        """编译告警配置，配置为空时使用默认配置（所有类别、默认阈值）"""
+        alarm_config = alarm_config or {}
+        self.enabled = bool(alarm_config.get("enabled", True))
+        self.confidence_threshold = float(alarm_config.get("confidence_threshold", DEFAULT_CONFIDENCE_THRESHOLD))
+        classes = alarm_config.get("classes") or []
+        # 空类别列表表示所有类别都会触发
+        self.classes = np.array(sorted({str(c) for c in classes})) if classes else None
+        self.cooldown = float(alarm_config.get("cooldown", default_cooldown))
+    
+    def match(self, objects: List[Dict]) -> np.ndarray:
+        """一次判断所有对象的置信度与类别，返回满足条件的对象掩码"""
+        if not self.enabled or not objects:
+            return np.zeros(len(objects), dtype=bool)
+        confidences = np.fromiter((obj.get("confidence") or 0 for obj in objects), dtype=np.float64, count=len(objects))
+        mask = confidences >= self.confidence_threshold
+        if self.classes is not None and mask.any():
+            labels = np.array([str(obj.get("label", "")) for obj in objects])
+            mask &= np.isin(labels, self.classes)
+        return mask
+
+class AlarmRuleCache:
+    """任务告警规则缓存（按task_id，线程安全）"""
+    
+    def __init__(self, loader: Callable[[str], Optional[AlarmRule]], ttl: float = DEFAULT_RULE_TTL):
+        """
+        Args:
+            loader: 从数据库加载并编译任务告警规则，任务不存在时返回None
+            ttl: 缓存兜底有效期（秒）
+        """
+        self.loader = loader
+        self.ttl = ttl
+        self._rules: Dict[str, Tuple[Optional[AlarmRule], float]] = {}
+        self._generation = 0  # 失效计数，加载期间发生失效时不缓存加载结果
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0, "load_errors": 0}
+    
+    def get(self, task_id: str) -> Optional[AlarmRule]:
+        """获取任务告警规则（任务不存在的结果同样缓存）"""
+        now = time.time()
+        with self._lock:
+            entry = self._rules.get(task_id)
+            if entry is not None and now - entry[1] < self.ttl:
+                self.stats["hits"] += 1
+                return entry[0]
+            self.stats["misses"] += 1
+            generation = self._generation
+        
+        try:
+            rule = self.loader(task_id)
+        except Exception as e:
+            logger.error(f"加载任务告警规则异常: {task_id}, {e}")
+            with self._lock:
+                self.stats["load_errors"] += 1
+            return None
+        with self._lock:
+            if generation == self._generation:
+                self._rules[task_id] = (rule, now)
+        return rule
+    
+    def invalidate(self, task_id: Optional[str] = None):
+        """使任务的告警规则失效（task_id为None时清空）"""
+        with self._lock:
+            if task_id is None:
+                self._rules.clear()
+            else:
+                self._rules.pop(task_id, None)
+            self._generation += 1
+            self.stats["invalidations"] += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存命中统计"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["cached_tasks"] = len(self._rules)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
 class AlarmModule:
     """告警管理模块，处理告警事件和通知"""
     
@@ -54,7 +155,10 @@ class AlarmModule:
         
         # 告警缓存 - 避免重复告警
         self.alarm_cache = {}  # {alarm_key: timestamp}
-        self.alarm_cache_ttl = 60  # 60秒内相同告警不重复触发
+        self.alarm_cache_ttl = DEFAULT_ALARM_COOLDOWN  # 60秒内相同告警不重复触发
+        
+        # 任务告警规则缓存
+        self.rule_cache = AlarmRuleCache(self._load_alarm_rule)
         
         # 事件总线
         self.event_bus = get_event_bus()
@@ -69,6 +173,16 @@ class AlarmModule:
         
         # 监听任务结果事件
         self.event_bus.subscribe("task.result", self._handle_task_result)
+        
+        # 监听任务变更事件，使告警规则缓存失效
+        for event_type in RULE_INVALIDATION_EVENTS:
+            self.event_bus.subscribe(event_type, self._handle_task_changed)
+    
+    def _handle_task_changed(self, event: Event):
+        """处理任务变更事件"""
+        task_id = (event.data or {}).get("task_id")
+        self.rule_cache.invalidate(task_id)
+        logger.debug(f"任务告警规则缓存失效: {task_id}, 事件: {event.event_type}")
     
     def _handle_algorithm_result(self, event: Event):
         """处理算法检测结果事件"""
@@ -97,29 +211,18 @@ class AlarmModule:
         if not objects:
             return
         
-        # 处理每个检测对象
-        for obj in objects:
-            # 检查是否需要触发告警
-            if self._should_trigger_alarm(task_id, obj):
-                # 创建告警数据
-                alarm_data = self._create_alarm_data(task_id, obj, result)
-                
-                # 放入告警队列
-                self.alarm_queue.put(alarm_data)
-    
-    def _should_trigger_alarm(self, task_id: str, obj: Dict) -> bool:
-        """判断是否需要触发告警
-        
-        Args:
-            task_id: 任务ID
-            obj: 检测对象
+        # 一次判断所有检测对象
+        for obj in self._evaluate_alarms(task_id, objects):
+            # 创建告警数据
+            alarm_data = self._create_alarm_data(task_id, obj, result)
             
-        Returns:
-            是否触发告警
-        """
-        # 获取告警配置
+            # 放入告警队列
+            self.alarm_queue.put(alarm_data)
+    
+    def _load_alarm_rule(self, task_id: str) -> Optional[AlarmRule]:
+        """从数据库加载任务告警配置并编译，任务不存在时返回None"""
+        conn = db_connect(self.db_path)
         try:
-            conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             cursor.execute(
                 """
@@ -129,57 +232,67 @@ class AlarmModule:
                 (task_id,)
             )
             result = cursor.fetchone()
+        finally:
             conn.close()
+        
+        if not result:
+            return None
+        return AlarmRule(json.loads(result[0]) if result[0] else {}, self.alarm_cache_ttl)
+    
+    def _evaluate_alarms(self, task_id: str, objects: List[Dict]) -> List[Dict]:
+        """判断一帧结果中需要触发告警的对象
+        
+        Args:
+            task_id: 任务ID
+            objects: 检测对象列表
             
-            if not result:
-                return False
-            
-            alarm_config = json.loads(result[0]) if result[0] else {}
-            
-            # 配置为空时使用默认配置
-            if not alarm_config:
-                # 默认告警配置 - 可以根据实际需求调整
-                alarm_config = {
-                    "enabled": True,
-                    "confidence_threshold": 0.5,
-                    "classes": [],  # 空列表表示所有类别都会触发
-                    "cooldown": self.alarm_cache_ttl
-                }
-            
-            # 检查告警是否启用
-            if not alarm_config.get("enabled", True):
-                return False
-            
-            # 检查置信度是否超过阈值
-            confidence = obj.get("confidence", 0)
-            confidence_threshold = alarm_config.get("confidence_threshold", 0.5)
-            if confidence < confidence_threshold:
-                return False
-            
-            # 检查类别是否需要告警
-            label = obj.get("label", "")
-            alarm_classes = alarm_config.get("classes", [])
-            if alarm_classes and label not in alarm_classes:
-                return False
+        Returns:
+            需要触发告警的对象（同一类别在冷却期内只触发一次）
+        """
+        try:
+            rule = self.rule_cache.get(task_id)
+            if rule is None or not objects:
+                return []
             
-            # 检查是否在冷却期内
-            cooldown = alarm_config.get("cooldown", self.alarm_cache_ttl)
-            alarm_key = f"{task_id}_{label}"
+            indices = np.flatnonzero(rule.match(objects))
+            if not len(indices):
+                return []
             
+            # 冷却检查：每个类别只检查一次
+            triggered = []
+            now = time.time()
             with self.lock:
-                if alarm_key in self.alarm_cache:
-                    last_time = self.alarm_cache[alarm_key]
-                    if time.time() - last_time < cooldown:
-                        return False
+                for index in indices:
+                    obj = objects[index]
+                    alarm_key = f"{task_id}_{obj.get('label', '')}"
+                    last_time = self.alarm_cache.get(alarm_key)
+                    if last_time is not None and now - last_time < rule.cooldown:
+                        continue
                     
-                # 更新最后告警时间
-                self.alarm_cache[alarm_key] = time.time()
-            
-            return True
+                    # 更新最后告警时间
+                    self.alarm_cache[alarm_key] = now
+                    triggered.append(obj)
+            return triggered
             
         except Exception as e:
             logger.error(f"检查告警条件异常: {e}")
-            return False
+            return []
+    
+    def _should_trigger_alarm(self, task_id: str, obj: Dict) -> bool:
+        """判断是否需要触发告警
+        
+        Args:
+            task_id: 任务ID
+            obj: 检测对象
+            
+        Returns:
+            是否触发告警
+        """
+        return bool(self._evaluate_alarms(task_id, [obj]))
+    
+    def get_rule_cache_stats(self) -> Dict[str, Any]:
+        """获取告警规则缓存统计（命中/未命中/失效次数）"""
+        return self.rule_cache.get_stats()
     
     def _create_alarm_data(self, task_id: str, obj: Dict, result: Dict) -> Dict:
         """创建告警数据
@@ -283,6 +396,11 @@ class AlarmModule:
         if self.alarm_thread and self.alarm_thread.is_alive():
             self.alarm_thread.join(timeout=5.0)
         
+        # 提交未写入的告警
+        journal = get_alarm_journal(self.db_path, create=False)
+        if journal is not None:
+            journal.close()
+        
         self.running = False
         
         # 发布模块停止事件
@@ -350,24 +468,21 @@ class AlarmModule:
             logger.error(f"处理告警异常: {e}")
     
     def _save_alarm(self, alarm_data: Dict) -> bool:
-        """保存告警到数据库
+        """保存告警到数据库（提交到告警写入日志，不等待事务提交）
         
         Args:
             alarm_data: 告警数据
             
         Returns:
-            是否成功
+            是否成功提交
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
             # 转换数据格式
             bbox_json = json.dumps(alarm_data["bbox"])
             created_at = datetime.fromtimestamp(alarm_data["created_at"]).strftime("%Y-%m-%d %H:%M:%S")
             
             # 插入数据
-            cursor.execute(
+            future = get_alarm_journal(self.db_path).submit(
                 """
                 INSERT INTO alarms (
                     alarm_id, task_id, stream_id, label, confidence, 
@@ -383,8 +498,7 @@ class AlarmModule:
                     alarm_data["level"]
                 )
             )
-            conn.commit()
-            conn.close()
+            future.add_done_callback(self._log_write_failure)
             
             return True
             
@@ -418,14 +532,11 @@ class AlarmModule:
             是否成功
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute(
+            future = get_alarm_journal(self.db_path).submit(
                 "UPDATE alarms SET image_path = ? WHERE alarm_id = ?",
                 (image_path, alarm_id)
             )
-            conn.commit()
-            conn.close()
+            future.add_done_callback(self._log_write_failure)
             
             return True
             
@@ -433,17 +544,25 @@ class AlarmModule:
             logger.error(f"更新告警图像路径异常: {e}")
             return False
     
+    @staticmethod
+    def _log_write_failure(future):
+        """告警写入失败时记录日志（写入日志的写线程中回调）"""
+        if future.exception() is not None:
+            logger.error(f"告警写入数据库失败: {future.exception()}")
+    
     def get_alarms(self, filters: Dict = None) -> List[Dict]:
         """获取告警列表
         
         Args:
-            filters: 过滤条件
+            filters: 过滤条件，传入cursor（上一页最后一条的encode_cursor(created_at, alarm_id)）时按游标分页
             
         Returns:
             告警列表
         """
+        # 先提交待写入的告警，保证读到最新数据
+        flush_alarm_journal(self.db_path)
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = db_connect(self.db_path)
             cursor = conn.cursor()
             
             # 构建查询
@@ -490,13 +609,17 @@ class AlarmModule:
                 if "end_time" in filters:
                     where_clauses.append("created_at <= ?")
                     params.append(datetime.fromtimestamp(filters["end_time"]).strftime("%Y-%m-%d %H:%M:%S"))
+                
+                if filters.get("cursor"):
+                    where_clauses.append("(created_at, alarm_id) < (?, ?)")
+                    params.extend(decode_cursor(filters["cursor"]))
             
             # 拼接查询条件
             if where_clauses:
                 query += " WHERE " + " AND ".join(where_clauses)
             
-            # 添加排序
-            query += " ORDER BY created_at DESC"
+            # 添加排序（与复合索引一致）
+            query += " ORDER BY created_at DESC, alarm_id DESC"
             
             # 添加分页
             if filters and "limit" in filters:
@@ -547,8 +670,9 @@ class AlarmModule:
         Returns:
             是否成功
         """
+        flush_alarm_journal(self.db_path)
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = db_connect(self.db_path)
             cursor = conn.cursor()
             cursor.execute(
                 "UPDATE alarms SET status = ? WHERE alarm_id = ?",
@@ -582,8 +706,9 @@ class AlarmModule:
         Returns:
             (图像路径, 错误消息)
         """
+        flush_alarm_journal(self.db_path)
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = db_connect(self.db_path)
             cursor = conn.cursor()
             cursor.execute(
                 "SELECT image_path FROM alarms WHERE alarm_id = ?",
@@ -614,8 +739,9 @@ class AlarmModule:
         Returns:
             (视频路径, 错误消息)
         """
+        flush_alarm_journal(self.db_path)
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = db_connect(self.db_path)
             cursor = conn.cursor()
             cursor.execute(
                 "SELECT video_path FROM alarms WHERE alarm_id = ?",
@@ -646,9 +772,10 @@ class AlarmModule:
         Returns:
             是否成功
         """
+        flush_alarm_journal(self.db_path)
         try:
             # 获取告警图像和视频路径
-            conn = sqlite3.connect(self.db_path)
+            conn = db_connect(self.db_path)
             cursor = conn.cursor()
             cursor.execute(
                 "SELECT image_path, video_path FROM alarms WHERE alarm_id = ?",
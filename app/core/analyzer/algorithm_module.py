@@ -13,7 +13,6 @@ import json
 import logging
 import time
 import uuid
-import sqlite3
 import threading
 from pathlib import Path
 import numpy as np
@@ -21,6 +20,8 @@ from typing import Dict, List, Any, Optional, Tuple
 
 # 导入事件总线
 from .event_bus import get_event_bus, Event
+# 导入数据库连接池
+from ...db.connection import connect as db_connect
 
 logger = logging.getLogger(__name__)
 
@@ -100,7 +101,7 @@ class AlgorithmModule:
     def get_algorithm_path(self, algo_id: str) -> Optional[str]:
         """获取算法路径"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = db_connect(self.db_path)
             cursor = conn.cursor()
             
             # 查询算法路径
@@ -596,7 +597,7 @@ class AlgorithmModule:
     def get_algorithm_info(self, algo_id: str = None) -> Dict:
         """获取算法信息"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = db_connect(self.db_path)
             cursor = conn.cursor()
             
             if algo_id:
@@ -3,16 +3,36 @@
 - 实现模块间解耦的消息传递机制
 - 支持事件发布/订阅模式
 - 支持事件优先级和多线程处理
+- 支持前缀订阅（"task.*"接收所有task.开头的事件）和通配符订阅（"*"接收所有事件）
+- 订阅表写时复制：订阅/取消订阅时整体替换，分发时不加锁、不拼接订阅者列表
+- 按分片键（默认为事件主题+任务/视频流ID）分配到固定的分片队列，每个分片一个处理线程，
+  同一主题内同一任务/视频流的事件按发布顺序处理（同优先级），慢回调只阻塞所在分片
+- 分片队列有界，队列满时按溢出策略处理
+- 统计每个订阅者的调用次数、异常次数与耗时分布
 """
 
+import heapq
+import itertools
 import threading
-import queue
 import logging
 import time
-from typing import Dict, List, Any, Callable, Optional
+import zlib
+from typing import Dict, List, Any, Callable, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# 队列满时的溢出策略
+OVERFLOW_BLOCK = "block"              # 等待队列空位，超时后丢弃新事件
+OVERFLOW_DROP_NEW = "drop_new"        # 丢弃新事件
+OVERFLOW_DROP_OLDEST = "drop_oldest"  # 丢弃队列中优先级最低且最早的事件（新事件优先级更低时丢弃新事件）
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_NEW, OVERFLOW_DROP_OLDEST)
+
+DEFAULT_QUEUE_SIZE = 10000   # 每个分片队列的容量
+DEFAULT_PUT_TIMEOUT = 0.1    # block策略下等待空位的时间(秒)
+
+# 订阅者耗时分布的桶上界(毫秒)
+TIMING_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000)
+
 class Event:
     """事件类，封装事件数据"""
     
@@ -40,6 +60,176 @@ class Event:
     def __str__(self):
         return f"Event({self.event_type}, from={self.sender}, priority={self.priority}, data={self.data})"
 
+def default_shard_key(event: Event) -> str:
+    """
+    默认分片键：事件主题（事件类型中第一个"."之前的部分）+ 任务ID或视频流ID
+    - stream.*事件按视频流，其余主题优先按任务，同一任务/视频流的事件由同一线程按顺序处理
+    - 不同主题分开排队，告警处理慢时不阻塞同一视频流的心跳
+    - 事件数据中没有ID时按主题
+    """
+    topic = event.event_type.split(".", 1)[0]
+    data = event.data
+    if isinstance(data, dict):
+        for field in (("stream_id",) if topic == "stream" else ("task_id", "stream_id")):
+            value = data.get(field)
+            if value is not None:
+                return f"{topic}:{value}"
+    return topic
+
+
+def subscriber_name(callback: Callable) -> str:
+    """订阅者名称（模块.限定名），用于耗时统计"""
+    name = getattr(callback, "__qualname__", None) or type(callback).__name__
+    module = getattr(callback, "__module__", None)
+    return f"{module}.{name}" if module else name
+
+
+class SubscriberStats:
+    """单个订阅者的调用耗时统计"""
+
+    __slots__ = ("name", "calls", "errors", "total_ms", "max_ms", "buckets", "_lock")
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.errors = 0
+            self.total_ms = 0.0
+            self.max_ms = 0.0
+            self.buckets = [0] * (len(TIMING_BUCKETS_MS) + 1)
+
+    def record(self, elapsed_ms: float, failed: bool = False):
+        index = len(TIMING_BUCKETS_MS)
+        for i, bound in enumerate(TIMING_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                index = i
+                break
+        with self._lock:
+            self.calls += 1
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+            self.buckets[index] += 1
+            if failed:
+                self.errors += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            histogram = {f"<={bound}ms": count for bound, count in zip(TIMING_BUCKETS_MS, self.buckets)}
+            histogram[f">{TIMING_BUCKETS_MS[-1]}ms"] = self.buckets[-1]
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "avg_ms": round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+                "max_ms": round(self.max_ms, 3),
+                "histogram": histogram
+            }
+
+
+class _SubscriberTable:
+    """订阅表（创建后不再修改，订阅变更时整体替换）"""
+
+    __slots__ = ("subscribers", "stats", "routes")
+
+    def __init__(self, subscribers: Dict[str, Tuple[Callable, ...]], stats: Dict[Callable, SubscriberStats]):
+        self.subscribers = subscribers  # {事件类型: (回调函数, ...)}
+        self.stats = stats              # {回调函数: 耗时统计}，按回调函数本身区分订阅者
+        self.routes = {}                # {事件类型: ((回调函数, 耗时统计), ...)}，首次分发时生成
+
+    def route(self, event_type: str) -> Tuple[Tuple[Callable, SubscriberStats], ...]:
+        """事件类型对应的订阅者（特定类型在前，其次前缀订阅，通配符在后）"""
+        route = self.routes.get(event_type)
+        if route is None:
+            callbacks = self.subscribers.get(event_type, ())
+            if "." in event_type:
+                callbacks = callbacks + self.subscribers.get(event_type.split(".", 1)[0] + ".*", ())
+            if event_type != "*":
+                callbacks = callbacks + self.subscribers.get("*", ())
+            route = tuple((callback, self.stats[callback]) for callback in callbacks)
+            self.routes[event_type] = route
+        return route
+
+
+class _ShardQueue:
+    """有界优先级分片队列：优先级高的先出队，同优先级按发布顺序"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition(threading.Lock())
+        self._closed = False
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {"published": 0, "processed": 0, "dropped": 0, "evicted": 0,
+                      "processing_time": 0.0, "max_queue_size": 0}
+
+    def put(self, event: Event, policy: str, timeout: float) -> bool:
+        """入队，队列满且按策略丢弃新事件时返回False"""
+        entry = (-event.priority, next(self._seq), event)
+        with self._cond:
+            if self.maxsize > 0 and len(self._heap) >= self.maxsize:
+                if policy == OVERFLOW_BLOCK:
+                    deadline = time.monotonic() + timeout
+                    while len(self._heap) >= self.maxsize and not self._closed:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                if len(self._heap) >= self.maxsize:
+                    if policy != OVERFLOW_DROP_OLDEST or not self._evict(entry):
+                        self.stats["dropped"] += 1
+                        return False
+            heapq.heappush(self._heap, entry)
+            self.stats["published"] += 1
+            self.stats["max_queue_size"] = max(self.stats["max_queue_size"], len(self._heap))
+            self._cond.notify()
+            return True
+
+    def _evict(self, entry) -> bool:
+        # 调用方持有self._cond；找出优先级最低且最早的事件，新事件优先级更低时不驱逐
+        index = max(range(len(self._heap)), key=lambda i: (self._heap[i][0], -self._heap[i][1]))
+        if entry[0] > self._heap[index][0]:
+            return False
+        self._heap[index] = self._heap[-1]
+        self._heap.pop()
+        heapq.heapify(self._heap)
+        self.stats["dropped"] += 1
+        self.stats["evicted"] += 1
+        return True
+
+    def get(self, timeout: float) -> Optional[Event]:
+        """出队，超时或已关闭时返回None"""
+        with self._cond:
+            if not self._heap and not self._closed:
+                self._cond.wait(timeout)
+            if not self._heap:
+                return None
+            event = heapq.heappop(self._heap)[2]
+            self._cond.notify()
+            return event
+
+    def close(self) -> int:
+        """关闭队列并清空，返回丢弃的事件数"""
+        with self._cond:
+            self._closed = True
+            count = len(self._heap)
+            self._heap.clear()
+            self._cond.notify_all()
+            return count
+
+    def qsize(self) -> int:
+        return len(self._heap)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+
 class EventBus:
     """事件总线，处理事件的发布和订阅，支持优先级和多线程处理"""
     
@@ -54,72 +244,86 @@ class EventBus:
                 cls._instance = EventBus()
             return cls._instance
     
-    def __init__(self):
-        """初始化事件总线"""
-        self.subscribers = {}  # 类型: {事件类型: [回调函数列表]}
-        self.event_queue = queue.PriorityQueue()  # 优先级事件队列
+    def __init__(self, queue_size: int = DEFAULT_QUEUE_SIZE, overflow_policy: str = OVERFLOW_DROP_OLDEST,
+                 put_timeout: float = DEFAULT_PUT_TIMEOUT,
+                 shard_key: Callable[[Event], str] = default_shard_key):
+        """初始化事件总线
+        
+        Args:
+            queue_size: 每个分片队列的容量，0表示不限
+            overflow_policy: 队列满时的溢出策略，见OVERFLOW_POLICIES
+            put_timeout: block策略下等待空位的时间(秒)
+            shard_key: 分片键函数，分片键相同的事件由同一线程按顺序处理
+        """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"不支持的溢出策略: {overflow_policy}")
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.put_timeout = put_timeout
+        self.shard_key = shard_key
+        
+        self._table = _SubscriberTable({}, {})  # 写时复制的订阅表
+        self._shards: List[_ShardQueue] = []
         self.process_threads = []
-        self.thread_count = 2  # 默认2个处理线程
+        self.thread_count = 4  # 默认4个处理线程（分片数）
         self.running = False
-        self.lock = threading.RLock()
+        self.lock = threading.RLock()  # 只在订阅变更、启停时使用
         
-        # 事件统计
+        # 事件统计（分片内的统计由各分片维护）
         self.stats = {
             "events_published": 0,
             "events_processed": 0,
-            "events_dropped": 0,
-            "avg_processing_time": 0,
-            "max_queue_size": 0
+            "events_dropped": 0
         }
     
+    @property
+    def subscribers(self) -> Dict[str, Tuple[Callable, ...]]:
+        """当前订阅表 {事件类型: (回调函数, ...)}"""
+        return self._table.subscribers
+    
     def start(self, thread_count: int = None):
         """启动事件处理线程
         
         Args:
-            thread_count: 处理线程数量
+            thread_count: 处理线程数量（每个线程处理一个分片队列）
         """
-        if self.running:
-            return
-        
-        if thread_count is not None:
-            self.thread_count = max(1, thread_count)
-        
-        self.running = True
-        
-        # 创建并启动处理线程
-        for i in range(self.thread_count):
-            thread = threading.Thread(
-                target=self._process_events,
-                name=f"EventProcessor-{i}",
-                daemon=True
-            )
-            thread.start()
-            self.process_threads.append(thread)
+        with self.lock:
+            if self.running:
+                return
+            
+            if thread_count is not None:
+                self.thread_count = max(1, thread_count)
+            
+            self._shards = [_ShardQueue(self.queue_size) for _ in range(self.thread_count)]
+            self.running = True
+            
+            # 创建并启动处理线程
+            for i, shard in enumerate(self._shards):
+                thread = threading.Thread(
+                    target=self._process_events,
+                    args=(shard,),
+                    name=f"EventProcessor-{i}",
+                    daemon=True
+                )
+                thread.start()
+                self.process_threads.append(thread)
         
-        logger.info(f"事件总线已启动，处理线程数: {self.thread_count}")
+        logger.info(f"事件总线已启动，处理线程数: {self.thread_count}，溢出策略: {self.overflow_policy}")
     
     def stop(self):
         """停止事件处理线程"""
-        if not self.running:
-            return
-        
-        self.running = False
+        with self.lock:
+            if not self.running:
+                return
+            self.running = False
+            threads, self.process_threads = self.process_threads, []
         
-        # 等待处理线程结束
-        for thread in self.process_threads:
+        # 唤醒并等待处理线程结束，清空事件队列
+        for shard in self._shards:
+            shard.close()
+        for thread in threads:
             thread.join(timeout=2.0)
         
-        # 清理
-        self.process_threads = []
-        
-        # 清空事件队列
-        while not self.event_queue.empty():
-            try:
-                self.event_queue.get_nowait()
-                self.event_queue.task_done()
-            except:
-                pass
-        
         logger.info("事件总线已停止")
     
     def subscribe(self, event_type: str, callback: Callable[[Event], None]) -> bool:
@@ -133,15 +337,20 @@ class EventBus:
             是否成功订阅
         """
         with self.lock:
-            if event_type not in self.subscribers:
-                self.subscribers[event_type] = []
+            table = self._table
+            callbacks = table.subscribers.get(event_type, ())
             
             # 避免重复订阅
-            if callback not in self.subscribers[event_type]:
-                self.subscribers[event_type].append(callback)
-                logger.debug(f"已订阅事件: {event_type}")
-                return True
-            return False
+            if callback in callbacks:
+                return False
+            
+            stats = table.stats.get(callback) or SubscriberStats(subscriber_name(callback))
+            self._table = _SubscriberTable(
+                {**table.subscribers, event_type: callbacks + (callback,)},
+                {**table.stats, callback: stats}
+            )
+            logger.debug(f"已订阅事件: {event_type}")
+            return True
     
     def unsubscribe(self, event_type: str, callback: Callable[[Event], None]) -> bool:
         """取消订阅特定类型的事件
@@ -154,11 +363,19 @@ class EventBus:
             是否成功取消订阅
         """
         with self.lock:
-            if event_type in self.subscribers and callback in self.subscribers[event_type]:
-                self.subscribers[event_type].remove(callback)
-                logger.debug(f"已取消订阅事件: {event_type}")
-                return True
-            return False
+            table = self._table
+            callbacks = table.subscribers.get(event_type, ())
+            if callback not in callbacks:
+                return False
+            
+            subscribers = {**table.subscribers, event_type: tuple(cb for cb in callbacks if cb != callback)}
+            stats = table.stats
+            if not any(callback in subs for subs in subscribers.values()):
+                # 不再订阅任何事件时移除其耗时统计
+                stats = {cb: cb_stats for cb, cb_stats in stats.items() if cb != callback}
+            self._table = _SubscriberTable(subscribers, stats)
+            logger.debug(f"已取消订阅事件: {event_type}")
+            return True
     
     def publish(self, event: Event) -> bool:
         """发布事件
@@ -167,30 +384,35 @@ class EventBus:
             event: 事件对象
             
         Returns:
-            是否成功发布
+            是否成功发布（队列满且按溢出策略丢弃时返回False）
         """
-        if not self.running:
+        shards = self._shards
+        if not self.running or not shards:
             logger.warning(f"事件总线未运行，无法发布事件: {event}")
-            self.stats["events_dropped"] += 1
+            self._count("events_dropped")
             return False
         
         try:
-            # 放入优先级队列
-            self.event_queue.put(event)
-            self.stats["events_published"] += 1
-            
-            # 更新最大队列大小统计
-            queue_size = self.event_queue.qsize()
-            if queue_size > self.stats["max_queue_size"]:
-                self.stats["max_queue_size"] = queue_size
+            shard = shards[self.shard_index(event, len(shards))]
+            if not shard.put(event, self.overflow_policy, self.put_timeout):
+                logger.warning(f"事件队列已满，丢弃事件: {event.event_type}")
+                return False
             
             logger.debug(f"事件已发布: {event}")
             return True
         except Exception as e:
             logger.error(f"发布事件失败: {e}")
-            self.stats["events_dropped"] += 1
+            self._count("events_dropped")
             return False
     
+    def shard_index(self, event: Event, shard_count: Optional[int] = None) -> int:
+        """事件所属的分片序号"""
+        shard_count = shard_count or len(self._shards) or self.thread_count
+        if shard_count <= 1:
+            return 0
+        key = str(self.shard_key(event))
+        return zlib.crc32(key.encode("utf-8")) % shard_count
+    
     def publish_immediate(self, event: Event) -> bool:
         """立即处理事件（在当前线程）
         
@@ -203,76 +425,89 @@ class EventBus:
         try:
             # 立即处理事件
             self._handle_event(event)
-            self.stats["events_published"] += 1
-            self.stats["events_processed"] += 1
+            self._count("events_published")
+            self._count("events_processed")
             return True
         except Exception as e:
             logger.error(f"立即处理事件失败: {e}")
-            self.stats["events_dropped"] += 1
+            self._count("events_dropped")
             return False
     
-    def _process_events(self):
-        """事件处理线程函数"""
+    def _count(self, key: str):
+        with self.lock:
+            self.stats[key] += 1
+    
+    def _process_events(self, shard: _ShardQueue):
+        """事件处理线程函数（处理一个分片队列）"""
         thread_name = threading.current_thread().name
         logger.info(f"事件处理线程已启动: {thread_name}")
         
-        while self.running:
+        while self.running and not shard.closed:
             try:
                 # 从队列获取事件，最多等待1秒
-                event = self.event_queue.get(timeout=1.0)
+                event = shard.get(timeout=1.0)
+                if event is None:
+                    continue
                 
                 # 处理事件
-                start_time = time.time()
+                start_time = time.perf_counter()
                 self._handle_event(event)
-                process_time = time.time() - start_time
-                
-                # 更新统计信息
-                self.stats["events_processed"] += 1
-                
-                # 更新平均处理时间 (移动平均)
-                avg = self.stats["avg_processing_time"]
-                self.stats["avg_processing_time"] = avg * 0.9 + process_time * 0.1
                 
-                # 标记任务完成
-                self.event_queue.task_done()
+                # 更新统计信息（每个分片只有本线程写入）
+                shard.stats["processing_time"] += time.perf_counter() - start_time
+                shard.stats["processed"] += 1
                 
-            except queue.Empty:
-                # 队列为空，继续等待
-                continue
             except Exception as e:
                 logger.error(f"处理事件异常: {e}")
         
         logger.info(f"事件处理线程已退出: {thread_name}")
     
     def _handle_event(self, event: Event):
-        """处理单个事件"""
-        event_type = event.event_type
-        
-        with self.lock:
-            # 获取特定类型的订阅者
-            subscribers = self.subscribers.get(event_type, [])
-            
-            # 获取通配符订阅者 ("*" 表示接收所有事件)
-            wildcard_subscribers = self.subscribers.get("*", [])
-            
-            # 合并订阅者列表
-            all_subscribers = subscribers + wildcard_subscribers
-        
-        # 调用每个订阅者的回调函数
-        for callback in all_subscribers:
+        """处理单个事件（读取订阅表快照，不加锁）"""
+        for callback, stats in self._table.route(event.event_type):
+            failed = False
+            start_time = time.perf_counter()
             try:
                 callback(event)
             except Exception as e:
+                failed = True
                 logger.error(f"调用事件回调异常: {e}, 事件: {event}")
+            stats.record((time.perf_counter() - start_time) * 1000.0, failed)
     
     def get_stats(self) -> Dict:
-        """获取事件统计信息"""
+        """获取事件统计信息（含分片队列与每个订阅者的耗时分布）"""
         with self.lock:
             stats_copy = self.stats.copy()
-            stats_copy["current_queue_size"] = self.event_queue.qsize()
-            stats_copy["subscriber_count"] = sum(len(subs) for subs in self.subscribers.values())
-            stats_copy["event_types"] = list(self.subscribers.keys())
-            return stats_copy
+            shards = list(self._shards)
+        table = self._table
+        
+        processed = sum(shard.stats["processed"] for shard in shards)
+        processing_time = sum(shard.stats["processing_time"] for shard in shards)
+        stats_copy["events_published"] += sum(shard.stats["published"] for shard in shards)
+        stats_copy["events_processed"] += processed
+        stats_copy["events_dropped"] += sum(shard.stats["dropped"] for shard in shards)
+        stats_copy["avg_processing_time"] = processing_time / processed if processed else 0
+        stats_copy["max_queue_size"] = max((shard.stats["max_queue_size"] for shard in shards), default=0)
+        stats_copy["current_queue_size"] = sum(shard.qsize() for shard in shards)
+        stats_copy["subscriber_count"] = sum(len(subs) for subs in table.subscribers.values())
+        stats_copy["event_types"] = list(table.subscribers.keys())
+        stats_copy["overflow_policy"] = self.overflow_policy
+        stats_copy["shards"] = [
+            {"queue_size": shard.qsize(), "published": shard.stats["published"],
+             "processed": shard.stats["processed"], "dropped": shard.stats["dropped"],
+             "evicted": shard.stats["evicted"], "max_queue_size": shard.stats["max_queue_size"]}
+            for shard in shards
+        ]
+        # 按订阅者名称输出，不同回调同名（如不同实例的同一方法）时追加序号区分
+        subscribers = {}
+        for stats in table.stats.values():
+            name, index = stats.name, 1
+            while name in subscribers:
+                index += 1
+                name = f"{stats.name}#{index}"
+            subscribers[name] = stats.snapshot()
+        stats_copy["subscribers"] = subscribers
+        return stats_copy
     
     def reset_stats(self):
         """重置统计信息"""
@@ -280,10 +515,12 @@ class EventBus:
             self.stats = {
                 "events_published": 0,
                 "events_processed": 0,
-                "events_dropped": 0,
-                "avg_processing_time": 0,
-                "max_queue_size": 0
+                "events_dropped": 0
             }
+            for shard in self._shards:
+                shard.reset_stats()
+            for stats in self._table.stats.values():
+                stats.reset()
 
 # 全局事件总线实例
 def get_event_bus():
@@ -3,6 +3,9 @@
 - 处理分析结果输出
 - 管理RTMP推流
 - 实现视频录制
+- 一次编码多端输出：同一任务、同一分辨率/帧率的输出共用一个编码器（输出复用器），
+  检测框只绘制一次、H.264只编码一次，编码数据分发给推流、录像文件和内存预览等输出端；
+  创建/停止输出只挂载/卸载输出端，不重启编码器
 """
 
 import os
@@ -12,16 +15,22 @@ import time
 import threading
 import queue
 import json
-import sqlite3
 import logging
 import numpy as np
 from typing import Dict, List, Any, Optional, Tuple
 
 # 导入事件总线
 from .event_bus import get_event_bus, Event
+# 导入数据库连接池
+from ...db.connection import connect as db_connect
+from core.output_pipeline import (OutputMultiplexer, RemuxSink, PreviewSink, build_encoder_cmd,
+                                  build_remux_cmd, build_segment_cmd, DEFAULT_PREVIEW_CHUNKS)
 
 logger = logging.getLogger(__name__)
 
+# 支持的输出类型
+OUTPUT_TYPES = ("rtmp", "file", "preview")
+
 class OutputModule:
     """输出模块，处理分析结果输出和视频推流"""
     
@@ -45,12 +54,11 @@ class OutputModule:
         # 数据库路径
         self.db_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))), "app.db")
         
-        # 输出队列 - {output_id: queue.Queue}
-        self.output_queues = {}
+        # 编码器 - {(task_id, width, height, fps): {task_id, queue, thread, stop_event, muxer, outputs}}
+        self.encoders = {}
         
-        # 输出线程 - {output_id: threading.Thread}
-        self.output_threads = {}
-        self.stop_events = {}  # {output_id: threading.Event}
+        # 输出所属编码器 - {output_id: encoder_key}
+        self.output_encoders = {}
         
         # 结果缓存 - {task_id: last_result}
         self.result_cache = {}
@@ -97,45 +105,22 @@ class OutputModule:
                 del self.result_cache[task_id]
     
     def _push_result_to_outputs(self, task_id: str, result: Dict):
-        """将结果推送到关联的输出队列"""
+        """将结果推送到任务的各个编码器队列（每个编码器只接收一份，与输出端数量无关）"""
         try:
-            # 查询关联的输出
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute(
-                """
-                SELECT output_id FROM outputs 
-                WHERE task_id = ? AND enabled = 1
-                """,
-                (task_id,)
-            )
-            
-            outputs = cursor.fetchall()
-            conn.close()
-            
-            if not outputs:
-                return
-            
-            # 推送到每个输出队列
             with self.lock:
-                for (output_id,) in outputs:
-                    if output_id in self.output_queues:
-                        # 检查队列是否已满
-                        queue = self.output_queues[output_id]
-                        
-                        try:
-                            if not queue.full():
-                                queue.put_nowait(result)
-                            else:
-                                # 队列满，丢弃旧结果
-                                try:
-                                    queue.get_nowait()
-                                    queue.put_nowait(result)
-                                except:
-                                    pass
-                        except:
-                            pass
+                encoders = [encoder for encoder in self.encoders.values() if encoder["task_id"] == task_id]
+            
+            for encoder in encoders:
+                encoder_queue = encoder["queue"]
+                try:
+                    encoder_queue.put_nowait(result)
+                except queue.Full:
+                    # 队列满，丢弃旧结果
+                    try:
+                        encoder_queue.get_nowait()
+                        encoder_queue.put_nowait(result)
+                    except (queue.Empty, queue.Full):
+                        pass
             
         except Exception as e:
             logger.error(f"推送结果到输出异常: {e}")
@@ -184,7 +169,7 @@ class OutputModule:
     def _recover_outputs(self):
         """恢复数据库中启用的输出"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = db_connect(self.db_path)
             cursor = conn.cursor()
             
             # 查询所有启用的输出
@@ -216,7 +201,7 @@ class OutputModule:
         """停止所有输出"""
         with self.lock:
             # 获取所有输出ID
-            output_ids = list(self.output_threads.keys())
+            output_ids = list(self.output_encoders.keys())
         
         # 停止每个输出
         for output_id in output_ids:
@@ -225,12 +210,15 @@ class OutputModule:
     def create_output(self, output_id: str, task_id: str, url: str, output_type: str = "rtmp", config: Dict = None) -> Tuple[bool, Optional[str]]:
         """创建输出
         
+        同一任务、同一分辨率/帧率的输出共用一个编码器，新输出只挂载为编码器的输出端
+        
         Args:
             output_id: 输出ID
             task_id: 关联的任务ID
-            url: 输出URL
-            output_type: 输出类型，如 'rtmp', 'file'
-            config: 输出配置
+            url: 输出URL（preview类型可为空）
+            output_type: 输出类型，如 'rtmp', 'file', 'preview'
+            config: 输出配置（width/height/fps；file类型可设segment_seconds分段录像；
+                    preview类型可设max_chunks内存保留块数）
             
         Returns:
             (成功标志, 错误消息)
@@ -238,19 +226,24 @@ class OutputModule:
         if not self.running:
             return False, "模块未运行"
         
-        with self.lock:
-            try:
+        stale_encoder = None
+        try:
+            with self.lock:
                 # 检查输出是否已存在
-                if output_id in self.output_threads and self.output_threads[output_id].is_alive():
+                if self._is_output_active(output_id):
                     logger.warning(f"输出已存在: {output_id}")
                     return False, "输出已存在"
                 
+                if output_type not in OUTPUT_TYPES:
+                    logger.error(f"不支持的输出类型: {output_type}")
+                    return False, f"不支持的输出类型: {output_type}"
+                
                 # 创建配置
                 if config is None:
                     config = {}
                 
                 # 保存到数据库
-                conn = sqlite3.connect(self.db_path)
+                conn = db_connect(self.db_path)
                 cursor = conn.cursor()
                 
                 cursor.execute(
@@ -264,23 +257,17 @@ class OutputModule:
                 conn.commit()
                 conn.close()
                 
-                # 创建输出队列
-                self.output_queues[output_id] = queue.Queue(maxsize=10)
-                
-                # 创建停止事件
-                stop_event = threading.Event()
-                self.stop_events[output_id] = stop_event
-                
-                # 创建并启动输出线程
-                thread = threading.Thread(
-                    target=self._output_worker,
-                    args=(output_id, task_id, url, output_type, config, stop_event),
-                    daemon=True
-                )
-                thread.start()
+                # 同ID的旧输出（已失效）先卸载
+                if output_id in self.output_encoders:
+                    stale_encoder = self._detach_output(output_id)
                 
-                # 保存线程引用
-                self.output_threads[output_id] = thread
+                # 挂载到任务的编码器（不存在时创建）
+                sink = self._create_sink(output_id, url, output_type, config)
+                encoder_key = self._get_or_create_encoder(task_id, config)
+                encoder = self.encoders[encoder_key]
+                encoder["muxer"].attach(output_id, sink)
+                encoder["outputs"].add(output_id)
+                self.output_encoders[output_id] = encoder_key
                 
                 # 发布输出创建事件
                 self.event_bus.publish(Event(
@@ -294,43 +281,119 @@ class OutputModule:
                     }
                 ))
                 
-                logger.info(f"创建输出: {output_id}, 任务: {task_id}, URL: {url}")
+                logger.info(f"创建输出: {output_id}, 任务: {task_id}, URL: {url}, 编码器输出端数: {len(encoder['outputs'])}")
                 return True, None
                 
-            except Exception as e:
-                logger.error(f"创建输出异常: {e}")
-                return False, str(e)
+        except Exception as e:
+            logger.error(f"创建输出异常: {e}")
+            return False, str(e)
+        finally:
+            # 旧编码器在释放锁后停止
+            self._stop_encoder(stale_encoder)
+    
+    def _create_sink(self, output_id: str, url: str, output_type: str, config: Dict):
+        """按输出类型创建输出端（转封装，不重新编码）"""
+        if output_type == "preview":
+            return PreviewSink(config.get("max_chunks", DEFAULT_PREVIEW_CHUNKS))
+        
+        if output_type == "file":
+            # 确保目录存在
+            os.makedirs(os.path.dirname(os.path.abspath(url)), exist_ok=True)
+            segment_seconds = config.get("segment_seconds")
+            if segment_seconds:
+                return RemuxSink(build_segment_cmd(url, segment_seconds), name=f"Output-{output_id}")
+        
+        return RemuxSink(build_remux_cmd(url), name=f"Output-{output_id}")
+    
+    def _get_or_create_encoder(self, task_id: str, config: Dict) -> Tuple:
+        """获取任务在该分辨率/帧率下的编码器，不存在时创建并启动（调用方持有self.lock）"""
+        frame_width = config.get("width", 1280)
+        frame_height = config.get("height", 720)
+        fps = config.get("fps", 25)
+        encoder_key = (task_id, frame_width, frame_height, fps)
+        
+        if encoder_key in self.encoders:
+            return encoder_key
+        
+        muxer = OutputMultiplexer(
+            build_encoder_cmd(frame_width, frame_height, fps),
+            name=f"Encoder-{task_id}-{frame_width}x{frame_height}"
+        )
+        muxer.start()
+        
+        stop_event = threading.Event()
+        encoder = {
+            "task_id": task_id,
+            "queue": queue.Queue(maxsize=10),
+            "stop_event": stop_event,
+            "muxer": muxer,
+            "outputs": set(),
+        }
+        encoder["thread"] = threading.Thread(
+            target=self._encoder_worker,
+            args=(encoder_key, encoder, stop_event),
+            daemon=True
+        )
+        self.encoders[encoder_key] = encoder
+        encoder["thread"].start()
+        
+        logger.info(f"创建编码器: 任务 {task_id}, {frame_width}x{frame_height}@{fps}")
+        return encoder_key
+    
+    def _detach_output(self, output_id: str) -> Optional[Dict]:
+        """
+        卸载输出端（调用方持有self.lock）
+        编码器没有输出端时从编码器表中移除并通知其退出，返回该编码器，
+        由调用方释放锁后调用_stop_encoder等待编码线程结束
+        """
+        encoder_key = self.output_encoders.pop(output_id, None)
+        encoder = self.encoders.get(encoder_key)
+        if not encoder:
+            return None
+        
+        encoder["muxer"].detach(output_id)
+        encoder["outputs"].discard(output_id)
+        
+        if encoder["outputs"]:
+            return None
+        encoder["stop_event"].set()
+        del self.encoders[encoder_key]
+        return encoder
+    
+    def _stop_encoder(self, encoder: Optional[Dict]):
+        """等待编码线程退出并停止复用器（不持有self.lock，避免阻塞其他输出操作）"""
+        if not encoder:
+            return
+        encoder["thread"].join(timeout=5.0)
+        encoder["muxer"].stop()
+        logger.info(f"停止编码器: 任务 {encoder['task_id']}")
+    
+    def _is_output_active(self, output_id: str) -> bool:
+        """输出是否活跃：编码线程运行中且输出端未失效"""
+        encoder = self.encoders.get(self.output_encoders.get(output_id))
+        if not encoder or not encoder["thread"].is_alive():
+            return False
+        sink = encoder["muxer"].get_sink(output_id)
+        return sink is not None and sink.alive
     
     def stop_output(self, output_id: str) -> Tuple[bool, Optional[str]]:
-        """停止输出"""
+        """停止输出（只卸载该输出端，同一编码器的其他输出不受影响）"""
         if not self.running:
             return False, "模块未运行"
         
+        stale_encoder = None
         try:
             with self.lock:
                 # 检查输出是否存在
-                if output_id not in self.output_threads:
+                if output_id not in self.output_encoders:
                     logger.warning(f"输出不存在: {output_id}")
                     return False, "输出不存在"
                 
-                # 设置停止事件
-                if output_id in self.stop_events:
-                    self.stop_events[output_id].set()
-                
-                # 等待线程结束
-                if output_id in self.output_threads:
-                    self.output_threads[output_id].join(timeout=5.0)
-                    del self.output_threads[output_id]
-                
-                # 清理资源
-                if output_id in self.stop_events:
-                    del self.stop_events[output_id]
-                
-                if output_id in self.output_queues:
-                    del self.output_queues[output_id]
+                # 卸载输出端（编码器在释放锁后停止）
+                stale_encoder = self._detach_output(output_id)
                 
                 # 更新数据库
-                conn = sqlite3.connect(self.db_path)
+                conn = db_connect(self.db_path)
                 cursor = conn.cursor()
                 cursor.execute(
                     "UPDATE outputs SET enabled = 0 WHERE output_id = ?",
@@ -352,11 +415,41 @@ class OutputModule:
         except Exception as e:
             logger.error(f"停止输出异常: {e}")
             return False, str(e)
+        finally:
+            # 编码器在释放锁后停止
+            self._stop_encoder(stale_encoder)
+    
+    def read_preview(self, output_id: str, cursor: int = 0, timeout: float = 1.0) -> Tuple[int, bytes]:
+        """读取预览输出的MPEG-TS数据
+        
+        Args:
+            output_id: preview类型的输出ID
+            cursor: 上次返回的游标，0表示从最早保留的数据开始
+            timeout: 无新数据时的等待时间(秒)
+            
+        Returns:
+            (新游标, 数据)；输出不存在或不是预览输出时返回(cursor, b'')
+        """
+        with self.lock:
+            encoder = self.encoders.get(self.output_encoders.get(output_id))
+            sink = encoder["muxer"].get_sink(output_id) if encoder else None
+        if not isinstance(sink, PreviewSink):
+            return cursor, b''
+        return sink.read(cursor, timeout)
+    
+    def get_encoder_stats(self) -> Dict:
+        """获取各编码器的编码与输出端统计"""
+        with self.lock:
+            encoders = list(self.encoders.items())
+        return {
+            f"{task_id}_{width}x{height}@{fps}": encoder["muxer"].get_stats()
+            for (task_id, width, height, fps), encoder in encoders
+        }
     
     def get_output_info(self, output_id: str = None) -> Dict:
         """获取输出信息"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = db_connect(self.db_path)
             cursor = conn.cursor()
             
             if output_id:
@@ -375,12 +468,6 @@ class OutputModule:
                 if not result:
                     return {}
                 
-                # 检查线程是否活跃
-                is_active = (
-                    output_id in self.output_threads and 
-                    self.output_threads[output_id].is_alive()
-                )
-                
                 return {
                     "output_id": result[0],
                     "task_id": result[1],
@@ -390,7 +477,7 @@ class OutputModule:
                     "enabled": bool(result[5]),
                     "created_at": result[6],
                     "updated_at": result[7],
-                    "active": is_active
+                    "active": self._is_output_active(output_id)
                 }
             else:
                 # 获取所有输出信息
@@ -408,12 +495,6 @@ class OutputModule:
                 for row in results:
                     output_id = row[0]
                     
-                    # 检查线程是否活跃
-                    is_active = (
-                        output_id in self.output_threads and 
-                        self.output_threads[output_id].is_alive()
-                    )
-                    
                     outputs[output_id] = {
                         "output_id": output_id,
                         "task_id": row[1],
@@ -423,7 +504,7 @@ class OutputModule:
                         "enabled": bool(row[5]),
                         "created_at": row[6],
                         "updated_at": row[7],
-                        "active": is_active
+                        "active": self._is_output_active(output_id)
                     }
                 
                 return outputs
@@ -432,60 +513,14 @@ class OutputModule:
             logger.error(f"获取输出信息异常: {e}")
             return {}
     
-    def _output_worker(self, output_id: str, task_id: str, url: str, output_type: str, config: Dict, stop_event: threading.Event):
-        """输出工作线程"""
-        try:
-            logger.info(f"启动输出线程: {output_id}, URL: {url}")
-            
-            # 根据输出类型初始化不同的输出处理
-            if output_type == "rtmp":
-                self._rtmp_output_worker(output_id, task_id, url, config, stop_event)
-            elif output_type == "file":
-                self._file_output_worker(output_id, task_id, url, config, stop_event)
-            else:
-                logger.error(f"不支持的输出类型: {output_type}")
-                return
-                
-        except Exception as e:
-            logger.error(f"输出线程异常: {e}")
-            
-            # 发布错误事件
-            self.event_bus.publish(Event(
-                "output.error",
-                "output_module",
-                {
-                    "output_id": output_id,
-                    "error": str(e)
-                }
-            ))
-    
-    def _rtmp_output_worker(self, output_id: str, task_id: str, url: str, config: Dict, stop_event: threading.Event):
-        """RTMP输出工作线程"""
-        # 视频编码器
-        fourcc = cv2.VideoWriter_fourcc(*'XVID')  # 或 'H264'，根据需要选择
-        writer = None
-        frame_width = config.get("width", 1280)
-        frame_height = config.get("height", 720)
-        fps = config.get("fps", 25)
+    def _encoder_worker(self, encoder_key: Tuple, encoder: Dict, stop_event: threading.Event):
+        """编码线程：每个结果只缩放、绘制一次，提交给输出复用器编码后分发到所有输出端"""
+        task_id, frame_width, frame_height, fps = encoder_key
+        output_queue = encoder["queue"]
+        muxer = encoder["muxer"]
         
         try:
-            # 创建视频写入器
-            writer = cv2.VideoWriter(
-                url,
-                fourcc,
-                fps,
-                (frame_width, frame_height)
-            )
-            
-            if not writer.isOpened():
-                logger.error(f"无法打开RTMP输出: {url}")
-                return
-            
-            # 获取输出队列
-            output_queue = self.output_queues.get(output_id)
-            if not output_queue:
-                logger.error(f"输出队列不存在: {output_id}")
-                return
+            logger.info(f"启动编码线程: 任务 {task_id}, {frame_width}x{frame_height}@{fps}")
             
             # 主循环
             while not stop_event.is_set():
@@ -500,9 +535,11 @@ class OutputModule:
                     if frame is None:
                         continue
                     
-                    # 调整帧大小
+                    # 调整帧大小（同一结果可能被多个编码器共享，不在原帧上绘制）
                     if frame.shape[1] != frame_width or frame.shape[0] != frame_height:
                         frame = cv2.resize(frame, (frame_width, frame_height))
+                    else:
+                        frame = frame.copy()
                     
                     # 绘制检测框
                     for det in detections:
@@ -518,8 +555,8 @@ class OutputModule:
                         text = f"{label}: {confidence:.2f}"
                         cv2.putText(frame, text, (int(x1), int(y1) - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
                     
-                    # 写入帧
-                    writer.write(frame)
+                    # 提交编码（从不阻塞，编码器队列满时丢弃最旧帧）
+                    muxer.submit(frame)
                     
                 except queue.Empty:
                     # 队列为空，继续等待
@@ -528,95 +565,21 @@ class OutputModule:
                     logger.error(f"处理输出帧异常: {e}")
                     time.sleep(1)  # 错误后延迟
             
-            logger.info(f"RTMP输出线程退出: {output_id}")
+            logger.info(f"编码线程退出: 任务 {task_id}")
             
         except Exception as e:
-            logger.error(f"RTMP输出异常: {e}")
-        finally:
-            # 清理资源
-            if writer:
-                writer.release()
-    
-    def _file_output_worker(self, output_id: str, task_id: str, file_path: str, config: Dict, stop_event: threading.Event):
-        """文件输出工作线程"""
-        # 视频编码器
-        fourcc = cv2.VideoWriter_fourcc(*'XVID')
-        writer = None
-        frame_width = config.get("width", 1280)
-        frame_height = config.get("height", 720)
-        fps = config.get("fps", 25)
-        
-        try:
-            # 确保目录存在
-            os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
-            
-            # 创建视频写入器
-            writer = cv2.VideoWriter(
-                file_path,
-                fourcc,
-                fps,
-                (frame_width, frame_height)
-            )
-            
-            if not writer.isOpened():
-                logger.error(f"无法打开文件输出: {file_path}")
-                return
-            
-            # 获取输出队列
-            output_queue = self.output_queues.get(output_id)
-            if not output_queue:
-                logger.error(f"输出队列不存在: {output_id}")
-                return
-            
-            # 主循环
-            while not stop_event.is_set():
-                try:
-                    # 尝试从队列获取结果，最多等待100ms
-                    result = output_queue.get(timeout=0.1)
-                    
-                    # 提取帧和检测结果
-                    frame = result.get("frame")
-                    detections = result.get("objects", [])
-                    
-                    if frame is None:
-                        continue
-                    
-                    # 调整帧大小
-                    if frame.shape[1] != frame_width or frame.shape[0] != frame_height:
-                        frame = cv2.resize(frame, (frame_width, frame_height))
-                    
-                    # 绘制检测框
-                    for det in detections:
-                        label = det.get("label", "")
-                        confidence = det.get("confidence", 0)
-                        box = det.get("bbox", [0, 0, 0, 0])
-                        
-                        # 绘制边界框
-                        x1, y1, x2, y2 = box
-                        cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
-                        
-                        # 绘制标签
-                        text = f"{label}: {confidence:.2f}"
-                        cv2.putText(frame, text, (int(x1), int(y1) - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-                    
-                    # 写入帧
-                    writer.write(frame)
-                    
-                except queue.Empty:
-                    # 队列为空，继续等待
-                    continue
-                except Exception as e:
-                    logger.error(f"处理输出帧异常: {e}")
-                    time.sleep(1)  # 错误后延迟
+            logger.error(f"编码线程异常: {e}")
             
-            logger.info(f"文件输出线程退出: {output_id}")
-            
-        except Exception as e:
-            logger.error(f"文件输出异常: {e}")
-        finally:
-            # 清理资源
-            if writer:
-                writer.release()
+            # 发布错误事件
+            for output_id in list(encoder["outputs"]):
+                self.event_bus.publish(Event(
+                    "output.error",
+                    "output_module",
+                    {
+                        "output_id": output_id,
+                        "error": str(e)
+                    }
+                ))
 
 # 全局输出模块实例
 def get_output_module():
@@ -3,12 +3,13 @@
 - 管理视频流生命周期
 - 实现流资源复用
 - 处理流状态监控
+- 独立解码线程+最新帧信箱，慢消费者不阻塞解码
+- 解码侧跳帧：按要求最高的消费者决定解码帧率，跳过的帧不解码
 """
 
 import cv2
 import time
 import threading
-import sqlite3
 import json
 import os
 import logging
@@ -17,6 +18,9 @@ from typing import Dict, List, Any, Optional, Tuple
 
 # 导入事件总线
 from .event_bus import get_event_bus, Event
+# 导入数据库连接池
+from ...db.connection import connect as db_connect
+from core.decode_pipeline import LatestFrameMailbox, DecodeThread, is_live_source, resolve_decode_interval
 
 # 设置配置常量，后续可以从配置文件读取
 FRAME_BUFFER_SIZE = 30
@@ -53,6 +57,9 @@ class StreamModule:
         # 流引用计数 - 用于流复用
         self.stream_ref_counts = {}  # {stream_id: count}
         
+        # 消费者跳帧间隔 - 用于解码侧跳帧
+        self.consumer_frame_skips = {}  # {stream_id: {consumer_id: interval}}
+        
         # 流处理线程
         self.stream_threads = {}  # {stream_id: thread}
         self.stop_events = {}     # {stream_id: event}
@@ -104,7 +111,7 @@ class StreamModule:
     def _recover_streams(self):
         """恢复数据库中标记为在线的流"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = db_connect(self.db_path)
             cursor = conn.cursor()
             
             # 查询所有在线流
@@ -137,7 +144,7 @@ class StreamModule:
             
         with self.lock:
             try:
-                conn = sqlite3.connect(self.db_path)
+                conn = db_connect(self.db_path)
                 cursor = conn.cursor()
                 
                 # 检查是否已存在
@@ -192,7 +199,7 @@ class StreamModule:
                 # 先停止流处理
                 self.stop_stream(stream_id)
                 
-                conn = sqlite3.connect(self.db_path)
+                conn = db_connect(self.db_path)
                 cursor = conn.cursor()
                 
                 # 检查是否存在
@@ -236,7 +243,7 @@ class StreamModule:
             
         with self.lock:
             try:
-                conn = sqlite3.connect(self.db_path)
+                conn = db_connect(self.db_path)
                 cursor = conn.cursor()
                 
                 # 检查流是否存在
@@ -325,7 +332,7 @@ class StreamModule:
                     del self.stop_events[stream_id]
                 
                 # 更新数据库状态
-                conn = sqlite3.connect(self.db_path)
+                conn = db_connect(self.db_path)
                 cursor = conn.cursor()
                 cursor.execute("UPDATE streams SET status = 'offline' WHERE stream_id = ?", (stream_id,))
                 conn.commit()
@@ -345,15 +352,18 @@ class StreamModule:
                 logger.error(f"停止流异常: {e}")
                 return False, str(e)
     
-    def add_consumer(self, stream_id: str, consumer_id: str) -> bool:
-        """添加流消费者"""
+    def add_consumer(self, stream_id: str, consumer_id: str, frame_skip: int = None) -> bool:
+        """添加流消费者，frame_skip为该消费者要求的跳帧间隔（None使用流默认间隔）"""
         if not self.running:
             return False
             
         with self.lock:
             try:
+                # 登记跳帧间隔（消费者已存在时也更新）
+                self.consumer_frame_skips.setdefault(stream_id, {})[consumer_id] = frame_skip or DEFAULT_FRAME_SKIP
+                
                 # 检查流是否存在
-                conn = sqlite3.connect(self.db_path)
+                conn = db_connect(self.db_path)
                 cursor = conn.cursor()
                 cursor.execute("SELECT consumers FROM streams WHERE stream_id = ?", (stream_id,))
                 result = cursor.fetchone()
@@ -419,7 +429,7 @@ class StreamModule:
         with self.lock:
             try:
                 # 检查流是否存在
-                conn = sqlite3.connect(self.db_path)
+                conn = db_connect(self.db_path)
                 cursor = conn.cursor()
                 cursor.execute("SELECT consumers FROM streams WHERE stream_id = ?", (stream_id,))
                 result = cursor.fetchone()
@@ -437,6 +447,9 @@ class StreamModule:
                     except:
                         consumers = []
                 
+                # 移除消费者跳帧间隔
+                self.consumer_frame_skips.get(stream_id, {}).pop(consumer_id, None)
+                
                 # 移除消费者
                 if consumer_id in consumers:
                     consumers.remove(consumer_id)
@@ -478,7 +491,7 @@ class StreamModule:
     def get_stream_info(self, stream_id: str = None) -> Dict[str, Any]:
         """获取流信息"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = db_connect(self.db_path)
             cursor = conn.cursor()
             
             if stream_id is not None:
@@ -512,7 +525,8 @@ class StreamModule:
                     "ref_count": self.stream_ref_counts.get(stream_id, 0),
                     "width": 0,
                     "height": 0,
-                    "fps": 0
+                    "fps": 0,
+                    "decode_stats": self.frame_buffers.get(stream_id, {}).get("decode_stats", {})
                 }
             else:
                 # 返回所有流信息
@@ -585,6 +599,21 @@ class StreamModule:
                 logger.error(f"获取最新帧异常: {e}")
                 return None, str(e)
     
+    def get_decode_interval(self, stream_id: str) -> int:
+        """解码间隔：该流要求最高（间隔最小）的消费者决定"""
+        skips = self.consumer_frame_skips.get(stream_id, {})
+        return resolve_decode_interval(list(skips.values()), DEFAULT_FRAME_SKIP)
+    
+    def _start_decoder(self, stream_id: str, url: str, cap, mailbox: LatestFrameMailbox, fps: float) -> DecodeThread:
+        """启动解码线程，本地文件按视频帧率节流，跳过的帧只grab()不解码"""
+        decoder = DecodeThread(
+            cap, mailbox, name=f"Decode-{stream_id}",
+            realtime_fps=None if is_live_source(url) else fps,
+            skip_interval=lambda: self.get_decode_interval(stream_id)
+        )
+        decoder.start()
+        return decoder
+    
     def _stream_worker(self, stream_id: str, url: str, stop_event: threading.Event):
         """流处理线程函数"""
         try:
@@ -626,7 +655,7 @@ class StreamModule:
                     
                     # 更新数据库流状态
                     try:
-                        conn = sqlite3.connect(self.db_path)
+                        conn = db_connect(self.db_path)
                         cursor = conn.cursor()
                         cursor.execute(
                             "UPDATE streams SET status = 'error', error_message = ? WHERE stream_id = ?",
@@ -657,7 +686,7 @@ class StreamModule:
             
             # 更新数据库流信息
             try:
-                conn = sqlite3.connect(self.db_path)
+                conn = db_connect(self.db_path)
                 cursor = conn.cursor()
                 cursor.execute(
                     """
@@ -685,20 +714,25 @@ class StreamModule:
             except Exception as e:
                 logger.error(f"更新流状态异常: {e}")
             
-            # 帧处理循环
+            # 帧处理循环：解码线程持续读取码流，本循环只从最新帧信箱取帧，
+            # 数据库心跳等慢操作不会阻塞解码、堆积RTSP缓冲
             frame_count = 0
             buffer_size = FRAME_BUFFER_SIZE
-            frame_skip = DEFAULT_FRAME_SKIP
             last_frame_time = time.time()
             last_heartbeat_time = time.time()
             actual_fps = 0
             
+            mailbox = LatestFrameMailbox()
+            decoder = self._start_decoder(stream_id, url, cap, mailbox, fps)
+            
             while not stop_event.is_set():
-                # 读取帧
-                ret, frame = cap.read()
-                if not ret:
+                # 取最新帧
+                item = mailbox.get(timeout=0.5)
+                if item is None:
+                    if decoder.is_alive():
+                        continue
+                    
                     logger.warning(f"流结束或读取错误，尝试重连: {url}")
-                    cap.release()
                     
                     # 重连逻辑
                     reconnected = False
@@ -731,12 +765,12 @@ class StreamModule:
                             }
                         ))
                         break
+                    
+                    decoder = self._start_decoder(stream_id, url, cap, mailbox, fps)
                     continue
                 
-                # 跳帧处理
+                frame, frame_timestamp = item
                 frame_count += 1
-                if frame_skip > 1 and frame_count % frame_skip != 0:
-                    continue
                 
                 # 更新帧缓冲区
                 with self.lock:
@@ -751,8 +785,8 @@ class StreamModule:
                         # 创建帧信息
                         frame_info = {
                             "frame": frame,  # 直接存储帧数据
-                            "timestamp": time.time(),
-                            "frame_id": frame_count,
+                            "timestamp": frame_timestamp,
+                            "frame_id": mailbox.decoded,
                             "width": width,
                             "height": height,
                             "shape": frame.shape,
@@ -762,6 +796,7 @@ class StreamModule:
                         buffer["queue"].append(frame_info)
                         buffer["current_frame"] = frame_info
                         buffer["last_frame_time"] = time.time()
+                        buffer["decode_stats"] = decoder.get_stats()
                         
                         self.frame_buffers[stream_id] = buffer
                 
@@ -776,7 +811,7 @@ class StreamModule:
                 if now - last_heartbeat_time >= 5.0:
                     # 每5秒更新一次数据库状态和发送心跳
                     try:
-                        conn = sqlite3.connect(self.db_path)
+                        conn = db_connect(self.db_path)
                         cursor = conn.cursor()
                         cursor.execute(
                             """
@@ -790,26 +825,26 @@ class StreamModule:
                         conn.commit()
                         conn.close()
                         
-                        # 发布流心跳事件
+                        # 发布流心跳事件（附带解码/丢弃/交付计数）
+                        heartbeat_data = {
+                            "stream_id": stream_id,
+                            "fps": actual_fps,
+                            "frame_count": frame_count
+                        }
+                        heartbeat_data.update(decoder.get_stats())
                         self.event_bus.publish(Event(
                             "stream.heartbeat",
                             "stream_module",
-                            {
-                                "stream_id": stream_id,
-                                "fps": actual_fps,
-                                "frame_count": frame_count
-                            }
+                            heartbeat_data
                         ))
                         
                         last_heartbeat_time = now
                     except Exception as e:
                         logger.error(f"更新流状态异常: {e}")
-                
-                # 控制帧率
-                target_frame_time = 1.0 / fps
-                elapsed = now - last_frame_time
-                if elapsed < target_frame_time:
-                    time.sleep(target_frame_time - elapsed)
+            
+            # 停止解码线程（视频流随解码线程退出关闭）
+            decoder.stop()
+            cap = None
             
             # 清理资源
             if cap:
@@ -822,7 +857,7 @@ class StreamModule:
             
             # 更新数据库流状态
             try:
-                conn = sqlite3.connect(self.db_path)
+                conn = db_connect(self.db_path)
                 cursor = conn.cursor()
                 cursor.execute(
                     "UPDATE streams SET status = 'error', error_message = ? WHERE stream_id = ?",
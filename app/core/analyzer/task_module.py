@@ -5,7 +5,6 @@
 - 支持任务状态监控和资源管理
 """
 
-import sqlite3
 import threading
 import time
 import logging
@@ -15,6 +14,8 @@ from datetime import datetime
 
 # 导入事件总线
 from .event_bus import get_event_bus, Event
+# 导入数据库连接池
+from ...db.connection import connect as db_connect
 from .utils.id_generator import generate_unique_id
 
 logger = logging.getLogger(__name__)
@@ -57,7 +58,7 @@ class TaskModule:
     def _init_database(self):
         """初始化数据库表"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = db_connect(self.db_path)
             cursor = conn.cursor()
             
             # 创建任务表
@@ -131,7 +132,7 @@ class TaskModule:
     def _recover_tasks(self):
         """恢复之前的任务"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = db_connect(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute("SELECT task_id, status FROM tasks WHERE status IN ('running', 'active')")
@@ -176,7 +177,7 @@ class TaskModule:
                     return False, f"任务已存在: {stream_id} + {algorithm_id}", None
                 
                 # 创建任务记录
-                conn = sqlite3.connect(self.db_path)
+                conn = db_connect(self.db_path)
                 cursor = conn.cursor()
                 
                 cursor.execute(
@@ -300,7 +301,7 @@ class TaskModule:
                 self.stop_task(task_id)
                 
                 # 删除数据库记录
-                conn = sqlite3.connect(self.db_path)
+                conn = db_connect(self.db_path)
                 cursor = conn.cursor()
                 
                 cursor.execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
@@ -399,7 +400,7 @@ class TaskModule:
                     return False, f"任务不存在: {task_id}"
                 
                 # 更新数据库
-                conn = sqlite3.connect(self.db_path)
+                conn = db_connect(self.db_path)
                 cursor = conn.cursor()
                 
                 update_fields = []
@@ -441,7 +442,7 @@ class TaskModule:
     def _check_stream_exists(self, stream_id: str) -> bool:
         """检查流是否存在"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = db_connect(self.db_path)
             cursor = conn.cursor()
             cursor.execute("SELECT stream_id FROM streams WHERE stream_id = ?", (stream_id,))
             exists = cursor.fetchone() is not None
@@ -454,7 +455,7 @@ class TaskModule:
     def _check_algorithm_exists(self, algorithm_id: str) -> bool:
         """检查算法是否存在"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = db_connect(self.db_path)
             cursor = conn.cursor()
             cursor.execute("SELECT algo_id FROM algorithms WHERE algo_id = ?", (algorithm_id,))
             exists = cursor.fetchone() is not None
@@ -467,7 +468,7 @@ class TaskModule:
     def _check_task_exists(self, stream_id: str, algorithm_id: str) -> bool:
         """检查任务是否已存在"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = db_connect(self.db_path)
             cursor = conn.cursor()
             cursor.execute(
                 "SELECT task_id FROM tasks WHERE stream_id = ? AND algorithm_id = ?",
@@ -484,7 +485,7 @@ class TaskModule:
         """更新任务状态"""
         try:
             # 更新数据库
-            conn = sqlite3.connect(self.db_path)
+            conn = db_connect(self.db_path)
             cursor = conn.cursor()
             cursor.execute(
                 "UPDATE tasks SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE task_id = ?",
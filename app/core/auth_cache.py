@@ -0,0 +1,225 @@
+"""
+认证缓存
+- 已验证令牌 → 用户快照的最近使用缓存，条目有效期取缓存TTL与令牌过期时间的较小值
+- 令牌黑名单在内存中维护，登出/刷新时同步加入；按间隔增量读取数据库新增记录，覆盖其他进程写入的黑名单
+- 用户停用、角色变更、删除以及角色定义变更时通过ORM事件使缓存失效
+- 统计命中率，命中时不查询数据库
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event, inspect
+
+from ..db.models import BlacklistedToken, Role, User
+
+logger = logging.getLogger(__name__)
+
+# 默认缓存参数
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL = 60.0                      # 条目有效期(秒)
+DEFAULT_BLACKLIST_SYNC_INTERVAL = 5.0   # 黑名单增量同步间隔(秒)
+
+# 影响认证结果的用户字段，变更时使该用户的缓存失效
+USER_AUTH_FIELDS = ("is_active", "role")
+# 快照中不保留的用户字段
+SNAPSHOT_EXCLUDED_FIELDS = ("hashed_password",)
+
+
+def snapshot_user(user: User) -> Dict[str, Any]:
+    """生成用户快照（列字段，不含密码哈希）"""
+    return {column.key: getattr(user, column.key) for column in User.__table__.columns
+            if column.key not in SNAPSHOT_EXCLUDED_FIELDS}
+
+
+def user_from_snapshot(snapshot: Dict[str, Any]) -> User:
+    """由快照构建用户对象（未关联会话，每次请求独立一份）"""
+    return User(**snapshot)
+
+
+class AuthCache:
+    """认证缓存（线程安全）"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL,
+                 blacklist_sync_interval: float = DEFAULT_BLACKLIST_SYNC_INTERVAL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.blacklist_sync_interval = blacklist_sync_interval
+
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()  # token -> (过期时间, 用户ID, 快照)
+        self._blacklist = set()
+        self._blacklist_last_id = 0
+        self._blacklist_synced_at: Optional[float] = None
+        self._generation = 0  # 失效计数，查询数据库期间发生失效时不写入缓存
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0, 'invalidations': 0,
+                      'blacklist_rejects': 0, 'blacklist_syncs': 0}
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """获取令牌对应的用户快照，未缓存或已过期返回None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            if entry[0] <= now:
+                del self._entries[token]
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(token)
+            self.stats['hits'] += 1
+            return entry[2]
+
+    @property
+    def generation(self) -> int:
+        """当前失效计数，查询用户前读取并传给put()"""
+        return self._generation
+
+    def put(self, token: str, snapshot: Dict[str, Any], token_expires_at: Optional[float] = None,
+            generation: Optional[int] = None) -> None:
+        """
+        缓存已验证的令牌
+        Args:
+            token: 令牌
+            snapshot: 用户快照
+            token_expires_at: 令牌过期时间戳
+            generation: 查询用户前读取的失效计数，期间发生过失效时不缓存
+        """
+        expires_at = time.time() + self.ttl
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        with self._lock:
+            if token in self._blacklist or (generation is not None and generation != self._generation):
+                return
+            self._entries[token] = (expires_at, snapshot.get('id'), snapshot)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evicted'] += 1
+
+    def is_blacklisted(self, token: str, db=None) -> bool:
+        """
+        检查令牌是否在黑名单中
+        Args:
+            token: 令牌
+            db: 数据库会话，到达同步间隔时增量读取黑名单
+        """
+        if db is not None:
+            self.sync_blacklist(db)
+        with self._lock:
+            if token in self._blacklist:
+                self._entries.pop(token, None)
+                self.stats['blacklist_rejects'] += 1
+                return True
+            return False
+
+    def sync_blacklist(self, db, force: bool = False) -> None:
+        """从数据库增量读取黑名单（首次全量）"""
+        now = time.monotonic()
+        with self._lock:
+            if not force and self._blacklist_synced_at is not None and \
+                    now - self._blacklist_synced_at < self.blacklist_sync_interval:
+                return
+            self._blacklist_synced_at = now
+            last_id = self._blacklist_last_id
+        try:
+            rows = db.query(BlacklistedToken.id, BlacklistedToken.token) \
+                .filter(BlacklistedToken.id > last_id).all()
+        except Exception as e:
+            logger.error(f"同步令牌黑名单失败: {e}")
+            with self._lock:
+                self._blacklist_synced_at = None
+            return
+        with self._lock:
+            for row_id, token in rows:
+                self._blacklist.add(token)
+                self._entries.pop(token, None)
+                self._blacklist_last_id = max(self._blacklist_last_id, row_id)
+            self.stats['blacklist_syncs'] += 1
+
+    def blacklist(self, token: str) -> None:
+        """令牌加入黑名单（登出、刷新后调用，数据库记录由调用方写入）"""
+        with self._lock:
+            self._blacklist.add(token)
+            self._entries.pop(token, None)
+            self._generation += 1
+
+    def invalidate_user(self, user_id: str) -> int:
+        """使某用户的全部缓存令牌失效，返回失效条目数"""
+        with self._lock:
+            tokens = [token for token, entry in self._entries.items() if entry[1] == user_id]
+            for token in tokens:
+                del self._entries[token]
+            self._generation += 1
+            self.stats['invalidations'] += len(tokens)
+            return len(tokens)
+
+    def clear(self) -> None:
+        """清空令牌缓存（黑名单保留）"""
+        with self._lock:
+            self.stats['invalidations'] += len(self._entries)
+            self._entries.clear()
+            self._generation += 1
+
+    def reset(self) -> None:
+        """清空令牌缓存与黑名单，下次检查时重新全量读取黑名单"""
+        with self._lock:
+            self._entries.clear()
+            self._blacklist.clear()
+            self._blacklist_last_id = 0
+            self._blacklist_synced_at = None
+            self._generation += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'entries': len(self._entries),
+                'blacklist_size': len(self._blacklist),
+                'hit_rate': round(self.stats['hits'] / lookups, 4) if lookups else 0.0
+            }
+
+
+def _cache_settings() -> Dict[str, Any]:
+    """读取应用配置中的缓存参数"""
+    try:
+        from .config import CONFIG
+        section = CONFIG.get("auth_cache") or {}
+    except Exception:
+        section = {}
+    return {
+        "max_entries": section.get("max_entries", DEFAULT_MAX_ENTRIES),
+        "ttl": section.get("ttl", DEFAULT_TTL),
+        "blacklist_sync_interval": section.get("blacklist_sync_interval", DEFAULT_BLACKLIST_SYNC_INTERVAL),
+    }
+
+
+# 全局认证缓存实例
+auth_cache = AuthCache(**_cache_settings())
+
+
+@event.listens_for(User, "after_update")
+def _on_user_updated(mapper, connection, target):
+    """用户停用或角色变更时使其缓存失效"""
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in USER_AUTH_FIELDS):
+        auth_cache.invalidate_user(target.id)
+
+
+@event.listens_for(User, "after_delete")
+def _on_user_deleted(mapper, connection, target):
+    auth_cache.invalidate_user(target.id)
+
+
+@event.listens_for(Role, "after_update")
+@event.listens_for(Role, "after_delete")
+def _on_role_changed(mapper, connection, target):
+    """角色定义变更时清空缓存（角色较少变更，不逐个匹配用户）"""
+    auth_cache.clear()
@@ -16,7 +16,23 @@ DEFAULT_CONFIG = {
         "token_expire_minutes": 60 * 24 * 8  # 8 days
     },
     "database": {
-        "path": str(BASE_DIR / "app.db")
+        "path": str(BASE_DIR / "app.db"),
+        "max_connections": 5,
+        "max_overflow": 10,
+        "pool_timeout": 5.0
+    },
+    "auth_cache": {
+        "max_entries": 1024,
+        "ttl": 60,
+        "blacklist_sync_interval": 5
+    },
+    "alarm_journal": {
+        "batch_interval_ms": 50,
+        "batch_size": 200,
+        "idle_timeout": 30
+    },
+    "org_hierarchy": {
+        "ttl": 300
     },
     "redis": {
         "enabled": False,
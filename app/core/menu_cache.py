@@ -0,0 +1,205 @@
+"""
+菜单缓存
+- 全部菜单一次查询后解析（权限列表JSON、角色列表），按角色组合过滤建树，响应体序列化一次后缓存
+- 每个响应体带ETag（内容哈希），客户端携带If-None-Match且未变化时返回304
+- 菜单或角色新增/修改/删除时使缓存失效，下次请求重建；有效期与失效机制见orm_cache
+"""
+
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..db.models import Menu, Role
+from ..schemas.menu import AuthItem, MenuItemOut
+from .orm_cache import DEFAULT_TTL, InvalidatingCache, cache_settings, invalidate_on_change
+
+logger = logging.getLogger(__name__)
+
+SUPER_ROLE = "R_SUPER"  # 超级管理员可以看到所有菜单
+ALL_MENUS = "*"
+
+
+class MenuPayload:
+    """已序列化的菜单响应"""
+
+    __slots__ = ("body", "etag")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """If-None-Match是否与当前ETag一致"""
+        if not if_none_match:
+            return False
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            if tag == "*" or tag == self.etag:
+                return True
+        return False
+
+
+def _parse_menu(menu: Menu) -> Tuple[str, Optional[str], Optional[FrozenSet[str]], Dict[str, Any]]:
+    """解析菜单行，返回(菜单ID, 父菜单ID, 允许的角色, 不含子菜单的输出项)"""
+    # 处理权限列表
+    auth_list = None
+    if menu.auth_list:
+        try:
+            auth_items = json.loads(menu.auth_list)
+            auth_list = [AuthItem(title=item.get('title', ''), authMark=item.get('authMark', ''))
+                         for item in auth_items]
+        except Exception:
+            auth_list = None
+
+    # 处理角色列表
+    roles = menu.roles.split(",") if menu.roles else None
+
+    item = MenuItemOut(
+        id=menu.menu_id,
+        menu_id=menu.menu_id,
+        name=menu.name,
+        path=menu.path,
+        component=menu.component,
+        redirect=menu.redirect,
+        meta={
+            "title": menu.meta_title,
+            "icon": menu.meta_icon,
+            "keepAlive": menu.keep_alive,
+            "roles": roles,
+            "showBadge": menu.show_badge,
+            "showTextBadge": menu.show_text_badge,
+            "isHide": menu.is_hidden,
+            "isHideTab": menu.is_hide_tab,
+            "isFullPage": menu.is_full_page,
+            "fixedTab": menu.fixed_tab,
+            "activePath": menu.active_path,
+            "link": menu.link,
+            "isIframe": menu.is_iframe,
+            "isFirstLevel": menu.is_first_level,
+            "authList": auth_list
+        },
+        children=[]
+    )
+    return menu.menu_id, menu.parent_id, frozenset(roles) if roles else None, \
+        item.model_dump(mode="json", by_alias=True)
+
+
+def build_menu_tree(menus: Sequence[Tuple], user_roles: Optional[FrozenSet[str]] = None) -> List[Dict[str, Any]]:
+    """
+    由解析后的菜单构建菜单树
+    Args:
+        menus: _parse_menu()结果，按排序顺序
+        user_roles: 用户角色，为None时不过滤
+    """
+    menu_dict = {}
+    for menu_id, _, allowed_roles, item in menus:
+        # 用户角色不在允许的角色列表中，跳过此菜单
+        if user_roles is not None and allowed_roles and not (allowed_roles & user_roles):
+            continue
+        menu_dict[menu_id] = {**item, "children": []}
+
+    root_menus = []
+    for menu_id, parent_id, _, _ in menus:
+        node = menu_dict.get(menu_id)
+        if node is None:
+            continue
+        if parent_id is None:
+            root_menus.append(node)
+        else:
+            parent = menu_dict.get(parent_id)
+            if parent is not None:
+                parent["children"].append(node)
+    return root_menus
+
+
+class MenuCache(InvalidatingCache):
+    """按角色组合缓存的菜单响应（线程安全）"""
+
+    def __init__(self, ttl: float = DEFAULT_TTL):
+        super().__init__(ttl)
+        self._menus: Optional[List[Tuple]] = None
+        self._built_at = 0.0  # 菜单加载时间(monotonic)，响应体随菜单一同过期
+        self._payloads: Dict[Tuple, MenuPayload] = {}
+        self.stats.update({"hits": 0, "misses": 0, "not_modified": 0, "loads": 0,
+                           "expirations": 0, "last_load_ms": 0.0})
+
+    @staticmethod
+    def role_key(user_roles: Sequence[str]):
+        """用户角色对应的缓存键：超级管理员共用全部菜单，其余按角色集合"""
+        roles = frozenset(role for role in user_roles if role)
+        return ALL_MENUS if SUPER_ROLE in roles else roles
+
+    def get(self, db: Session, user_roles: Sequence[str], msg: str = "获取菜单成功") -> MenuPayload:
+        """
+        获取用户角色可见的菜单响应
+        Args:
+            db: 数据库会话（仅缓存失效后使用）
+            user_roles: 用户角色列表
+            msg: 响应消息
+        """
+        key = (self.role_key(user_roles), msg)
+        with self._lock:
+            if self._menus is not None and self._expired(self._built_at):
+                self._reset()
+                self.stats["expirations"] += 1
+            payload = self._payloads.get(key)
+            if payload is not None:
+                self.stats["hits"] += 1
+                return payload
+            self.stats["misses"] += 1
+            generation = self._generation
+            menus = self._menus
+
+        built_at = None
+        if menus is None:
+            built_at = time.monotonic()
+            start = time.perf_counter()
+            menus = [_parse_menu(menu) for menu in db.query(Menu).order_by(Menu.sort).all()]
+            with self._lock:
+                self.stats["loads"] += 1
+                self.stats["last_load_ms"] = round((time.perf_counter() - start) * 1000.0, 3)
+
+        role_key = key[0]
+        tree = build_menu_tree(menus, None if role_key == ALL_MENUS else role_key)
+        body = json.dumps({"code": 200, "msg": msg, "data": {"menuList": tree}},
+                          ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        payload = MenuPayload(body)
+
+        with self._lock:
+            if generation == self._generation:
+                if built_at is not None:
+                    self._built_at = built_at
+                self._menus = menus
+                self._payloads[key] = payload
+        return payload
+
+    def record_not_modified(self) -> None:
+        with self._lock:
+            self.stats["not_modified"] += 1
+
+    def _clear(self) -> None:
+        self._menus = None
+        self._payloads.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self._payloads),
+                "menus": len(self._menus) if self._menus is not None else 0,
+                "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0
+            }
+
+
+# 全局菜单缓存实例
+menu_cache = MenuCache(**cache_settings("menu_cache"))
+
+invalidate_on_change(menu_cache, "menu_cache_changed", (Menu, Role))
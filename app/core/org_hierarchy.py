@@ -0,0 +1,237 @@
+"""
+组织层级服务
+- 组织表保存物化路径（/a/b/c/），子树查询用路径前缀范围条件一次取出，不逐层递归
+- 组织树在内存中缓存：一次查询全部组织、一次分组统计绑定数，按父节点建索引后组装，请求直接返回缓存
+- 组织新增/修改/移动/删除、绑定变更时通过ORM事件使缓存失效（见orm_cache）；批量UPDATE不触发ORM事件，调用方提交后显式invalidate()
+"""
+
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session, aliased
+
+from ..db.models import Organization, OrganizationBinding, VideoStream
+from .orm_cache import DEFAULT_TTL, InvalidatingCache, cache_settings, invalidate_on_change
+
+logger = logging.getLogger(__name__)
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 影响组织树的组织字段
+TREE_FIELDS = ("name", "parent_id", "path", "description", "status", "sort_order")
+
+
+def subtree_filter(column, path: str):
+    """
+    子树条件：路径以path为前缀（含自身）
+    等价于 column LIKE 'path%'，写成范围条件以便使用路径索引，且不受路径中%和_的影响
+    """
+    return and_(column >= path, column < path[:-1] + chr(ord(path[-1]) + 1))
+
+
+def format_time(value) -> Optional[str]:
+    return value.strftime(TIME_FORMAT) if value is not None else None
+
+
+def stream_count_query(db: Session):
+    """按组织分组统计绑定的视频流数量"""
+    return db.query(OrganizationBinding.org_id,
+                    func.count(OrganizationBinding.binding_id).label("stream_count")) \
+        .group_by(OrganizationBinding.org_id)
+
+
+class _TreeSnapshot:
+    """某一时刻的组织树"""
+
+    __slots__ = ("nodes", "children", "tree", "built_at")
+
+    def __init__(self, nodes: Dict[str, Dict[str, Any]], children: Dict[Optional[str], List[str]],
+                 tree: List[Dict[str, Any]]):
+        self.nodes = nodes          # org_id -> 节点（含children列表）
+        self.children = children    # parent_id -> 子组织ID（按排序顺序）
+        self.tree = tree            # 根节点列表
+        self.built_at = time.monotonic()
+
+
+class OrgHierarchy(InvalidatingCache):
+    """组织层级缓存（线程安全）"""
+
+    def __init__(self, ttl: float = DEFAULT_TTL):
+        super().__init__(ttl)
+        self._snapshot: Optional[_TreeSnapshot] = None
+        self.stats.update({"hits": 0, "builds": 0, "last_build_ms": 0.0})
+
+    def _clear(self) -> None:
+        self._snapshot = None
+
+    def _get_snapshot(self, db: Session) -> _TreeSnapshot:
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and not self._expired(snapshot.built_at):
+                self.stats["hits"] += 1
+                return snapshot
+            generation = self._generation
+
+        start = time.perf_counter()
+        snapshot = self._build(db)
+        with self._lock:
+            self.stats["builds"] += 1
+            self.stats["last_build_ms"] = round((time.perf_counter() - start) * 1000.0, 3)
+            if generation == self._generation:
+                self._snapshot = snapshot
+        return snapshot
+
+    @staticmethod
+    def _build(db: Session) -> _TreeSnapshot:
+        """两次查询构建组织树：全部组织、按组织分组的绑定数"""
+        rows = db.query(
+            Organization.org_id, Organization.name, Organization.parent_id, Organization.path,
+            Organization.description, Organization.status, Organization.sort_order, Organization.created_at
+        ).all()
+        counts = dict(stream_count_query(db).all())
+
+        nodes: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            nodes[row.org_id] = {
+                "org_id": row.org_id,
+                "name": row.name,
+                "parent_id": row.parent_id,
+                "path": row.path,
+                "description": row.description,
+                "status": row.status,
+                "sort_order": row.sort_order or 0,
+                "created_at": format_time(row.created_at),
+                "stream_count": counts.get(row.org_id, 0),
+                "children": [],
+            }
+
+        children: Dict[Optional[str], List[str]] = {}
+        for node in sorted(nodes.values(), key=lambda item: item["sort_order"]):
+            # 父组织不存在时作为根节点
+            parent_id = node["parent_id"] if node["parent_id"] in nodes else None
+            children.setdefault(parent_id, []).append(node["org_id"])
+            if parent_id is not None:
+                nodes[parent_id]["children"].append(node)
+
+        tree = [nodes[org_id] for org_id in children.get(None, [])]
+        return _TreeSnapshot(nodes, children, tree)
+
+    def get_tree(self, db: Session, root_id: Optional[str] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        获取组织树
+        Args:
+            db: 数据库会话
+            root_id: 子树根组织ID，为None时返回整棵树
+        Returns:
+            (根节点列表, 节点总数)，root_id不存在时返回([], 0)
+        """
+        snapshot = self._get_snapshot(db)
+        if root_id is None:
+            return snapshot.tree, len(snapshot.nodes)
+        node = snapshot.nodes.get(root_id)
+        if node is None:
+            return [], 0
+        return [node], len(self._descendants(snapshot, root_id)) + 1
+
+    @staticmethod
+    def _descendants(snapshot: _TreeSnapshot, org_id: str) -> List[str]:
+        result = []
+        pending = [org_id]
+        while pending:
+            next_level = []
+            for parent_id in pending:
+                next_level.extend(snapshot.children.get(parent_id, ()))
+            result.extend(next_level)
+            pending = next_level
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        with self._lock:
+            snapshot = self._snapshot
+            return {**self.stats, "cached": snapshot is not None,
+                    "nodes": len(snapshot.nodes) if snapshot is not None else 0}
+
+
+def list_organizations(db: Session, keyword: Optional[str] = None, status: Optional[str] = None,
+                       parent_id: Optional[str] = None, offset: int = 0,
+                       limit: int = 20) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    组织平铺列表：一次计数 + 一次分页查询（父组织名称自连接、绑定数分组子查询）
+    Returns:
+        (列表项, 总数)
+    """
+    query = db.query(Organization)
+    if keyword:
+        query = query.filter(or_(
+            Organization.name.ilike(f"%{keyword}%"),
+            Organization.description.ilike(f"%{keyword}%")
+        ))
+    if status:
+        query = query.filter(Organization.status == status)
+    if parent_id:
+        query = query.filter(Organization.parent_id == parent_id)
+
+    total = query.count()
+
+    parent = aliased(Organization)
+    counts = stream_count_query(db).subquery()
+    rows = query.outerjoin(parent, parent.org_id == Organization.parent_id) \
+        .outerjoin(counts, counts.c.org_id == Organization.org_id) \
+        .add_columns(parent.name, func.coalesce(counts.c.stream_count, 0)) \
+        .order_by(Organization.sort_order, Organization.org_id) \
+        .offset(offset).limit(limit).all()
+
+    items = []
+    for org, parent_name, stream_count in rows:
+        items.append({
+            "org_id": org.org_id,
+            "name": org.name,
+            "parent_id": org.parent_id,
+            "parent_name": parent_name,
+            "description": org.description,
+            "status": org.status,
+            "sort_order": org.sort_order,
+            "stream_count": stream_count,
+            "created_at": format_time(org.created_at)
+        })
+    return items, total
+
+
+def get_streams(db: Session, org: Organization, include_children: bool = False) -> List[VideoStream]:
+    """
+    组织绑定的视频流（一次连接查询）
+    Args:
+        org: 组织
+        include_children: 是否包含全部下级组织绑定的视频流（按物化路径前缀）
+    """
+    query = db.query(VideoStream).join(OrganizationBinding, OrganizationBinding.stream_id == VideoStream.stream_id)
+    if include_children and org.path:
+        query = query.join(Organization, Organization.org_id == OrganizationBinding.org_id) \
+            .filter(subtree_filter(Organization.path, org.path))
+    else:
+        query = query.filter(OrganizationBinding.org_id == org.org_id)
+    return query.distinct().order_by(VideoStream.created_at, VideoStream.stream_id).all()
+
+
+def move_subtree_paths(db: Session, old_path: str, new_path: str) -> int:
+    """
+    一条UPDATE改写全部下级组织的路径前缀（不含自身），返回更新行数
+    批量UPDATE不触发ORM事件，提交后需调用org_hierarchy.invalidate()
+    """
+    if not old_path or old_path == new_path:
+        return 0
+    return db.query(Organization) \
+        .filter(subtree_filter(Organization.path, old_path), Organization.path != old_path) \
+        .update({Organization.path: new_path + func.substr(Organization.path, len(old_path) + 1)},
+                synchronize_session=False)
+
+
+# 全局组织层级缓存实例
+org_hierarchy = OrgHierarchy(**cache_settings("org_hierarchy"))
+
+# 组织只有影响组织树的字段变更时失效
+invalidate_on_change(org_hierarchy, "org_hierarchy_changed", (Organization, OrganizationBinding),
+                     update_fields={Organization: TREE_FIELDS})
@@ -0,0 +1,97 @@
+"""
+ORM数据缓存公共部分
+- InvalidatingCache：有效期 + 失效计数，构建期间发生失效时丢弃构建结果
+- invalidate_on_change：模型新增/修改/删除时通过ORM事件使缓存失效，会话提交或回滚后再失效一次
+- cache_settings：从应用配置读取缓存参数
+有效期用于兜底其他进程或直接SQL写入的变更（这些变更不会触发本进程的ORM事件）
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Sequence
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+DEFAULT_TTL = 300.0  # 缓存有效期(秒)
+
+
+class InvalidatingCache(ABC):
+    """带有效期与失效计数的缓存基类（线程安全），子类实现_clear()"""
+
+    def __init__(self, ttl: float = DEFAULT_TTL):
+        self.ttl = ttl
+        self._generation = 0  # 失效计数，构建期间发生失效时不写入缓存
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Any] = {"invalidations": 0}
+
+    def invalidate(self) -> None:
+        """使缓存失效"""
+        with self._lock:
+            self._reset()
+            self.stats["invalidations"] += 1
+
+    def _expired(self, built_at: float) -> bool:
+        return time.monotonic() - built_at >= self.ttl
+
+    def _reset(self) -> None:
+        """清空缓存（调用方持有self._lock），构建中的结果不再写入"""
+        self._clear()
+        self._generation += 1
+
+    @abstractmethod
+    def _clear(self) -> None:
+        """丢弃缓存内容（调用方持有self._lock）"""
+
+
+def invalidate_on_change(cache: InvalidatingCache, flag: str, models: Iterable[type],
+                         update_fields: Optional[Mapping[type, Sequence[str]]] = None) -> None:
+    """
+    模型变更时使缓存失效
+    Args:
+        cache: 缓存
+        flag: 会话info中标记本会话有变更的键
+        models: 监听的模型
+        update_fields: 模型 -> 字段，该模型只有这些字段变更时失效（默认任何修改都失效）
+    """
+    update_fields = update_fields or {}
+
+    def mark_changed(target) -> None:
+        # 立即失效；提交或回滚后再失效一次，避免提交前按旧数据或未提交的数据重建缓存
+        cache.invalidate()
+        session = Session.object_session(target)
+        if session is not None:
+            session.info[flag] = True
+
+    def on_changed(mapper, connection, target):
+        mark_changed(target)
+
+    def updated_listener(fields: Sequence[str]) -> Callable:
+        def on_updated(mapper, connection, target):
+            state = inspect(target)
+            if any(state.attrs[field].history.has_changes() for field in fields):
+                mark_changed(target)
+        return on_updated
+
+    def on_session_end(session):
+        if session.info.pop(flag, False):
+            cache.invalidate()
+
+    for model in models:
+        event.listen(model, "after_insert", on_changed)
+        event.listen(model, "after_delete", on_changed)
+        fields = update_fields.get(model)
+        event.listen(model, "after_update", updated_listener(fields) if fields else on_changed)
+    event.listen(Session, "after_commit", on_session_end)
+    event.listen(Session, "after_rollback", on_session_end)
+
+
+def cache_settings(section: str) -> Dict[str, Any]:
+    """读取应用配置中section下的缓存参数"""
+    try:
+        from .config import CONFIG
+        values = CONFIG.get(section) or {}
+    except Exception:
+        values = {}
+    return {"ttl": values.get("ttl", DEFAULT_TTL)}
@@ -0,0 +1,213 @@
+"""
+状态推送服务
+- 由事件总线的task.*/stream.*事件驱动，事件到达后标记状态已变化，等待合并窗口后统一计算一次状态
+- 与上一次快照比较，只向所有状态连接推送发生变化的任务/流（增量），没有变化时不推送
+- 防抖合并：首个事件到达后再等待min_interval，窗口内的突发事件（可能来自事件总线的不同分片线程）
+  合并为一次计算；长时间无事件时按兜底间隔重算一次，覆盖未发事件的状态变化
+- 每次推送带递增序号，客户端发现序号不连续时可请求全量状态
+- 全量状态（initial_status/status_update）保持get_task_status()的结构，另附seq与streams；按ID索引的结构只用于增量
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 推送参数
+DEFAULT_MIN_INTERVAL = 0.5     # 合并窗口(秒)：首个事件到达后等待该时长再计算，也是两次推送的最小间隔
+DEFAULT_RESYNC_INTERVAL = 10.0  # 无事件时的兜底重算间隔(秒)
+STATUS_EVENT_PATTERNS = ("task.*", "stream.*")
+IGNORED_EVENTS = ("stream.heartbeat",)
+
+# 流状态中参与比较的字段（其余字段如解码统计变化频繁，不单独触发推送）
+STREAM_FIELDS = ("stream_id", "name", "status", "error_message", "ref_count", "consumer_count")
+
+
+def build_status_snapshot(analyzer_service) -> Dict[str, Any]:
+    """计算一次系统状态快照（任务按task_id、流按stream_id索引）"""
+    task_status = analyzer_service.get_task_status() or {}
+    tasks = {task["task_id"]: task for task in task_status.get("tasks", [])}
+    streams = {}
+    stream_module = getattr(analyzer_service, "stream_module", None)
+    if stream_module is not None and getattr(analyzer_service, "running", False):
+        for stream_id, info in (stream_module.get_stream_info() or {}).items():
+            streams[stream_id] = {field: info.get(field) for field in STREAM_FIELDS}
+    return {
+        "summary": {
+            "total_tasks": task_status.get("total_tasks", 0),
+            "running_tasks": task_status.get("running_tasks", 0),
+            "stopped_tasks": task_status.get("stopped_tasks", 0),
+            "total_streams": len(streams)
+        },
+        "tasks": tasks,
+        "streams": streams
+    }
+
+
+def full_status(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    由快照生成全量状态消息数据
+    与get_task_status()结构一致（计数在顶层、tasks为列表），另附streams
+    """
+    summary = snapshot["summary"]
+    return {
+        "total_tasks": summary.get("total_tasks", 0),
+        "running_tasks": summary.get("running_tasks", 0),
+        "stopped_tasks": summary.get("stopped_tasks", 0),
+        "tasks": list(snapshot["tasks"].values()),
+        "streams": snapshot["streams"]
+    }
+
+
+def diff_snapshot(previous: Optional[Dict[str, Any]], current: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    比较两次快照，返回增量
+    Returns:
+        {summary?, tasks?: {变化或新增的任务}, removed_tasks?: [...], streams?: {...}, removed_streams?: [...]}，
+        无变化时返回空字典
+    """
+    previous = previous or {"summary": {}, "tasks": {}, "streams": {}}
+    delta = {}
+    if current["summary"] != previous["summary"]:
+        delta["summary"] = current["summary"]
+    for section in ("tasks", "streams"):
+        before, after = previous[section], current[section]
+        changed = {key: value for key, value in after.items() if before.get(key) != value}
+        removed = [key for key in before if key not in after]
+        if changed:
+            delta[section] = changed
+        if removed:
+            delta[f"removed_{section}"] = removed
+    return delta
+
+
+class StatusPublisher:
+    """事件驱动的状态推送器（每个应用一个，在事件循环中运行）"""
+
+    def __init__(self, snapshot: Callable[[], Dict[str, Any]],
+                 broadcast: Callable[[Dict[str, Any]], Awaitable[int]],
+                 has_subscribers: Callable[[], bool],
+                 min_interval: float = DEFAULT_MIN_INTERVAL,
+                 resync_interval: float = DEFAULT_RESYNC_INTERVAL):
+        """
+        Args:
+            snapshot: 计算状态快照的函数（在线程池中执行）
+            broadcast: 广播消息的协程函数，返回发送的连接数
+            has_subscribers: 是否有状态连接，没有时不计算
+            min_interval: 合并窗口/两次推送的最小间隔(秒)
+            resync_interval: 无事件时的兜底重算间隔(秒)
+        """
+        self.snapshot = snapshot
+        self.broadcast = broadcast
+        self.has_subscribers = has_subscribers
+        self.min_interval = min_interval
+        self.resync_interval = resync_interval
+
+        self.seq = 0
+        self.current: Optional[Dict[str, Any]] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._dirty: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._stats_lock = threading.Lock()  # 事件回调来自事件总线的多个分片线程
+        self.stats = {"events": 0, "ticks": 0, "deltas_sent": 0, "empty_ticks": 0, "skipped_ticks": 0,
+                      "last_compute_ms": 0.0}
+
+    def attach(self, event_bus) -> None:
+        """订阅事件总线的任务/流事件"""
+        for pattern in STATUS_EVENT_PATTERNS:
+            event_bus.subscribe(pattern, self.on_event)
+
+    def detach(self, event_bus) -> None:
+        """取消订阅"""
+        for pattern in STATUS_EVENT_PATTERNS:
+            event_bus.unsubscribe(pattern, self.on_event)
+
+    def on_event(self, event) -> None:
+        """事件总线回调（在事件处理线程中调用），只标记状态已变化"""
+        if event.event_type in IGNORED_EVENTS:
+            return
+        with self._stats_lock:
+            self.stats["events"] += 1
+        self.mark_dirty()
+
+    def mark_dirty(self) -> None:
+        """标记状态已变化（线程安全）"""
+        if self._loop is not None and self._dirty is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._dirty.set)
+
+    async def _compute(self) -> Dict[str, Any]:
+        start = time.perf_counter()
+        snapshot = await asyncio.get_running_loop().run_in_executor(None, self.snapshot)
+        self.stats["last_compute_ms"] = round((time.perf_counter() - start) * 1000.0, 3)
+        return snapshot
+
+    async def current_snapshot(self) -> Dict[str, Any]:
+        """获取全量状态消息数据（供新连接的初始状态和全量请求使用，结构见full_status）"""
+        if self._lock is None:
+            # 发布循环未启动：计算结果同样作为后续增量的基线
+            self.current = await self._compute()
+            return {"seq": self.seq, **full_status(self.current)}
+        async with self._lock:
+            if self.current is None:
+                self.current = await self._compute()
+            return {"seq": self.seq, **full_status(self.current)}
+
+    async def tick(self) -> int:
+        """计算一次状态并推送增量，返回发送的连接数"""
+        async with self._lock:
+            self.stats["ticks"] += 1
+            current = await self._compute()
+            delta = diff_snapshot(self.current, current)
+            self.current = current
+            if not delta:
+                self.stats["empty_ticks"] += 1
+                return 0
+            self.seq += 1
+            seq = self.seq
+        message = {
+            "type": "status_delta",
+            "seq": seq,
+            "data": delta,
+            "timestamp": int(time.time()),
+            "server_time": datetime.now().isoformat()
+        }
+        sent = await self.broadcast(message)
+        self.stats["deltas_sent"] += 1
+        logger.debug(f"状态增量推送: seq={seq}, 变化项: {list(delta)}, 发送到 {sent} 个连接")
+        return sent
+
+    async def run(self) -> None:
+        """推送循环：等待事件或兜底间隔，事件到达后等待合并窗口再计算一次"""
+        self._loop = asyncio.get_running_loop()
+        self._dirty = asyncio.Event()
+        self._lock = asyncio.Lock()
+        logger.info("状态推送服务启动")
+        while True:
+            try:
+                try:
+                    await asyncio.wait_for(self._dirty.wait(), self.resync_interval)
+                    # 防抖：首个事件到达后等待合并窗口，窗口内的后续事件一并计入本次计算
+                    await asyncio.sleep(self.min_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._dirty.clear()
+                if not self.has_subscribers():
+                    # 无订阅者时丢弃基线，下次有连接时重新计算
+                    self.current = None
+                    self.stats["skipped_ticks"] += 1
+                    continue
+                await self.tick()
+            except asyncio.CancelledError:
+                logger.info("状态推送服务已停止")
+                break
+            except Exception as e:
+                logger.error(f"状态推送异常: {e}", exc_info=True)
+                await asyncio.sleep(self.min_interval)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取推送统计"""
+        return {**self.stats, "seq": self.seq}
@@ -1,33 +1,133 @@
 """
 统一的WebSocket连接管理器
 整合报警WebSocket和状态WebSocket的连接管理
+- 每个连接一个有界发送队列和一个写出任务，广播只入队不等待，慢客户端不拖慢其他连接
+- 广播消息只序列化一次，各连接共享同一份文本/二进制帧
+- 发送队列满时丢弃最旧消息（降级），连续丢弃过多或发送超时的慢客户端被断开
 """
 
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import Dict, List, Set, Optional, Any
+from typing import Dict, List, Set, Optional, Any, Union
 import json
 import logging
 import asyncio
 from datetime import datetime
 from enum import Enum
 
+from core.alarm_protocol import AlarmNotification, DEFAULT_MEDIA_MODE, normalize_media_mode
+
 logger = logging.getLogger(__name__)
 
+# 发送队列参数
+DEFAULT_SEND_QUEUE_SIZE = 64     # 每个连接最多排队的消息数
+DEFAULT_SEND_TIMEOUT = 5.0       # 单条消息发送超时(秒)，超时视为慢客户端
+DEFAULT_MAX_DROPPED = 32         # 连续丢弃消息数上限，超过后断开连接
+SLOW_CONSUMER_CLOSE_CODE = 1013  # 断开慢客户端时的关闭码（Try Again Later）
+
 class WebSocketType(Enum):
     """WebSocket连接类型"""
     ALARMS = "alarms"        # 报警WebSocket
     STATUS = "status"        # 状态WebSocket
     GENERAL = "general"      # 通用WebSocket
+    ALARM_PRODUCER = "alarm_producer"  # 告警进程推送连接（只接收告警，不参与任何广播）
+
+class ConnectionSender:
+    """
+    单个连接的发送队列与写出任务
+    队列元素为一条消息的帧列表（str为文本帧，bytes为二进制帧），同一连接的消息按入队顺序发送
+    """
+    
+    def __init__(self, websocket: WebSocket, on_close, queue_size: int = DEFAULT_SEND_QUEUE_SIZE,
+                 send_timeout: float = DEFAULT_SEND_TIMEOUT, max_dropped: int = DEFAULT_MAX_DROPPED):
+        self.websocket = websocket
+        self.on_close = on_close
+        self.send_timeout = send_timeout
+        self.max_dropped = max_dropped
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+        self.consecutive_dropped = 0
+        self.closed = False
+        self.stats = {"enqueued": 0, "sent": 0, "dropped": 0, "bytes_sent": 0}
+        self.task = asyncio.create_task(self._run())
+    
+    def enqueue(self, frames: List[Union[str, bytes]]) -> bool:
+        """
+        消息入队（不阻塞）
+        队列满时丢弃最旧的消息；连续丢弃超过上限时返回False，由管理器断开该连接
+        """
+        if self.closed:
+            return False
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.queue.task_done()
+            self.stats["dropped"] += 1
+            self.consecutive_dropped += 1
+            if self.consecutive_dropped > self.max_dropped:
+                return False
+        self.queue.put_nowait(frames)
+        self.stats["enqueued"] += 1
+        return True
+    
+    async def _run(self):
+        reason = None
+        try:
+            while True:
+                frames = await self.queue.get()
+                try:
+                    for frame in frames:
+                        if isinstance(frame, bytes):
+                            await asyncio.wait_for(self.websocket.send_bytes(frame), self.send_timeout)
+                        else:
+                            await asyncio.wait_for(self.websocket.send_text(frame), self.send_timeout)
+                        self.stats["bytes_sent"] += len(frame)
+                finally:
+                    self.queue.task_done()
+                self.stats["sent"] += 1
+                self.consecutive_dropped = 0
+        except asyncio.CancelledError:
+            return
+        except asyncio.TimeoutError:
+            reason = "slow"
+            logger.warning("WebSocket发送超时，断开慢客户端")
+        except Exception as e:
+            reason = "error"
+            logger.error(f"WebSocket发送失败: {e}")
+        self.closed = True
+        self.on_close(self.websocket, reason)
+    
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize()
+    
+    async def flush(self):
+        """等待已入队的消息发送完成"""
+        if not self.closed:
+            await self.queue.join()
+    
+    def stop(self):
+        """停止写出任务，丢弃未发送的消息"""
+        self.closed = True
+        if not self.task.done():
+            self.task.cancel()
 
 class UnifiedWebSocketManager:
     """统一的WebSocket连接管理器"""
     
-    def __init__(self):
+    def __init__(self, send_queue_size: int = DEFAULT_SEND_QUEUE_SIZE,
+                 send_timeout: float = DEFAULT_SEND_TIMEOUT, max_dropped: int = DEFAULT_MAX_DROPPED):
+        # 发送队列参数
+        self.send_queue_size = send_queue_size
+        self.send_timeout = send_timeout
+        self.max_dropped = max_dropped
+        
+        # 每个连接的发送队列与写出任务
+        self.senders: Dict[WebSocket, ConnectionSender] = {}
+        
         # 按类型分组的连接
         self.connections_by_type: Dict[str, List[WebSocket]] = {
             WebSocketType.ALARMS.value: [],
             WebSocketType.STATUS.value: [],
-            WebSocketType.GENERAL.value: []
+            WebSocketType.GENERAL.value: [],
+            WebSocketType.ALARM_PRODUCER.value: []
         }
         
         # 按流ID分组的报警连接（用于流特定广播）
@@ -42,10 +142,19 @@ class UnifiedWebSocketManager:
             "connections_by_type": {t.value: 0 for t in WebSocketType},
             "stream_subscriptions": 0
         }
+        
+        # 广播统计
+        self.broadcast_stats = {
+            "broadcasts": 0,
+            "messages_enqueued": 0,
+            "messages_dropped": 0,
+            "slow_consumers_evicted": 0,
+            "send_errors": 0
+        }
     
     async def connect(self, websocket: WebSocket, ws_type: str, 
-                     stream_id: str = None, client_info: Dict = None):
-        """建立WebSocket连接"""
+                     stream_id: str = None, client_info: Dict = None, media_mode: str = None):
+        """建立WebSocket连接（media_mode为告警图片媒体模式：full/thumbnail/url）"""
         try:
             await websocket.accept()
             
@@ -66,10 +175,16 @@ class UnifiedWebSocketManager:
                 "type": ws_type,
                 "stream_id": stream_id,
                 "client_info": client_info or {},
+                "media_mode": normalize_media_mode(media_mode),
                 "connected_time": datetime.now(),
                 "last_activity": datetime.now()
             }
             
+            # 发送队列与写出任务
+            self.senders[websocket] = ConnectionSender(
+                websocket, self._on_sender_closed, self.send_queue_size, self.send_timeout, self.max_dropped
+            )
+            
             # 更新统计
             self.connection_stats["total_connections"] += 1
             self.connection_stats["connections_by_type"][ws_type] += 1
@@ -86,6 +201,15 @@ class UnifiedWebSocketManager:
     def disconnect(self, websocket: WebSocket):
         """断开WebSocket连接"""
         try:
+            if websocket not in self.connection_metadata:
+                return
+            
+            # 停止写出任务
+            sender = self.senders.pop(websocket, None)
+            if sender:
+                sender.stop()
+                self.broadcast_stats["messages_dropped"] += sender.stats["dropped"]
+            
             metadata = self.connection_metadata.get(websocket, {})
             ws_type = metadata.get("type", "unknown")
             stream_id = metadata.get("stream_id")
@@ -119,94 +243,114 @@ class UnifiedWebSocketManager:
         except Exception as e:
             logger.error(f"WebSocket连接断开处理失败: {e}")
     
-    async def send_personal_message(self, message: str, websocket: WebSocket):
-        """发送个人消息"""
+    def _on_sender_closed(self, websocket: WebSocket, reason: Optional[str]):
+        """写出任务因发送失败或超时退出"""
+        if reason == "slow":
+            self.broadcast_stats["slow_consumers_evicted"] += 1
+            asyncio.ensure_future(self._close_quietly(websocket))
+        else:
+            self.broadcast_stats["send_errors"] += 1
+        self.disconnect(websocket)
+    
+    async def _close_quietly(self, websocket: WebSocket):
         try:
-            await websocket.send_text(message)
-            
-            # 更新活动时间
-            if websocket in self.connection_metadata:
-                self.connection_metadata[websocket]["last_activity"] = datetime.now()
-                
-            return True
-        except Exception as e:
-            logger.error(f"发送个人消息失败: {e}")
-            self.disconnect(websocket)
+            await websocket.close(code=SLOW_CONSUMER_CLOSE_CODE)
+        except Exception:
+            pass
+    
+    def _evict(self, websocket: WebSocket):
+        """断开发送队列持续溢出的慢客户端"""
+        logger.warning(f"WebSocket发送队列持续溢出，断开慢客户端: {self.connection_metadata.get(websocket, {}).get('type')}")
+        self.broadcast_stats["slow_consumers_evicted"] += 1
+        self.disconnect(websocket)
+        asyncio.ensure_future(self._close_quietly(websocket))
+    
+    def enqueue(self, websocket: WebSocket, frames: List[Union[str, bytes]]) -> bool:
+        """消息入连接的发送队列（不阻塞），返回是否入队"""
+        sender = self.senders.get(websocket)
+        if sender is None:
+            return False
+        if not sender.enqueue(frames):
+            self._evict(websocket)
             return False
+        self.broadcast_stats["messages_enqueued"] += 1
+        
+        # 更新活动时间
+        if websocket in self.connection_metadata:
+            self.connection_metadata[websocket]["last_activity"] = datetime.now()
+        return True
+    
+    def _fanout(self, connections: List[WebSocket], frames: List[Union[str, bytes]]) -> int:
+        """同一份帧列表入队到多个连接，返回入队的连接数"""
+        self.broadcast_stats["broadcasts"] += 1
+        return sum(1 for connection in connections if self.enqueue(connection, frames))
+    
+    @staticmethod
+    def _serialize(message: Union[str, Dict[str, Any]]) -> str:
+        return message if isinstance(message, str) else json.dumps(message, ensure_ascii=False)
+    
+    async def flush(self, timeout: float = DEFAULT_SEND_TIMEOUT):
+        """等待所有连接的已入队消息发送完成（超时返回）"""
+        senders = list(self.senders.values())
+        if not senders:
+            return
+        try:
+            await asyncio.wait_for(asyncio.gather(*(sender.flush() for sender in senders)), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("等待WebSocket发送队列清空超时")
     
-    async def broadcast_to_type(self, message: str, ws_type: str):
-        """向特定类型的所有连接广播消息"""
+    async def send_personal_message(self, message: Union[str, Dict[str, Any]], websocket: WebSocket):
+        """发送个人消息（经连接的发送队列，与广播消息保持顺序）"""
+        return self.enqueue(websocket, [self._serialize(message)])
+    
+    async def broadcast_to_type(self, message: Union[str, Dict[str, Any]], ws_type: str):
+        """向特定类型的所有连接广播消息（只序列化一次，入队后立即返回）"""
         if ws_type not in self.connections_by_type:
             logger.warning(f"未知的WebSocket类型: {ws_type}")
             return 0
         
         connections = self.connections_by_type[ws_type].copy()
-        disconnected = []
-        sent_count = 0
-        
-        for connection in connections:
-            try:
-                await connection.send_text(message)
-                
-                # 更新活动时间
-                if connection in self.connection_metadata:
-                    self.connection_metadata[connection]["last_activity"] = datetime.now()
-                
-                sent_count += 1
-            except Exception as e:
-                logger.error(f"广播消息失败: {e}")
-                disconnected.append(connection)
-        
-        # 清理断开的连接
-        for connection in disconnected:
-            self.disconnect(connection)
-        
-        logger.debug(f"广播到类型 {ws_type}: 发送成功 {sent_count}/{len(connections)} 个连接")
+        sent_count = self._fanout(connections, [self._serialize(message)])
+        logger.debug(f"广播到类型 {ws_type}: 入队 {sent_count}/{len(connections)} 个连接")
         return sent_count
     
-    async def broadcast_to_stream(self, message: str, stream_id: str):
-        """向特定流的订阅者广播消息"""
+    async def broadcast_to_stream(self, message: Union[str, Dict[str, Any]], stream_id: str):
+        """向特定流的订阅者广播消息（只序列化一次，入队后立即返回）"""
         if stream_id not in self.alarm_stream_connections:
             logger.debug(f"流 {stream_id} 没有订阅者")
             return 0
         
         connections = self.alarm_stream_connections[stream_id].copy()
-        disconnected = []
-        sent_count = 0
-        
-        for connection in connections:
-            try:
-                await connection.send_text(message)
-                
-                # 更新活动时间
-                if connection in self.connection_metadata:
-                    self.connection_metadata[connection]["last_activity"] = datetime.now()
-                
-                sent_count += 1
-            except Exception as e:
-                logger.error(f"向流广播消息失败: {e}")
-                disconnected.append(connection)
-        
-        # 清理断开的连接
-        for connection in disconnected:
-            self.disconnect(connection)
-        
-        logger.debug(f"广播到流 {stream_id}: 发送成功 {sent_count}/{len(connections)} 个连接")
+        sent_count = self._fanout(connections, [self._serialize(message)])
+        logger.debug(f"广播到流 {stream_id}: 入队 {sent_count}/{len(connections)} 个连接")
         return sent_count
     
-    async def broadcast_to_all(self, message: str):
-        """向所有连接广播消息"""
-        total_sent = 0
-        for ws_type in self.connections_by_type:
-            sent = await self.broadcast_to_type(message, ws_type)
-            total_sent += sent
-        
-        logger.debug(f"全局广播: 发送成功 {total_sent} 个连接")
+    async def broadcast_to_all(self, message: Union[str, Dict[str, Any]]):
+        """向所有连接广播消息（告警进程连接不读取消息，不参与广播）"""
+        frames = [self._serialize(message)]
+        connections = [connection for ws_type, connections in self.connections_by_type.items()
+                       if ws_type != WebSocketType.ALARM_PRODUCER.value for connection in connections]
+        total_sent = self._fanout(connections, frames)
+        logger.debug(f"全局广播: 入队 {total_sent} 个连接")
         return total_sent
     
-    async def broadcast_alarm(self, alarm_data: Dict[str, Any]):
+    async def send_frames(self, websocket: WebSocket, frames: List[Any]) -> bool:
+        """按顺序发送一组帧（str为文本帧，bytes为二进制帧）"""
+        return self.enqueue(websocket, frames)
+    
+    def set_media_mode(self, websocket: WebSocket, media_mode: str) -> str:
+        """设置连接的告警图片媒体模式，返回规范化后的模式"""
+        media_mode = normalize_media_mode(media_mode)
+        if websocket in self.connection_metadata:
+            self.connection_metadata[websocket]["media_mode"] = media_mode
+        return media_mode
+    
+    async def broadcast_alarm(self, alarm_data: Dict[str, Any], media: Optional[Dict[str, bytes]] = None,
+                              exclude: Optional[WebSocket] = None):
         """
         广播告警通知
+        元数据以紧凑JSON文本帧发送，图片按各连接协商的媒体模式以二进制帧内联或只给出下载地址，
+        每种媒体模式只序列化一次
         
         Args:
             alarm_data: 告警数据
@@ -219,24 +363,31 @@ class UnifiedWebSocketManager:
                     "detections": [...],
                     "message": "检测到告警事件"
                 }
+            media: 告警图片 {媒体类型: JPEG字节}，媒体类型为original/processed/original_thumb/processed_thumb
+            exclude: 不发送的连接（推送该告警的告警进程连接）
         """
         try:
-            import json
-            message = json.dumps(alarm_data, ensure_ascii=False)
-            total_sent = 0
+            metadata = {"type": "alarm", **alarm_data}
+            metadata["media"] = {**alarm_data.get("media", {}),
+                                 **{kind: len(data) for kind, data in (media or {}).items()}}
+            notification = AlarmNotification(metadata, media)
             
-            # 1. 向所有告警类型连接广播
-            alarm_sent = await self.broadcast_to_type(message, WebSocketType.ALARMS.value)
-            total_sent += alarm_sent
+            # 告警连接与该流的订阅者，去重后每个连接只发送一次
+            connections = list(dict.fromkeys(
+                self.connections_by_type[WebSocketType.ALARMS.value] +
+                self.alarm_stream_connections.get(alarm_data.get("stream_id"), [])
+            ))
+            self.broadcast_stats["broadcasts"] += 1
+            sent_count = 0
+            for connection in connections:
+                if connection is exclude:
+                    continue
+                mode = self.connection_metadata.get(connection, {}).get("media_mode", DEFAULT_MEDIA_MODE)
+                if self.enqueue(connection, notification.frames(mode)):
+                    sent_count += 1
             
-            # 2. 向特定流的订阅者广播（如果有流ID）
-            stream_id = alarm_data.get("stream_id")
-            if stream_id:
-                stream_sent = await self.broadcast_to_stream(message, stream_id)
-                # 注意：stream_sent可能与alarm_sent有重叠，这里简化处理
-            
-            logger.info(f"告警广播完成: alarm_id={alarm_data.get('alarm_id')}, 发送到 {alarm_sent} 个告警连接")
-            return total_sent
+            logger.info(f"告警广播完成: alarm_id={alarm_data.get('alarm_id')}, 发送到 {sent_count} 个告警连接")
+            return sent_count
             
         except Exception as e:
             logger.error(f"广播告警失败: {e}")
@@ -250,7 +401,22 @@ class UnifiedWebSocketManager:
                 stream_id: len(connections) 
                 for stream_id, connections in self.alarm_stream_connections.items()
             },
-            "active_streams": list(self.alarm_stream_connections.keys())
+            "active_streams": list(self.alarm_stream_connections.keys()),
+            "broadcast": self.get_broadcast_stats()
+        }
+    
+    def get_broadcast_stats(self) -> Dict:
+        """获取广播与发送队列统计（入队、丢弃、断开的慢客户端、队列深度）"""
+        senders = list(self.senders.values())
+        depths = [sender.depth for sender in senders]
+        return {
+            **self.broadcast_stats,
+            "messages_dropped": self.broadcast_stats["messages_dropped"] + sum(s.stats["dropped"] for s in senders),
+            "messages_sent": sum(s.stats["sent"] for s in senders),
+            "bytes_sent": sum(s.stats["bytes_sent"] for s in senders),
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "send_queue_size": self.send_queue_size
         }
     
     def get_connection_info(self, websocket: WebSocket) -> Dict:
@@ -319,12 +485,20 @@ class UnifiedWebSocketManager:
         for connections in self.connections_by_type.values():
             all_connections.extend(connections)
         
-        for connection in all_connections:
+        # 尽量发出已入队的消息后停止写出任务
+        await self.flush(timeout=1.0)
+        for sender in self.senders.values():
+            sender.stop()
+        self.senders.clear()
+        
+        async def close(connection):
             try:
                 await connection.close()
             except Exception as e:
                 logger.error(f"关闭WebSocket连接失败: {e}")
         
+        await asyncio.gather(*(close(connection) for connection in all_connections))
+        
         # 清理所有数据
         self.connections_by_type = {t.value: [] for t in WebSocketType}
         self.alarm_stream_connections.clear()
@@ -0,0 +1,309 @@
+"""
+SQLite连接层
+- 所有SQLite连接（ORM引擎、分析器数据访问层、各模块直接SQL）统一在此创建，使用相同的PRAGMA：
+  WAL日志（读不阻塞写）、synchronous=NORMAL、页缓存、mmap、忙等待
+- 按数据库文件共享一个连接池，连接长期复用，sqlite3按连接缓存预编译语句，相同SQL不重复编译
+- connect()返回的连接用法与sqlite3连接一致，close()时回滚未提交事务并归还连接池
+- 统计连接池等待时间与语句执行耗时
+"""
+
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 连接PRAGMA（journal_mode对数据库文件持久生效，其余按连接设置）
+SQLITE_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -16000),        # 页缓存16MB（负数单位为KB）
+    ("mmap_size", 268435456),      # 256MB内存映射读
+    ("temp_store", "MEMORY"),
+    ("busy_timeout", 5000),        # 被写锁阻塞时等待(毫秒)
+)
+
+# 连接池默认参数
+DEFAULT_POOL_SIZE = 5            # 保留的空闲连接数
+DEFAULT_MAX_OVERFLOW = 10        # 超出空闲连接数后允许临时创建的连接数
+DEFAULT_POOL_TIMEOUT = 5.0       # 连接全部占用时的等待时间(秒)
+DEFAULT_CACHED_STATEMENTS = 256  # 每个连接缓存的预编译语句数
+
+
+def open_connection(db_path: str, isolation_level: Optional[str] = "",
+                    cached_statements: int = DEFAULT_CACHED_STATEMENTS) -> sqlite3.Connection:
+    """创建一个已设置PRAGMA的SQLite连接（可跨线程归还复用）"""
+    conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=isolation_level,
+                           cached_statements=cached_statements)
+    try:
+        for name, value in SQLITE_PRAGMAS:
+            conn.execute(f"PRAGMA {name} = {value}")
+    except sqlite3.DatabaseError:
+        conn.close()
+        raise
+    return conn
+
+
+class _TimedCursor:
+    """统计执行耗时的游标代理"""
+
+    __slots__ = ("_cursor", "_pool")
+
+    def __init__(self, cursor: sqlite3.Cursor, pool: "ConnectionPool"):
+        self._cursor = cursor
+        self._pool = pool
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            self._cursor.execute(sql, parameters)
+        finally:
+            self._pool._record_query(time.perf_counter() - start)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            self._cursor.executemany(sql, seq_of_parameters)
+        finally:
+            self._pool._record_query(time.perf_counter() - start)
+        return self
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class PooledConnection:
+    """
+    连接池中借出的连接
+    与sqlite3.Connection用法一致；close()归还连接池而不是关闭，未显式关闭时回收对象时归还
+    """
+
+    def __init__(self, conn: sqlite3.Connection, pool: "ConnectionPool"):
+        object.__setattr__(self, "_conn", conn)
+        object.__setattr__(self, "_pool", pool)
+
+    def cursor(self, *args):
+        return _TimedCursor(self._conn.cursor(*args), self._pool)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        """归还连接池（回滚未提交的事务）"""
+        conn = self._conn
+        if conn is not None:
+            object.__setattr__(self, "_conn", None)
+            self._pool.release_connection(conn)
+
+    @property
+    def closed(self) -> bool:
+        return self._conn is None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # 与sqlite3连接一致：with块只管理事务，不关闭连接
+        if exc_type is None:
+            self._conn.commit()
+        else:
+            self._conn.rollback()
+        return False
+
+    def __getattr__(self, name):
+        conn = object.__getattribute__(self, "_conn")
+        if conn is None:
+            raise sqlite3.ProgrammingError("连接已归还连接池")
+        return getattr(conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """SQLite连接池（按需创建连接，空闲连接长期复用）"""
+
+    def __init__(self, db_path: str, max_connections: int = DEFAULT_POOL_SIZE,
+                 max_overflow: int = DEFAULT_MAX_OVERFLOW, timeout: float = DEFAULT_POOL_TIMEOUT):
+        """
+        Args:
+            db_path: 数据库文件路径
+            max_connections: 保留的空闲连接数
+            max_overflow: 超出空闲连接数后允许临时创建的连接数
+            timeout: 连接全部占用时的等待时间(秒)
+        """
+        self.db_path = db_path
+        self.max_connections = max_connections
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.connections: "queue.LifoQueue" = queue.LifoQueue()
+        self.lock = threading.RLock()
+        self._available = threading.Condition(self.lock)
+        self._opened = 0
+        self.stats = {
+            "checkouts": 0, "waits": 0, "timeouts": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0,
+            "queries": 0, "query_ms_total": 0.0, "query_ms_max": 0.0, "connections_created": 0,
+        }
+
+    def get_connection(self, row_factory=None) -> sqlite3.Connection:
+        """
+        借出一个原始连接，用完后调用release_connection归还
+        Raises:
+            sqlite3.OperationalError: 等待超时或无法打开数据库
+        """
+        start = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        with self._available:
+            while True:
+                try:
+                    conn = self.connections.get_nowait()
+                    break
+                except queue.Empty:
+                    pass
+                if self._opened < self.max_connections + self.max_overflow:
+                    self._opened += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats["timeouts"] += 1
+                    raise sqlite3.OperationalError(f"等待数据库连接超时: {self.db_path}")
+                waited = True
+                self._available.wait(remaining)
+
+        if conn is None:
+            try:
+                conn = open_connection(self.db_path)
+            except Exception:
+                with self._available:
+                    self._opened -= 1
+                    self._available.notify()
+                raise
+            with self.lock:
+                self.stats["connections_created"] += 1
+
+        conn.row_factory = row_factory
+        wait_ms = (time.perf_counter() - start) * 1000.0
+        with self.lock:
+            self.stats["checkouts"] += 1
+            self.stats["wait_ms_total"] += wait_ms
+            self.stats["wait_ms_max"] = max(self.stats["wait_ms_max"], wait_ms)
+            if waited:
+                self.stats["waits"] += 1
+        return conn
+
+    def release_connection(self, conn: sqlite3.Connection) -> None:
+        """归还连接（回滚未提交的事务，超出空闲连接数时关闭）"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            keep = True
+        except sqlite3.Error:
+            keep = False
+        with self._available:
+            if keep and self.connections.qsize() < self.max_connections:
+                self.connections.put(conn)
+            else:
+                self._opened -= 1
+                conn.close()
+            self._available.notify()
+
+    def connect(self, row_factory=None) -> PooledConnection:
+        """借出一个连接，用法与sqlite3.connect()返回的连接一致，close()时归还"""
+        return PooledConnection(self.get_connection(row_factory), self)
+
+    def _record_query(self, seconds: float) -> None:
+        elapsed_ms = seconds * 1000.0
+        with self.lock:
+            self.stats["queries"] += 1
+            self.stats["query_ms_total"] += elapsed_ms
+            self.stats["query_ms_max"] = max(self.stats["query_ms_max"], elapsed_ms)
+
+    def close_all(self) -> None:
+        """关闭所有空闲连接（借出的连接归还时关闭或重新入池，之后按需重建）"""
+        with self._available:
+            while True:
+                try:
+                    conn = self.connections.get_nowait()
+                except queue.Empty:
+                    break
+                self._opened -= 1
+                conn.close()
+            self._available.notify_all()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取连接池统计（等待时间、语句耗时）"""
+        with self.lock:
+            stats = dict(self.stats)
+            stats["idle"] = self.connections.qsize()
+            stats["in_use"] = self._opened - stats["idle"]
+            stats["wait_ms_avg"] = round(stats["wait_ms_total"] / stats["checkouts"], 3) if stats["checkouts"] else 0.0
+            stats["query_ms_avg"] = round(stats["query_ms_total"] / stats["queries"], 3) if stats["queries"] else 0.0
+            for key in ("wait_ms_total", "wait_ms_max", "query_ms_total", "query_ms_max"):
+                stats[key] = round(stats[key], 3)
+            return stats
+
+
+# 按数据库文件索引的连接池
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool_settings() -> Dict[str, Any]:
+    """读取应用配置中的连接池参数，配置不可用时使用默认值"""
+    try:
+        from ..core.config import CONFIG
+        section = CONFIG.get("database") or {}
+    except Exception:
+        section = {}
+    return {
+        "max_connections": section.get("max_connections", DEFAULT_POOL_SIZE),
+        "max_overflow": section.get("max_overflow", DEFAULT_MAX_OVERFLOW),
+        "timeout": section.get("pool_timeout", DEFAULT_POOL_TIMEOUT),
+    }
+
+
+def get_connection_pool(db_path: str, **kwargs) -> ConnectionPool:
+    """
+    获取数据库文件对应的连接池（同一文件的不同写法共用一个连接池）
+    Args:
+        db_path: 数据库文件路径
+        kwargs: 首次创建时的连接池参数，未指定时读取配置
+    """
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(key, **{**_pool_settings(), **kwargs})
+            _pools[key] = pool
+        return pool
+
+
+def connect(db_path: str, row_factory=None) -> PooledConnection:
+    """从连接池借出连接，替代sqlite3.connect(db_path)"""
+    return get_connection_pool(db_path).connect(row_factory)
+
+
+def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """获取全部连接池统计"""
+    with _pools_lock:
+        pools = list(_pools.items())
+    return {path: pool.get_stats() for path, pool in pools}
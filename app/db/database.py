@@ -1,17 +1,23 @@
 """
 数据库连接管理模块
 提供数据库会话和引擎管理功能
+- 引擎的连接来自app.db.connection的连接池，与分析器数据访问层、各模块直接SQL共用同一组连接和PRAGMA
 """
 
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from .connection import get_connection_pool
 
 # 数据库URL
 SQLALCHEMY_DATABASE_URL = "sqlite:///./app.db"
-# 创建数据库引擎，启用外键约束
+# 创建数据库引擎：连接由共享连接池借出，会话关闭时归还（引擎自身不再维护连接池）
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL,
+    creator=lambda: get_connection_pool(engine.url.database).connect(),
+    poolclass=NullPool
 )
 # 创建会话类
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -25,4 +31,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close() 
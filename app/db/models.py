@@ -6,7 +6,7 @@
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import Boolean, Column, DateTime, Integer, String, Text, ForeignKey, func, Float
+from sqlalchemy import Boolean, Column, DateTime, Integer, String, Text, ForeignKey, func, Float, Index
 from sqlalchemy.orm import relationship
 
 from app.db.database import Base
@@ -96,6 +96,20 @@ class OrganizationBinding(Base):
     stream = relationship("VideoStream", back_populates="bindings")
 
 
+# 组织层级查询使用的索引（路径前缀范围查询、按父组织取子节点、按组织统计绑定）
+ORGANIZATION_INDEXES = (
+    ("ix_organizations_path", ("path",)),
+    ("ix_organizations_parent_sort", ("parent_id", "sort_order")),
+)
+ORGANIZATION_BINDING_INDEXES = (
+    ("ix_organization_bindings_org_stream", ("org_id", "stream_id")),
+)
+for _name, _columns in ORGANIZATION_INDEXES:
+    Index(_name, *(Organization.__table__.c[column] for column in _columns))
+for _name, _columns in ORGANIZATION_BINDING_INDEXES:
+    Index(_name, *(OrganizationBinding.__table__.c[column] for column in _columns))
+
+
 class BlacklistedToken(Base):
     """已失效令牌黑名单"""
     __tablename__ = "blacklisted_tokens"
@@ -257,6 +271,21 @@ class Alarm(Base):
     processor = relationship("User", foreign_keys=[processed_by])
 
 
+# 告警列表复合索引：与列表过滤条件组合一致，均以(created_at, alarm_id)结尾，支持倒序游标分页
+# 分析器告警表（stream_id、level列）共用该定义，按实际存在的列创建
+ALARM_INDEXES = (
+    ("ix_alarms_created_at_id", ("created_at", "alarm_id")),
+    ("ix_alarms_task_created", ("task_id", "created_at", "alarm_id")),
+    ("ix_alarms_status_created", ("status", "created_at", "alarm_id")),
+    ("ix_alarms_processed_created", ("processed", "created_at", "alarm_id")),
+    ("ix_alarms_level_created", ("level", "created_at", "alarm_id")),
+    ("ix_alarms_stream_created", ("stream_id", "created_at", "alarm_id")),
+)
+for _name, _columns in ALARM_INDEXES:
+    if all(column in Alarm.__table__.c for column in _columns):
+        Index(_name, *(Alarm.__table__.c[column] for column in _columns))
+
+
 class ModelInstance(Base):
     """模型实例模型 - 支持实例池管理"""
     __tablename__ = "model_instances"
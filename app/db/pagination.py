@@ -0,0 +1,116 @@
+"""
+列表分页工具
+- 游标分页：按(created_at, 主键)倒序，游标为上一页最后一条记录的排序键，深翻页不再扫描跳过的行
+- 总数缓存：相同过滤条件的总数在有效期内复用，列表轮询不再每次全表计数
+- 复合索引：按数据库中实际存在的列创建（IF NOT EXISTS），兼容已有数据库
+"""
+
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple, Union
+
+# 总数统计模式
+COUNT_EXACT = "exact"        # 每次精确计数（默认，兼容现有页面）
+COUNT_CACHED = "cached"      # 有效期内复用上次计数
+COUNT_ESTIMATE = "estimate"  # 同cached（有效期内复用的精确计数），保留以兼容已有调用
+COUNT_NONE = "none"          # 不统计总数
+COUNT_MODES = (COUNT_EXACT, COUNT_CACHED, COUNT_ESTIMATE, COUNT_NONE)
+
+DEFAULT_COUNT_TTL = 30.0
+DEFAULT_COUNT_ENTRIES = 256
+
+
+def encode_cursor(created_at: Union[datetime, str, None], key: str) -> str:
+    """生成游标（URL安全）"""
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat(sep=" ")
+    raw = json.dumps([created_at, key], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[str], str]:
+    """
+    解析游标
+    Returns:
+        (created_at字符串, 主键)
+    Raises:
+        ValueError: 游标格式错误
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, key = json.loads(raw.decode("utf-8"))
+    except Exception:
+        raise ValueError("无效的分页游标")
+    if not isinstance(key, str) or not (created_at is None or isinstance(created_at, str)):
+        raise ValueError("无效的分页游标")
+    return created_at, key
+
+
+def next_cursor(rows: Sequence[Any], limit: int, created_at: Callable[[Any], Any],
+                key: Callable[[Any], str]) -> Optional[str]:
+    """本页已满时由最后一条记录生成下一页游标，否则返回None"""
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor(created_at(last), key(last))
+
+
+class CountCache:
+    """按过滤条件缓存的总数（线程安全）"""
+
+    def __init__(self, ttl: float = DEFAULT_COUNT_TTL, max_entries: int = DEFAULT_COUNT_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._items: 'OrderedDict[Hashable, Tuple[float, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, key: Hashable, compute: Callable[[], int]) -> int:
+        """获取缓存的总数，过期或不存在时调用compute重新计数"""
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[0] > now:
+                self._items.move_to_end(key)
+                self.stats["hits"] += 1
+                return item[1]
+            self.stats["misses"] += 1
+        value = compute()
+        with self._lock:
+            self._items[key] = (now + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "entries": len(self._items)}
+
+
+def ensure_indexes(conn, table: str, indexes: Iterable[Tuple[str, Sequence[str]]]) -> List[str]:
+    """
+    为表创建复合索引，跳过表中不存在的列对应的索引
+    Args:
+        conn: sqlite3连接
+        table: 表名
+        indexes: [(索引名, (列, ...)), ...]
+    Returns:
+        执行了创建语句的索引名
+    """
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+    created = []
+    for name, index_columns in indexes:
+        if columns and all(column in columns for column in index_columns):
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(index_columns)})")
+            created.append(name)
+    conn.commit()
+    return created
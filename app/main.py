@@ -58,6 +58,11 @@ app_state = {"is_shutting_down": False}
 # 导入统一的WebSocket管理器
 from app.core.websocket_manager import unified_ws_manager
 from app.api.endpoints.websocket_status import status_broadcast_task
+from app.core.alarm_journal import close_alarm_journals
+from app.db.connection import connect
+from app.db.database import engine
+from app.db.models import ALARM_INDEXES, ORGANIZATION_BINDING_INDEXES, ORGANIZATION_INDEXES
+from app.db.pagination import ensure_indexes
 
 # 自定义异常处理
 @app.exception_handler(RequestValidationError)
@@ -106,6 +111,9 @@ async def handle_shutdown(app_state):
         # 停止关键服务
         analyzer_service.stop()
         
+        # 提交未写入的告警记录
+        close_alarm_journals()
+        
         # 尝试清理WebSocket连接
         try:
             await unified_ws_manager.close_all_connections()
@@ -124,6 +132,17 @@ async def handle_shutdown(app_state):
 @app.on_event("startup")
 async def startup_event():
     logger.info("应用启动，初始化服务...")
+    # 补建告警列表复合索引（已有数据库不会由建表语句创建）
+    try:
+        conn = connect(engine.url.database)
+        try:
+            ensure_indexes(conn, "alarms", ALARM_INDEXES)
+            ensure_indexes(conn, "organizations", ORGANIZATION_INDEXES)
+            ensure_indexes(conn, "organization_bindings", ORGANIZATION_BINDING_INDEXES)
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.error(f"创建查询索引失败: {e}")
     # 初始化视频分析器服务
     analyzer_service.start()
     # 启动WebSocket状态广播任务
@@ -11,7 +11,8 @@ import logging
 from app.core.config import settings
 from app.core.security import ALGORITHM
 from app.db.database import get_db
-from app.db.models import User, BlacklistedToken
+from app.db.models import User
+from app.core.auth_cache import auth_cache, snapshot_user, user_from_snapshot
 from app.schemas.auth import TokenPayload
 
 # 配置日志
@@ -45,10 +46,23 @@ def get_current_user(
 ) -> User:
     """
     获取当前用户
+    已验证的令牌缓存用户快照，命中时不解析令牌、不查询数据库（见app.core.auth_cache）
     """
+    # 检查token是否在黑名单中（内存黑名单，按间隔增量同步数据库）
+    if auth_cache.is_blacklisted(token, db):
+        logger.warning(f"令牌已被列入黑名单: {token[:10]}...")
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="令牌已失效",
+        )
+    
+    snapshot = auth_cache.get(token)
+    if snapshot is not None:
+        return user_from_snapshot(snapshot)
+    
     try:
         # 记录令牌信息，方便调试
-        logger.info(f"正在验证令牌: {token[:10]}...")
+        logger.debug(f"正在验证令牌: {token[:10]}...")
         
         # 解析令牌
         payload = jwt.decode(
@@ -56,7 +70,7 @@ def get_current_user(
         )
         token_data = TokenPayload(**payload)
         
-        logger.info(f"令牌解析成功，用户ID: {token_data.sub}")
+        logger.debug(f"令牌解析成功，用户ID: {token_data.sub}")
     except jwt.JWTError as e:
         # 记录具体的JWT错误
         logger.error(f"JWT解析错误: {str(e)}")
@@ -72,16 +86,8 @@ def get_current_user(
             detail="无法验证凭据",
         )
     
-    # 检查token是否在黑名单中
-    blacklisted = db.query(BlacklistedToken).filter(BlacklistedToken.token == token).first()
-    if blacklisted:
-        logger.warning(f"令牌已被列入黑名单: {token[:10]}...")
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="令牌已失效",
-        )
-    
     # 查询用户
+    generation = auth_cache.generation
     user = db.query(User).filter(User.id == token_data.sub).first()
     
     if not user:
@@ -91,7 +97,8 @@ def get_current_user(
         logger.warning(f"用户未激活: {user.username}")
         raise HTTPException(status_code=403, detail="用户未激活")
     
-    logger.info(f"用户认证成功: {user.username}")
+    auth_cache.put(token, snapshot_user(user), payload.get("exp"), generation)
+    logger.debug(f"用户认证成功: {user.username}")
     return user
 
 
@@ -0,0 +1 @@
+"""基准测试套件，用法见 benchmarks/pipeline_bench.py"""
@@ -0,0 +1,708 @@
+"""
+帧处理流水线基准测试
+- 回放test.mp4（或指定分辨率的合成帧），走真实的IPCManager、algorithm_process、draw_results、streaming_process代码路径
+- 每路流一个回放进程（put_frame写入环形缓冲区）、一个算法进程、一个推流进程，与生产部署的进程拓扑一致
+- 模型为CPU合成检测模型（真实预处理引擎 + 按帧内容生成检测框），不依赖GPU和模型权重
+- 统计各阶段p50/p95/p99延迟、每核帧率、RSS增长和共享内存占用，流数从1扩展到N
+- 结果输出为JSON，可用--compare与历史结果对比
+
+用法:
+    python -m benchmarks.pipeline_bench --streams 4 --duration 20
+    python -m benchmarks.pipeline_bench --source synthetic --resolution 1280x720 --output result.json
+    python -m benchmarks.pipeline_bench --compare baseline.json result.json --fail-on-regression 10
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+import multiprocessing as mp
+from collections import defaultdict
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# 添加项目根目录和算法目录到路径
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+sys.path.append(os.path.join(ROOT_DIR, 'algorithms'))
+
+from core import output_pipeline, worker_processes
+from core.ipc_manager import IPCManager
+from preprocess_engine import PreprocessEngine
+
+logger = logging.getLogger(__name__)
+
+# 报告中的阶段顺序
+STAGES = ('decode', 'capture', 'inference', 'postprocess', 'alarm', 'publish', 'draw', 'push', 'end_to_end')
+
+# 每个进程每个阶段最多保留的样本数
+MAX_SAMPLES = 100000
+
+# 对比时参与回归判断的指标（越大越差）
+COMPARE_STAGE_METRIC = 'p95_ms'
+
+ALGO_ID = 'bench'
+MODEL_ID = 'bench_model'
+
+
+# ---------------------------------------------------------------------------
+# 合成模型
+# ---------------------------------------------------------------------------
+
+class SyntheticDetector:
+    """CPU合成检测模型：真实预处理引擎 + 按网格亮度生成固定数量的检测框"""
+
+    def __init__(self, img_size=640, num_boxes=5, grid=4):
+        self.engine = PreprocessEngine(img_size=img_size)
+        self.img_size = img_size
+        self.num_boxes = num_boxes
+        self.grid = grid
+
+    def infer(self, image):
+        tensor, meta = self.engine.process_one(image)
+        cell = self.img_size // self.grid
+        # 网格亮度均值作为置信度，取最亮的num_boxes个格子作为检测框
+        scores = tensor[0].mean(axis=0)[:cell * self.grid, :cell * self.grid]
+        scores = scores.reshape(self.grid, cell, self.grid, cell).mean(axis=(1, 3)).ravel()
+        results = []
+        for index in np.argsort(scores)[::-1][:self.num_boxes]:
+            row, col = divmod(int(index), self.grid)
+            x1, y1, x2, y2 = meta.to_original(col * cell, row * cell, (col + 1) * cell, (row + 1) * cell)
+            results.append({'xyxy': [int(x1), int(y1), int(x2), int(y2)], 'conf': float(scores[index]), 'label': int(index)})
+        return results, results
+
+
+class SyntheticPostprocessor:
+    """输出draw_results所需标准格式的合成后处理器（含一个固定ROI多边形）"""
+
+    def __init__(self, frame_shape):
+        height, width = frame_shape[:2]
+        self.polygons = {
+            'roi': {
+                'polygon': [[width // 8, height // 8], [width * 7 // 8, height // 8],
+                            [width * 7 // 8, height * 7 // 8], [width // 8, height * 7 // 8]],
+                'color': [255, 0, 0],
+            }
+        }
+
+    def process(self, model_results):
+        rectangles = [
+            {'xyxy': result['xyxy'], 'conf': result['conf'], 'label': str(result['label']), 'color': [0, 255, 0]}
+            for result in model_results['default']['engine_result'] or []
+        ]
+        return {'data': {'bbox': {'rectangles': rectangles, 'polygons': self.polygons}}}
+
+
+class SyntheticRegistry:
+    """只提供get_model_instance的模型注册表替身"""
+
+    def __init__(self, model, postprocessor):
+        self._instance = (model, postprocessor)
+
+    def get_model_instance(self, model_id):
+        return self._instance
+
+
+# ---------------------------------------------------------------------------
+# 计时
+# ---------------------------------------------------------------------------
+
+class StageRecorder:
+    """进程内阶段计时器，只在测量窗口内（measure_event置位后）记录样本"""
+
+    def __init__(self, measure_event):
+        self.measure_event = measure_event
+        self.samples = defaultdict(list)
+        self.counters = defaultdict(int)
+
+    def add(self, stage, seconds):
+        if not self.measure_event.is_set():
+            return
+        samples = self.samples[stage]
+        if len(samples) < MAX_SAMPLES:
+            samples.append(seconds * 1000.0)
+
+    def count(self, name, amount=1):
+        if self.measure_event.is_set():
+            self.counters[name] += amount
+
+    def timed(self, stage, func):
+        """包装函数，记录每次调用耗时"""
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - start)
+        return wrapper
+
+
+def summarize(samples):
+    """样本(毫秒) → 统计"""
+    if not samples:
+        return {'count': 0}
+    values = np.asarray(samples, dtype=np.float64)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'count': int(len(values)),
+        'mean_ms': round(float(values.mean()), 3),
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'max_ms': round(float(values.max()), 3),
+    }
+
+
+# ---------------------------------------------------------------------------
+# 推流输出替身
+# ---------------------------------------------------------------------------
+
+class _TimedPipe:
+    """记录每帧写入耗时和端到端延迟的stdin替身"""
+
+    def __init__(self, pipe, recorder, frame_timestamp):
+        self._pipe = pipe
+        self._recorder = recorder
+        self._frame_timestamp = frame_timestamp
+        self._write_time = 0.0
+
+    def write(self, data):
+        start = time.perf_counter()
+        written = self._pipe.write(data) if self._pipe else len(data)
+        self._write_time = time.perf_counter() - start
+        return written
+
+    def flush(self):
+        start = time.perf_counter()
+        if self._pipe:
+            self._pipe.flush()
+        self._recorder.add('push', self._write_time + time.perf_counter() - start)
+        if self._frame_timestamp[0]:
+            self._recorder.add('end_to_end', time.time() - self._frame_timestamp[0])
+
+    def close(self):
+        if self._pipe:
+            self._pipe.close()
+
+
+class BenchSink:
+    """
+    替换streaming_process中的FFmpeg进程
+    - null: 进程内丢弃（只计调用开销）
+    - pipe: 写入cat进程的管道（计入管道拷贝开销）
+    - ffmpeg: 真实FFmpeg以libx264 ultrafast编码到null封装（需要PATH中有ffmpeg）
+    """
+
+    def __init__(self, mode, cmd, recorder, frame_timestamp):
+        self.process = None
+        if mode == 'ffmpeg':
+            # 保留输入参数，输出改为本地编码后丢弃
+            input_args = cmd[:cmd.index('-i') + 2]
+            cmd = input_args + ['-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p', '-f', 'null', '-']
+        elif mode == 'pipe':
+            cmd = [shutil.which('cat')] if shutil.which('cat') else [
+                sys.executable, '-c', 'import sys, shutil; shutil.copyfileobj(sys.stdin.buffer, open(__import__("os").devnull, "wb"))']
+        if mode != 'null':
+            self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                            stderr=subprocess.DEVNULL, bufsize=10**6)
+        self.stdin = _TimedPipe(self.process.stdin if self.process else None, recorder, frame_timestamp)
+        self.stderr = SimpleNamespace(read=lambda: b'', readline=lambda: b'')
+        # 编码输出不回传，复用器的输出端收不到数据
+        self.stdout = None
+        self.returncode = None
+
+    def poll(self):
+        if self.process:
+            self.returncode = self.process.poll()
+        return self.returncode
+
+    def wait(self, timeout=None):
+        if self.process:
+            self.returncode = self.process.wait(timeout)
+        else:
+            self.returncode = 0
+        return self.returncode
+
+    def terminate(self):
+        if self.process:
+            self.process.terminate()
+
+    def kill(self):
+        if self.process:
+            self.process.kill()
+
+
+# ---------------------------------------------------------------------------
+# 子进程
+# ---------------------------------------------------------------------------
+
+def _child_setup(workdir, verbose):
+    """子进程公共设置：工作目录（算法进程会创建temp_frames）、日志级别"""
+    os.chdir(workdir)
+    logging.getLogger().setLevel(logging.INFO if verbose else logging.WARNING)
+
+
+def producer_worker(ipc_manager, stream_id, frames, fps, stop_event, measure_event, report_queue, workdir, verbose):
+    """回放进程：按帧率把帧写入流的环形缓冲区"""
+    _child_setup(workdir, verbose)
+    recorder = StageRecorder(measure_event)
+    ipc_manager.set_shared_status('stream', stream_id, {'status': 'running', 'fps': fps or 25,
+                                                       'width': frames[0].shape[1], 'height': frames[0].shape[0]})
+    interval = 1.0 / fps if fps else 0.0
+    next_time = time.time()
+    index = 0
+    while not stop_event.is_set():
+        start = time.perf_counter()
+        if ipc_manager.put_frame(stream_id, frames[index % len(frames)]):
+            recorder.add('capture', time.perf_counter() - start)
+        else:
+            recorder.count('capture_dropped')
+        index += 1
+        if interval:
+            next_time += interval
+            delay = next_time - time.time()
+            if delay > 0:
+                stop_event.wait(delay)
+            else:
+                next_time = time.time()
+    report_queue.put(('producer', stream_id, dict(recorder.samples), dict(recorder.counters)))
+
+
+def algorithm_worker(ipc_manager, stream_id, frame_shape, img_size, stop_event, measure_event, report_queue, workdir, verbose):
+    """算法进程：真实algorithm_process，各阶段函数替换为计时包装"""
+    _child_setup(workdir, verbose)
+    recorder = StageRecorder(measure_event)
+    worker_processes.run_inference = recorder.timed('inference', worker_processes.run_inference)
+    worker_processes.run_postprocess = recorder.timed('postprocess', worker_processes.run_postprocess)
+    worker_processes.handle_alarm = recorder.timed('alarm', worker_processes.handle_alarm)
+    worker_processes.put_result = recorder.timed('publish', worker_processes.put_result)
+
+    registry = SyntheticRegistry(SyntheticDetector(img_size), SyntheticPostprocessor(frame_shape))
+    worker_processes.algorithm_process(stream_id, ALGO_ID, MODEL_ID, ipc_manager, registry, stop_event,
+                                       save_alarm=False, skip_frame_interval=1)
+    report_queue.put(('algorithm', stream_id, dict(recorder.samples), dict(recorder.counters)))
+
+
+def streaming_worker(ipc_manager, stream_id, sink_mode, draw, stop_event, measure_event, report_queue, workdir, verbose):
+    """推流进程：真实streaming_process（含标注渲染），FFmpeg替换为计时输出替身"""
+    _child_setup(workdir, verbose)
+    recorder = StageRecorder(measure_event)
+    worker_processes.GlobalConfig.instance().config.setdefault('output', {})['annotate'] = draw
+    worker_processes.draw_results = recorder.timed('draw', worker_processes.draw_results)
+    frame_timestamp = [0.0]
+    get_result = ipc_manager.get_result
+
+    def get_result_with_timestamp(*args, **kwargs):
+        result = get_result(*args, **kwargs)
+        if result:
+            frame_timestamp[0] = result['frame_ref'].timestamp
+        return result
+
+    ipc_manager.get_result = get_result_with_timestamp
+    # FFmpeg由输出复用器启动（core.output_pipeline），端到端延迟以写出时最近取到的结果帧为准；
+    # 编码器（读取rawvideo）按--sink替换并计时，转封装输出端一律进程内丢弃且不计时
+    discard = StageRecorder(SimpleNamespace(is_set=lambda: False))
+
+    def popen(cmd, **kwargs):
+        if 'rawvideo' in cmd:
+            return BenchSink(sink_mode, cmd, recorder, frame_timestamp)
+        return BenchSink('null', cmd, discard, [0.0])
+
+    output_pipeline.subprocess = SimpleNamespace(
+        Popen=popen,
+        PIPE=subprocess.PIPE,
+        DEVNULL=subprocess.DEVNULL,
+        TimeoutExpired=subprocess.TimeoutExpired,
+    )
+    worker_processes.streaming_process(stream_id, ALGO_ID, 'bench://null', ipc_manager, stop_event)
+    report_queue.put(('streaming', stream_id, dict(recorder.samples), dict(recorder.counters)))
+
+
+# ---------------------------------------------------------------------------
+# 帧源
+# ---------------------------------------------------------------------------
+
+def parse_resolution(text):
+    """'1280x720' → (720, 1280)"""
+    width, height = (int(v) for v in text.lower().split('x'))
+    return height, width
+
+
+def load_frames(source, resolution=None, max_frames=150):
+    """
+    加载回放帧
+    Returns:
+        (帧列表, 每帧解码耗时样本(毫秒), 源帧率)
+    """
+    if source == 'synthetic':
+        height, width = resolution or (720, 1280)
+        rng = np.random.default_rng(0)
+        frames = [rng.integers(0, 255, (height, width, 3), dtype=np.uint8) for _ in range(8)]
+        return frames, [], 25.0
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise RuntimeError(f"无法打开视频: {source}")
+    source_fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    frames, decode_samples = [], []
+    try:
+        while len(frames) < max_frames:
+            start = time.perf_counter()
+            ret, frame = cap.read()
+            decode_samples.append((time.perf_counter() - start) * 1000.0)
+            if not ret:
+                decode_samples.pop()
+                break
+            if resolution and frame.shape[:2] != resolution:
+                frame = cv2.resize(frame, (resolution[1], resolution[0]))
+            frames.append(frame)
+    finally:
+        cap.release()
+    if not frames:
+        raise RuntimeError(f"视频无可用帧: {source}")
+    return frames, decode_samples, source_fps
+
+
+# ---------------------------------------------------------------------------
+# 资源采样
+# ---------------------------------------------------------------------------
+
+def _process_tree(pids):
+    procs = []
+    for pid in pids:
+        try:
+            proc = psutil.Process(pid)
+            procs.append(proc)
+            procs.extend(proc.children(recursive=True))
+        except psutil.NoSuchProcess:
+            continue
+    return procs
+
+
+def sample_resources(pids):
+    """
+    采样进程树的内存与CPU时间，psutil不可用时返回None
+    - rss包含fork时从父进程继承的共享页（如预解码帧），绝对值偏大，主要看增长
+    - uss只计进程独占页，平台不支持时为None
+    """
+    if psutil is None:
+        return None
+    rss = cpu = 0.0
+    uss = 0.0
+    for proc in _process_tree(pids):
+        try:
+            rss += proc.memory_info().rss
+            times = proc.cpu_times()
+            cpu += times.user + times.system
+            if uss is not None:
+                uss += proc.memory_full_info().uss
+        except psutil.NoSuchProcess:
+            continue
+        except (psutil.AccessDenied, AttributeError):
+            uss = None
+    return {'rss': rss, 'uss': uss, 'cpu': cpu}
+
+
+def dev_shm_used():
+    """/dev/shm已用字节数（不存在时返回None）"""
+    if not os.path.isdir('/dev/shm'):
+        return None
+    return shutil.disk_usage('/dev/shm').used
+
+
+# ---------------------------------------------------------------------------
+# 单次运行
+# ---------------------------------------------------------------------------
+
+def run_streams(num_streams, frames, fps, args):
+    """以num_streams路流运行一次，返回该次结果"""
+    ctx = mp.get_context('fork')
+    manager_id = f"bench_{uuid.uuid4().hex[:8]}"
+    shm_before = dev_shm_used()
+    ipc_manager = IPCManager(max_queue_size=args.queue_size, manager_id=manager_id, ring_slots=args.ring_slots)
+    stop_event = ctx.Event()
+    measure_event = ctx.Event()
+    report_queue = ctx.Queue()
+    workdir = tempfile.mkdtemp(prefix='pipeline_bench_')
+    height, width = frames[0].shape[:2]
+
+    processes = []
+    try:
+        for i in range(num_streams):
+            stream_id = f"bench_stream_{i}"
+            # 环形缓冲区和结果队列在父进程创建，fork后各角色进程共享
+            ipc_manager.create_stream_queue(stream_id, width, height, num_slots=args.ring_slots)
+            ipc_manager.create_result_queue(stream_id, ALGO_ID)
+            common = (stop_event, measure_event, report_queue, workdir, args.verbose)
+            processes.append(ctx.Process(target=streaming_worker, name=f"bench-push-{i}",
+                                         args=(ipc_manager, stream_id, args.sink, not args.no_draw) + common))
+            processes.append(ctx.Process(target=algorithm_worker, name=f"bench-algo-{i}",
+                                         args=(ipc_manager, stream_id, frames[0].shape, args.img_size) + common))
+            processes.append(ctx.Process(target=producer_worker, name=f"bench-capture-{i}",
+                                         args=(ipc_manager, stream_id, frames, fps) + common))
+        for process in processes:
+            process.start()
+        pids = [process.pid for process in processes]
+
+        # 预热：等待推流进程就绪、模型预处理缓冲区分配完成
+        time.sleep(args.warmup)
+        status_start = ipc_manager.get_status_snapshot()
+        resources_start = sample_resources(pids)
+        measure_start = time.time()
+        measure_event.set()
+
+        time.sleep(args.duration)
+
+        measure_event.clear()
+        window = time.time() - measure_start
+        resources_end = sample_resources(pids)
+        status_end = ipc_manager.get_status_snapshot()
+        shm_peak = dev_shm_used()
+    finally:
+        stop_event.set()
+
+    # 先收集报告再join，避免子进程阻塞在队列写入上
+    reports = []
+    deadline = time.time() + 30
+    while len(reports) < len(processes) and time.time() < deadline:
+        try:
+            reports.append(report_queue.get(timeout=1.0))
+        except Exception:
+            if not any(process.is_alive() for process in processes):
+                break
+    for process in processes:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+            process.join(timeout=1)
+
+    ring_bytes = sum(ring.shm.size for ring in ipc_manager.memory_manager.rings.values() if ring.shm)
+    table_bytes = ipc_manager.status_table.shm.size if ipc_manager.status_table.shm else 0
+    ipc_manager.cleanup()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    return build_run_result(num_streams, window, reports, status_start, status_end,
+                            resources_start, resources_end, ring_bytes, table_bytes, shm_before, shm_peak)
+
+
+def _counter_delta(start, end, section, field):
+    return sum(row.get(field, 0) - start.get(section, {}).get(key, {}).get(field, 0)
+               for key, row in end.get(section, {}).items())
+
+
+def build_run_result(num_streams, window, reports, status_start, status_end,
+                     resources_start, resources_end, ring_bytes, table_bytes, shm_before, shm_peak):
+    """汇总各进程报告为单次运行结果"""
+    samples = defaultdict(list)
+    counters = defaultdict(int)
+    for _role, _stream_id, stage_samples, stage_counters in reports:
+        for stage, values in stage_samples.items():
+            samples[stage].extend(values)
+        for name, value in stage_counters.items():
+            counters[name] += value
+
+    processed = _counter_delta(status_start, status_end, 'algorithms', 'processed_count')
+    pushed = _counter_delta(status_start, status_end, 'outputs', 'frame_count')
+    captured = _counter_delta(status_start, status_end, 'streams', 'frame_count')
+    dropped = sum(row.get('dropped_count', 0) for row in status_end.get('algorithms', {}).values())
+
+    throughput = {
+        'captured_fps': round(captured / window, 2),
+        'processed_fps': round(processed / window, 2),
+        'pushed_fps': round(pushed / window, 2),
+        'consumer_dropped_frames': int(dropped),
+        'capture_dropped_frames': int(counters.get('capture_dropped', 0)),
+        'cpu_seconds': None,
+        'fps_per_core': None,
+    }
+    memory = None
+    if resources_start and resources_end:
+        cpu_seconds = resources_end['cpu'] - resources_start['cpu']
+        throughput['cpu_seconds'] = round(cpu_seconds, 3)
+        # 每核帧率：每消耗1个CPU秒处理的帧数
+        throughput['fps_per_core'] = round(processed / cpu_seconds, 2) if cpu_seconds > 0 else None
+        memory = {
+            'rss_start_mb': round(resources_start['rss'] / 2**20, 2),
+            'rss_end_mb': round(resources_end['rss'] / 2**20, 2),
+            'rss_growth_mb': round((resources_end['rss'] - resources_start['rss']) / 2**20, 2),
+            'uss_start_mb': None,
+            'uss_end_mb': None,
+            'uss_growth_mb': None,
+        }
+        if resources_start['uss'] is not None and resources_end['uss'] is not None:
+            memory['uss_start_mb'] = round(resources_start['uss'] / 2**20, 2)
+            memory['uss_end_mb'] = round(resources_end['uss'] / 2**20, 2)
+            memory['uss_growth_mb'] = round((resources_end['uss'] - resources_start['uss']) / 2**20, 2)
+
+    return {
+        'streams': num_streams,
+        'window_seconds': round(window, 3),
+        'stages': {stage: summarize(samples[stage]) for stage in STAGES if stage in samples},
+        'throughput': throughput,
+        'memory': memory,
+        'shm': {
+            'ring_bytes': ring_bytes,
+            'status_table_bytes': table_bytes,
+            'total_bytes': ring_bytes + table_bytes,
+            'dev_shm_growth_bytes': (shm_peak - shm_before) if shm_before is not None and shm_peak is not None else None,
+        },
+    }
+
+
+# ---------------------------------------------------------------------------
+# 对比
+# ---------------------------------------------------------------------------
+
+def compare_results(baseline, current, threshold=None):
+    """
+    按流数逐项对比两次结果
+    Returns:
+        (对比行列表, 是否存在超过阈值的回归)
+    """
+    rows = []
+    regressed = False
+    baseline_runs = {run['streams']: run for run in baseline['runs']}
+    for run in current['runs']:
+        base = baseline_runs.get(run['streams'])
+        if base is None:
+            continue
+        metrics = [(f"{stage}.{COMPARE_STAGE_METRIC}", base['stages'].get(stage, {}).get(COMPARE_STAGE_METRIC),
+                    stats.get(COMPARE_STAGE_METRIC), True) for stage, stats in run['stages'].items()]
+        metrics.append(('fps_per_core', base['throughput'].get('fps_per_core'), run['throughput'].get('fps_per_core'), False))
+        metrics.append(('pushed_fps', base['throughput'].get('pushed_fps'), run['throughput'].get('pushed_fps'), False))
+        for name, old, new, lower_is_better in metrics:
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100.0
+            worse = change if lower_is_better else -change
+            flagged = threshold is not None and worse > threshold
+            regressed = regressed or flagged
+            rows.append({'streams': run['streams'], 'metric': name, 'baseline': old, 'current': new,
+                         'change_pct': round(change, 1), 'regression': flagged})
+    return rows, regressed
+
+
+# ---------------------------------------------------------------------------
+# 入口
+# ---------------------------------------------------------------------------
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="帧处理流水线基准测试")
+    parser.add_argument('--source', default=os.path.join(ROOT_DIR, 'test.mp4'),
+                        help="回放视频路径，或synthetic使用合成帧")
+    parser.add_argument('--resolution', type=parse_resolution, default=None,
+                        help="帧分辨率，如1280x720（视频源会缩放到该分辨率）")
+    parser.add_argument('--streams', type=int, default=1, help="最大流数，依次测试1..N路")
+    parser.add_argument('--stream-counts', default=None, help="指定测试的流数列表，如1,2,4，优先于--streams")
+    parser.add_argument('--duration', type=float, default=10.0, help="每次测量时长(秒)")
+    parser.add_argument('--warmup', type=float, default=5.0, help="每次预热时长(秒)")
+    parser.add_argument('--fps', type=float, default=None, help="每路回放帧率，默认使用源帧率，0表示不限速")
+    parser.add_argument('--img-size', type=int, default=640, help="合成模型输入尺寸")
+    parser.add_argument('--sink', choices=('null', 'pipe', 'ffmpeg'), default='pipe', help="推流输出替身")
+    parser.add_argument('--no-draw', action='store_true', help="推流不绘制标注（output.annotate=false），原始帧零拷贝推送")
+    parser.add_argument('--ring-slots', type=int, default=8, help="每路流环形缓冲区槽位数")
+    parser.add_argument('--queue-size', type=int, default=10, help="结果队列长度")
+    parser.add_argument('--max-video-frames', type=int, default=60, help="视频源预解码的最大帧数")
+    parser.add_argument('--output', default=None, help="JSON结果输出路径")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'), help="对比两份JSON结果")
+    parser.add_argument('--fail-on-regression', type=float, default=None, metavar='PCT',
+                        help="对比时任一指标恶化超过PCT%%则以非零状态退出")
+    parser.add_argument('--verbose', action='store_true', help="输出工作进程INFO日志")
+    return parser.parse_args(argv)
+
+
+def print_summary(result):
+    for run in result['runs']:
+        throughput = run['throughput']
+        print(f"\n== {run['streams']} 路流 ({run['window_seconds']}s) ==")
+        print(f"  采集 {throughput['captured_fps']} fps, 处理 {throughput['processed_fps']} fps, "
+              f"推流 {throughput['pushed_fps']} fps, 每核 {throughput['fps_per_core']} fps/CPU秒")
+        for stage, stats in run['stages'].items():
+            if stats['count']:
+                print(f"  {stage:<12} n={stats['count']:<6} p50={stats['p50_ms']:.2f}ms "
+                      f"p95={stats['p95_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms")
+        if run['memory']:
+            print(f"  RSS {run['memory']['rss_start_mb']}MB → {run['memory']['rss_end_mb']}MB "
+                  f"(增长 {run['memory']['rss_growth_mb']}MB, USS增长 {run['memory']['uss_growth_mb']}MB)")
+        print(f"  共享内存 {run['shm']['total_bytes'] / 2**20:.1f}MB")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.compare:
+        with open(args.compare[0], 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        with open(args.compare[1], 'r', encoding='utf-8') as f:
+            current = json.load(f)
+        rows, regressed = compare_results(baseline, current, args.fail_on_regression)
+        for row in rows:
+            flag = '  <-- 回归' if row['regression'] else ''
+            print(f"{row['streams']}路 {row['metric']:<24} {row['baseline']:>10} → {row['current']:<10} "
+                  f"{row['change_pct']:+.1f}%{flag}")
+        return 1 if regressed else 0
+
+    frames, decode_samples, source_fps = load_frames(args.source, args.resolution, args.max_video_frames)
+    fps = source_fps if args.fps is None else args.fps
+    if args.stream_counts:
+        stream_counts = [int(v) for v in args.stream_counts.split(',') if v.strip()]
+    else:
+        stream_counts = list(range(1, args.streams + 1))
+
+    runs = []
+    for num_streams in stream_counts:
+        logger.warning(f"运行基准测试: {num_streams} 路流")
+        run = run_streams(num_streams, frames, fps, args)
+        if decode_samples:
+            run['stages'] = {'decode': summarize(decode_samples), **run['stages']}
+        runs.append(run)
+
+    result = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'host': platform.node(),
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count(),
+            'source': 'synthetic' if args.source == 'synthetic' else os.path.basename(args.source),
+            'resolution': f"{frames[0].shape[1]}x{frames[0].shape[0]}",
+            'fps': fps,
+            'duration': args.duration,
+            'warmup': args.warmup,
+            'sink': args.sink,
+            'draw': not args.no_draw,
+            'img_size': args.img_size,
+            'ring_slots': args.ring_slots,
+        },
+        'runs': runs,
+    }
+
+    print_summary(result)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入: {args.output}")
+    else:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
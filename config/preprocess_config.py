@@ -5,11 +5,17 @@
 预处理配置文件
 - 根据性能测试结果提供不同场景的预处理配置
 - 包含实时应用、高精度应用和平衡配置
+- 预处理耗时以profile_preprocess()的实测结果为准（python config/preprocess_config.py）
 """
 
+import os
+import sys
+
+import numpy as np
+
 # 实时应用配置 - 最低延迟 (<50ms)
 REALTIME_CONFIG = {
-    'preprocess_mode': 'crop',      # 最快的方法 (1.80ms)
+    'preprocess_mode': 'crop',      # 最快的方法
     'auto_contrast': False,         # 关闭以节省时间 (123.10ms)
     'blur_detection': True,         # 启用模糊检测 (19.00ms)
     'normalize': True,              # 启用归一化
@@ -21,7 +27,7 @@ REALTIME_CONFIG = {
 
 # 高精度应用配置 - 高检测精度 (>100ms)
 HIGH_PRECISION_CONFIG = {
-    'preprocess_mode': 'letterbox', # 保持宽高比 (3.21ms)
+    'preprocess_mode': 'letterbox', # 保持宽高比
     'auto_contrast': True,          # 启用对比度增强 (123.10ms)
     'blur_detection': True,         # 启用模糊检测 (19.00ms)
     'normalize': True,              # 启用归一化
@@ -33,7 +39,7 @@ HIGH_PRECISION_CONFIG = {
 
 # 平衡配置 - 平衡延迟和精度 (50-100ms)
 BALANCED_CONFIG = {
-    'preprocess_mode': 'resize',    # 平衡方法 (2.80ms)
+    'preprocess_mode': 'resize',    # 平衡方法
     'auto_contrast': False,         # 可选启用 (123.10ms)
     'blur_detection': True,         # 启用模糊检测 (19.00ms)
     'normalize': True,              # 启用归一化
@@ -45,7 +51,7 @@ BALANCED_CONFIG = {
 
 # 低端设备配置 - 适用于CPU或低端GPU
 LOW_END_CONFIG = {
-    'preprocess_mode': 'resize',    # 平衡方法 (2.80ms)
+    'preprocess_mode': 'resize',    # 平衡方法
     'auto_contrast': False,         # 关闭以节省时间 (123.10ms)
     'blur_detection': False,        # 关闭以节省时间 (19.00ms)
     'normalize': True,              # 启用归一化
@@ -57,7 +63,7 @@ LOW_END_CONFIG = {
 
 # 高端设备配置 - 适用于高端GPU (RTX 3080+)
 HIGH_END_CONFIG = {
-    'preprocess_mode': 'letterbox', # 保持宽高比 (3.21ms)
+    'preprocess_mode': 'letterbox', # 保持宽高比
     'auto_contrast': True,          # 启用对比度增强 (123.10ms)
     'blur_detection': True,         # 启用模糊检测 (19.00ms)
     'normalize': True,              # 启用归一化
@@ -91,6 +97,37 @@ def get_config(device_type='cuda', latency_requirement='balanced'):
     else:  # balanced
         return BALANCED_CONFIG
 
+def profile_preprocess(config, frame_shape=(1080, 1920, 3), iterations=50):
+    """
+    按配置实测预处理引擎各阶段耗时
+    
+    Args:
+        config: 预处理配置字典
+        frame_shape: 模拟输入帧尺寸 (高, 宽, 通道)
+        iterations: 测量次数（另有5次预热不计入）
+    
+    Returns:
+        各阶段耗时统计(毫秒)，见PreprocessEngine.get_stats()
+    """
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'algorithms'))
+    from preprocess_engine import PreprocessEngine
+    
+    batch_size = config.get('batch_size', 1)
+    engine = PreprocessEngine(
+        img_size=config.get('img_size', 640),
+        mode=config.get('preprocess_mode', 'letterbox'),
+        normalize=config.get('normalize', True),
+        half=config.get('half_precision', False),
+        max_batch_size=batch_size
+    )
+    frames = [np.random.randint(0, 255, frame_shape, dtype=np.uint8) for _ in range(batch_size)]
+    for _ in range(5):
+        engine.process(frames)
+    engine.reset_stats()
+    for _ in range(iterations):
+        engine.process(frames)
+    return engine.get_stats()
+
 # 配置说明
 CONFIG_DESCRIPTION = {
     'preprocess_mode': '图像尺寸调整方法: letterbox(保持宽高比)、resize(简单缩放)、crop(中心裁剪)',
@@ -121,4 +158,17 @@ if __name__ == "__main__":
     
     print("\n平衡配置:")
     for key, value in BALANCED_CONFIG.items():
-        print(f"- {key}: {value}") 
\ No newline at end of file
+        print(f"- {key}: {value}")
+    
+    print("\n预处理实测耗时 (1920x1080输入):")
+    profiles = {
+        '实时应用': REALTIME_CONFIG,
+        '高精度应用': HIGH_PRECISION_CONFIG,
+        '平衡': BALANCED_CONFIG,
+        '低端设备': LOW_END_CONFIG,
+        '高端设备': HIGH_END_CONFIG,
+    }
+    for name, config in profiles.items():
+        stats = profile_preprocess(config)
+        stages = ', '.join(f"{stage} {stats[stage]['avg_ms']:.2f}ms" for stage in ('resize', 'pack', 'pad', 'total'))
+        print(f"- {name} ({config['preprocess_mode']}, {config['img_size']}, batch {config.get('batch_size', 1)}): {stages}")
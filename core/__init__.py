@@ -1,8 +1,16 @@
 """核心模块，包含视频分析系统的基础组件。"""
 
 __all__ = [
+    'alarm_media',
+    'alarm_protocol',
+    'annotation_renderer',
+    'decode_pipeline',
+    'inference_server',
     'ipc_manager',
     'model_manager',
+    'output_pipeline',
+    'process_lock',
     'process_manager',
+    'status_table',
     'worker_processes',
 ] 
\ No newline at end of file
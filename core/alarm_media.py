@@ -0,0 +1,244 @@
+"""
+告警媒体写出模块
+- 告警图片的绘制、JPEG编码和落盘移出推理循环，由后台写出线程池完成
+- 线程池接收帧租约（零拷贝），在告警突发时超过租约上限的帧先复制再归还租约，避免占满环形缓冲区
+- 原图与画框图各编码一次（可配置质量、最大宽度），同时生成缩略图
+- 编码后的字节随告警数据直接交给告警进程，无需再从磁盘读取
+- 队列满时丢弃新告警并计数，推理循环从不阻塞
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 默认参数（可在config.yaml的alarm_media段覆盖）
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 16
+DEFAULT_MAX_LEASES = 2
+DEFAULT_JPEG_QUALITY = 90
+DEFAULT_MAX_WIDTH = 0            # 0表示保持原分辨率
+DEFAULT_THUMBNAIL_WIDTH = 320    # 0表示不生成缩略图
+DEFAULT_THUMBNAIL_QUALITY = 70
+
+# 告警媒体类型：原图、画框图及其缩略图
+MEDIA_KINDS = ('original', 'processed', 'original_thumb', 'processed_thumb')
+
+
+def resize_to_width(image: np.ndarray, max_width: int) -> np.ndarray:
+    """按最大宽度等比缩小（不放大）"""
+    height, width = image.shape[:2]
+    if not max_width or width <= max_width:
+        return image
+    new_height = max(1, int(round(height * max_width / width)))
+    return cv2.resize(image, (max_width, new_height), interpolation=cv2.INTER_AREA)
+
+
+def encode_jpeg(image: np.ndarray, quality: int) -> bytes:
+    """JPEG编码，返回字节"""
+    ok, buffer = cv2.imencode('.jpg', image, [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)])
+    if not ok:
+        raise ValueError("JPEG编码失败")
+    return buffer.tobytes()
+
+
+class AlarmMediaWriter:
+    """告警媒体写出线程池（每个算法进程一个）"""
+
+    def __init__(self, publish: Callable[[Dict], Any], draw: Callable[[np.ndarray, Dict], np.ndarray],
+                 workers: int = DEFAULT_WORKERS, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 max_leases: int = DEFAULT_MAX_LEASES, jpeg_quality: int = DEFAULT_JPEG_QUALITY,
+                 max_width: int = DEFAULT_MAX_WIDTH, thumbnail_width: int = DEFAULT_THUMBNAIL_WIDTH,
+                 thumbnail_quality: int = DEFAULT_THUMBNAIL_QUALITY, save: bool = True, name: str = "AlarmMedia"):
+        """
+        初始化告警媒体写出线程池
+        Args:
+            publish: 媒体写出完成后的回调，参数为补充了图片路径与字节的告警数据（如IPCManager.put_alarm）
+            draw: 绘制检测结果的函数（在可写副本上原地绘制）
+            workers: 写出线程数
+            queue_size: 待写出告警队列长度，满时丢弃新告警
+            max_leases: 同时持有的帧租约上限，超出时复制帧后立即归还租约
+            jpeg_quality: 原图/画框图JPEG质量
+            max_width: 原图/画框图最大宽度，0表示保持原分辨率
+            thumbnail_width: 缩略图宽度，0表示不生成缩略图
+            thumbnail_quality: 缩略图JPEG质量
+            save: 是否落盘（关闭时只编码并随告警数据发送）
+            name: 线程名前缀
+        """
+        self.publish = publish
+        self.draw = draw
+        self.max_leases = max(0, int(max_leases))
+        self.jpeg_quality = jpeg_quality
+        self.max_width = max_width
+        self.thumbnail_width = thumbnail_width
+        self.thumbnail_quality = thumbnail_quality
+        self.save = save
+
+        self._queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._lock = threading.Lock()
+        self._held_leases = 0
+        self._running = True
+        self.stats = {'submitted': 0, 'written': 0, 'dropped': 0, 'copied': 0, 'errors': 0, 'encode_ms': 0.0}
+
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"{name}-{i}", daemon=True)
+            for i in range(max(1, int(workers)))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    @classmethod
+    def from_config(cls, publish, draw, config: Optional[Dict] = None, **kwargs) -> 'AlarmMediaWriter':
+        """按config.yaml的alarm_media段创建"""
+        config = dict(config or {})
+        config.update(kwargs)
+        allowed = ('workers', 'queue_size', 'max_leases', 'jpeg_quality', 'max_width',
+                   'thumbnail_width', 'thumbnail_quality', 'save', 'name')
+        return cls(publish, draw, **{k: v for k, v in config.items() if k in allowed})
+
+    def submit(self, alarm_data: Dict, save_dir: str, frame: Optional[np.ndarray] = None, lease=None,
+               processed_frame: Optional[np.ndarray] = None, post_result: Optional[Dict] = None) -> bool:
+        """
+        提交告警媒体写出（从不阻塞）
+        Args:
+            alarm_data: 告警数据（需包含alarm_id），写出后补充媒体路径与字节再发布
+            save_dir: 图片保存目录
+            frame: 原始帧（无租约时使用，调用方保证写出前不被修改）
+            lease: 帧租约，写出完成或被丢弃后归还
+            processed_frame: 已绘制好的画框图，为None时在写出线程中绘制
+            post_result: 后处理结果（用于绘制画框图）
+        Returns:
+            是否已入队
+        """
+        if lease is not None:
+            with self._lock:
+                keep_lease = self._held_leases < self.max_leases
+                if keep_lease:
+                    self._held_leases += 1
+            if not keep_lease:
+                # 租约数已达上限：复制帧后立即归还，避免告警突发占满环形缓冲区
+                frame = lease.copy()
+                lease.release()
+                lease = None
+                self._count('copied')
+        item = (alarm_data, save_dir, frame, lease, processed_frame, post_result)
+        if not self._running:
+            self._discard(item)
+            return False
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            logger.warning(f"告警媒体队列已满，丢弃告警: {alarm_data.get('alarm_id')}")
+            self._discard(item)
+            return False
+        self._count('submitted')
+        return True
+
+    def _count(self, key: str) -> None:
+        """计数加一（提交方线程与写出线程并发更新）"""
+        with self._lock:
+            self.stats[key] += 1
+
+    def _discard(self, item) -> None:
+        self._count('dropped')
+        self._release(item[3])
+
+    def _release(self, lease) -> None:
+        if lease is None:
+            return
+        lease.release()
+        with self._lock:
+            self._held_leases -= 1
+
+    def encode(self, frame: np.ndarray, processed: np.ndarray) -> Dict[str, bytes]:
+        """编码原图、画框图及缩略图，返回{媒体类型: JPEG字节}"""
+        media = {
+            'original': encode_jpeg(resize_to_width(frame, self.max_width), self.jpeg_quality),
+            'processed': encode_jpeg(resize_to_width(processed, self.max_width), self.jpeg_quality),
+        }
+        if self.thumbnail_width:
+            media['original_thumb'] = encode_jpeg(resize_to_width(frame, self.thumbnail_width), self.thumbnail_quality)
+            media['processed_thumb'] = encode_jpeg(resize_to_width(processed, self.thumbnail_width), self.thumbnail_quality)
+        return media
+
+    def _write(self, item) -> Dict:
+        alarm_data, save_dir, frame, lease, processed, post_result = item
+        start = time.perf_counter()
+        try:
+            if lease is not None:
+                frame = lease.frame
+            if processed is None:
+                processed = self.draw(frame.copy(), post_result)
+            media = self.encode(frame, processed)
+        finally:
+            # 编码完成即归还租约，落盘不占用环形缓冲区槽位
+            self._release(lease)
+
+        alarm_id = alarm_data['alarm_id']
+        if self.save:
+            os.makedirs(save_dir, exist_ok=True)
+        for kind, data in media.items():
+            alarm_data[f'{kind}_jpeg'] = data
+            if self.save:
+                path = os.path.join(save_dir, f"{alarm_id}_{kind}.jpg")
+                with open(path, 'wb') as f:
+                    f.write(data)
+                # 保持原有字段名：original_img_path / processed_img_path / *_thumb_path
+                path_key = f'{kind}_img_path' if kind in ('original', 'processed') else f'{kind}_path'
+                alarm_data[path_key] = path
+        alarm_data['media_encode_ms'] = round((time.perf_counter() - start) * 1000.0, 3)
+        return alarm_data
+
+    def _worker(self) -> None:
+        while True:
+            try:
+                item = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                if not self._running:
+                    return
+                continue
+            if item is None:
+                return
+            try:
+                alarm_data = self._write(item)
+                with self._lock:
+                    self.stats['written'] += 1
+                    self.stats['encode_ms'] = alarm_data['media_encode_ms']
+                self.publish(alarm_data)
+            except Exception as e:
+                self._count('errors')
+                logger.error(f"告警媒体写出失败: {item[0].get('alarm_id')}, {e}", exc_info=True)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """停止线程池：已入队的告警写完后退出，超时未写出的告警丢弃"""
+        self._running = False
+        for _ in self._threads:
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                break
+        deadline = time.time() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.time()))
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                self._discard(item)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取写出/丢弃/复制计数与最近一次编码耗时"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['held_leases'] = self._held_leases
+        stats['queued'] = self._queue.qsize()
+        return stats
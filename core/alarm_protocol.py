@@ -0,0 +1,179 @@
+"""
+告警通知协议
+- 告警元数据为紧凑JSON文本帧，图片以独立二进制帧发送，不再base64编码嵌入JSON
+- 二进制帧格式：魔数(4字节) + 头长度(2字节, 大端) + JSON头{alarm_id, kind} + JPEG字节
+- 客户端协商媒体模式：full（原图）、thumbnail（缩略图，默认）、url（仅下发媒体接口地址）
+- 同一告警按媒体模式各序列化一次，广播给所有同模式客户端时复用
+- 告警进程以role=producer连接，只推送告警，不接收广播
+"""
+
+import json
+import struct
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+# 二进制帧魔数与头部
+FRAME_MAGIC = b'ALRM'
+_FRAME_HEADER = struct.Struct('!4sH')
+
+# 媒体类型（与告警媒体写出线程池一致）
+FULL_KINDS = ('original', 'processed')
+THUMBNAIL_KINDS = ('original_thumb', 'processed_thumb')
+MEDIA_KINDS = FULL_KINDS + THUMBNAIL_KINDS
+
+# 客户端媒体模式
+MEDIA_MODE_FULL = 'full'
+MEDIA_MODE_THUMBNAIL = 'thumbnail'
+MEDIA_MODE_URL = 'url'
+MEDIA_MODES = (MEDIA_MODE_FULL, MEDIA_MODE_THUMBNAIL, MEDIA_MODE_URL)
+DEFAULT_MEDIA_MODE = MEDIA_MODE_THUMBNAIL
+
+# 告警进程连接的身份参数（连接地址查询参数role的值）
+PRODUCER_ROLE = 'producer'
+
+# 告警媒体下载接口（{alarm_id}、{kind}占位）
+DEFAULT_MEDIA_URL = "/api/analyzer/alarms/{alarm_id}/download/{kind}"
+
+# 元数据中保留的告警字段
+METADATA_FIELDS = ('alarm_id', 'stream_id', 'algo_id', 'task_id', 'timestamp', 'detection_result',
+                   'detections', 'message')
+
+
+def producer_url(websocket_url: str) -> str:
+    """告警进程使用的连接地址（附加role=producer查询参数）"""
+    separator = '&' if '?' in websocket_url else '?'
+    return f"{websocket_url}{separator}role={PRODUCER_ROLE}"
+
+
+def pack_media_frame(alarm_id: str, kind: str, data: bytes) -> bytes:
+    """打包告警图片二进制帧"""
+    header = json.dumps({'alarm_id': alarm_id, 'kind': kind}, separators=(',', ':')).encode('utf-8')
+    return b''.join((_FRAME_HEADER.pack(FRAME_MAGIC, len(header)), header, data))
+
+
+def unpack_media_frame(frame: bytes) -> Tuple[Dict[str, Any], memoryview]:
+    """
+    解析告警图片二进制帧
+    Returns:
+        (头部字典, 图片数据视图)
+    Raises:
+        ValueError: 帧格式错误
+    """
+    view = memoryview(frame)
+    if len(view) < _FRAME_HEADER.size:
+        raise ValueError("告警二进制帧长度不足")
+    magic, header_len = _FRAME_HEADER.unpack_from(view)
+    if magic != FRAME_MAGIC:
+        raise ValueError("告警二进制帧魔数错误")
+    start = _FRAME_HEADER.size
+    header = json.loads(bytes(view[start:start + header_len]).decode('utf-8'))
+    return header, view[start + header_len:]
+
+
+def normalize_media_mode(mode: Optional[str]) -> str:
+    """规范化客户端媒体模式，未知值使用默认模式"""
+    return mode if mode in MEDIA_MODES else DEFAULT_MEDIA_MODE
+
+
+def media_kinds_for_mode(mode: str, available) -> Tuple[str, ...]:
+    """媒体模式下需要内联发送的图片类型（缩略图缺失时退回原图）"""
+    if mode == MEDIA_MODE_URL:
+        return ()
+    if mode == MEDIA_MODE_THUMBNAIL and all(kind in available for kind in THUMBNAIL_KINDS):
+        return THUMBNAIL_KINDS
+    return tuple(kind for kind in FULL_KINDS if kind in available)
+
+
+def build_alarm_metadata(alarm_data: Dict[str, Any], media: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    构建告警元数据（不含图片内容）
+    Args:
+        alarm_data: 告警数据
+        media: {媒体类型: JPEG字节或字节数}
+    """
+    metadata = {'type': 'alarm'}
+    metadata.update({key: alarm_data[key] for key in METADATA_FIELDS if key in alarm_data})
+    metadata['media'] = {kind: (value if isinstance(value, int) else len(value))
+                         for kind, value in (media or {}).items() if kind in MEDIA_KINDS}
+    return metadata
+
+
+class AlarmNotification:
+    """
+    一条待广播的告警通知
+    按媒体模式生成[文本帧, 二进制帧...]并缓存，同模式的客户端共享同一份序列化结果
+    """
+
+    def __init__(self, metadata: Dict[str, Any], media: Optional[Dict[str, bytes]] = None,
+                 media_url: str = DEFAULT_MEDIA_URL):
+        self.metadata = metadata
+        self.media = {kind: data for kind, data in (media or {}).items() if data}
+        self.media_url = media_url
+        self._frames: Dict[str, List[Union[str, bytes]]] = {}
+
+    @property
+    def alarm_id(self) -> Optional[str]:
+        return self.metadata.get('alarm_id')
+
+    @property
+    def stream_id(self) -> Optional[str]:
+        return self.metadata.get('stream_id')
+
+    def frames(self, mode: str) -> List[Union[str, bytes]]:
+        """获取某媒体模式下的发送帧（首帧为JSON文本，其后为图片二进制帧）"""
+        mode = normalize_media_mode(mode)
+        frames = self._frames.get(mode)
+        if frames is None:
+            inline = media_kinds_for_mode(mode, self.media)
+            alarm_id = self.alarm_id
+            message = dict(self.metadata)
+            message['media_mode'] = mode
+            message['images'] = {
+                kind: {
+                    'size': len(self.media[kind]) if kind in self.media else self.metadata.get('media', {}).get(kind),
+                    'inline': kind in inline,
+                    'url': self.media_url.format(alarm_id=alarm_id, kind=kind),
+                }
+                for kind in MEDIA_KINDS if kind in self.media or kind in self.metadata.get('media', {})
+            }
+            message.pop('media', None)
+            frames = [json.dumps(message, ensure_ascii=False, separators=(',', ':'))]
+            frames.extend(pack_media_frame(alarm_id, kind, self.media[kind]) for kind in inline)
+            self._frames[mode] = frames
+        return frames
+
+
+class AlarmAssembler:
+    """
+    告警接收端组装器：先收到元数据文本帧，再按元数据声明的图片类型收齐二进制帧
+    """
+
+    def __init__(self, max_pending: int = 32):
+        self.max_pending = max_pending
+        self._pending: Dict[str, Tuple[Dict[str, Any], Dict[str, bytes]]] = {}
+
+    def begin(self, metadata: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], Dict[str, bytes]]]:
+        """登记元数据，未声明图片时直接返回(元数据, {})"""
+        if not metadata.get('media'):
+            return metadata, {}
+        self._pending[metadata['alarm_id']] = (metadata, {})
+        while len(self._pending) > self.max_pending:
+            # 发送端异常时丢弃最早的未完成告警
+            self._pending.pop(next(iter(self._pending)))
+        return None
+
+    def add(self, frame: bytes) -> Optional[Tuple[Dict[str, Any], Dict[str, bytes]]]:
+        """添加图片二进制帧，收齐后返回(元数据, {媒体类型: JPEG字节})"""
+        header, payload = unpack_media_frame(frame)
+        entry = self._pending.get(header.get('alarm_id'))
+        if entry is None:
+            return None
+        metadata, media = entry
+        media[header['kind']] = bytes(payload)
+        if all(kind in media for kind in metadata['media']):
+            del self._pending[metadata['alarm_id']]
+            return metadata, media
+        return None
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
@@ -0,0 +1,179 @@
+"""
+检测结果标注渲染模块
+- 静态叠加层（ROI多边形及其名称）按(流, 分辨率)预先光栅化为掩码并缓存，只保留非零像素的索引和颜色
+- 每帧静态层只做一次向量化写入（按像素索引赋值），动态检测框和标签逐帧绘制
+- 多边形内容变化（配置更新）时按签名自动重建，缓存按最近使用淘汰
+- 结果中没有可绘制内容时直接跳过，调用方可用needs_annotation判断是否需要准备可写帧
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 缓存的静态叠加层数量上限（每个(流, 分辨率)一个）
+DEFAULT_MAX_LAYERS = 32
+
+# 默认颜色与线宽
+DEFAULT_POLYGON_COLOR = (0, 255, 0)
+LINE_THICKNESS = 2
+FONT_SCALE = 0.5
+
+
+def _bbox(results: Dict) -> Dict:
+    try:
+        return results['data']['bbox'] or {}
+    except (KeyError, TypeError):
+        return {}
+
+
+def needs_annotation(results: Optional[Dict]) -> bool:
+    """结果中是否有需要绘制的检测框或多边形"""
+    if not results:
+        return False
+    bbox = _bbox(results)
+    return bool(bbox.get('rectangles') or bbox.get('polygons'))
+
+
+def polygon_signature(polygons: Dict) -> Tuple:
+    """多边形内容签名（ID、顶点、颜色、名称），用于判断缓存的静态层是否仍然有效"""
+    return tuple(
+        (str(poly_id), np.asarray(poly_data['polygon'], dtype=np.int32).tobytes(),
+         tuple(poly_data.get('color') or DEFAULT_POLYGON_COLOR), poly_data.get('label'))
+        for poly_id, poly_data in sorted(polygons.items(), key=lambda item: str(item[0]))
+    )
+
+
+class StaticLayer:
+    """
+    预光栅化的静态叠加层
+    ROI轮廓只占整帧极少像素，按掩码中非零像素的平铺索引和颜色保存，
+    混合时一次花式索引赋值写入，不遍历整帧
+    """
+    __slots__ = ('signature', 'shape', 'indices', 'ys', 'xs', 'values')
+
+    def __init__(self, signature: Tuple, shape: Tuple[int, int], polygons: Dict):
+        self.signature = signature
+        self.shape = tuple(shape)
+        height, width = shape
+        color = np.zeros((height, width, 3), dtype=np.uint8)
+        mask = np.zeros((height, width), dtype=np.uint8)
+        for poly_data in polygons.values():
+            points = np.asarray(poly_data['polygon'], dtype=np.int32).reshape((-1, 1, 2))
+            poly_color = tuple(int(c) for c in (poly_data.get('color') or DEFAULT_POLYGON_COLOR))
+            cv2.polylines(color, [points], True, poly_color, LINE_THICKNESS)
+            cv2.polylines(mask, [points], True, 255, LINE_THICKNESS)
+            label = poly_data.get('label')
+            if label:
+                # ROI名称与轮廓一起光栅化，每帧不再重新排版文字
+                origin = (int(points[0, 0, 0]), int(points[0, 0, 1]) - 5)
+                cv2.putText(color, str(label), origin, cv2.FONT_HERSHEY_SIMPLEX, FONT_SCALE, poly_color, LINE_THICKNESS)
+                cv2.putText(mask, str(label), origin, cv2.FONT_HERSHEY_SIMPLEX, FONT_SCALE, 255, LINE_THICKNESS)
+
+        self.indices = np.flatnonzero(mask)
+        self.ys, self.xs = np.divmod(self.indices, width)
+        self.values = color.reshape(-1, 3)[self.indices]
+
+    def blend(self, frame: np.ndarray) -> None:
+        """把静态层写入帧（一次向量化操作）"""
+        if frame.flags.c_contiguous:
+            # 连续帧reshape为视图，按平铺索引写入
+            frame.reshape(-1, frame.shape[-1])[self.indices] = self.values
+        else:
+            frame[self.ys, self.xs] = self.values
+
+class AnnotationRenderer:
+    """标注渲染器（每个进程一个，线程安全）"""
+
+    def __init__(self, max_layers: int = DEFAULT_MAX_LAYERS):
+        self.max_layers = max(1, int(max_layers))
+        self._layers: 'OrderedDict[Tuple, StaticLayer]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'renders': 0, 'skipped': 0, 'layer_hits': 0, 'layer_misses': 0}
+
+    def _static_layer(self, stream_id: str, shape: Tuple[int, int], polygons: Dict) -> StaticLayer:
+        key = (stream_id, shape)
+        signature = polygon_signature(polygons)
+        with self._lock:
+            layer = self._layers.get(key)
+            if layer is not None and layer.signature == signature:
+                self._layers.move_to_end(key)
+                self.stats['layer_hits'] += 1
+                return layer
+
+        layer = StaticLayer(signature, shape, polygons)
+        with self._lock:
+            self.stats['layer_misses'] += 1
+            self._layers[key] = layer
+            self._layers.move_to_end(key)
+            while len(self._layers) > self.max_layers:
+                self._layers.popitem(last=False)
+        logger.debug(f"静态叠加层已光栅化: {stream_id}, {shape[1]}x{shape[0]}, 多边形数: {len(polygons)}")
+        return layer
+
+    def render(self, frame: Any, results: Dict, stream_id: str = '-') -> Any:
+        """
+        在帧上绘制检测结果（原地修改）
+        Args:
+            frame: 可写的BGR帧
+            results: 后处理结果（data.bbox.rectangles / data.bbox.polygons）
+            stream_id: 流ID，静态层按(流, 分辨率)缓存
+        Returns:
+            绘制后的帧
+        """
+        bbox = _bbox(results) if results else {}
+        rectangles = bbox.get('rectangles') or []
+        polygons = bbox.get('polygons') or {}
+        if frame is None or not (rectangles or polygons):
+            self.stats['skipped'] += 1
+            return frame
+
+        if polygons:
+            self._static_layer(stream_id, frame.shape[:2], polygons).blend(frame)
+
+        for rect in rectangles:
+            x1, y1, x2, y2 = (int(v) for v in rect['xyxy'])
+            color = rect['color']
+            label = rect.get('label', '')
+            conf = rect.get('conf', 0)
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, LINE_THICKNESS)
+            cv2.putText(frame, f"{label} {conf:.2f}", (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX,
+                        FONT_SCALE, color, LINE_THICKNESS)
+        self.stats['renders'] += 1
+        return frame
+
+    def invalidate(self, stream_id: Optional[str] = None) -> None:
+        """清除静态层缓存（stream_id为None时清除全部）"""
+        with self._lock:
+            if stream_id is None:
+                self._layers.clear()
+            else:
+                for key in [key for key in self._layers if key[0] == stream_id]:
+                    del self._layers[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取渲染次数、跳过次数、静态层缓存命中统计"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['cached_layers'] = len(self._layers)
+        lookups = stats['layer_hits'] + stats['layer_misses']
+        stats['layer_hit_rate'] = round(stats['layer_hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer() -> AnnotationRenderer:
+    """获取本进程的标注渲染器"""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = AnnotationRenderer()
+        return _renderer
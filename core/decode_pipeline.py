@@ -0,0 +1,204 @@
+"""
+解码流水线模块
+- 解码线程：独占VideoCapture，持续读取码流，消费者变慢时也不会阻塞解码、堆积RTSP缓冲
+- 最新帧信箱：单槽、新帧覆盖未取走的旧帧，消费者非阻塞读取，端到端延迟最多一帧
+- 解码侧跳帧：跳过的帧只grab()不retrieve()，不做色彩转换也不发布
+- 计数：解码帧数、跳过帧数、丢弃帧数、交付帧数
+- 与硬件无关：只依赖cv2.VideoCapture接口，软解/硬解后端均可
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# 实时流协议前缀，其他来源（本地文件等）按视频帧率节流解码
+LIVE_SCHEMES = ('rtsp://', 'rtmp://', 'http://', 'https://', 'udp://', 'tcp://', 'srt://')
+
+
+def is_live_source(url) -> bool:
+    """判断是否为实时源（网络流或摄像头编号）"""
+    url = str(url).strip().lower()
+    return url.startswith(LIVE_SCHEMES) or url.isdigit()
+
+
+def resolve_decode_interval(consumer_intervals: Iterable[int], default: int = 1) -> int:
+    """
+    计算解码间隔：要求最高（间隔最小）的消费者决定解码帧率
+    Args:
+        consumer_intervals: 各消费者要求的跳帧间隔
+        default: 没有消费者登记时使用的流默认间隔
+    Returns:
+        解码间隔（每N帧解码1帧）
+    """
+    intervals = [int(interval) for interval in consumer_intervals if interval and int(interval) > 0]
+    return max(1, min(intervals) if intervals else int(default or 1))
+
+
+def stream_consumer_intervals(stream_id: str, consumer_status: Dict[str, Dict[str, Any]],
+                              stream_ids: Iterable[str] = ()) -> List[int]:
+    """
+    取出属于该流的消费者登记的跳帧间隔
+    Args:
+        stream_id: 流ID
+        consumer_status: 算法状态 {"{stream_id}_{algo_id}": 状态字典}
+        stream_ids: 已登记的全部流ID；流ID可能互为前缀（如cam1与cam1_backup），
+            消费者键归属于作为其前缀的最长流ID，cam1的消费者不包含cam1_backup_*
+    """
+    prefix = f"{stream_id}_"
+    longer = tuple(f"{other}_" for other in stream_ids if other != stream_id and other.startswith(prefix))
+    return [
+        status.get('skip_interval', 0)
+        for key, status in consumer_status.items()
+        if key.startswith(prefix) and not key.startswith(longer)
+    ]
+
+
+def consumer_step(consumer_interval: int, decode_interval: int) -> int:
+    """消费者在已解码帧序列上的取帧步长（消费者间隔相对源帧率，解码已按decode_interval抽帧）"""
+    return max(1, int(round(max(1, consumer_interval) / max(1, decode_interval))))
+
+
+class LatestFrameMailbox:
+    """单槽最新帧信箱：新帧覆盖未被取走的旧帧"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._frame = None
+        self._timestamp = 0.0
+
+        # 计数
+        self.decoded = 0
+        self.dropped = 0
+        self.delivered = 0
+
+    def put(self, frame: Any, timestamp: Optional[float] = None) -> None:
+        """放入新帧（解码线程调用，从不阻塞）"""
+        with self._cond:
+            if self._frame is not None:
+                self.dropped += 1
+            self._frame = frame
+            self._timestamp = timestamp if timestamp is not None else time.time()
+            self.decoded += 1
+            self._cond.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Tuple[Any, float]]:
+        """
+        取走最新帧
+        Args:
+            timeout: 等待超时(秒)，0表示不等待，None表示一直等待
+        Returns:
+            (帧, 时间戳)，超时返回None
+        """
+        with self._cond:
+            if self._frame is None and timeout != 0:
+                self._cond.wait_for(lambda: self._frame is not None, timeout)
+            if self._frame is None:
+                return None
+            frame, timestamp = self._frame, self._timestamp
+            self._frame = None
+            self.delivered += 1
+            return frame, timestamp
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取解码/丢弃/交付计数"""
+        with self._cond:
+            return {
+                'decoded': self.decoded,
+                'dropped': self.dropped,
+                'delivered': self.delivered,
+            }
+
+
+class DecodeThread(threading.Thread):
+    """解码线程：持续读取视频流并投递到最新帧信箱"""
+
+    def __init__(self, cap, mailbox: LatestFrameMailbox, name: str = "Decode",
+                 realtime_fps: Optional[float] = None, max_consecutive_failures: int = 5,
+                 skip_interval: Union[int, Callable[[], int]] = 1):
+        """
+        初始化解码线程
+        Args:
+            cap: 已打开的cv2.VideoCapture（启动后归本线程所有，退出时释放）
+            mailbox: 最新帧信箱
+            name: 线程名称
+            realtime_fps: 非实时源（本地文件）按该帧率节流，实时源传None
+            max_consecutive_failures: 连续读取失败次数上限，超过后线程退出并标记failed
+            skip_interval: 每N帧解码1帧，可为返回当前间隔的函数（消费者变化时动态调整）
+        """
+        super().__init__(name=name, daemon=True)
+        self.cap = cap
+        self.mailbox = mailbox
+        self.frame_interval = 1.0 / realtime_fps if realtime_fps and realtime_fps > 0 else 0.0
+        self.max_consecutive_failures = max_consecutive_failures
+        self.skip_interval = skip_interval
+        self.failed = False
+        self._stop_event = threading.Event()
+
+        # 计数：grab的帧数、只grab未retrieve的帧数
+        self.grabbed = 0
+        self.skipped = 0
+
+    def _current_interval(self) -> int:
+        interval = self.skip_interval() if callable(self.skip_interval) else self.skip_interval
+        return max(1, int(interval or 1))
+
+    def _pace(self) -> None:
+        """本地文件按原始帧率节流（每grab一帧计一次），落后时不追帧"""
+        if not self.frame_interval:
+            return
+        self._next_frame_time += self.frame_interval
+        delay = self._next_frame_time - time.time()
+        if delay > 0:
+            self._stop_event.wait(delay)
+        else:
+            self._next_frame_time = time.time()
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取grab/跳过计数及信箱计数"""
+        stats = self.mailbox.get_stats()
+        stats['grabbed'] = self.grabbed
+        stats['skipped'] = self.skipped
+        return stats
+
+    def run(self) -> None:
+        consecutive_failures = 0
+        self._next_frame_time = time.time()
+        try:
+            while not self._stop_event.is_set():
+                # 先只取压缩包/解码，不做色彩转换；跳过的帧不retrieve()
+                ret = self.cap.grab()
+                if ret:
+                    self.grabbed += 1
+                    if self.grabbed % self._current_interval() != 0:
+                        self.skipped += 1
+                        consecutive_failures = 0
+                        self._pace()
+                        continue
+                    ret, frame = self.cap.retrieve()
+                if not ret:
+                    consecutive_failures += 1
+                    logger.warning(f"{self.name} 读取视频帧失败 ({consecutive_failures}/{self.max_consecutive_failures})")
+                    if consecutive_failures >= self.max_consecutive_failures:
+                        self.failed = True
+                        break
+                    time.sleep(0.1)
+                    continue
+                consecutive_failures = 0
+
+                self.mailbox.put(frame, time.time())
+                self._pace()
+        except Exception as e:
+            logger.error(f"{self.name} 解码线程异常: {e}", exc_info=True)
+            self.failed = True
+        finally:
+            # VideoCapture由解码线程独占，退出时在本线程内释放，避免与阻塞中的read()并发
+            self.cap.release()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """通知线程退出并等待结束，VideoCapture随线程退出释放"""
+        self._stop_event.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
@@ -0,0 +1,384 @@
+"""
+推理服务模块
+- 模型权重只在推理执行器进程中加载，汇集所有使用该算法包的流（跨流）提交的帧
+- 动态批处理：凑满最大批大小或等待超过最大等待时间即执行一次批量前向计算
+- 请求只携带帧引用，服务进程从共享内存环形缓冲区租用帧，不拷贝帧数据
+- 结果按客户端（流_算法）分发回各自的响应队列
+- 执行器池：同一模型可启动多个执行器，客户端按在途请求数（队列深度）选择最空闲的执行器
+"""
+
+import logging
+import queue
+import time
+import multiprocessing as mp
+from typing import Any, Dict, List, Optional
+
+from .worker_processes import GlobalConfig, run_batch_inference, run_postprocess, log_exception
+
+logger = logging.getLogger(__name__)
+
+# 默认批处理参数
+DEFAULT_MAX_BATCH_SIZE = 8
+DEFAULT_MAX_WAIT_MS = 10
+DEFAULT_REQUEST_TIMEOUT = 5.0
+
+# 控制消息类型
+MSG_REGISTER = 'register'
+MSG_UNREGISTER = 'unregister'
+
+# 统计日志输出间隔(秒)
+STATS_LOG_INTERVAL = 60
+
+
+def get_inference_config() -> Dict[str, Any]:
+    """读取推理服务配置"""
+    config = GlobalConfig.instance().get_section('inference_server')
+    return {
+        'enabled': config.get('enabled', False),
+        'max_batch_size': int(config.get('max_batch_size', DEFAULT_MAX_BATCH_SIZE)),
+        'max_wait_ms': float(config.get('max_wait_ms', DEFAULT_MAX_WAIT_MS)),
+        'request_timeout': float(config.get('request_timeout', DEFAULT_REQUEST_TIMEOUT)),
+    }
+
+
+class ExecutorPool:
+    """推理执行器池：每个执行器一个请求队列，共享在途请求计数用于按队列深度分发"""
+
+    def __init__(self, num_executors: int = 1, queue_size: int = DEFAULT_MAX_BATCH_SIZE * 16):
+        """
+        初始化执行器池（须在进程管理器中创建，随进程参数继承给执行器和客户端）
+        Args:
+            num_executors: 执行器数量
+            queue_size: 每个执行器请求队列长度
+        """
+        num_executors = max(1, num_executors)
+        self.request_queues = [mp.Queue(maxsize=queue_size) for _ in range(num_executors)]
+        self.depths = mp.Array('i', num_executors)
+
+    def __len__(self):
+        return len(self.request_queues)
+
+    def select(self) -> int:
+        """选择在途请求最少的执行器并占用一个计数，返回执行器序号"""
+        with self.depths.get_lock():
+            depths = self.depths.get_obj()
+            index = min(range(len(depths)), key=depths.__getitem__)
+            depths[index] += 1
+        return index
+
+    def done(self, index: int, count: int = 1) -> None:
+        """执行器完成请求后归还计数"""
+        with self.depths.get_lock():
+            depths = self.depths.get_obj()
+            depths[index] = max(0, depths[index] - count)
+
+    def reset(self, index: int) -> None:
+        """执行器重启时清零其在途计数"""
+        with self.depths.get_lock():
+            self.depths.get_obj()[index] = 0
+
+    def get_depths(self) -> List[int]:
+        """获取各执行器在途请求数"""
+        with self.depths.get_lock():
+            return list(self.depths.get_obj())
+
+    def broadcast(self, message) -> None:
+        """向所有执行器发送控制消息"""
+        for request_queue in self.request_queues:
+            try:
+                request_queue.put(message, timeout=1.0)
+            except queue.Full:
+                logger.warning(f"执行器请求队列已满，控制消息未送达: {message[0]}")
+
+
+class InferenceRequest:
+    """推理请求：客户端ID + 请求序号 + 帧引用"""
+
+    __slots__ = ('client_id', 'request_id', 'frame_ref')
+
+    def __init__(self, client_id, request_id, frame_ref):
+        self.client_id = client_id
+        self.request_id = request_id
+        self.frame_ref = frame_ref
+
+    def __getstate__(self):
+        return (self.client_id, self.request_id, self.frame_ref)
+
+    def __setstate__(self, state):
+        self.client_id, self.request_id, self.frame_ref = state
+
+
+class InferenceServer:
+    """动态批处理推理服务（运行在推理服务进程内）"""
+
+    def __init__(self, model, postprocessor, memory_manager, response_queues: Optional[Dict[str, Any]] = None,
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+                 executor_pool: Optional[ExecutorPool] = None, executor_index: int = 0):
+        """
+        初始化推理服务
+        Args:
+            model: 模型实例（支持infer_batch时执行批量前向计算）
+            postprocessor: 后处理器实例
+            memory_manager: 共享内存管理器，用于租用帧
+            response_queues: 客户端ID -> 响应队列
+            max_batch_size: 最大批大小
+            max_wait_ms: 凑批最大等待时间(毫秒)
+            executor_pool: 所属执行器池，完成请求后归还在途计数
+            executor_index: 本执行器在池中的序号
+        """
+        self.model = model
+        self.postprocessor = postprocessor
+        self.memory_manager = memory_manager
+        self.response_queues = dict(response_queues or {})
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.executor_pool = executor_pool
+        self.executor_index = executor_index
+
+        # 统计
+        self.stats = {
+            'batches': 0,
+            'frames': 0,
+            'stale_frames': 0,
+            'max_batch': 0,
+            'infer_time': 0.0,
+        }
+
+    def register_client(self, client_id: str, response_queue) -> None:
+        """登记客户端响应队列"""
+        self.response_queues[client_id] = response_queue
+        logger.info(f"推理服务登记客户端: {client_id}")
+
+    def unregister_client(self, client_id: str) -> None:
+        """注销客户端"""
+        self.response_queues.pop(client_id, None)
+
+    def _handle_message(self, message, batch: List[InferenceRequest]) -> None:
+        """处理一条队列消息：推理请求加入批次，控制消息立即执行"""
+        if isinstance(message, InferenceRequest):
+            batch.append(message)
+        elif isinstance(message, tuple) and message:
+            if message[0] == MSG_REGISTER:
+                self.register_client(message[1], message[2])
+            elif message[0] == MSG_UNREGISTER:
+                self.unregister_client(message[1])
+
+    def collect_batch(self, request_queue, poll_timeout: float = 0.1) -> List[InferenceRequest]:
+        """
+        凑批：阻塞等待第一个请求，之后在最大等待时间内尽量凑满最大批大小
+        Args:
+            request_queue: 请求队列
+            poll_timeout: 等待第一个请求的超时时间(秒)
+        Returns:
+            请求列表（可能为空）
+        """
+        batch = []
+        poll_deadline = time.time() + poll_timeout
+        while not batch:
+            remaining = poll_deadline - time.time()
+            if remaining <= 0:
+                return batch
+            try:
+                self._handle_message(request_queue.get(timeout=remaining), batch)
+            except queue.Empty:
+                return batch
+
+        deadline = time.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.time()
+            try:
+                if remaining > 0:
+                    message = request_queue.get(timeout=remaining)
+                else:
+                    message = request_queue.get_nowait()
+            except queue.Empty:
+                break
+            self._handle_message(message, batch)
+        return batch
+
+    def _respond(self, request: InferenceRequest, post_result: Optional[Dict]) -> None:
+        """将结果放回请求方的响应队列"""
+        response_queue = self.response_queues.get(request.client_id)
+        if response_queue is None:
+            logger.warning(f"推理结果无人接收，客户端未登记: {request.client_id}")
+            return
+        try:
+            response_queue.put_nowait((request.request_id, post_result))
+        except queue.Full:
+            logger.warning(f"客户端响应队列已满，丢弃结果: {request.client_id}")
+
+    def process_batch(self, batch: List[InferenceRequest]) -> int:
+        """
+        执行一次批量推理并分发结果
+        Args:
+            batch: 请求列表
+        Returns:
+            实际推理的帧数
+        """
+        leases = []
+        valid_requests = []
+        try:
+            for request in batch:
+                lease = self.memory_manager.lease_frame(request.frame_ref)
+                if lease is None:
+                    # 帧已被覆盖，通知客户端放弃本帧
+                    self.stats['stale_frames'] += 1
+                    self._respond(request, None)
+                    continue
+                leases.append(lease)
+                valid_requests.append(request)
+
+            if not valid_requests:
+                return 0
+
+            start_time = time.time()
+            outputs = run_batch_inference(self.model, [lease.frame for lease in leases])
+            self.stats['infer_time'] += time.time() - start_time
+
+            for request, (orig_result, _) in zip(valid_requests, outputs):
+                self._respond(request, run_postprocess(self.postprocessor, orig_result))
+        finally:
+            for lease in leases:
+                lease.release()
+            if self.executor_pool is not None:
+                self.executor_pool.done(self.executor_index, len(batch))
+
+        self.stats['batches'] += 1
+        self.stats['frames'] += len(valid_requests)
+        self.stats['max_batch'] = max(self.stats['max_batch'], len(valid_requests))
+        return len(valid_requests)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取批处理统计"""
+        stats = dict(self.stats)
+        stats['avg_batch_size'] = stats['frames'] / stats['batches'] if stats['batches'] else 0.0
+        stats['avg_frame_time'] = stats['infer_time'] / stats['frames'] if stats['frames'] else 0.0
+        stats['clients'] = len(self.response_queues)
+        if self.executor_pool is not None:
+            stats['queue_depths'] = self.executor_pool.get_depths()
+        return stats
+
+    def serve(self, request_queue, stop_event) -> None:
+        """服务主循环"""
+        last_stats_time = time.time()
+        while not stop_event.is_set():
+            try:
+                batch = self.collect_batch(request_queue)
+                if batch:
+                    self.process_batch(batch)
+            except Exception as e:
+                log_exception("inference_server", "-", e)
+                time.sleep(0.1)
+
+            if time.time() - last_stats_time >= STATS_LOG_INTERVAL:
+                logger.info(f"推理服务统计: {self.get_stats()}")
+                last_stats_time = time.time()
+
+
+class InferenceClient:
+    """推理服务客户端（运行在算法进程内）"""
+
+    def __init__(self, client_id: str, executor_pool: ExecutorPool, response_queue, timeout: float = DEFAULT_REQUEST_TIMEOUT):
+        """
+        初始化客户端
+        Args:
+            client_id: 客户端ID（流_算法）
+            executor_pool: 模型的推理执行器池
+            response_queue: 本客户端响应队列
+            timeout: 单次推理等待超时(秒)
+        """
+        self.client_id = client_id
+        self.executor_pool = executor_pool
+        self.response_queue = response_queue
+        self.timeout = timeout
+        self._next_request_id = 0
+
+    def register(self) -> None:
+        """向所有执行器登记响应队列（执行器重启后由进程管理器重新下发）"""
+        self.executor_pool.broadcast((MSG_REGISTER, self.client_id, self.response_queue))
+
+    def unregister(self) -> None:
+        """注销客户端"""
+        self.executor_pool.broadcast((MSG_UNREGISTER, self.client_id))
+
+    def infer(self, frame_ref, timeout: Optional[float] = None) -> Optional[Dict]:
+        """
+        提交帧引用并等待后处理结果
+        Args:
+            frame_ref: 帧引用
+            timeout: 等待超时(秒)，默认使用客户端超时
+        Returns:
+            后处理结果；超时或帧已失效时返回None
+        """
+        self._next_request_id += 1
+        request_id = self._next_request_id
+        index = self.executor_pool.select()
+        try:
+            self.executor_pool.request_queues[index].put(InferenceRequest(self.client_id, request_id, frame_ref), timeout=1.0)
+        except queue.Full:
+            self.executor_pool.done(index)
+            logger.warning(f"推理执行器请求队列已满: {self.client_id}, 执行器: {index}")
+            return None
+
+        deadline = time.time() + (self.timeout if timeout is None else timeout)
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                logger.warning(f"等待推理结果超时: {self.client_id}")
+                return None
+            try:
+                response_id, post_result = self.response_queue.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            # 丢弃此前超时请求的迟到结果
+            if response_id == request_id:
+                return post_result
+
+
+def inference_server_process(manager_id: str, model_id: str, algo_package: str, model_name: str, model_config: Dict,
+                             executor_pool: ExecutorPool, executor_index: int, response_queues: Dict[str, Any],
+                             stop_event=None, lock_pool=None) -> None:
+    """
+    推理执行器进程：加载一份模型权重，为所有使用该模型的算法进程提供批量推理
+    Args:
+        manager_id: 管理器ID（用于附加共享内存）
+        model_id: 模型ID
+        algo_package: 算法包
+        model_name: 模型名称
+        model_config: 模型配置
+        executor_pool: 模型的推理执行器池
+        executor_index: 本执行器序号
+        response_queues: 已登记的客户端ID -> 响应队列
+        stop_event: 停止事件
+        lock_pool: 跨进程锁池（租用帧时与拉流进程互斥）
+    """
+    from .ipc_manager import SharedMemoryManager
+    from .model_manager import ModelRegistry
+
+    mp.current_process().name = f"Infer-{model_id}-{executor_index}"
+    stop_event = stop_event or mp.Event()
+    memory_manager = SharedMemoryManager(manager_id, lock_pool=lock_pool)
+    executor_pool.reset(executor_index)
+
+    try:
+        model_registry = ModelRegistry()
+        model_registry.register_model(algo_package, model_name, model_config)
+        if not model_registry.load_model(model_id, num_instances=1):
+            logger.error(f"推理服务加载模型失败: {model_id}")
+            return
+        model, postprocessor = model_registry.get_model_instance(model_id)
+
+        config = get_inference_config()
+        server = InferenceServer(
+            model, postprocessor, memory_manager, response_queues,
+            max_batch_size=model_config.get('max_batch_size', config['max_batch_size']),
+            max_wait_ms=model_config.get('max_wait_ms', config['max_wait_ms']),
+            executor_pool=executor_pool, executor_index=executor_index
+        )
+        logger.info(f"推理执行器已启动: {model_id}#{executor_index}, 最大批大小: {server.max_batch_size}, 最大等待: {server.max_wait * 1000:.0f}ms")
+        server.serve(executor_pool.request_queues[executor_index], stop_event)
+    except Exception as e:
+        logger.error(f"推理服务进程异常: {e}", exc_info=True)
+    finally:
+        memory_manager.close()
+        logger.info(f"推理执行器进程结束: {model_id}#{executor_index}")
@@ -1,7 +1,9 @@
 """
 进程间通信与状态共享模块
 - 共享队列/内存：帧队列、结果队列、告警队列，多进程安全复用
-- 状态共享：Manager字典+文件快照
+- 帧数据：每路流预分配共享内存环形缓冲区，队列中只传递槽位索引+序列号
+- 帧广播：同一路流只解码一次，各消费者按自己的读游标和丢帧策略读取同一个环形缓冲区
+- 状态共享：共享内存状态表（固定布局、单写者无锁计数、快照读取）
 - put/get_frame、put/get_result、put/get_alarm等接口注释清晰
 - 只保留分析器主线相关内容
 """
@@ -15,23 +17,26 @@ import numpy as np
 import queue
 import threading
 import multiprocessing as mp
-import json
-import tempfile
+import hashlib
 from multiprocessing import shared_memory
 from multiprocessing.queues import Empty as MPQueueEmpty  # 添加多进程队列专用的Empty异常
+from multiprocessing.queues import Full as MPQueueFull
+
+from .process_lock import LockPool, pid_alive
+from .status_table import StatusTable, get_table_name
 
 logger = logging.getLogger(__name__)
 
 # 生成全局唯一的资源名称前缀，避免冲突
 RESOURCE_PREFIX = f"ipc_{time.strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
 
-# 进程本地引用计数字典
-_local_ref_counts = {}
-_local_ref_lock = threading.RLock()
+# 每路流环形缓冲区默认槽位数
+DEFAULT_RING_SLOTS = 8
 
-# 状态文件的基础目录
-STATUS_BASE_DIR = os.path.join(tempfile.gettempdir(), "video_analyzer_status")
-os.makedirs(STATUS_BASE_DIR, exist_ok=True)
+# 帧消费者丢帧策略
+DROP_LATEST = 'latest'  # 总是取最新帧，跳过积压（实时检测，延迟最低）
+DROP_OLDEST = 'oldest'  # 按顺序取帧，落后超过缓冲区容量时丢弃已被覆盖的最旧帧
+DROP_POLICIES = (DROP_LATEST, DROP_OLDEST)
 
 def get_queue_name(manager_id, stream_id=None, algo_id=None, type_prefix=""):
     """生成队列名称"""
@@ -42,140 +47,545 @@ def get_queue_name(manager_id, stream_id=None, algo_id=None, type_prefix=""):
     else:
         return f"{type_prefix}_{manager_id}"
 
+def get_ring_name(manager_id, stream_id):
+    """生成环形缓冲区共享内存名称（定长，兼容各平台的名称长度限制）"""
+    digest = hashlib.md5(f"{manager_id}:{stream_id}".encode('utf-8')).hexdigest()[:16]
+    return f"vring_{digest}"
+
 class FrameReference:
-    """帧引用类，用于在进程间共享帧数据的引用"""
-    def __init__(self, shm_name, shape, dtype, frame_id, timestamp):
-        self.shm_name = shm_name
-        self.shape = shape
-        self.dtype = dtype
-        self.frame_id = frame_id
+    """帧引用类，只携带环形缓冲区的槽位索引和序列号，进程间传递开销极小"""
+    __slots__ = ('stream_id', 'slot', 'seq', 'timestamp')
+
+    def __init__(self, stream_id, slot, seq, timestamp):
+        self.stream_id = stream_id
+        self.slot = slot
+        self.seq = seq
         self.timestamp = timestamp
-        
-        # 初始化进程本地引用计数
-        global _local_ref_counts, _local_ref_lock
-        with _local_ref_lock:
-            if self.frame_id not in _local_ref_counts:
-                _local_ref_counts[self.frame_id] = 1
-            else:
-                _local_ref_counts[self.frame_id] += 1
-
-    def get_array(self):
-        """获取共享内存中的数组"""
+
+    def __getstate__(self):
+        return (self.stream_id, self.slot, self.seq, self.timestamp)
+
+    def __setstate__(self, state):
+        self.stream_id, self.slot, self.seq, self.timestamp = state
+
+    @property
+    def frame_id(self):
+        """帧ID（流ID+序列号，全局唯一）"""
+        return f"{self.stream_id}:{self.seq}"
+
+
+class FrameRingBuffer:
+    """
+    每路流一个的定长共享内存环形缓冲区
+    - 创建时按流的宽高一次性分配，热路径只做一次内存拷贝，不再创建/销毁共享内存
+    - 单写者（拉流进程）按顺序写入下一个未被租用的槽位，槽位序列号用于检测过期/撕裂读取
+    - 租约表每个持有进程独占一行，写者跳过任一行计数非零的槽位
+    - 认领租约行、租用/归还槽位、写者选取槽位均在本缓冲区的跨进程锁内完成（按名称取自主进程创建的锁池，
+      持锁进程被强制结束后由等待者代为释放）；numpy读写不提供内存屏障，不能依赖"先写后读"在进程间的可见顺序
+    - 头部记录几何信息，其他进程可仅凭名称附加
+    内存布局: [头部 int64 x HEADER_WORDS][槽位序列号 int64 x N][槽位时间戳 float64 x N]
+              [租约持有者PID int64 x H][租约计数 int32 x H x N][帧数据 x N]
+    """
+
+    MAGIC = 0x56524E47  # 'VRNG'
+    HEADER_WORDS = 9
+    MAX_LEASE_HOLDERS = 16
+    # 头部字段索引
+    (_H_MAGIC, _H_STATE, _H_SLOTS, _H_HEIGHT, _H_WIDTH, _H_CHANNELS, _H_DTYPE,
+     _H_WRITE_SEQ, _H_HOLDERS) = range(HEADER_WORDS)
+    STATE_ACTIVE = 1
+    STATE_CLOSED = 2
+
+    def __init__(self, shm, owner=False, lock=None):
+        self.shm = shm
+        self.owner = owner
+        self._lock = lock if lock is not None else threading.RLock()
+        self._holder_row = None
+        self._map_views()
+
+    @classmethod
+    def _metadata_bytes(cls, num_slots, num_holders):
+        """头部与元数据区大小（8字节对齐）"""
+        lease_bytes = (num_holders * num_slots * 4 + 7) // 8 * 8
+        return (cls.HEADER_WORDS + 2 * num_slots + num_holders) * 8 + lease_bytes
+
+    @classmethod
+    def create(cls, name, height, width, channels=3, dtype=np.uint8, num_slots=DEFAULT_RING_SLOTS, lock=None):
+        """创建环形缓冲区（lock为本缓冲区的跨进程锁，各进程按名称取自同一锁池）"""
+        dtype = np.dtype(dtype)
+        slot_bytes = height * width * channels * dtype.itemsize
+        header_bytes = cls._metadata_bytes(num_slots, cls.MAX_LEASE_HOLDERS)
+        # 同名残留块（上次异常退出）先清理
+        try:
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        shm = shared_memory.SharedMemory(name=name, create=True, size=header_bytes + slot_bytes * num_slots)
+        header = np.ndarray((cls.HEADER_WORDS,), dtype=np.int64, buffer=shm.buf)
+        header[cls._H_MAGIC] = cls.MAGIC
+        header[cls._H_SLOTS] = num_slots
+        header[cls._H_HEIGHT] = height
+        header[cls._H_WIDTH] = width
+        header[cls._H_CHANNELS] = channels
+        header[cls._H_DTYPE] = dtype.num
+        header[cls._H_WRITE_SEQ] = 0
+        header[cls._H_HOLDERS] = cls.MAX_LEASE_HOLDERS
+        header[cls._H_STATE] = cls.STATE_ACTIVE
+        del header
+        ring = cls(shm, owner=True, lock=lock)
+        ring.seqs[:] = -1
+        ring.timestamps[:] = 0
+        ring.holder_pids[:] = 0
+        ring.leases[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name, lock=None):
+        """按名称附加到已存在的环形缓冲区，不存在时返回None"""
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            return None
+        header = np.ndarray((cls.HEADER_WORDS,), dtype=np.int64, buffer=shm.buf)
+        valid = header[cls._H_MAGIC] == cls.MAGIC and header[cls._H_STATE] == cls.STATE_ACTIVE
+        del header
+        if not valid:
+            shm.close()
+            return None
+        return cls(shm, owner=False, lock=lock)
+
+    def _map_views(self):
+        """在共享内存上建立头部、元数据和各槽位的数组视图"""
+        buf = self.shm.buf
+        self.header = np.ndarray((self.HEADER_WORDS,), dtype=np.int64, buffer=buf)
+        self.num_slots = int(self.header[self._H_SLOTS])
+        self.shape = (int(self.header[self._H_HEIGHT]), int(self.header[self._H_WIDTH]), int(self.header[self._H_CHANNELS]))
+        self.dtype = self._dtype_from_num(int(self.header[self._H_DTYPE]))
+        num_holders = int(self.header[self._H_HOLDERS])
+        offset = self.HEADER_WORDS * 8
+        self.seqs = np.ndarray((self.num_slots,), dtype=np.int64, buffer=buf, offset=offset)
+        offset += self.num_slots * 8
+        self.timestamps = np.ndarray((self.num_slots,), dtype=np.float64, buffer=buf, offset=offset)
+        offset += self.num_slots * 8
+        self.holder_pids = np.ndarray((num_holders,), dtype=np.int64, buffer=buf, offset=offset)
+        offset += num_holders * 8
+        self.leases = np.ndarray((num_holders, self.num_slots), dtype=np.int32, buffer=buf, offset=offset)
+        offset = self._metadata_bytes(self.num_slots, num_holders)
+        self.frames = np.ndarray((self.num_slots,) + self.shape, dtype=self.dtype, buffer=buf, offset=offset)
+        self._next_slot = 0
+
+    @staticmethod
+    def _dtype_from_num(num):
+        for dtype in (np.uint8, np.uint16, np.float32, np.float16, np.float64, np.int16, np.int32):
+            if np.dtype(dtype).num == num:
+                return np.dtype(dtype)
+        raise ValueError(f"不支持的帧数据类型编号: {num}")
+
+    @property
+    def closed(self):
+        """所有者是否已关闭（例如分辨率变化后重建）"""
+        return self.header is None or self.header[self._H_STATE] != self.STATE_ACTIVE
+
+    def matches(self, shape, dtype):
+        """判断帧几何信息是否与缓冲区一致"""
+        return tuple(shape) == self.shape and np.dtype(dtype) == self.dtype
+
+    def _acquire_write_slot(self):
+        """
+        从下一槽位开始查找未被租用的槽位，找到时已标记为写入中(-1)（调用方持有锁）
+        与租用方的"计数+校验序列号"在同一把锁内互斥，两者不会同时成功
+        """
+        for i in range(self.num_slots):
+            slot = (self._next_slot + i) % self.num_slots
+            prev_seq = self.seqs[slot]
+            self.seqs[slot] = -1
+            if not self.leases[:, slot].any():
+                return slot
+            self.seqs[slot] = prev_seq
+        return None
+
+    def reap_dead_holders(self):
+        """清理已退出进程遗留的租约行，返回清理行数"""
+        with self._lock:
+            return self._reap_dead_holders()
+
+    def _reap_dead_holders(self):
+        """清理已退出进程遗留的租约行（调用方持有锁）"""
+        reaped = 0
+        for row, pid in enumerate(self.holder_pids):
+            if pid and not pid_alive(int(pid)):
+                self.leases[row, :] = 0
+                self.holder_pids[row] = 0
+                reaped += 1
+        return reaped
+
+    def write(self, frame, timestamp=None):
+        """写入下一个空闲槽位，返回(槽位索引, 序列号)；所有槽位均被租用时返回None"""
+        with self._lock:
+            slot = self._acquire_write_slot()
+            if slot is None and self._reap_dead_holders():
+                slot = self._acquire_write_slot()
+        if slot is None:
+            return None
+        # 槽位已标记为写入中，租用方校验序列号失败，拷贝可在锁外进行
+        seq = int(self.header[self._H_WRITE_SEQ]) + 1
+        np.copyto(self.frames[slot], frame, casting='no')
+        self.timestamps[slot] = timestamp if timestamp is not None else time.time()
+        # 在锁内发布序列号，租用方在锁内看到新序列号时帧数据已写完
+        with self._lock:
+            self.seqs[slot] = seq
+            self.header[self._H_WRITE_SEQ] = seq
+        self._next_slot = (slot + 1) % self.num_slots
+        return slot, seq
+
+    def is_valid(self, slot, seq):
+        """槽位内容是否仍是指定序列号的帧"""
+        return 0 <= slot < self.num_slots and self.seqs[slot] == seq
+
+    def read(self, slot, seq):
+        """读取帧副本；若帧已被覆盖或读取期间被改写，返回None"""
+        if not self.is_valid(slot, seq):
+            return None
+        frame = self.frames[slot].copy()
+        if self.seqs[slot] != seq:
+            return None
+        return frame
+
+    def _claim_holder_row(self):
+        """为本进程认领租约表中的一行（同一进程复用同一行，调用方持有锁）"""
+        if self._holder_row is not None:
+            return self._holder_row
+        pid = os.getpid()
+        rows = np.flatnonzero(self.holder_pids == pid)
+        if len(rows) == 0:
+            rows = np.flatnonzero(self.holder_pids == 0)
+            if len(rows) == 0:
+                self._reap_dead_holders()
+                rows = np.flatnonzero(self.holder_pids == 0)
+            if len(rows) == 0:
+                return None
+            self.holder_pids[rows[0]] = pid
+            self.leases[rows[0], :] = 0
+        self._holder_row = int(rows[0])
+        return self._holder_row
+
+    def lease(self, slot, seq):
+        """租用槽位，返回只读零拷贝视图；帧已被覆盖或租约表已满时返回None"""
+        if not 0 <= slot < self.num_slots:
+            return None
+        with self._lock:
+            row = self._claim_holder_row()
+            if row is None:
+                logger.warning("环形缓冲区租约表已满，无法租用帧")
+                return None
+            # 计数与校验序列号在锁内完成，与写者选取槽位互斥
+            if self.seqs[slot] != seq:
+                return None
+            self.leases[row, slot] += 1
+        view = self.frames[slot].view()
+        view.flags.writeable = False
+        return view
+
+    def unlease(self, slot):
+        """归还槽位租约"""
+        with self._lock:
+            if self._holder_row is None or self.leases is None:
+                return
+            if self.leases[self._holder_row, slot] > 0:
+                self.leases[self._holder_row, slot] -= 1
+
+    def close(self):
+        """关闭映射；所有者同时标记关闭并删除共享内存"""
+        if self.shm is None:
+            return
+        if self.owner:
+            try:
+                self.header[self._H_STATE] = self.STATE_CLOSED
+            except Exception:
+                pass
+        elif self._holder_row is not None:
+            try:
+                with self._lock:
+                    self.leases[self._holder_row, :] = 0
+                    self.holder_pids[self._holder_row] = 0
+            except Exception:
+                pass
+        # 释放所有视图后才能关闭底层缓冲区
+        self.header = self.seqs = self.timestamps = self.frames = None
+        self.holder_pids = self.leases = None
         try:
-            shm = shared_memory.SharedMemory(name=self.shm_name)
-            array = np.ndarray(self.shape, dtype=self.dtype, buffer=shm.buf)
-            return array, shm
+            if self.owner:
+                self.shm.unlink()
+            self.shm.close()
+        except FileNotFoundError:
+            pass
+        except BufferError:
+            # 仍有未归还的租约视图，映射随视图回收
+            logger.debug("环形缓冲区仍有未归还的帧视图，延迟释放映射")
         except Exception as e:
-            logger.error(f"获取共享内存数组失败: {e}")
-            return None, None
-
-    def increment_ref(self):
-        """增加引用计数"""
-        global _local_ref_counts, _local_ref_lock
-        with _local_ref_lock:
-            if self.frame_id not in _local_ref_counts:
-                _local_ref_counts[self.frame_id] = 1
-            else:
-                _local_ref_counts[self.frame_id] += 1
-            return _local_ref_counts[self.frame_id]
-
-    def decrement_ref(self):
-        """减少引用计数，返回当前计数值"""
-        global _local_ref_counts, _local_ref_lock
-        with _local_ref_lock:
-            if self.frame_id in _local_ref_counts:
-                _local_ref_counts[self.frame_id] = max(0, _local_ref_counts[self.frame_id] - 1)
-                return _local_ref_counts[self.frame_id]
-            return 0
+            logger.error(f"关闭环形缓冲区失败: {e}")
+        self.shm = None
+
+
+class FrameLease:
+    """
+    帧租约
+    - frame为环形缓冲区槽位上的只读零拷贝视图，在release()之前写者不会覆盖该槽位
+    - 需要修改帧（如绘制检测框）时调用copy()获取可写副本
+    - 支持with语句，退出时自动归还
+    """
+    __slots__ = ('frame_ref', 'frame', '_manager', '_ring', '_released')
+
+    def __init__(self, manager, ring, frame_ref, frame):
+        self._manager = manager
+        self._ring = ring
+        self.frame_ref = frame_ref
+        self.frame = frame
+        self._released = False
+
+    def copy(self):
+        """获取帧的可写副本"""
+        return self.frame.copy()
+
+    def release(self):
+        """归还租约，之后不得再访问frame"""
+        if self._released:
+            return
+        self._released = True
+        self.frame = None
+        self._manager._release_lease(self._ring, self.frame_ref)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class FrameSubscriber:
+    """
+    帧广播通道的消费者端
+    - 同一路流的所有消费者读取同一个环形缓冲区，互不争抢，每个消费者都能看到每一帧
+    - 读游标为本消费者已读取的最大序列号，只保存在消费者进程内，写者无需感知消费者
+    - 丢帧策略：latest跳到最新帧；oldest按序读取，被覆盖的帧计入丢帧数
+    - 缓冲区重建（分辨率变化、拉流进程重启）后游标自动归零
+    """
+
+    def __init__(self, memory_manager, stream_id, consumer_id, drop_policy=DROP_LATEST, poll_interval=0.002):
+        """
+        初始化帧消费者
+        Args:
+            memory_manager: 共享内存管理器
+            stream_id: 流ID
+            consumer_id: 消费者ID（如算法ID），仅用于日志和统计
+            drop_policy: 丢帧策略，DROP_LATEST或DROP_OLDEST
+            poll_interval: 无新帧时的轮询间隔(秒)
+        """
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"未知丢帧策略: {drop_policy}")
+        self.memory_manager = memory_manager
+        self.stream_id = stream_id
+        self.consumer_id = consumer_id
+        self.drop_policy = drop_policy
+        self.poll_interval = poll_interval
+        self.cursor = 0
+        self._ring = None
+        self._started = False
+
+        # 计数
+        self.delivered = 0
+        self.dropped = 0
+
+    def _sync_ring(self):
+        """获取当前环形缓冲区，缓冲区重建时重置游标"""
+        ring = self.memory_manager.get_ring(self.stream_id)
+        if ring is not self._ring:
+            self._ring = ring
+            self.cursor = 0
+            self._started = False
+        return ring
+
+    def poll(self):
+        """非阻塞读取下一帧引用，没有新帧时返回None"""
+        ring = self._sync_ring()
+        if ring is None:
+            return None
+        seqs = ring.seqs.copy()
+        candidates = np.flatnonzero(seqs > self.cursor)
+        if len(candidates) == 0:
+            return None
+        if self.drop_policy == DROP_LATEST:
+            slot = int(candidates[np.argmax(seqs[candidates])])
+        else:
+            slot = int(candidates[np.argmin(seqs[candidates])])
+        seq = int(seqs[slot])
+        timestamp = float(ring.timestamps[slot])
+        # 读取时间戳期间槽位被改写，下次轮询重新选择
+        if ring.seqs[slot] != seq:
+            return None
+        # 订阅前已写入的帧不计入丢帧
+        if self._started:
+            self.dropped += seq - self.cursor - 1
+        self._started = True
+        self.cursor = seq
+        self.delivered += 1
+        return FrameReference(self.stream_id, slot, seq, timestamp)
+
+    def get(self, timeout=1.0):
+        """读取下一帧引用，等待超时返回None"""
+        deadline = time.time() + (timeout or 0)
+        while True:
+            frame_ref = self.poll()
+            if frame_ref is not None or time.time() >= deadline:
+                return frame_ref
+            time.sleep(self.poll_interval)
+
+    def get_stats(self):
+        """获取交付/丢帧计数"""
+        return {
+            'consumer_id': self.consumer_id,
+            'drop_policy': self.drop_policy,
+            'cursor': self.cursor,
+            'delivered': self.delivered,
+            'dropped': self.dropped,
+        }
 
 
 class SharedMemoryManager:
-    """共享内存管理器"""
-    def __init__(self):
-        self.shared_blocks = {}
+    """共享内存管理器，按流维护环形缓冲区"""
+    def __init__(self, manager_id=RESOURCE_PREFIX, num_slots=DEFAULT_RING_SLOTS, lock_pool=None):
+        """
+        Args:
+            manager_id: 管理器ID
+            num_slots: 每路流环形缓冲区的槽位数
+            lock_pool: 跨进程锁池（主进程创建并传给各工作进程），每个环形缓冲区按名称使用其中一把锁；
+                为None时新建，只在本进程及其子进程内有效
+        """
+        self.manager_id = manager_id
+        self.num_slots = num_slots
+        self.lock_pool = lock_pool if lock_pool is not None else LockPool()
+        self.rings = {}  # stream_id: FrameRingBuffer
         self._lock = threading.RLock()  # 使用线程锁而非进程锁
 
-    def create_shared_frame(self, frame):
-        """创建共享内存帧"""
-        frame_id = str(uuid.uuid4())
-        timestamp = time.time()
-        
+    def create_ring(self, stream_id, height, width, channels=3, dtype=np.uint8, num_slots=None):
+        """为流分配环形缓冲区；已存在且几何一致时直接复用"""
+        shape = (height, width, channels)
+        with self._lock:
+            ring = self.rings.get(stream_id)
+            if ring is not None and ring.owner and not ring.closed and ring.matches(shape, dtype):
+                return ring
+            if ring is not None:
+                ring.close()
+            try:
+                name = get_ring_name(self.manager_id, stream_id)
+                ring = FrameRingBuffer.create(
+                    name, height, width, channels, dtype,
+                    num_slots or self.num_slots,
+                    lock=self.lock_pool.get(name)
+                )
+            except Exception as e:
+                logger.error(f"创建环形缓冲区失败: {stream_id}, 错误: {e}")
+                self.rings.pop(stream_id, None)
+                return None
+            self.rings[stream_id] = ring
+            logger.info(f"环形缓冲区已分配: {stream_id}, {width}x{height}x{channels}, 槽位数: {ring.num_slots}")
+            return ring
+
+    def get_ring(self, stream_id):
+        """获取流的环形缓冲区，本进程未持有时按名称附加"""
+        with self._lock:
+            ring = self.rings.get(stream_id)
+            if ring is not None and ring.closed:
+                # 所有者已重建缓冲区，重新附加
+                ring.close()
+                ring = None
+                del self.rings[stream_id]
+            if ring is None:
+                name = get_ring_name(self.manager_id, stream_id)
+                ring = FrameRingBuffer.attach(name, lock=self.lock_pool.get(name))
+                if ring is not None:
+                    self.rings[stream_id] = ring
+            return ring
+
+    def create_shared_frame(self, stream_id, frame):
+        """将帧写入流的环形缓冲区，返回帧引用"""
+        ring = self.rings.get(stream_id)
+        if ring is None or not ring.owner or not ring.matches(frame.shape, frame.dtype):
+            # 未预分配或分辨率变化时按帧尺寸（重新）分配
+            channels = frame.shape[2] if frame.ndim == 3 else 1
+            ring = self.create_ring(stream_id, frame.shape[0], frame.shape[1], channels, frame.dtype)
+            if ring is None:
+                return None
         try:
-            # 创建共享内存块
-            shm = shared_memory.SharedMemory(create=True, size=frame.nbytes)
-            
-            # 将帧数据复制到共享内存
-            shared_array = np.ndarray(frame.shape, dtype=frame.dtype, buffer=shm.buf)
-            shared_array[:] = frame[:]
-            
-            # 创建帧引用对象
-            frame_ref = FrameReference(
-                shm_name=shm.name,
-                shape=frame.shape,
-                dtype=frame.dtype,
-                frame_id=frame_id,
-                timestamp=timestamp
-            )
-            
-            # 记录共享内存块
-            with self._lock:
-                self.shared_blocks[frame_id] = {
-                    'shm': shm,
-                    'ref': frame_ref
-                }
-            
-            return frame_ref
-            
+            timestamp = time.time()
+            written = ring.write(frame.reshape(ring.shape), timestamp)
+            if written is None:
+                logger.debug(f"环形缓冲区槽位均被租用，丢弃帧: {stream_id}")
+                return None
+            slot, seq = written
+            return FrameReference(stream_id, slot, seq, timestamp)
         except Exception as e:
-            logger.error(f"创建共享内存帧失败: {e}")
+            logger.error(f"写入环形缓冲区失败: {e}")
             return None
 
     def get_frame(self, frame_ref):
-        """根据帧引用获取帧数据"""
-        array, shm = frame_ref.get_array()
-        if array is not None:
-            # 返回数组的副本，防止修改原数据
-            # 极致零拷贝，将 SharedMemoryManager.get_frame 的 return array.copy() 改为 return array
-            return array.copy()
-        return None
+        """根据帧引用获取帧数据；帧已被覆盖时返回None"""
+        ring = self.get_ring(frame_ref.stream_id)
+        if ring is None:
+            return None
+        return ring.read(frame_ref.slot, frame_ref.seq)
+
+    def lease_frame(self, frame_ref):
+        """租用帧，返回FrameLease（只读零拷贝视图）；帧已被覆盖时返回None"""
+        with self._lock:
+            ring = self.get_ring(frame_ref.stream_id)
+            if ring is None:
+                return None
+            view = ring.lease(frame_ref.slot, frame_ref.seq)
+        if view is None:
+            return None
+        return FrameLease(self, ring, frame_ref, view)
+
+    def _release_lease(self, ring, frame_ref):
+        """归还帧租约（归还到租用时的缓冲区，缓冲区已重建时忽略）"""
+        with self._lock:
+            if not ring.closed:
+                ring.unlease(frame_ref.slot)
 
     def release_frame(self, frame_ref):
-        """释放帧引用，当引用计数为0时释放共享内存"""
-        if not frame_ref:
-            return
-            
-        ref_count = frame_ref.decrement_ref()
-        
-        if ref_count <= 0:
-            # 最后一个引用被释放，清理共享内存
-            with self._lock:
-                if frame_ref.frame_id in self.shared_blocks:
-                    try:
-                        block = self.shared_blocks[frame_ref.frame_id]
-                        block['shm'].close()
-                        block['shm'].unlink()
-                        del self.shared_blocks[frame_ref.frame_id]
-                    except Exception as e:
-                        logger.error(f"释放共享内存块失败: {e}")
+        """释放帧引用（未租用的槽位由写者循环复用，无需显式回收）"""
+        return None
+
+    def close(self):
+        """关闭所有环形缓冲区，所有者同时删除共享内存"""
+        with self._lock:
+            for ring in self.rings.values():
+                ring.close()
+            self.rings.clear()
 
 
 class IPCManager:
     """进程间通信管理器"""
     
-    def __init__(self, max_queue_size=10, manager_id=None):
+    def __init__(self, max_queue_size=10, manager_id=None, ring_slots=DEFAULT_RING_SLOTS, lock_pool=None):
         """
         初始化进程间通信管理器
         
         参数:
             max_queue_size: 队列最大长度
             manager_id: 管理器ID，用于标识同一组管理器共享的资源
+            ring_slots: 每路流环形缓冲区的槽位数
+            lock_pool: 同一组管理器共用的跨进程锁池（LockPool，由主进程创建并传给工作进程）
         """
         self.manager_id = manager_id or RESOURCE_PREFIX
         self.max_queue_size = max_queue_size
         
-        # 使用普通队列替代Manager队列
-        self.frame_queues = {}  # 用于存放各个流的帧队列
+        # 帧广播通道：(流ID, 消费者ID) -> 本进程内的消费者读游标
+        self.frame_subscribers = {}
         self.result_queues = {}  # 用于存放各个算法的结果队列
+        self.dropped_results = {}  # 本进程未能放入结果队列的结果数 {stream_id_algo_id: 数量}
         
         # 告警队列
         self.alarm_queue = mp.Queue(maxsize=100)  
@@ -186,91 +596,106 @@ class IPCManager:
         self.output_status = {}
         
         # 共享内存管理
-        self.memory_manager = SharedMemoryManager()
+        self.lock_pool = lock_pool if lock_pool is not None else LockPool()
+        self.memory_manager = SharedMemoryManager(self.manager_id, ring_slots, self.lock_pool)
         
-        # 状态文件基础路径
-        self.status_dir = os.path.join(STATUS_BASE_DIR, self.manager_id)
-        os.makedirs(self.status_dir, exist_ok=True)
+        # 共享内存状态表（各进程按manager_id附加到同一张表）
+        self.status_table = StatusTable.open(self.manager_id, lock=self.lock_pool.get(get_table_name(self.manager_id)))
         
         logger.info(f"IPC管理器初始化完成，ID: {self.manager_id}")
-        
-    def _get_status_file_path(self, status_type, key):
-        """获取状态文件路径"""
-        return os.path.join(self.status_dir, f"{status_type}_{key}.json")
+    
+    def _local_status(self, status_type):
+        """获取本地状态字典"""
+        if status_type == 'algo':
+            return self.algo_status
+        elif status_type == 'stream':
+            return self.stream_status
+        elif status_type == 'output':
+            return self.output_status
+        raise ValueError(f"未知状态类型: {status_type}")
+    
+    def _merge_local_status(self, status_type, key, status_data):
+        """合并到本地状态字典（原地更新，保持调用方持有的引用有效）"""
+        local = self._local_status(status_type)
+        current = local.get(key)
+        if current is None:
+            local[key] = dict(status_data)
+        elif current is not status_data:
+            current.update(status_data)
     
     def set_shared_status(self, status_type, key, status_data):
         """设置共享状态"""
         try:
-            file_path = self._get_status_file_path(status_type, key)
-            with open(file_path, 'w') as f:
-                json.dump(status_data, f)
+            if not self.status_table.update(status_type, key, status_data):
+                return False
             
             # 同时更新本地状态字典
-            if status_type == 'algo':
-                self.algo_status[key] = status_data
-            elif status_type == 'stream':
-                self.stream_status[key] = status_data
-            elif status_type == 'output':
-                self.output_status[key] = status_data
-                
+            self._merge_local_status(status_type, key, status_data)
             return True
         except Exception as e:
             logger.error(f"设置共享状态失败: {status_type}, {key}, 错误: {e}")
             return False
     
+    def increment_shared_status(self, status_type, key, field, amount=1):
+        """共享状态计数器自增（调用方须是该状态行的唯一写者，如errors计数）"""
+        try:
+            return self.status_table.increment(status_type, key, field, amount)
+        except Exception as e:
+            logger.error(f"更新共享状态计数失败: {status_type}, {key}, {field}, 错误: {e}")
+            return None
+    
     def get_shared_status(self, status_type, key):
         """获取共享状态"""
         try:
-            file_path = self._get_status_file_path(status_type, key)
-            if os.path.exists(file_path):
-                with open(file_path, 'r') as f:
-                    status_data = json.load(f)
-                
+            status_data = self.status_table.get(status_type, key)
+            if status_data is not None:
                 # 更新本地状态字典
-                if status_type == 'algo':
-                    self.algo_status[key] = status_data
-                elif status_type == 'stream':
-                    self.stream_status[key] = status_data
-                elif status_type == 'output':
-                    self.output_status[key] = status_data
-                
-                return status_data
-            else:
-                return None
+                self._merge_local_status(status_type, key, status_data)
+            return status_data
         except Exception as e:
             logger.error(f"获取共享状态失败: {status_type}, {key}, 错误: {e}")
             return None
     
     def get_all_shared_status(self, status_type):
-        """获取所有共享状态"""
+        """获取所有共享状态（状态表快照）"""
         try:
-            result = {}
-            status_prefix = f"{status_type}_"
-            
-            for filename in os.listdir(self.status_dir):
-                if filename.startswith(status_prefix) and filename.endswith('.json'):
-                    key = filename[len(status_prefix):-5]  # 去掉前缀和.json后缀
-                    status_data = self.get_shared_status(status_type, key)
-                    if status_data:
-                        result[key] = status_data
-            
-            # 更新本地状态字典
-            if status_type == 'algo':
-                self.algo_status.update(result)
-            elif status_type == 'stream':
-                self.stream_status.update(result)
-            elif status_type == 'output':
-                self.output_status.update(result)
-                
-            return result
+            return self.status_table.snapshot(status_type)
         except Exception as e:
             logger.error(f"获取所有共享状态失败: {status_type}, 错误: {e}")
             return {}
     
-    def create_stream_queue(self, stream_id):
-        """创建视频流队列"""
-        if stream_id not in self.frame_queues:
-            self.frame_queues[stream_id] = mp.Queue(maxsize=self.max_queue_size)
+    def get_status_snapshot(self):
+        """获取全部流/算法/推流状态快照，供REST/WebSocket层使用"""
+        return {
+            'streams': self.get_all_shared_status('stream'),
+            'algorithms': self.get_all_shared_status('algo'),
+            'outputs': self.get_all_shared_status('output'),
+        }
+    
+    def remove_shared_status(self, status_type, key):
+        """删除共享状态"""
+        self._local_status(status_type).pop(key, None)
+        try:
+            return self.status_table.remove(status_type, key)
+        except Exception as e:
+            logger.error(f"删除共享状态失败: {status_type}, {key}, 错误: {e}")
+            return False
+    
+    def create_stream_queue(self, stream_id, width=None, height=None, channels=3, num_slots=None):
+        """
+        创建视频流帧通道
+        
+        参数:
+            stream_id: 流ID
+            width/height/channels: 帧尺寸，提供时一次性分配该流的环形缓冲区；
+                未提供时在首帧写入时按帧尺寸分配
+            num_slots: 环形缓冲区槽位数，默认使用管理器配置
+        返回:
+            流的环形缓冲区（尚未分配时为None）
+        """
+        if width and height:
+            self.memory_manager.create_ring(stream_id, height, width, channels, num_slots=num_slots)
+        if stream_id not in self.stream_status:
             status_data = {
                 'status': 'initialized',
                 'last_frame_time': 0,
@@ -280,7 +705,28 @@ class IPCManager:
             self.stream_status[stream_id] = status_data
             # 写入共享状态
             self.set_shared_status('stream', stream_id, status_data)
-        return self.frame_queues[stream_id]
+        return self.memory_manager.rings.get(stream_id)
+    
+    def subscribe_frames(self, stream_id, consumer_id, drop_policy=DROP_LATEST):
+        """
+        订阅流的帧广播通道（同一消费者重复订阅返回同一读游标）
+        
+        参数:
+            stream_id: 流ID
+            consumer_id: 消费者ID，同一路流的不同消费者各自看到每一帧
+            drop_policy: 丢帧策略，DROP_LATEST或DROP_OLDEST
+        """
+        key = (stream_id, consumer_id)
+        subscriber = self.frame_subscribers.get(key)
+        if subscriber is None:
+            subscriber = FrameSubscriber(self.memory_manager, stream_id, consumer_id, drop_policy)
+            self.frame_subscribers[key] = subscriber
+        return subscriber
+    
+    def unsubscribe_frames(self, stream_id, consumer_id):
+        """取消订阅，返回消费者的最终计数"""
+        subscriber = self.frame_subscribers.pop((stream_id, consumer_id), None)
+        return subscriber.get_stats() if subscriber else None
     
     def create_result_queue(self, stream_id, algo_id):
         """创建算法结果队列"""
@@ -298,59 +744,56 @@ class IPCManager:
             self.set_shared_status('algo', key, status_data)
         return self.result_queues[key]
     
+    def _release_item_frame(self, item):
+        """释放队列项携带的帧引用"""
+        if isinstance(item, dict):
+            item = item.get('frame_ref')
+        if item is not None:
+            self.memory_manager.release_frame(item)
+    
+    def _put_drop_oldest(self, q, item):
+        """
+        非阻塞放入队列，队列满时丢弃最旧的一项后重试
+        重试仍失败（mp.Queue的后台线程尚未把已放入的项写入管道时，get_nowait可能为空）则丢弃本项并释放其帧引用
+        Returns:
+            是否放入队列
+        """
+        try:
+            q.put_nowait(item)
+            return True
+        except MPQueueFull:
+            pass
+        try:
+            self._release_item_frame(q.get_nowait())
+        except MPQueueEmpty:
+            pass
+        try:
+            q.put_nowait(item)
+            return True
+        except MPQueueFull:
+            self._release_item_frame(item)
+            return False
+    
     def put_frame(self, stream_id, frame):
-        """将帧放入队列"""
-        if stream_id not in self.frame_queues:
+        """将帧写入流的环形缓冲区（广播给该流的所有消费者）"""
+        if stream_id not in self.stream_status:
             self.create_stream_queue(stream_id)
         
-        queue = self.frame_queues[stream_id]
-        
-        # 如果队列满，丢弃最旧的帧
-        if queue.full():
-            try:
-                old_frame_ref = queue.get_nowait()
-                self.memory_manager.release_frame(old_frame_ref)
-            except MPQueueEmpty:
-                pass
-        
-        # 创建共享内存帧
-        frame_ref = self.memory_manager.create_shared_frame(frame)
+        # 写入环形缓冲区下一槽位，消费者按各自读游标读取，无需逐个投递
+        frame_ref = self.memory_manager.create_shared_frame(stream_id, frame)
         if not frame_ref:
             return False
             
-        # 更新流状态
-        # 先获取最新的共享状态
-        status = self.get_shared_status('stream', stream_id) or self.stream_status.get(stream_id, {})
-        status['last_frame_time'] = time.time()
-        status['frame_count'] = status.get('frame_count', 0) + 1
-        self.stream_status[stream_id] = status
-        # 更新共享状态
-        self.set_shared_status('stream', stream_id, status)
-        
-        # 放入队列
-        try:
-            queue.put(frame_ref)
-            return True
-        except Exception as e:
-            logger.error(f"放入帧失败: {e}")
-            return False
+        # 更新流状态（拉流进程是该行唯一写者，直接原地计数）
+        self.status_table.tick('stream', stream_id, 'frame_count', 'last_frame_time', frame_ref.timestamp)
+        return True
     
-    def get_frame(self, stream_id, timeout=1.0):
-        """从队列获取帧引用"""
-        if stream_id not in self.frame_queues:
-            self.create_stream_queue(stream_id)
-            return None
-            
-        queue = self.frame_queues[stream_id]
-        
+    def get_frame(self, stream_id, timeout=1.0, consumer_id='default', drop_policy=DROP_LATEST):
+        """按消费者读游标获取下一帧引用，不同消费者互不争抢"""
         try:
-            frame_ref = queue.get(timeout=timeout)
-            # 增加引用计数
-            frame_ref.increment_ref()
-            return frame_ref
-        except (MPQueueEmpty, Exception) as e:
-            if not isinstance(e, MPQueueEmpty):
-                logger.error(f"获取帧失败: {e}")
+            return self.subscribe_frames(stream_id, consumer_id, drop_policy).get(timeout)
+        except Exception as e:
+            logger.error(f"获取帧失败: {e}")
             return None
     
     def put_result(self, stream_id, algo_id, frame_ref, result_data):
@@ -359,21 +802,9 @@ class IPCManager:
         if key not in self.result_queues:
             self.create_result_queue(stream_id, algo_id)
             
-        queue = self.result_queues[key]
-        
-        # 如果队列满，丢弃最旧的结果
-        if queue.full():
-            try:
-                old_result = queue.get_nowait()
-                if 'frame_ref' in old_result:
-                    self.memory_manager.release_frame(old_result['frame_ref'])
-            except MPQueueEmpty:
-                pass
+        q = self.result_queues[key]
         
         try:
-            # 增加帧引用计数
-            frame_ref.increment_ref()
-            
             # 创建结果对象
             result = {
                 'frame_ref': frame_ref,
@@ -381,17 +812,13 @@ class IPCManager:
                 'timestamp': time.time()
             }
             
-            # 更新算法状态
-            # 先获取最新的共享状态
-            status = self.get_shared_status('algo', key) or self.algo_status.get(key, {})
-            status['last_process_time'] = time.time()
-            status['processed_count'] = status.get('processed_count', 0) + 1
-            self.algo_status[key] = status
-            # 更新共享状态
-            self.set_shared_status('algo', key, status)
+            # 放入队列（队列满时丢弃最旧的结果）
+            if not self._put_drop_oldest(q, result):
+                self.dropped_results[key] = self.dropped_results.get(key, 0) + 1
+                return False
             
-            # 放入队列
-            queue.put(result)
+            # 更新算法状态（算法进程是该行唯一写者，直接原地计数）
+            self.status_table.tick('algo', key, 'processed_count', 'last_process_time', result['timestamp'])
             return True
         except Exception as e:
             logger.error(f"放入结果失败: {e}")
@@ -404,10 +831,10 @@ class IPCManager:
             self.create_result_queue(stream_id, algo_id)
             return None
             
-        queue = self.result_queues[key]
+        q = self.result_queues[key]
         
         try:
-            return queue.get(timeout=timeout)
+            return q.get(timeout=timeout)
         except (MPQueueEmpty, Exception) as e:
             if not isinstance(e, MPQueueEmpty):
                 logger.error(f"获取结果失败: {e}")
@@ -416,7 +843,7 @@ class IPCManager:
     def put_alarm(self, alarm_data):
         # 支持双份图片推送
         self.alarm_queue.put(alarm_data)
-        logger.info(f"推送告警数据: {alarm_data['frame_id']} 包含原图和画框图")
+        logger.info(f"推送告警数据: {alarm_data.get('alarm_id')} 包含原图和画框图")
     
     def get_alarm(self, timeout=1.0):
         """获取告警信息"""
@@ -430,40 +857,23 @@ class IPCManager:
     def cleanup(self):
         """清理资源"""
         # 清理所有队列
-        for stream_id in list(self.frame_queues.keys()):
-            queue = self.frame_queues[stream_id]
-            while True:
-                try:
-                    frame_ref = queue.get_nowait()
-                    self.memory_manager.release_frame(frame_ref)
-                except:
-                    break
+        self.frame_subscribers.clear()
         
         for key in list(self.result_queues.keys()):
-            queue = self.result_queues[key]
+            q = self.result_queues[key]
             while True:
                 try:
-                    result = queue.get_nowait()
+                    result = q.get_nowait()
                     if 'frame_ref' in result:
                         self.memory_manager.release_frame(result['frame_ref'])
                 except MPQueueEmpty:
                     break
         
-        # 清理状态文件
-        try:
-            if os.path.exists(self.status_dir):
-                for filename in os.listdir(self.status_dir):
-                    file_path = os.path.join(self.status_dir, filename)
-                    try:
-                        os.remove(file_path)
-                    except:
-                        pass
-                try:
-                    os.rmdir(self.status_dir)
-                except:
-                    pass
-        except Exception as e:
-            logger.error(f"清理状态文件失败: {e}")
+        # 关闭环形缓冲区
+        self.memory_manager.close()
+        
+        # 关闭共享状态表
+        self.status_table.close()
     
     # 重写get_status方法，确保获取最新的共享状态
     def get_algo_status(self):
@@ -2,6 +2,7 @@
 模型管理模块
 - 模型注册/加载/卸载接口风格统一
 - 支持多算法、多实例池，自动轮询分配
+- 托管模式：模型只在推理执行器进程中加载，实例池为执行器池，按队列深度分发
 - 负载均衡策略清晰
 - 只保留分析器主线相关内容
 - 注释和结构一目了然
@@ -16,6 +17,8 @@ import os
 import sys
 import threading
 
+from .inference_server import ExecutorPool
+
 logger = logging.getLogger(__name__)
 
 # 全局字典用于存储模型实例，避免跨进程传递
@@ -32,7 +35,7 @@ class ModelRegistry:
         self.model_locks = {}
         self.model_usage = self.manager.dict()
         # 新增：实例池
-        self.instance_pools = {}  # model_id: [实例, ...]
+        self.instance_pools = {}  # model_id: [实例, ...]，托管模式下为ExecutorPool
         self.instance_index = {}  # model_id: 轮询索引
         
     def register_model(self, algo_package, model_name, model_config):
@@ -141,6 +144,41 @@ class ModelRegistry:
                 
                 return False
     
+    def host_model(self, model_id, num_executors=1, queue_size=128):
+        """
+        托管模式加载模型：本进程不加载权重，只创建推理执行器池，
+        由推理执行器进程各加载一份权重，算法进程通过IPC提交推理请求
+        """
+        if model_id not in self.models:
+            logger.error(f"模型未注册: {model_id}")
+            return None
+            
+        with self.model_locks[model_id]:
+            pool = self.instance_pools.get(model_id)
+            if isinstance(pool, ExecutorPool):
+                return pool
+            
+            pool = ExecutorPool(num_executors, queue_size)
+            self.instance_pools[model_id] = pool
+            
+            model_info = self.models[model_id]
+            self.models[model_id] = {
+                'package': model_info['package'],
+                'name': model_info['name'],
+                'config': model_info['config'],
+                'status': 'hosted',
+                'error': None,
+                'instance_count': len(pool)
+            }
+            
+            logger.info(f"模型已托管: {model_id}，执行器数: {len(pool)}")
+            return pool
+    
+    def get_executor_pool(self, model_id):
+        """获取托管模型的推理执行器池，未托管时返回None"""
+        pool = self.instance_pools.get(model_id)
+        return pool if isinstance(pool, ExecutorPool) else None
+    
     def get_model_instance(self, model_id):
         """获取模型实例（负载均衡）"""
         if model_id not in self.models:
@@ -183,6 +221,19 @@ class ModelRegistry:
         with self.model_locks[model_id]:
             model_info = self.models[model_id]
             
+            if model_info['status'] == 'hosted':
+                # 执行器进程由进程管理器停止，这里只移除执行器池
+                self.instance_pools[model_id] = []
+                self.models[model_id] = {
+                    'package': model_info['package'],
+                    'name': model_info['name'],
+                    'config': model_info['config'],
+                    'status': 'unloaded',
+                    'error': None
+                }
+                logger.info(f"托管模型已卸载: {model_id}")
+                return True
+            
             if model_info['status'] == 'loaded':
                 try:
                     global _model_instances, _postproc_instances, _model_locks
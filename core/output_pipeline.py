@@ -0,0 +1,575 @@
+"""
+推流输出流水线模块
+- 写出线程：独占FFmpeg进程，主循环只把帧放入有界队列，网络背压不会阻塞标注/取帧循环
+- 有界队列满时丢弃最旧的帧，丢弃和写出完成时回调归还帧（如环形缓冲区租约）
+- 按缓冲区协议把numpy帧直接写入管道，不再tobytes()复制整帧
+- FFmpeg退出或管道断开时在写出线程内按指数退避重启，连续失败超过上限后标记failed
+- 持续读取FFmpeg的stderr，避免管道写满阻塞FFmpeg，退出时输出最后几行便于排查
+- 输出复用器：每路标注流只编码一次（H.264封装为MPEG-TS），编码数据分发到任意多个输出端
+  （推流地址、分段录像文件、内存预览），输出端可在运行时挂载/卸载，无需重启编码器
+- 编码数据按188字节TS包对齐后分发，输出端队列满时丢弃整包而不会截断TS包
+"""
+
+import logging
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 写出队列默认长度（帧）
+DEFAULT_WRITER_QUEUE_SIZE = 3
+
+# 推流进程同时持有的零拷贝帧租约上限，超出时复制帧后立即归还租约（租约会占住环形缓冲区槽位）
+DEFAULT_MAX_LEASES = 1
+
+# FFmpeg连续失败重启次数上限
+DEFAULT_MAX_RESTARTS = 3
+
+# 重启退避上限(秒)
+MAX_RESTART_DELAY = 30.0
+
+# FFmpeg持续运行超过该时长(秒)后才清零连续失败计数（写入管道成功不代表FFmpeg已正常工作）
+STABLE_RUN_SECONDS = 5.0
+
+# 保留的FFmpeg stderr行数
+STDERR_TAIL_LINES = 20
+
+# 编码器输出读取块大小（MPEG-TS包长188字节的整数倍）
+TS_PACKET_SIZE = 188
+OUTPUT_CHUNK_SIZE = TS_PACKET_SIZE * 64
+
+# 输出端待写出数据块队列长度
+DEFAULT_SINK_QUEUE_SIZE = 256
+
+# 内存预览保留的数据块数
+DEFAULT_PREVIEW_CHUNKS = 512
+
+# 推流协议 → FFmpeg封装格式
+URL_FORMATS = {
+    'rtmp': 'flv',
+    'rtmps': 'flv',
+    'rtsp': 'rtsp',
+    'srt': 'mpegts',
+    'udp': 'mpegts',
+}
+
+
+def write_frame(pipe, frame) -> int:
+    """
+    按缓冲区协议把帧（或编码数据块）写入管道（不复制整帧），返回写入字节数
+    非连续数组先转为连续数组；管道部分写入时继续写剩余部分
+    """
+    if isinstance(frame, np.ndarray) and not frame.flags.c_contiguous:
+        frame = np.ascontiguousarray(frame)
+    view = memoryview(frame).cast('B')
+    total = len(view)
+    while view:
+        written = pipe.write(view)
+        if written is None:
+            # 非阻塞管道暂不可写
+            time.sleep(0.001)
+            continue
+        view = view[written:]
+    pipe.flush()
+    return total
+
+
+class FFmpegWriter(threading.Thread):
+    """FFmpeg写出线程：有界队列 + 丢弃最旧帧 + 后台重启"""
+
+    def __init__(self, ffmpeg_cmd: List[str], name: str = "FFmpegWriter",
+                 queue_size: int = DEFAULT_WRITER_QUEUE_SIZE, max_restarts: int = DEFAULT_MAX_RESTARTS,
+                 restart_delay: float = 1.0, on_write: Optional[Callable[[], None]] = None,
+                 on_output: Optional[Callable[[bytes], None]] = None):
+        """
+        初始化写出线程
+        Args:
+            ffmpeg_cmd: FFmpeg命令（从stdin读取rawvideo或编码数据）
+            name: 线程名称
+            queue_size: 待写出帧队列长度，满时丢弃最旧的帧
+            max_restarts: FFmpeg连续失败的重启次数上限，超过后线程退出并标记failed
+            restart_delay: 首次重启等待时间(秒)，之后按指数退避
+            on_write: 每写出一帧后的回调（如更新推流状态）
+            on_output: FFmpeg stdout数据块回调（编码器输出到pipe:1时使用），在读取线程中调用，不得阻塞
+        """
+        super().__init__(name=name, daemon=True)
+        self.ffmpeg_cmd = ffmpeg_cmd
+        self.queue_size = max(1, int(queue_size))
+        self.max_restarts = max_restarts
+        self.restart_delay = restart_delay
+        self.on_write = on_write
+        self.on_output = on_output
+        self.process = None
+        self.failed = False
+        self._launched_at = 0.0
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+        self._stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+
+        # 计数
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.restarts = 0
+        self.bytes_written = 0
+
+    def submit(self, frame: np.ndarray, release: Optional[Callable[[], None]] = None) -> bool:
+        """
+        提交一帧（从不阻塞）
+        Args:
+            frame: 帧数据，写出或丢弃前调用方不得修改
+            release: 帧写出或被丢弃后的回调（如归还租约）
+        Returns:
+            是否已入队；线程已失败或已停止时返回False并立即回调release
+        """
+        if self.failed or self._stop_event.is_set():
+            if release:
+                release()
+            return False
+        dropped = None
+        with self._cond:
+            if len(self._queue) >= self.queue_size:
+                dropped = self._queue.popleft()
+                self.dropped += 1
+            self._queue.append((frame, release))
+            self.submitted += 1
+            self._cond.notify()
+        if dropped is not None and dropped[1]:
+            dropped[1]()
+        return True
+
+    def _take(self, timeout: float):
+        with self._cond:
+            if not self._queue:
+                self._cond.wait(timeout)
+            return self._queue.popleft() if self._queue else None
+
+    def _drain_queue(self):
+        """丢弃并归还队列中所有帧"""
+        with self._cond:
+            items = list(self._queue)
+            self._queue.clear()
+        for _, release in items:
+            if release:
+                release()
+        return len(items)
+
+    def _read_stderr(self, process):
+        """持续读取stderr，只保留最后几行"""
+        try:
+            for line in iter(process.stderr.readline, b''):
+                self._stderr_tail.append(line.decode('utf-8', errors='ignore').rstrip())
+        except Exception:
+            pass
+
+    def _read_stdout(self, process):
+        """
+        读取编码输出并回调（每个FFmpeg进程一个读取线程，进程退出时结束）
+        管道读取可能返回不足一个TS包的数据，回调前按188字节对齐，余下的部分留到下次读取，
+        输出端丢弃数据块时不会把TS包截断
+        """
+        pending = b''
+        try:
+            while True:
+                chunk = process.stdout.read(OUTPUT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if pending:
+                    chunk = pending + chunk
+                aligned = len(chunk) - len(chunk) % TS_PACKET_SIZE
+                pending = chunk[aligned:]
+                if aligned:
+                    self.on_output(chunk[:aligned] if pending else chunk)
+        except Exception as e:
+            logger.debug(f"{self.name} 读取FFmpeg输出结束: {e}")
+        if pending:
+            logger.debug(f"{self.name} 丢弃末尾不完整的TS包: {len(pending)}字节")
+
+    def _launch(self) -> bool:
+        """启动FFmpeg进程"""
+        try:
+            self.process = subprocess.Popen(
+                self.ffmpeg_cmd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE if self.on_output else subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                bufsize=0
+            )
+        except Exception as e:
+            logger.error(f"{self.name} 启动FFmpeg失败: {e}")
+            self.process = None
+            return False
+        self._launched_at = time.monotonic()
+        if self.process.stderr is not None:
+            threading.Thread(target=self._read_stderr, args=(self.process,),
+                             name=f"{self.name}-stderr", daemon=True).start()
+        if self.on_output and getattr(self.process, 'stdout', None) is not None:
+            threading.Thread(target=self._read_stdout, args=(self.process,),
+                             name=f"{self.name}-stdout", daemon=True).start()
+        logger.info(f"{self.name} FFmpeg已启动: {' '.join(self.ffmpeg_cmd)}")
+        return True
+
+    def _terminate(self, timeout: float = 3.0):
+        """关闭FFmpeg：先关闭stdin让其正常收尾，超时后终止"""
+        process, self.process = self.process, None
+        if process is None:
+            return
+        try:
+            if process.stdin:
+                process.stdin.close()
+        except Exception:
+            pass
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.terminate()
+            try:
+                process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        except Exception as e:
+            logger.error(f"{self.name} 关闭FFmpeg进程异常: {e}")
+
+    def _restart(self, consecutive_failures: int) -> bool:
+        """
+        按指数退避重启FFmpeg，退避期间新帧继续入队（队列满时丢弃最旧帧）
+        Returns:
+            是否继续运行；超过重启上限时标记failed并返回False
+        """
+        if self.process is not None:
+            returncode = self.process.poll()
+            logger.error(f"{self.name} FFmpeg异常退出，返回码: {returncode}")
+            if self._stderr_tail:
+                logger.error(f"{self.name} FFmpeg错误输出:\n" + "\n".join(self._stderr_tail))
+            self._terminate(timeout=1.0)
+        if consecutive_failures > self.max_restarts:
+            logger.error(f"{self.name} FFmpeg错误次数过多，停止尝试")
+            self.failed = True
+            return False
+        delay = min(self.restart_delay * (2 ** (consecutive_failures - 1)), MAX_RESTART_DELAY)
+        logger.info(f"{self.name} {delay:.1f}s后重新启动FFmpeg进程")
+        if self._stop_event.wait(delay):
+            return False
+        self.restarts += 1
+        self._stderr_tail.clear()
+        # 启动失败时process为None，下一轮循环继续计数重试
+        self._launch()
+        return True
+
+    def run(self) -> None:
+        consecutive_failures = 0
+        try:
+            self._launch()
+            while not self._stop_event.is_set():
+                if self.process is None or self.process.poll() is not None:
+                    consecutive_failures += 1
+                    if not self._restart(consecutive_failures):
+                        break
+                    continue
+
+                item = self._take(timeout=0.5)
+                if item is None:
+                    continue
+                frame, release = item
+                try:
+                    self.bytes_written += write_frame(self.process.stdin, frame)
+                    self.written += 1
+                    if consecutive_failures and time.monotonic() - self._launched_at >= STABLE_RUN_SECONDS:
+                        consecutive_failures = 0
+                except (OSError, ValueError) as e:
+                    # 管道断开(BrokenPipeError)或FFmpeg已退出
+                    logger.error(f"{self.name} 写入FFmpeg失败: {e}")
+                    consecutive_failures += 1
+                    if not self._restart(consecutive_failures):
+                        break
+                    continue
+                finally:
+                    if release:
+                        release()
+                if self.on_write:
+                    self.on_write()
+        except Exception as e:
+            logger.error(f"{self.name} 写出线程异常: {e}", exc_info=True)
+            self.failed = True
+        finally:
+            self._drain_queue()
+            self._terminate()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """停止写出线程：丢弃未写出的帧，关闭FFmpeg"""
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
+        self._drain_queue()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取写出/丢弃/重启计数"""
+        with self._cond:
+            queued = len(self._queue)
+        return {
+            'submitted': self.submitted,
+            'written': self.written,
+            'dropped': self.dropped,
+            'queued': queued,
+            'restarts': self.restarts,
+            'bytes_written': self.bytes_written,
+            'failed': self.failed,
+        }
+
+
+def build_encoder_cmd(width: int, height: int, fps: float, codec_args: Optional[List[str]] = None) -> List[str]:
+    """
+    构建编码器命令：stdin读取bgr24原始帧，编码为H.264后以MPEG-TS输出到stdout
+    Args:
+        codec_args: 编码参数（-c:v及其选项），默认libx264低延迟配置
+    """
+    if codec_args is None:
+        codec_args = [
+            '-c:v', 'libx264',
+            '-preset', 'ultrafast',
+            '-tune', 'zerolatency',
+            '-pix_fmt', 'yuv420p',
+            '-bufsize', '5000k',
+            '-maxrate', '10000k',
+            '-g', '15',
+            '-x264-params', 'keyint=15:min-keyint=15:scenecut=0:repeat-headers=1',
+        ]
+    return [
+        'ffmpeg', '-y', '-an',
+        '-f', 'rawvideo', '-vcodec', 'rawvideo', '-pix_fmt', 'bgr24',
+        '-s', f'{width}x{height}', '-r', str(fps), '-i', '-',
+        *codec_args,
+        # 每个关键帧前重复SPS/PPS，运行时挂载的输出端可从下一个关键帧开始解码
+        '-bsf:v', 'dump_extra',
+        '-f', 'mpegts', '-muxdelay', '0', 'pipe:1',
+    ]
+
+
+def build_remux_cmd(url: str, output_format: Optional[str] = None) -> List[str]:
+    """
+    构建转封装命令：stdin读取MPEG-TS，不重新编码(-c copy)写到推流地址或文件
+    Args:
+        url: 推流地址或文件路径
+        output_format: 封装格式，默认按协议推断（rtmp→flv，rtsp→rtsp），文件按扩展名推断
+    """
+    if output_format is None and '://' in url:
+        output_format = URL_FORMATS.get(url.split('://', 1)[0].lower())
+    cmd = ['ffmpeg', '-y', '-loglevel', 'error', '-f', 'mpegts', '-i', '-', '-c', 'copy']
+    if output_format:
+        cmd += ['-f', output_format]
+    if output_format == 'rtsp':
+        cmd += ['-rtsp_transport', 'tcp']
+    return cmd + [url]
+
+
+def build_segment_cmd(pattern: str, segment_seconds: float) -> List[str]:
+    """
+    构建分段录像命令：stdin读取MPEG-TS，按关键帧切分为固定时长的文件
+    Args:
+        pattern: 文件名模板（strftime格式，如 output/recordings/cam1/%Y%m%d_%H%M%S.ts）
+        segment_seconds: 每段时长(秒)
+    """
+    return [
+        'ffmpeg', '-y', '-loglevel', 'error', '-f', 'mpegts', '-i', '-', '-c', 'copy',
+        '-f', 'segment', '-segment_time', str(segment_seconds),
+        '-reset_timestamps', '1', '-strftime', '1', pattern,
+    ]
+
+
+class RemuxSink:
+    """转封装输出端：独立FFmpeg进程把编码数据写到推流地址或文件，队列满时丢弃最旧的数据块"""
+
+    def __init__(self, cmd: List[str], name: str = "RemuxSink", queue_size: int = DEFAULT_SINK_QUEUE_SIZE,
+                 max_restarts: int = DEFAULT_MAX_RESTARTS):
+        self.cmd = cmd
+        self.writer = FFmpegWriter(cmd, name=name, queue_size=queue_size, max_restarts=max_restarts)
+
+    def start(self) -> None:
+        self.writer.start()
+
+    def write(self, chunk: bytes) -> None:
+        self.writer.submit(chunk)
+
+    def close(self) -> None:
+        self.writer.stop()
+
+    @property
+    def alive(self) -> bool:
+        return self.writer.is_alive() and not self.writer.failed
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self.writer.get_stats()
+        stats['type'] = 'remux'
+        return stats
+
+
+class PreviewSink:
+    """
+    内存预览输出端：保留最近的编码数据块，读者按游标增量读取（如HTTP分块推送MPEG-TS）
+    读者落后超过保留范围时从最早保留的数据块继续，跳过的块数计入skipped
+    """
+
+    def __init__(self, max_chunks: int = DEFAULT_PREVIEW_CHUNKS):
+        self._chunks = deque(maxlen=max(1, int(max_chunks)))
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._closed = False
+        self.bytes_received = 0
+        self.skipped = 0
+
+    def start(self) -> None:
+        pass
+
+    def write(self, chunk: bytes) -> None:
+        with self._cond:
+            self._seq += 1
+            self._chunks.append((self._seq, chunk))
+            self.bytes_received += len(chunk)
+            self._cond.notify_all()
+
+    def read(self, cursor: int = 0, timeout: float = 1.0):
+        """
+        读取游标之后的数据
+        Args:
+            cursor: 上次读取返回的游标，0表示从最早保留的数据开始
+            timeout: 无新数据时的等待时间(秒)
+        Returns:
+            (新游标, 数据)；超时或已关闭时数据为b''
+        """
+        with self._cond:
+            if self._seq <= cursor and not self._closed:
+                self._cond.wait(timeout)
+            chunks = [(seq, chunk) for seq, chunk in self._chunks if seq > cursor]
+            if not chunks:
+                return cursor, b''
+            if cursor and chunks[0][0] > cursor + 1:
+                self.skipped += chunks[0][0] - cursor - 1
+            return chunks[-1][0], b''.join(chunk for _, chunk in chunks)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def alive(self) -> bool:
+        return not self._closed
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            buffered = sum(len(chunk) for _, chunk in self._chunks)
+        return {
+            'type': 'preview',
+            'chunks': self._seq,
+            'bytes_received': self.bytes_received,
+            'buffered_bytes': buffered,
+            'skipped': self.skipped,
+        }
+
+
+class OutputMultiplexer:
+    """
+    输出复用器：一个编码器 + 多个输出端
+    - 标注帧只编码一次，编码数据在编码器输出读取线程中分发给所有输出端
+    - 输出端写入从不阻塞（各自有界队列），慢输出端只丢自己的数据，不影响编码器和其他输出端
+    - 输出端表写时复制，挂载/卸载不需要重启编码器，分发时无需加锁
+    """
+
+    def __init__(self, encoder_cmd: List[str], name: str = "OutputMultiplexer",
+                 queue_size: int = DEFAULT_WRITER_QUEUE_SIZE, max_restarts: int = DEFAULT_MAX_RESTARTS,
+                 on_write: Optional[Callable[[], None]] = None):
+        """
+        初始化输出复用器
+        Args:
+            encoder_cmd: 编码器命令（见build_encoder_cmd）
+            name: 名称（用于线程名和日志）
+            queue_size: 待编码帧队列长度，满时丢弃最旧的帧
+            max_restarts: 编码器连续失败的重启次数上限
+            on_write: 每编码一帧后的回调
+        """
+        self.name = name
+        self._sinks: Dict[str, Any] = {}
+        self._sinks_lock = threading.Lock()
+        self.encoded_bytes = 0
+        self.encoded_chunks = 0
+        self.encoder = FFmpegWriter(encoder_cmd, name=f"{name}-encoder", queue_size=queue_size,
+                                    max_restarts=max_restarts, on_write=on_write, on_output=self._fanout)
+
+    def start(self) -> None:
+        self.encoder.start()
+
+    def submit(self, frame: np.ndarray, release: Optional[Callable[[], None]] = None) -> bool:
+        """提交一帧待编码（从不阻塞），见FFmpegWriter.submit"""
+        return self.encoder.submit(frame, release)
+
+    def attach(self, sink_id: str, sink) -> None:
+        """挂载输出端（同ID的旧输出端会被卸载），从编码器的下一个数据块开始接收"""
+        sink.start()
+        with self._sinks_lock:
+            old = self._sinks.get(sink_id)
+            sinks = dict(self._sinks)
+            sinks[sink_id] = sink
+            self._sinks = sinks
+        if old is not None:
+            old.close()
+        logger.info(f"{self.name} 挂载输出端: {sink_id}")
+
+    def detach(self, sink_id: str):
+        """卸载并关闭输出端，返回该输出端；不存在时返回None"""
+        with self._sinks_lock:
+            if sink_id not in self._sinks:
+                return None
+            sinks = dict(self._sinks)
+            sink = sinks.pop(sink_id)
+            self._sinks = sinks
+        sink.close()
+        logger.info(f"{self.name} 卸载输出端: {sink_id}")
+        return sink
+
+    def get_sink(self, sink_id: str):
+        return self._sinks.get(sink_id)
+
+    def sink_ids(self) -> List[str]:
+        return list(self._sinks)
+
+    def _fanout(self, chunk: bytes) -> None:
+        self.encoded_chunks += 1
+        self.encoded_bytes += len(chunk)
+        for sink in self._sinks.values():
+            try:
+                sink.write(chunk)
+            except Exception as e:
+                logger.error(f"{self.name} 分发编码数据失败: {e}")
+
+    @property
+    def failed(self) -> bool:
+        return self.encoder.failed
+
+    @property
+    def dropped(self) -> int:
+        return self.encoder.dropped
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """停止编码器并关闭所有输出端"""
+        self.encoder.stop(timeout)
+        with self._sinks_lock:
+            sinks, self._sinks = self._sinks, {}
+        for sink in sinks.values():
+            sink.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取编码与各输出端统计"""
+        stats = self.encoder.get_stats()
+        stats['encoded_chunks'] = self.encoded_chunks
+        stats['encoded_bytes'] = self.encoded_bytes
+        stats['sinks'] = {sink_id: sink.get_stats() for sink_id, sink in self._sinks.items()}
+        return stats
@@ -0,0 +1,113 @@
+"""
+跨进程锁池模块
+- 主进程预先创建一组锁（锁只能随进程启动参数继承），各资源按名称散列到其中一把，不同流之间基本不争用
+- 持锁进程PID记录在共享数组中；等待超时后检查持有者，持有者已退出（被terminate/kill）时代为释放
+- 锁不可重入，临界区内不得再次获取同一把锁
+"""
+
+import hashlib
+import logging
+import multiprocessing as mp
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# 锁池大小（不同资源散列到同一把锁时才会互相等待）
+DEFAULT_LOCK_STRIPES = 32
+
+# 单次等待超时(秒)，超时后检查持有者是否存活
+DEFAULT_ACQUIRE_TIMEOUT = 0.5
+
+
+def pid_alive(pid):
+    """判断进程是否仍存活"""
+    try:
+        import psutil
+        return psutil.pid_exists(pid)
+    except ImportError:
+        pass
+    if os.name == 'posix':
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+    return True
+
+
+class ProcessLock:
+    """锁池中的一把锁，支持with语句"""
+
+    __slots__ = ('_pool', '_index')
+
+    def __init__(self, pool, index):
+        self._pool = pool
+        self._index = index
+
+    def acquire(self):
+        self._pool._acquire(self._index)
+        return True
+
+    def release(self):
+        self._pool._release(self._index)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class LockPool:
+    """
+    跨进程锁池（由主进程创建，随启动参数传给各工作进程）
+    - get(name)按资源名称返回固定的一把锁，各进程对同一名称得到同一把锁
+    """
+
+    def __init__(self, stripes=DEFAULT_LOCK_STRIPES, timeout=DEFAULT_ACQUIRE_TIMEOUT):
+        self.stripes = stripes
+        self.timeout = timeout
+        self._locks = [mp.Lock() for _ in range(stripes)]
+        self._owners = mp.RawArray('q', stripes)  # 各锁持有者PID，0表示未持有
+        self._recover_lock = mp.Lock()  # 代为释放时互斥，避免多个等待者重复释放
+
+    def get(self, name):
+        """获取资源名称对应的锁"""
+        digest = hashlib.md5(str(name).encode('utf-8')).digest()
+        return ProcessLock(self, int.from_bytes(digest[:4], 'little') % self.stripes)
+
+    def _acquire(self, index):
+        lock = self._locks[index]
+        start = time.monotonic()
+        while not lock.acquire(timeout=self.timeout):
+            owner = self._owners[index]
+            if owner and not pid_alive(owner):
+                self._recover(index, owner)
+            elif time.monotonic() - start >= self.timeout * 10:
+                logger.warning(f"等待跨进程锁超时: #{index}, 持有进程: {owner or '未知'}")
+                start = time.monotonic()
+        self._owners[index] = os.getpid()
+
+    def _release(self, index):
+        self._owners[index] = 0
+        self._locks[index].release()
+
+    def _recover(self, index, dead_pid):
+        """持有者已退出，代为释放其持有的锁"""
+        if not self._recover_lock.acquire(timeout=self.timeout):
+            return
+        try:
+            # 重新确认：其他等待者可能已释放并重新获取
+            if self._owners[index] != dead_pid:
+                return
+            logger.warning(f"跨进程锁持有进程已退出，代为释放: #{index}, 进程: {dead_pid}")
+            self._owners[index] = 0
+            try:
+                self._locks[index].release()
+            except ValueError:
+                pass
+        finally:
+            self._recover_lock.release()
@@ -2,6 +2,7 @@
 进程管理器模块
 - 统一进程调度/生命周期/任务管理/流复用/健康监控
 - create_task: 一条流多算法多推流，自动流复用、模型池分配、推流开关
+- 模型托管：同一模型只在推理执行器进程中加载，跨流动态批处理，按队列深度分发
 - stop_process/stop_all: 优雅退出，进程健康监控，异常自动重启
 - 状态监控：定期检查所有进程健康，自动重启异常进程
 - 进程命名、日志、异常风格统一
@@ -22,8 +23,10 @@ import copy
 import uuid
 from multiprocessing import context, Manager
 from .ipc_manager import IPCManager
+from .process_lock import LockPool
 from .model_manager import ModelRegistry
 from .worker_processes import stream_process, algorithm_process, streaming_process, alarm_process
+from .inference_server import InferenceClient, inference_server_process, get_inference_config
 
 logger = logging.getLogger(__name__)
 
@@ -44,8 +47,11 @@ class ProcessManager:
         # 停止事件
         self.stop_event = mp.Event()
         
+        # 跨进程锁池（每个环形缓冲区、状态表各用其中一把），随参数传给各工作进程
+        self.lock_pool = LockPool()
+        
         # 进程间通信管理器
-        self.ipc_manager = IPCManager(max_queue_size=100)
+        self.ipc_manager = IPCManager(max_queue_size=100, manager_id=self.manager_id, lock_pool=self.lock_pool)
         
         # 模型管理器
         self.model_registry = ModelRegistry()
@@ -67,6 +73,10 @@ class ProcessManager:
         self.stream_queues = {}      # stream_id: 帧队列
         self.stream_ref_count = {}   # stream_id: 使用计数
         
+        # 推理服务：model_id -> {'executor_pool', 'clients': {client_id: 响应队列}, ...}
+        self.inference_config = get_inference_config()
+        self.inference_servers = {}
+        
         # 注册退出处理函数
         atexit.register(self._cleanup_on_exit)
     
@@ -271,7 +281,8 @@ class ProcessManager:
                 
                 new_process = mp.Process(
                     target=stream_process_worker,
-                    args=(self.manager_id, stream_id, stream_url)
+                    args=(self.manager_id, stream_id, stream_url, process_info.get('skip_frame_interval')),
+                    kwargs={'lock_pool': self.lock_pool}
                 )
                 
             elif process_type == 'algorithm':
@@ -281,7 +292,23 @@ class ProcessManager:
                 
                 new_process = mp.Process(
                     target=algorithm_process_worker,
-                    args=(self.manager_id, stream_id, algo_id, model_id)
+                    args=(self.manager_id, stream_id, algo_id, model_id,
+                          process_info['algo_package'], process_info['model_name'],
+                          process_info.get('executor_pool'), process_info.get('response_queue'),
+                          process_info.get('skip_frame_interval'), process_info.get('frame_drop_policy')),
+                    kwargs={'lock_pool': self.lock_pool}
+                )
+                
+            elif process_type == 'inference':
+                model_id = process_info['model_id']
+                server = self.inference_servers[model_id]
+                
+                new_process = mp.Process(
+                    target=inference_server_process_worker,
+                    args=(self.manager_id, model_id, server['algo_package'], server['model_name'],
+                          server['model_config'], server['executor_pool'], process_info['executor_index'],
+                          dict(server['clients'])),
+                    kwargs={'lock_pool': self.lock_pool}
                 )
                 
             elif process_type == 'streaming':
@@ -291,13 +318,15 @@ class ProcessManager:
                 
                 new_process = mp.Process(
                     target=streaming_process_worker,
-                    args=(self.manager_id, stream_id, algo_id, output_url)
+                    args=(self.manager_id, stream_id, algo_id, output_url),
+                    kwargs={'lock_pool': self.lock_pool}
                 )
                 
             elif process_type == 'alarm':
                 new_process = mp.Process(
                     target=alarm_process_worker,
-                    args=(self.manager_id, self.websocket_url)
+                    args=(self.manager_id, self.websocket_url),
+                    kwargs={'lock_pool': self.lock_pool}
                 )
                 
             else:
@@ -317,8 +346,8 @@ class ProcessManager:
             logger.error(f"重启进程 {process_id} 失败: {e}", exc_info=True)
             return False
     
-    def start_stream_process(self, stream_id, stream_url, auto_restart=True):
-        """启动拉流进程"""
+    def start_stream_process(self, stream_id, stream_url, auto_restart=True, skip_frame_interval=None):
+        """启动拉流进程（skip_frame_interval为流默认跳帧间隔，也作为该流消费者的默认间隔）"""
         process_id = f"stream_{stream_id}"
         
         # 检查是否已存在
@@ -330,7 +359,8 @@ class ProcessManager:
             # 创建进程
             process = mp.Process(
                 target=stream_process_worker,
-                args=(self.manager_id, stream_id, stream_url)
+                args=(self.manager_id, stream_id, stream_url, skip_frame_interval),
+                kwargs={'lock_pool': self.lock_pool}
             )
             
             # 保存进程信息
@@ -339,6 +369,7 @@ class ProcessManager:
                 'type': 'stream',
                 'stream_id': stream_id,
                 'stream_url': stream_url,
+                'skip_frame_interval': skip_frame_interval,
                 'auto_restart': auto_restart
             }
             
@@ -365,18 +396,33 @@ class ProcessManager:
             # 注册模型
             model_id = self.model_registry.register_model(algo_package, model_name, model_config)
             
-            # 获取模型实例数配置，默认为1
-            num_instances = model_config.get('model_pool_size', 1)
+            executor_pool = None
+            response_queue = None
+            if self.inference_config['enabled']:
+                # 托管模式：模型只在推理执行器进程中加载，算法进程通过IPC提交推理请求
+                if not self.start_inference_server(model_id, algo_package, model_name, model_config):
+                    return False
+                executor_pool, response_queue = self._attach_inference_client(model_id, f"{stream_id}_{algo_id}")
+            else:
+                # 获取模型实例数配置，默认为1
+                num_instances = model_config.get('model_pool_size', 1)
+                
+                # 加载模型
+                if not self.model_registry.load_model(model_id, num_instances=num_instances):
+                    logger.error(f"无法加载模型: {model_id}")
+                    return False
             
-            # 加载模型
-            if not self.model_registry.load_model(model_id, num_instances=num_instances):
-                logger.error(f"无法加载模型: {model_id}")
-                return False
+            # 跳帧间隔：任务（消费者）配置优先，否则沿用流默认间隔
+            stream_info = self.processes.get(f"stream_{stream_id}", {})
+            skip_frame_interval = model_config.get('skip_frame_interval', stream_info.get('skip_frame_interval'))
+            # 丢帧策略：latest只处理最新帧，oldest按顺序处理（缓冲区容量内不丢帧）
+            frame_drop_policy = model_config.get('frame_drop_policy')
             
             # 创建进程
             process = mp.Process(
                 target=algorithm_process_worker,
-                args=(self.manager_id, stream_id, algo_id, model_id, algo_package, model_name)
+                args=(self.manager_id, stream_id, algo_id, model_id, algo_package, model_name, executor_pool, response_queue, skip_frame_interval, frame_drop_policy),
+                kwargs={'lock_pool': self.lock_pool}
             )
             
             # 保存进程信息
@@ -386,6 +432,12 @@ class ProcessManager:
                 'stream_id': stream_id,
                 'algo_id': algo_id,
                 'model_id': model_id,
+                'algo_package': algo_package,
+                'model_name': model_name,
+                'executor_pool': executor_pool,
+                'response_queue': response_queue,
+                'skip_frame_interval': skip_frame_interval,
+                'frame_drop_policy': frame_drop_policy,
                 'auto_restart': auto_restart
             }
             
@@ -399,6 +451,83 @@ class ProcessManager:
             logger.error(f"启动算法进程失败: {e}", exc_info=True)
             return False
     
+    def start_inference_server(self, model_id, algo_package, model_name, model_config, auto_restart=True):
+        """托管模型并启动其推理执行器进程（已启动时直接返回）"""
+        if model_id in self.inference_servers:
+            return True
+        
+        try:
+            # 执行器数沿用模型实例池大小，默认为1
+            num_executors = model_config.get('model_pool_size', 1)
+            executor_pool = self.model_registry.host_model(
+                model_id, num_executors=num_executors,
+                queue_size=self.inference_config['max_batch_size'] * 16
+            )
+            if executor_pool is None:
+                return False
+            
+            server = {
+                'executor_pool': executor_pool,
+                'clients': {},
+                'algo_package': algo_package,
+                'model_name': model_name,
+                'model_config': model_config
+            }
+            self.inference_servers[model_id] = server
+            
+            for index in range(len(executor_pool)):
+                process_id = f"infer_{model_id}_{index}"
+                
+                # 创建进程
+                process = mp.Process(
+                    target=inference_server_process_worker,
+                    args=(self.manager_id, model_id, algo_package, model_name, model_config,
+                          executor_pool, index, dict(server['clients'])),
+                    kwargs={'lock_pool': self.lock_pool}
+                )
+                
+                # 保存进程信息
+                self.processes[process_id] = {
+                    'process': process,
+                    'type': 'inference',
+                    'model_id': model_id,
+                    'executor_index': index,
+                    'auto_restart': auto_restart
+                }
+                
+                # 启动进程
+                process.daemon = False
+                process.start()
+                
+                logger.info(f"推理执行器进程已启动: {model_id}#{index}, PID: {process.pid}")
+            return True
+        except Exception as e:
+            logger.error(f"启动推理执行器进程失败: {e}", exc_info=True)
+            return False
+    
+    def _attach_inference_client(self, model_id, client_id):
+        """为算法进程创建响应队列，返回(执行器池, 响应队列)"""
+        server = self.inference_servers[model_id]
+        response_queue = server['clients'].get(client_id)
+        if response_queue is None:
+            # 管理器队列代理可在执行器进程运行期间传递给它
+            response_queue = self.model_registry.manager.Queue(maxsize=self.inference_config['max_batch_size'] * 4)
+            server['clients'][client_id] = response_queue
+        return server['executor_pool'], response_queue
+    
+    def _detach_inference_client(self, model_id, client_id):
+        """注销推理服务客户端，没有客户端时停止该模型的全部执行器进程"""
+        server = self.inference_servers.get(model_id)
+        if server is None or client_id not in server['clients']:
+            return
+        server['clients'].pop(client_id)
+        InferenceClient(client_id, server['executor_pool'], None).unregister()
+        if not server['clients']:
+            for index in range(len(server['executor_pool'])):
+                self.stop_process(f"infer_{model_id}_{index}")
+            self.inference_servers.pop(model_id)
+            self.model_registry.unload_model(model_id)
+    
     def start_streaming_process(self, stream_id, algo_id, output_url, auto_restart=True):
         """启动推流进程"""
         process_id = f"stream_out_{stream_id}_{algo_id}"
@@ -412,7 +541,8 @@ class ProcessManager:
             # 创建进程
             process = mp.Process(
                 target=streaming_process_worker,
-                args=(self.manager_id, stream_id, algo_id, output_url)
+                args=(self.manager_id, stream_id, algo_id, output_url),
+                kwargs={'lock_pool': self.lock_pool}
             )
             
             # 保存进程信息
@@ -452,7 +582,8 @@ class ProcessManager:
             # 创建进程
             process = mp.Process(
                 target=alarm_process_worker,
-                args=(self.manager_id, self.websocket_url)
+                args=(self.manager_id, self.websocket_url),
+                kwargs={'lock_pool': self.lock_pool}
             )
             
             # 保存进程信息
@@ -501,23 +632,24 @@ class ProcessManager:
             logger.error(f"停止进程 {process_id} 失败: {e}", exc_info=True)
             return False
     
-    def create_task(self, task_id, stream_id, stream_url, algo_id, algo_package, model_name, model_config, output_url=None, enable_output=True):
-        """创建完整的处理任务（拉流+算法+推流）"""
+    def create_task(self, task_id, stream_id, stream_url, algo_id, algo_package, model_name, model_config, output_url=None, enable_output=True, skip_frame_interval=None):
+        """创建完整的处理任务（拉流+算法+推流），skip_frame_interval为流默认跳帧间隔"""
         try:
             # 1. 流复用：同一路流只拉一次
             if stream_id not in self.stream_queues:
                 frame_queue = self.ipc_manager.create_stream_queue(stream_id)
                 self.stream_queues[stream_id] = frame_queue
                 self.stream_ref_count[stream_id] = 1
-                self.start_stream_process(stream_id, stream_url)
+                self.start_stream_process(stream_id, stream_url, skip_frame_interval=skip_frame_interval)
             else:
                 self.stream_ref_count[stream_id] += 1
                 frame_queue = self.stream_queues[stream_id]
             # 2. 启动算法进程（支持模型池）
             model_id = self.model_registry.register_model(algo_package, model_name, model_config)
-            # 获取模型实例数配置，默认为1
-            num_instances = model_config.get('model_pool_size', 1)
-            self.model_registry.load_model(model_id, num_instances=num_instances)
+            if not self.inference_config['enabled']:
+                # 获取模型实例数配置，默认为1
+                num_instances = model_config.get('model_pool_size', 1)
+                self.model_registry.load_model(model_id, num_instances=num_instances)
             result_queue = self.ipc_manager.create_result_queue(stream_id, algo_id)
             self.start_algorithm_process(stream_id, algo_id, algo_package, model_name, model_config)
             # 3. 推流进程（可配置开关，支持动态增删）
@@ -547,10 +679,16 @@ class ProcessManager:
             stream_out_id = f"stream_out_{stream_id}_{algo_id}"
             if stop_output and stream_out_id in self.processes:
                 self.stop_process(stream_out_id)
+            if stop_output:
+                self.ipc_manager.remove_shared_status('output', f"{stream_id}_{algo_id}")
             # 支持单独关闭算法进程
             algo_process_id = f"algo_{stream_id}_{algo_id}"
             if stop_algo and algo_process_id in self.processes:
+                model_id = self.processes[algo_process_id].get('model_id')
                 self.stop_process(algo_process_id)
+                self._detach_inference_client(model_id, f"{stream_id}_{algo_id}")
+            if stop_algo:
+                self.ipc_manager.remove_shared_status('algo', f"{stream_id}_{algo_id}")
             # 新增：流复用引用计数
             if stop_algo and stream_id in self.stream_ref_count:
                 self.stream_ref_count[stream_id] -= 1
@@ -561,6 +699,7 @@ class ProcessManager:
                         self.stop_process(stream_process_id)
                     self.stream_ref_count.pop(stream_id)
                     self.stream_queues.pop(stream_id)
+                    self.ipc_manager.remove_shared_status('stream', stream_id)
             return True, "任务停止成功"
         except Exception as e:
             logger.error(f"停止任务异常: {e}", exc_info=True)
@@ -584,16 +723,24 @@ class ProcessManager:
                     'alive': False
                 }
         
-        # 获取共享状态
-        streams = self.ipc_manager.get_stream_status()
-        algorithms = self.ipc_manager.get_algo_status()
-        outputs = self.ipc_manager.get_output_status()
+        # 获取共享状态（状态表快照）
+        snapshot = self.ipc_manager.get_status_snapshot()
+        
+        # 托管模型的执行器队列深度
+        inference = {}
+        for model_id, server in self.inference_servers.items():
+            inference[model_id] = {
+                'executors': len(server['executor_pool']),
+                'queue_depths': server['executor_pool'].get_depths(),
+                'clients': len(server['clients'])
+            }
         
         return {
             'processes': processes,
-            'streams': streams,
-            'algorithms': algorithms,
-            'outputs': outputs,
+            'streams': snapshot['streams'],
+            'algorithms': snapshot['algorithms'],
+            'outputs': snapshot['outputs'],
+            'inference': inference,
             'memory_usage': self._get_memory_usage()
         }
     
@@ -655,12 +802,12 @@ def create_stop_event():
     """创建停止事件"""
     return mp.Event()
 
-def stream_process_worker(manager_id, stream_id, stream_url):
+def stream_process_worker(manager_id, stream_id, stream_url, skip_frame_interval=None, lock_pool=None):
     """拉流进程工作函数"""
     try:
         # 创建本地对象
         stop_event = create_stop_event()
-        ipc_manager = IPCManager(max_queue_size=100, manager_id=manager_id)
+        ipc_manager = IPCManager(max_queue_size=100, manager_id=manager_id, lock_pool=lock_pool)
         
         # 设置进程名称
         mp.current_process().name = f"Stream-{stream_id}"
@@ -668,23 +815,35 @@ def stream_process_worker(manager_id, stream_id, stream_url):
         logger.info(f"拉流进程初始化: manager_id={manager_id}, stream_id={stream_id}, url={stream_url}")
         
         # 执行实际工作
-        stream_process(stream_id, stream_url, ipc_manager, stop_event)
+        stream_process(stream_id, stream_url, ipc_manager, stop_event, skip_frame_interval)
     except Exception as e:
         logger.error(f"拉流进程异常: {e}", exc_info=True)
 
-def algorithm_process_worker(manager_id, stream_id, algo_id, model_id, algo_package, model_name):
+def algorithm_process_worker(manager_id, stream_id, algo_id, model_id, algo_package, model_name, executor_pool=None, response_queue=None, skip_frame_interval=None, frame_drop_policy=None, lock_pool=None):
     """算法处理进程工作函数"""
     try:
         # 创建本地对象
         stop_event = create_stop_event()
-        ipc_manager = IPCManager(max_queue_size=100, manager_id=manager_id)
-        model_registry = ModelRegistry()
+        ipc_manager = IPCManager(max_queue_size=100, manager_id=manager_id, lock_pool=lock_pool)
         
         # 设置进程名称
         mp.current_process().name = f"Algo-{stream_id}-{algo_id}"
         
         logger.info(f"算法进程初始化: manager_id={manager_id}, stream_id={stream_id}, algo_id={algo_id}, model_id={model_id}")
         
+        if executor_pool is not None:
+            # 托管模式：本进程不加载模型，帧提交给推理执行器批量推理
+            inference_client = InferenceClient(
+                f"{stream_id}_{algo_id}", executor_pool, response_queue,
+                timeout=get_inference_config()['request_timeout']
+            )
+            algorithm_process(stream_id, algo_id, model_id, ipc_manager, None, stop_event,
+                              inference_client=inference_client, skip_frame_interval=skip_frame_interval,
+                              frame_drop_policy=frame_drop_policy)
+            return
+        
+        model_registry = ModelRegistry()
+        
         # 在algorithm_process_worker内部，直接用传入的algo_package和model_name参数。
         # 删除所有对model_id的split、algo_package的默认赋值、model_name的推断等逻辑。
         # 例如：
@@ -706,16 +865,32 @@ def algorithm_process_worker(manager_id, stream_id, algo_id, model_id, algo_pack
             logger.error(f"自动注册模型异常: {e}", exc_info=True)
         
         # 执行实际工作
-        algorithm_process(stream_id, algo_id, model_id, ipc_manager, model_registry, stop_event)
+        algorithm_process(stream_id, algo_id, model_id, ipc_manager, model_registry, stop_event,
+                          skip_frame_interval=skip_frame_interval, frame_drop_policy=frame_drop_policy)
     except Exception as e:
         logger.error(f"算法进程异常: {e}", exc_info=True)
 
-def streaming_process_worker(manager_id, stream_id, algo_id, output_url):
+def inference_server_process_worker(manager_id, model_id, algo_package, model_name, model_config, executor_pool, executor_index, response_queues, lock_pool=None):
+    """推理执行器进程工作函数"""
+    try:
+        # 创建本地对象
+        stop_event = create_stop_event()
+        
+        logger.info(f"推理执行器进程初始化: manager_id={manager_id}, model_id={model_id}#{executor_index}, 客户端数: {len(response_queues)}")
+        
+        # 执行实际工作
+        inference_server_process(manager_id, model_id, algo_package, model_name, model_config,
+                                 executor_pool, executor_index, response_queues, stop_event,
+                                 lock_pool=lock_pool)
+    except Exception as e:
+        logger.error(f"推理执行器进程异常: {e}", exc_info=True)
+
+def streaming_process_worker(manager_id, stream_id, algo_id, output_url, lock_pool=None):
     """推流进程工作函数"""
     try:
         # 创建本地对象
         stop_event = create_stop_event()
-        ipc_manager = IPCManager(max_queue_size=100, manager_id=manager_id)
+        ipc_manager = IPCManager(max_queue_size=100, manager_id=manager_id, lock_pool=lock_pool)
         
         # 设置进程名称
         mp.current_process().name = f"Stream-Out-{stream_id}-{algo_id}"
@@ -727,12 +902,12 @@ def streaming_process_worker(manager_id, stream_id, algo_id, output_url):
     except Exception as e:
         logger.error(f"推流进程异常: {e}", exc_info=True)
 
-def alarm_process_worker(manager_id, websocket_url):
+def alarm_process_worker(manager_id, websocket_url, lock_pool=None):
     """告警处理进程工作函数"""
     try:
         # 创建本地对象
         stop_event = create_stop_event()
-        ipc_manager = IPCManager(max_queue_size=100, manager_id=manager_id)
+        ipc_manager = IPCManager(max_queue_size=100, manager_id=manager_id, lock_pool=lock_pool)
         
         # 设置进程名称
         mp.current_process().name = f"Alarm-Handler"
@@ -0,0 +1,236 @@
+"""
+共享内存状态表模块
+- 固定布局：每类状态（stream/algo/output）固定行数，每行固定字段
+- 无锁计数：每行只由其所属工作进程写入（单写者），计数器直接原地自增，无需加锁
+- 行登记/删除在跨进程锁内完成，多个进程同时登记时不会认领同一行
+- 快照接口：REST/WebSocket层一次读取整张表，代价为微秒级内存拷贝，不再读写状态文件
+"""
+
+import hashlib
+import logging
+import threading
+import numpy as np
+from multiprocessing import shared_memory
+
+logger = logging.getLogger(__name__)
+
+# 状态类型及每类最大行数
+STATUS_TYPES = ('stream', 'algo', 'output')
+DEFAULT_ROWS_PER_TYPE = 256
+
+# 行键最大字节数，超长键不予登记（快照须返回原始键，摘要无法还原）
+KEY_BYTES = 96
+
+# 状态字符串与编码
+STATUS_CODES = {
+    'unknown': 0,
+    'initialized': 1,
+    'starting': 2,
+    'running': 3,
+    'ready': 4,
+    'stopped': 5,
+    'error': 6,
+}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+# 行布局（所有状态类型共用，快照时按类型输出相关字段）
+ROW_DTYPE = np.dtype([
+    ('key', f'S{KEY_BYTES}'),
+    ('status', np.int64),
+    ('frame_count', np.int64),
+    ('processed_count', np.int64),
+    ('decoded_count', np.int64),
+    ('dropped_count', np.int64),
+    ('skipped_count', np.int64),
+    ('skip_interval', np.int64),
+    ('errors', np.int64),
+    ('width', np.int64),
+    ('height', np.int64),
+    ('last_frame_time', np.float64),
+    ('last_process_time', np.float64),
+    ('last_push_time', np.float64),
+    ('fps', np.float64),
+])
+
+# 各状态类型快照输出的字段
+TYPE_FIELDS = {
+    'stream': ('frame_count', 'decoded_count', 'skipped_count', 'dropped_count', 'skip_interval',
+               'last_frame_time', 'fps', 'width', 'height', 'errors'),
+    'algo': ('processed_count', 'dropped_count', 'skip_interval', 'last_process_time', 'errors'),
+    'output': ('frame_count', 'dropped_count', 'last_push_time', 'errors'),
+}
+
+NUMERIC_FIELDS = tuple(name for name in ROW_DTYPE.names if name not in ('key', 'status'))
+
+
+def get_table_name(manager_id):
+    """生成状态表共享内存名称"""
+    digest = hashlib.md5(str(manager_id).encode('utf-8')).hexdigest()[:16]
+    return f"vstat_{digest}"
+
+
+def _encode_key(key):
+    """行键编码，超过KEY_BYTES时返回None"""
+    raw = str(key).encode('utf-8')
+    return raw if len(raw) <= KEY_BYTES else None
+
+
+class StatusTable:
+    """共享内存状态表"""
+
+    def __init__(self, shm, rows_per_type, owner=False, lock=None):
+        self.shm = shm
+        self.owner = owner
+        self._lock = lock if lock is not None else threading.RLock()  # 行登记锁（各进程共用同一把跨进程锁）
+        self.rows_per_type = rows_per_type
+        self.rows = np.ndarray((len(STATUS_TYPES), rows_per_type), dtype=ROW_DTYPE, buffer=shm.buf)
+        # 进程本地的 键 -> 行号 缓存
+        self._index = {status_type: {} for status_type in STATUS_TYPES}
+        # 已记录过日志的超长键，热路径上不重复报错
+        self._rejected_keys = set()
+
+    @classmethod
+    def open(cls, manager_id, rows_per_type=DEFAULT_ROWS_PER_TYPE, lock=None):
+        """附加到管理器的状态表，不存在时创建（lock为同一管理器各进程共用的跨进程锁）"""
+        name = get_table_name(manager_id)
+        size = len(STATUS_TYPES) * rows_per_type * ROW_DTYPE.itemsize
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+            return cls(shm, rows_per_type, owner=False, lock=lock)
+        except FileNotFoundError:
+            pass
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # 其他进程刚刚创建
+            shm = shared_memory.SharedMemory(name=name)
+            return cls(shm, rows_per_type, owner=False, lock=lock)
+        table = cls(shm, rows_per_type, owner=True, lock=lock)
+        table.rows[:] = np.zeros((), dtype=ROW_DTYPE)
+        return table
+
+    def _type_index(self, status_type):
+        return STATUS_TYPES.index(status_type)
+
+    def _find_row(self, status_type, key, create):
+        """查找行号，create为True时在首个空行登记"""
+        encoded = _encode_key(key)
+        if encoded is None:
+            if create and key not in self._rejected_keys:
+                self._rejected_keys.add(key)
+                logger.error(f"状态表键超过{KEY_BYTES}字节，无法登记: {status_type}, {key}")
+            return None
+        cached = self._index[status_type].get(key)
+        section = self.rows[self._type_index(status_type)]
+        if cached is not None and section['key'][cached] == encoded:
+            return cached
+
+        matches = np.flatnonzero(section['key'] == encoded)
+        if len(matches):
+            row = int(matches[0])
+            self._index[status_type][key] = row
+            return row
+        if not create:
+            return None
+
+        with self._lock:
+            # 加锁后重新查找：其他进程可能刚刚登记了同一个键
+            matches = np.flatnonzero(section['key'] == encoded)
+            if len(matches):
+                row = int(matches[0])
+            else:
+                empty = np.flatnonzero(section['key'] == b'')
+                if len(empty) == 0:
+                    logger.error(f"状态表已满: {status_type}, 无法登记 {key}")
+                    return None
+                row = int(empty[0])
+                self._reset_row(section, row)
+                section['key'][row] = encoded
+        self._index[status_type][key] = row
+        return row
+
+    @staticmethod
+    def _reset_row(section, row):
+        section['status'][row] = STATUS_CODES['initialized']
+        for field in NUMERIC_FIELDS:
+            section[field][row] = 0
+
+    def update(self, status_type, key, status_data):
+        """写入状态字典中的已知字段，返回是否成功"""
+        row = self._find_row(status_type, key, create=True)
+        if row is None:
+            return False
+        section = self.rows[self._type_index(status_type)]
+        for field, value in status_data.items():
+            if field == 'status':
+                section['status'][row] = STATUS_CODES.get(value, STATUS_CODES['unknown'])
+            elif field in NUMERIC_FIELDS and value is not None:
+                section[field][row] = value
+        return True
+
+    def increment(self, status_type, key, field, amount=1):
+        """计数器原地自增（调用方须是该行唯一写者），返回新值"""
+        row = self._find_row(status_type, key, create=True)
+        if row is None:
+            return None
+        column = self.rows[self._type_index(status_type)][field]
+        column[row] += amount
+        return column[row]
+
+    def tick(self, status_type, key, count_field, time_field, timestamp):
+        """热路径：一次查找内完成计数自增和时间戳更新（调用方须是该行唯一写者）"""
+        row = self._find_row(status_type, key, create=True)
+        if row is None:
+            return False
+        section = self.rows[self._type_index(status_type)]
+        section[count_field][row] += 1
+        section[time_field][row] = timestamp
+        return True
+
+    def _row_to_dict(self, status_type, record):
+        data = {'status': STATUS_NAMES.get(int(record['status']), 'unknown')}
+        for field in TYPE_FIELDS[status_type]:
+            value = record[field]
+            data[field] = float(value) if value.dtype.kind == 'f' else int(value)
+        return data
+
+    def get(self, status_type, key):
+        """读取单行状态，不存在时返回None"""
+        row = self._find_row(status_type, key, create=False)
+        if row is None:
+            return None
+        record = self.rows[self._type_index(status_type)][row].copy()
+        return self._row_to_dict(status_type, record)
+
+    def snapshot(self, status_type):
+        """读取某类全部状态 {key: 状态字典}"""
+        section = self.rows[self._type_index(status_type)].copy()
+        result = {}
+        for record in section[section['key'] != b'']:
+            result[record['key'].decode('utf-8')] = self._row_to_dict(status_type, record)
+        return result
+
+    def remove(self, status_type, key):
+        """删除行，行号可被后续登记复用"""
+        row = self._find_row(status_type, key, create=False)
+        if row is None:
+            return False
+        with self._lock:
+            self.rows[self._type_index(status_type)]['key'][row] = b''
+        self._index[status_type].pop(key, None)
+        return True
+
+    def close(self):
+        """关闭映射；创建者同时删除共享内存"""
+        if self.shm is None:
+            return
+        self.rows = None
+        try:
+            if self.owner:
+                self.shm.unlink()
+            self.shm.close()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"关闭状态表失败: {e}")
+        self.shm = None
@@ -1,9 +1,9 @@
 """
 分析器核心进程模块
-- 拉流进程（stream_process）：断线重连、流复用、参数自适应
-- 算法进程（algorithm_process）：模型池、异常保护、队列溢出保护
-- 推流进程（streaming_process）：多协议、健康监控、自动重启
-- 告警进程（alarm_process）：双图推送、队列溢出保护
+- 拉流进程（stream_process）：独立解码线程+最新帧信箱、断线重连、流复用、参数自适应
+- 算法进程（algorithm_process）：模型池或推理服务（跨流批处理）、异常保护、队列溢出保护
+- 推流进程（streaming_process）：多协议、按需标注（静态ROI缓存叠加）、一次编码多端输出（推流/分段录像）、有界队列丢弃最旧帧、零拷贝写管道、后台自动重启
+- 告警进程（alarm_process）：双图推送（图片由算法进程的告警媒体线程池编码一次，随告警数据传递，以二进制帧发送）、队列溢出保护
 - 所有进程日志、异常、状态共享接口风格统一
 - 辅助函数集中管理
 """
@@ -14,7 +14,6 @@ import time
 import logging
 import json
 import os
-import subprocess
 import signal
 import uuid
 import numpy as np
@@ -28,6 +27,15 @@ import yaml
 from multiprocessing import shared_memory
 from typing import Any, Dict, Optional, Tuple, Callable, List
 
+from .ipc_manager import DROP_LATEST
+from .decode_pipeline import (LatestFrameMailbox, DecodeThread, is_live_source, resolve_decode_interval, consumer_step,
+                              stream_consumer_intervals)
+from .alarm_media import AlarmMediaWriter, encode_jpeg, DEFAULT_JPEG_QUALITY
+from .alarm_protocol import FULL_KINDS, MEDIA_KINDS, build_alarm_metadata, pack_media_frame, producer_url
+from .annotation_renderer import get_renderer, needs_annotation
+from .output_pipeline import (OutputMultiplexer, RemuxSink, build_encoder_cmd, build_remux_cmd, build_segment_cmd,
+                              DEFAULT_WRITER_QUEUE_SIZE, DEFAULT_MAX_RESTARTS, DEFAULT_MAX_LEASES)
+
 try:
     import psutil
 except ImportError:
@@ -102,6 +110,23 @@ def run_inference(model: Any, frame: Any) -> Tuple[Optional[Any], List[Any]]:
         log_exception("inference", "-", e)
         return None, []
 
+def run_batch_inference(model: Any, frames: List[Any]) -> List[Tuple[Optional[Any], List[Any]]]:
+    """
+    批量推理函数，模型支持infer_batch时执行一次批量前向计算，否则逐帧推理。
+    Args:
+        model: 推理模型实例
+        frames: 输入帧列表
+    Returns:
+        [(原始结果, 标准化结果列表), ...]，与输入顺序一致
+    """
+    if hasattr(model, 'infer_batch'):
+        try:
+            return model.infer_batch(frames)
+        except Exception as e:
+            log_exception("inference", "-", e)
+            return [(None, []) for _ in frames]
+    return [run_inference(model, frame) for frame in frames]
+
 def run_postprocess(postprocessor, infer_result):
     """独立后处理函数，返回后处理结果"""
     try:
@@ -138,8 +163,6 @@ def send_heartbeat(process_type: str, task_id: str) -> None:
         "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
     }, ensure_ascii=False))
 
-import uuid
-
 def log_structured(level: str, msg: str, trace_id: Optional[str] = None, task_id: Optional[str] = None, extra: Optional[Dict[str, Any]] = None) -> None:
     log_data = {
         "level": level,
@@ -169,7 +192,21 @@ def log_structured(level: str, msg: str, trace_id: Optional[str] = None, task_id
 # log_structured("ERROR", "推理异常", trace_id, task_id, extra={"exception": str(e)})
 
 # 1. 拉流进程
-def stream_process(stream_id: str, stream_url: str, ipc_manager, stop_event) -> None:
+def get_decode_interval(ipc_manager, stream_id: str, default: int) -> int:
+    """
+    按状态表中该流所有消费者（算法进程）登记的跳帧间隔计算解码间隔。
+    Args:
+        ipc_manager: IPC管理器实例
+        stream_id: 流ID
+        default: 没有消费者登记时的流默认间隔
+    Returns:
+        解码间隔（每N帧解码1帧）
+    """
+    status_table = ipc_manager.status_table
+    intervals = stream_consumer_intervals(stream_id, status_table.snapshot('algo'), status_table.snapshot('stream'))
+    return resolve_decode_interval(intervals, default)
+
+def stream_process(stream_id: str, stream_url: str, ipc_manager, stop_event, skip_frame_interval: Optional[int] = None) -> None:
     """
     拉流进程，负责从流地址拉取视频帧并放入共享队列。
     Args:
@@ -177,6 +214,7 @@ def stream_process(stream_id: str, stream_url: str, ipc_manager, stop_event) ->
         stream_url: 流地址
         ipc_manager: IPC管理器实例
         stop_event: 停止事件
+        skip_frame_interval: 流默认跳帧间隔，没有消费者登记时使用；为None时使用全局配置
     """
     try:
         # 设置进程名
@@ -184,12 +222,16 @@ def stream_process(stream_id: str, stream_url: str, ipc_manager, stop_event) ->
         
         logger.info(f"启动拉流进程: {stream_id}, URL: {stream_url}")
         
-        # 获取队列
-        frame_queue = ipc_manager.create_stream_queue(stream_id)
+        # 注册流的帧通道（环形缓冲区在首帧写入时按帧尺寸分配）
+        ipc_manager.create_stream_queue(stream_id)
+        
+        # 更新流状态
+        ipc_manager.set_shared_status('stream', stream_id, {'status': 'starting'})
         
-        # 获取流状态
-        stream_status = ipc_manager.stream_status[stream_id]
-        stream_status['status'] = 'starting'
+        # 解码间隔：由该流要求最高的消费者决定，跳过的帧只grab()不解码发布
+        if skip_frame_interval is None:
+            skip_frame_interval = GlobalConfig.instance().get('skip_frame_interval', 2)
+        decode_interval = [get_decode_interval(ipc_manager, stream_id, skip_frame_interval)]
         
         # 打开视频流
         retry_count = 0
@@ -213,52 +255,68 @@ def stream_process(stream_id: str, stream_url: str, ipc_manager, stop_event) ->
                 
                 logger.info(f"视频流参数: {frame_width}x{frame_height}, {fps}fps")
                 
+                # 按流分辨率一次性分配环形缓冲区（分辨率变化时自动重建）
+                ring_slots = GlobalConfig.instance().get_section('shared_memory').get('frame_ring_slots')
+                ipc_manager.create_stream_queue(stream_id, frame_width, frame_height, num_slots=ring_slots)
+                
                 # 更新流状态
-                stream_status['width'] = frame_width
-                stream_status['height'] = frame_height
-                stream_status['fps'] = fps
-                stream_status['status'] = 'running'
-                stream_status['errors'] = 0
+                ipc_manager.set_shared_status('stream', stream_id, {
+                    'width': frame_width,
+                    'height': frame_height,
+                    'fps': fps,
+                    'status': 'running',
+                    'errors': 0
+                })
                 
-                # 读取帧
-                frame_count = 0
-                consecutive_failures = 0
-                max_consecutive_failures = 5
+                # 解码线程持续读取码流，本循环只从最新帧信箱取帧，慢消费者不会阻塞解码
+                mailbox = LatestFrameMailbox()
+                decoder = DecodeThread(
+                    cap, mailbox, name=f"Decode-{stream_id}",
+                    realtime_fps=None if is_live_source(stream_url) else fps,
+                    skip_interval=lambda: decode_interval[0]
+                )
+                decoder.start()
+                last_interval_check = 0
                 
-                while not stop_event.is_set():
-                    # 读取一帧
-                    ret, frame = cap.read()
-                    
-                    if not ret:
-                        consecutive_failures += 1
-                        logger.warning(f"读取视频帧失败 ({consecutive_failures}/{max_consecutive_failures})")
+                try:
+                    while not stop_event.is_set():
+                        # 每秒按消费者登记情况调整解码间隔
+                        now = time.time()
+                        if now - last_interval_check >= 1.0:
+                            last_interval_check = now
+                            interval = get_decode_interval(ipc_manager, stream_id, skip_frame_interval)
+                            if interval != decode_interval[0]:
+                                logger.info(f"解码间隔调整: {stream_id}, {decode_interval[0]} -> {interval}")
+                                decode_interval[0] = interval
+                            ipc_manager.status_table.update('stream', stream_id, {'skip_interval': interval})
                         
-                        if consecutive_failures >= max_consecutive_failures:
-                            logger.error("连续多次读取失败，重新连接")
-                            break
-                            
-                        time.sleep(0.1)
-                        continue
-                    
-                    # 重置失败计数
-                    consecutive_failures = 0
-                    
-                    # 将帧放入队列
-                    if not ipc_manager.put_frame(stream_id, frame):
-                        logger.warning(f"放入帧失败: {stream_id}")
-                    
-                    frame_count += 1
-                    
-                    # 防止CPU占用过高
-                    if frame_count % 5 == 0:
-                        time.sleep(0.001)
-                
-                # 关闭视频流
-                cap.release()
+
+                        item = mailbox.get(timeout=0.5)
+                        if item is None:
+                            if not decoder.is_alive():
+                                logger.error("解码线程退出（连续多次读取失败），重新连接")
+                                break
+                            continue
+                        frame, _ = item
+                        
+                        # 将帧放入队列
+                        if not ipc_manager.put_frame(stream_id, frame):
+                            logger.warning(f"放入帧失败: {stream_id}")
+                        
+                        # 同步解码/跳过/丢弃计数（交付计数即frame_count）
+                        ipc_manager.status_table.update('stream', stream_id, {
+                            'decoded_count': mailbox.decoded,
+                            'skipped_count': decoder.skipped,
+                            'dropped_count': mailbox.dropped
+                        })
+                finally:
+                    # 视频流由解码线程退出时关闭
+                    decoder.stop()
+                    cap = None
                 
             except Exception as e:
                 log_exception("stream_process", stream_id, e)
-                stream_status['errors'] = stream_status.get('errors', 0) + 1
+                ipc_manager.increment_shared_status('stream', stream_id, 'errors')
                 
                 if cap:
                     cap.release()
@@ -266,31 +324,33 @@ def stream_process(stream_id: str, stream_url: str, ipc_manager, stop_event) ->
                 time.sleep(retry_interval)
         
         if retry_count >= max_retries:
-            stream_status['status'] = 'error'
+            ipc_manager.set_shared_status('stream', stream_id, {'status': 'error'})
             logger.error(f"拉流失败次数过多，停止尝试: {stream_id}")
         else:
-            stream_status['status'] = 'stopped'
+            ipc_manager.set_shared_status('stream', stream_id, {'status': 'stopped'})
             
     except Exception as e:
         logger.error(f"拉流进程异常: {e}", exc_info=True)
-        if stream_id in ipc_manager.stream_status:
-            ipc_manager.stream_status[stream_id]['status'] = 'error'
+        ipc_manager.set_shared_status('stream', stream_id, {'status': 'error'})
     
     logger.info(f"拉流进程结束: {stream_id}")
 
 
 # 2. 算法进程
-def algorithm_process(stream_id: str, algo_id: str, model_id: str, ipc_manager, model_registry, stop_event, save_alarm: bool = True) -> None:
+def algorithm_process(stream_id: str, algo_id: str, model_id: str, ipc_manager, model_registry, stop_event, save_alarm: bool = True, inference_client=None, skip_frame_interval: Optional[int] = None, frame_drop_policy: Optional[str] = None) -> None:
     """
-    算法处理进程，负责从共享队列获取帧，进行算法处理，并将结果放入结果队列。
+    算法处理进程，负责从帧广播通道获取帧，进行算法处理，并将结果放入结果队列。
     Args:
         stream_id: 流ID
         algo_id: 算法ID
         model_id: 模型ID
         ipc_manager: IPC管理器实例
-        model_registry: 模型注册表实例
+        model_registry: 模型注册表实例（使用推理服务时可为None）
         stop_event: 停止事件
         save_alarm: 是否保存告警图片
+        inference_client: 推理服务客户端，提供时帧提交给推理服务批量推理，本进程不加载模型
+        skip_frame_interval: 本消费者的跳帧间隔（相对源帧率），为None时使用全局配置
+        frame_drop_policy: 丢帧策略（latest/oldest），为None时使用全局配置
     """
     try:
         # 设置进程名
@@ -298,12 +358,16 @@ def algorithm_process(stream_id: str, algo_id: str, model_id: str, ipc_manager,
         
         logger.info(f"启动算法处理进程: {stream_id}, 算法: {algo_id}, 模型: {model_id}")
         
-        # 获取模型实例
-        model, postprocessor = model_registry.get_model_instance(model_id)
-        
-        if not model or not postprocessor:
-            logger.error(f"无法获取模型实例: {model_id}")
-            return
+        # 获取模型实例（使用推理服务时由推理服务进程持有模型）
+        if inference_client is not None:
+            model, postprocessor = None, None
+            inference_client.register()
+        else:
+            model, postprocessor = model_registry.get_model_instance(model_id)
+            
+            if not model or not postprocessor:
+                logger.error(f"无法获取模型实例: {model_id}")
+                return
         
         # 创建结果队列
         result_queue = ipc_manager.create_result_queue(stream_id, algo_id)
@@ -313,6 +377,17 @@ def algorithm_process(stream_id: str, algo_id: str, model_id: str, ipc_manager,
         algo_status = ipc_manager.algo_status[algo_status_key]
         algo_status['status'] = 'running'
         
+        # 登记跳帧间隔，拉流进程按该流所有消费者中最小的间隔在解码侧抽帧
+        if skip_frame_interval is None:
+            skip_frame_interval = GlobalConfig.instance().get('skip_frame_interval', 2)
+        skip_frame_interval = max(1, int(skip_frame_interval))
+        algo_status['skip_interval'] = skip_frame_interval
+        
+        # 订阅帧广播通道：同一路流的多个算法各自按读游标读取，互不争抢帧
+        if frame_drop_policy is None:
+            frame_drop_policy = GlobalConfig.instance().get_section('shared_memory').get('frame_drop_policy', DROP_LATEST)
+        frame_subscriber = ipc_manager.subscribe_frames(stream_id, algo_id, frame_drop_policy)
+        
         # 显式打印状态，确认它在被设置
         logger.info(f"算法处理进程状态已设置: {algo_status_key}, 状态列表: {list(ipc_manager.algo_status.keys())}")
         
@@ -328,6 +403,16 @@ def algorithm_process(stream_id: str, algo_id: str, model_id: str, ipc_manager,
         temp_dir = os.path.join("temp_frames", stream_id, algo_id)
         os.makedirs(temp_dir, exist_ok=True)
         
+        # 告警媒体写出线程池：绘制、JPEG编码、落盘不占用推理循环
+        media_writer = None
+        if save_alarm:
+            media_writer = AlarmMediaWriter.from_config(
+                ipc_manager.put_alarm,
+                lambda image, result: draw_results(image, result, stream_id=stream_id),
+                GlobalConfig.instance().get_section('alarm_media'),
+                name=f"AlarmMedia-{algo_status_key}"
+            )
+        
         # 主循环
         consecutive_empty = 0
         max_consecutive_empty = 50
@@ -335,27 +420,11 @@ def algorithm_process(stream_id: str, algo_id: str, model_id: str, ipc_manager,
         frame_count = 0
         logger.info(f"算法进程进入主循环，等待处理第一帧...")
         
-        # 在algorithm_process主循环内，添加帧计数器，每两帧检测一次
-        # 找到while not stop_event.is_set():主循环，添加如下逻辑
-        # 伪代码：
-        # frame_counter = 0  # 在循环外定义
-        # while not stop_event.is_set():
-        #     ...
-        #     frame_counter += 1
-        #     if frame_counter % 2 != 0:
-        #         # 释放帧引用，跳过本帧
-        #         ipc_manager.memory_manager.release_frame(frame_ref)
-        #         continue
-        #     # 后续推理处理...
-        # 实现为实际代码
-        # 获取跳帧间隔配置，默认为2
-        cfg = GlobalConfig.instance()
-        skip_frame_interval = cfg.get('skip_frame_interval', 2)
         frame_counter = 0
         while not stop_event.is_set():
             try:
                 # 获取帧
-                frame_ref = ipc_manager.get_frame(stream_id)
+                frame_ref = frame_subscriber.get(timeout=1.0)
                 
                 if not frame_ref:
                     consecutive_empty += 1
@@ -364,37 +433,53 @@ def algorithm_process(stream_id: str, algo_id: str, model_id: str, ipc_manager,
                         consecutive_empty = 0
                     continue
                 
-                # 跳帧检测逻辑
+                # 跳帧检测逻辑：解码侧已按最小间隔抽帧，这里只按本消费者在已解码帧上的步长取帧
                 frame_counter += 1
-                if skip_frame_interval > 1 and (frame_counter % skip_frame_interval != 0):
+                stream_status = ipc_manager.status_table.get('stream', stream_id) or {}
+                step = consumer_step(skip_frame_interval, stream_status.get('skip_interval') or 1)
+                if step > 1 and (frame_counter % step != 0):
                     ipc_manager.memory_manager.release_frame(frame_ref)
                     continue
                 
                 # 重置连续空计数
                 consecutive_empty = 0
                 
-                # 获取帧数据
-                frame = ipc_manager.memory_manager.get_frame(frame_ref)
+                # 租用帧：只读零拷贝视图，处理完成前写者不会覆盖该槽位
+                lease = ipc_manager.memory_manager.lease_frame(frame_ref)
                 
-                if frame is None:
+                if lease is None:
                     ipc_manager.memory_manager.release_frame(frame_ref)
                     continue
                 
-                # 更新处理时间
-                frame_count += 1
-                algo_status['last_process_time'] = time.time()
-                
-                # 推理
-                orig_result, std_result = run_inference(model, frame)
-                
-                # 后处理
-                post_result = run_postprocess(postprocessor, orig_result)
-                
-                # 创建原始帧的副本，用于绘制检测结果
-                processed_frame = frame.copy()
-                
-                # 在图像上绘制检测结果
-                draw_results(processed_frame, post_result)
+                try:
+                    frame = lease.frame
+                    
+                    # 更新处理时间
+                    frame_count += 1
+                    algo_status['last_process_time'] = time.time()
+                    dropped = frame_subscriber.dropped + ipc_manager.dropped_results.get(algo_status_key, 0)
+                    if dropped != algo_status.get('dropped_count'):
+                        # 读游标落后被覆盖的帧数与未能放入结果队列的结果数（本进程是该行唯一写者）
+                        algo_status['dropped_count'] = dropped
+                        ipc_manager.status_table.update('algo', algo_status_key, {'dropped_count': dropped})
+                    
+                    if inference_client is not None:
+                        # 提交帧引用给推理服务，与其他流的帧合批推理
+                        post_result = inference_client.infer(frame_ref)
+                        if post_result is None:
+                            continue
+                    else:
+                        # 推理
+                        orig_result, std_result = run_inference(model, frame)
+                        
+                        # 后处理
+                        post_result = run_postprocess(postprocessor, orig_result)
+                    
+                    # 处理告警（仅在真正触发告警时才复制帧并绘制检测结果）
+                    last_alarm_time = handle_alarm(ipc_manager, stream_id, algo_id, frame, None, post_result, temp_dir, last_alarm_time, alarm_cooldown, save_alarm,
+                                                   frame_ref=frame_ref, media_writer=media_writer)
+                finally:
+                    lease.release()
                 
                 # 如果是第一帧，设置算法状态为就绪
                 if not first_frame_processed:
@@ -404,9 +489,6 @@ def algorithm_process(stream_id: str, algo_id: str, model_id: str, ipc_manager,
                     logger.info(f"算法处理进程已处理第一帧，状态已设置为ready: {algo_status_key}")
                     first_frame_processed = True
                 
-                # 处理告警
-                last_alarm_time = handle_alarm(ipc_manager, stream_id, algo_id, frame, processed_frame, post_result, temp_dir, last_alarm_time, alarm_cooldown, save_alarm)
-                
                 # 将结果放入结果队列
                 put_result(ipc_manager, stream_id, algo_id, frame_ref, post_result)
                 
@@ -415,11 +497,19 @@ def algorithm_process(stream_id: str, algo_id: str, model_id: str, ipc_manager,
                 
             except Exception as e:
                 log_exception("algorithm_process", f"{stream_id}_{algo_id}", e)
-                algo_status['errors'] = algo_status.get('errors', 0) + 1
+                ipc_manager.increment_shared_status('algo', algo_status_key, 'errors')
                 time.sleep(0.1)
         
+        if media_writer is not None:
+            media_writer.stop()
+            logger.info(f"告警媒体写出统计: {algo_status_key}, {media_writer.get_stats()}")
+        
         algo_status['status'] = 'stopped'
+        algo_status['dropped_count'] = frame_subscriber.dropped + ipc_manager.dropped_results.get(algo_status_key, 0)
         ipc_manager.set_shared_status('algo', algo_status_key, algo_status)
+        ipc_manager.unsubscribe_frames(stream_id, algo_id)
+        if inference_client is not None:
+            inference_client.unregister()
         
     except Exception as e:
         logger.error(f"算法进程异常: {e}", exc_info=True)
@@ -453,17 +543,13 @@ def streaming_process(stream_id: str, algo_id: str, output_url: str, ipc_manager
         # 创建进程状态条目
         key = f"{stream_id}_{algo_id}"
         if key not in ipc_manager.output_status:
-            output_status = {
+            # 写入共享状态
+            ipc_manager.set_shared_status('output', key, {
                 'status': 'starting',
                 'last_push_time': 0,
                 'frame_count': 0,
                 'errors': 0
-            }
-            ipc_manager.output_status[key] = output_status
-            # 写入共享状态
-            ipc_manager.set_shared_status('output', key, output_status)
-        else:
-            output_status = ipc_manager.output_status[key]
+            })
         
         # 等待算法处理就绪
         max_wait = 60  # 延长最大等待时间(秒)
@@ -503,37 +589,32 @@ def streaming_process(stream_id: str, algo_id: str, output_url: str, ipc_manager
         if key not in algo_status_dict or algo_status_dict[key].get('status') != 'ready':
             logger.error(f"等待算法处理就绪超时: {key}")
             logger.error(f"当前所有状态: 算法状态={algo_status_dict}, 流状态={ipc_manager.get_all_shared_status('stream')}")
-            output_status['status'] = 'error'
-            ipc_manager.set_shared_status('output', key, output_status)
+            ipc_manager.set_shared_status('output', key, {'status': 'error'})
             return
         
-        # 等待第一帧
+        # 等待第一帧（结果队列积压时队首结果的帧可能已被环形缓冲区覆盖，继续取下一个结果）
         wait_start = time.time()
         first_result = None
+        first_frame = None
         
-        while first_result is None and (time.time() - wait_start) < max_wait:
+        while first_frame is None and (time.time() - wait_start) < max_wait:
             if stop_event.is_set():
                 return
                 
             first_result = ipc_manager.get_result(stream_id, algo_id, timeout=0.5)
+            if first_result is not None:
+                first_frame = ipc_manager.memory_manager.get_frame(first_result['frame_ref'])
         
-        if first_result is None:
+        if first_frame is None:
             logger.error(f"等待首帧超时: {key}")
-            output_status['status'] = 'error'
+            ipc_manager.set_shared_status('output', key, {'status': 'error'})
             return
         
         # 获取视频参数
         first_frame_ref = first_result['frame_ref']
-        first_frame = ipc_manager.memory_manager.get_frame(first_frame_ref)
-        
-        if first_frame is None:
-            logger.error(f"无法获取首帧: {key}")
-            ipc_manager.memory_manager.release_frame(first_frame_ref)
-            output_status['status'] = 'error'
-            return
         
         frame_height, frame_width = first_frame.shape[:2]
-        fps = ipc_manager.stream_status.get(stream_id, {}).get('fps', 25)
+        fps = (ipc_manager.get_shared_status('stream', stream_id) or {}).get('fps') or 25
         
         # 释放首帧
         ipc_manager.memory_manager.release_frame(first_frame_ref)
@@ -568,17 +649,9 @@ def streaming_process(stream_id: str, algo_id: str, output_url: str, ipc_manager
             except Exception as e:
                 logger.error(f"检查推流目标服务器时出错: {e}")
         
-        # 构建FFmpeg命令
+        # 编码参数：RTSP使用libx264，其他使用NVENC
         if is_rtsp:
-            ffmpeg_cmd = [
-                'ffmpeg',
-                '-y',
-                '-f', 'rawvideo',
-                '-vcodec', 'rawvideo',
-                '-pix_fmt', 'bgr24',
-                '-s', f'{frame_width}x{frame_height}',
-                '-r', str(fps),
-                '-i', '-',
+            codec_args = [
                 '-c:v', 'libx264',
                 '-preset', 'ultrafast',
                 '-tune', 'zerolatency',
@@ -586,50 +659,73 @@ def streaming_process(stream_id: str, algo_id: str, output_url: str, ipc_manager
                 '-bufsize', '5000k',
                 '-maxrate', '10000k',
                 '-g', '15',
-                '-x264-params', 'keyint=15:min-keyint=15:scenecut=0:no-cabac=1:8x8dct=0:ref=0',
-                '-f', 'rtsp',
-                '-rtsp_transport', 'tcp',
-                output_url
+                '-x264-params', 'keyint=15:min-keyint=15:scenecut=0:no-cabac=1:8x8dct=0:ref=0:repeat-headers=1',
             ]
         else:
-            ffmpeg_cmd = ['ffmpeg', '-y', '-an', # 禁用音频
-            '-f', 'rawvideo', '-vcodec', 'rawvideo', '-pix_fmt', 'bgr24',
-            '-s', f'{frame_width}x{frame_height}', '-r', str(fps), '-i', '-',
-            # 进一步优化NVENC参数以降低延迟
-            '-c:v', 'h264_nvenc',
-            '-preset', 'p1', '-tune', 'll', '-zerolatency', '1', '-delay', '0',
-            '-rc', 'cbr', '-rc-lookahead', '0', '-no-scenecut', '1',
-            '-b:v', '2M', '-maxrate', '2.5M', '-bufsize', '512k', # 减小缓冲区大小
-            '-g', '10', '-keyint_min', '10', # 减少GOP大小以降低延迟
-            '-forced-idr', '1', '-surfaces', '1',
-            '-profile:v', 'baseline', '-pix_fmt', 'yuv420p',
-            # 优化RTSP传输设置
-            '-f', 'rtsp', '-rtsp_transport', 'tcp', 
-            '-muxdelay', '0.1', # 最小化复用延迟
-            output_url]
-        
-        # 启动FFmpeg进程
-        logger.info(f"启动FFmpeg: {' '.join(ffmpeg_cmd)}")
+            codec_args = [
+                # 进一步优化NVENC参数以降低延迟
+                '-c:v', 'h264_nvenc',
+                '-preset', 'p1', '-tune', 'll', '-zerolatency', '1', '-delay', '0',
+                '-rc', 'cbr', '-rc-lookahead', '0', '-no-scenecut', '1',
+                '-b:v', '2M', '-maxrate', '2.5M', '-bufsize', '512k', # 减小缓冲区大小
+                '-g', '10', '-keyint_min', '10', # 减少GOP大小以降低延迟
+                '-forced-idr', '1', '-surfaces', '1',
+                '-profile:v', 'baseline', '-pix_fmt', 'yuv420p'
+            ]
         
-        ffmpeg_process = subprocess.Popen(
-            ffmpeg_cmd,
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            bufsize=10**6
+        # 启动输出复用器：标注流只编码一次，编码数据分发给推流地址和录像等输出端；
+        # FFmpeg的启动、写入和重启都在复用器线程内完成，主循环只投递帧
+        output_config = GlobalConfig.instance().get_section('output') or {}
+        status_table = ipc_manager.status_table
+        max_restarts = output_config.get('ffmpeg_max_restarts', DEFAULT_MAX_RESTARTS)
+        muxer = OutputMultiplexer(
+            build_encoder_cmd(frame_width, frame_height, fps, codec_args),
+            name=f"Output-{key}",
+            queue_size=output_config.get('writer_queue_size', DEFAULT_WRITER_QUEUE_SIZE),
+            max_restarts=max_restarts,
+            # 更新推流时间（编码线程是该行frame_count/last_push_time的唯一写者）
+            on_write=lambda: status_table.tick('output', key, 'frame_count', 'last_push_time', time.time())
         )
+        muxer.start()
+        muxer.attach('primary', RemuxSink(build_remux_cmd(output_url), name=f"Remux-{key}", max_restarts=max_restarts))
         
-        output_status['status'] = 'running'
+        # 分段录像与推流共用同一份编码数据
+        segment_seconds = output_config.get('segment_seconds') or 0
+        if segment_seconds > 0:
+            record_dir = os.path.join(output_config.get('file_output_dir', 'output/recordings'), key)
+            os.makedirs(record_dir, exist_ok=True)
+            muxer.attach('record', RemuxSink(
+                build_segment_cmd(os.path.join(record_dir, '%Y%m%d_%H%M%S.ts'), segment_seconds),
+                name=f"Record-{key}", max_restarts=max_restarts))
+        
+        # 是否推送带标注的帧；不需要时（或结果中没有可绘制内容）跳过渲染，原始帧零拷贝写出
+        annotate = output_config.get('annotate', True)
+        # 标注/复制缓冲区池：只有本线程取出，编码线程写出后放回
+        frame_pool = []
+        # 零拷贝租约上限：写出队列中的帧各占一个环形缓冲区槽位，与算法进程、告警写出共用槽位，
+        # 超出上限的帧复制到缓冲区池后立即归还租约，避免槽位被占满后拉流丢弃全部新帧
+        lease_budget = threading.BoundedSemaphore(max(0, int(output_config.get('max_leases', DEFAULT_MAX_LEASES))))
+        
+        def release_lease(lease):
+            lease.release()
+            lease_budget.release()
+        
+        ipc_manager.set_shared_status('output', key, {'status': 'running'})
         
         # 主循环
         consecutive_empty = 0
         max_consecutive_empty = 30
-        ffmpeg_error_count = 0
-        max_ffmpeg_errors = 3
+        reported_dropped = 0
         
         retry_delay = 1
         while not stop_event.is_set():
             try:
+                primary = muxer.get_sink('primary')
+                if muxer.failed or primary is None or not primary.alive:
+                    logger.error(f"FFmpeg编码器或推流输出已失败，停止推流: {key}")
+                    ipc_manager.set_shared_status('output', key, {'status': 'error'})
+                    break
+                
                 # 获取处理后的结果
                 result = ipc_manager.get_result(stream_id, algo_id)
                 
@@ -643,128 +739,55 @@ def streaming_process(stream_id: str, algo_id: str, output_url: str, ipc_manager
                 # 重置连续空计数
                 consecutive_empty = 0
                 
-                # 获取帧数据
+                # 租用帧（零拷贝），写出或被丢弃后由写出线程归还租约
                 frame_ref = result['frame_ref']
-                frame = ipc_manager.memory_manager.get_frame(frame_ref)
+                lease = ipc_manager.memory_manager.lease_frame(frame_ref)
                 
-                if frame is None:
+                if lease is None:
                     ipc_manager.memory_manager.release_frame(frame_ref)
                     continue
                 
-                # 更新推流时间
-                output_status['last_push_time'] = time.time()
-                output_status['frame_count'] = output_status.get('frame_count', 0) + 1
-                
-                # 检查FFmpeg进程状态
-                if ffmpeg_process.poll() is not None:
-                    logger.error(f"FFmpeg进程已终止，返回码: {ffmpeg_process.returncode}")
-                    try:
-                        stderr_output = ffmpeg_process.stderr.read().decode('utf-8', errors='ignore')
-                        logger.error(f"FFmpeg错误输出: {stderr_output}")
-                    except Exception as e:
-                        logger.error(f"无法读取FFmpeg错误输出: {e}")
-                    
-                    # 尝试重启FFmpeg
-                    ffmpeg_error_count += 1
-                    if ffmpeg_error_count >= max_ffmpeg_errors:
-                        logger.error(f"FFmpeg错误次数过多，停止尝试")
-                        output_status['status'] = 'error'
-                        break
-                    
-                    # 重新启动FFmpeg进程
-                    logger.info(f"重新启动FFmpeg进程")
-                    try:
-                        ffmpeg_process = subprocess.Popen(
-                            ffmpeg_cmd,
-                            stdin=subprocess.PIPE,
-                            stdout=subprocess.PIPE,
-                            stderr=subprocess.PIPE,
-                            bufsize=10**6
-                        )
-                    except Exception as e:
-                        logger.error(f"重启FFmpeg失败: {e}")
-                        output_status['status'] = 'error'
-                        break
-                
-                # 将帧写入FFmpeg
-                try:
-                    ffmpeg_process.stdin.write(frame.tobytes())
-                    ffmpeg_process.stdin.flush()
-                except Exception as e:
-                    log_exception("streaming_process", f"{stream_id}_{algo_id}", e)
-                    ffmpeg_error_count += 1
-                    if ffmpeg_error_count >= max_ffmpeg_errors:
-                        logger.error(f"FFmpeg错误次数过多，停止尝试")
-                        output_status['status'] = 'error'
-                        break
-                    
-                    # 尝试重启FFmpeg进程
-                    try:
-                        if ffmpeg_process.poll() is None:
-                            # 尝试正常关闭
-                            try:
-                                ffmpeg_process.stdin.close()
-                                ffmpeg_process.wait(timeout=3)
-                            except:
-                                # 强制终止
-                                try:
-                                    ffmpeg_process.terminate()
-                                    ffmpeg_process.wait(timeout=1)
-                                except:
-                                    try:
-                                        ffmpeg_process.kill()
-                                    except:
-                                        pass
-                        
-                        logger.info(f"重新启动FFmpeg进程")
-                        ffmpeg_process = subprocess.Popen(
-                            ffmpeg_cmd,
-                            stdin=subprocess.PIPE,
-                            stdout=subprocess.PIPE,
-                            stderr=subprocess.PIPE,
-                            bufsize=10**6
-                        )
-                    except Exception as e2:
-                        logger.error(f"重启FFmpeg失败: {e2}")
-                        output_status['status'] = 'error'
-                        break
+                detection_result = (result.get('result_data') or {}).get('detection_result')
+                draw = annotate and needs_annotation(detection_result)
+                if not draw and lease_budget.acquire(blocking=False):
+                    # 无需标注且租约未达上限时原始帧零拷贝写出，写出或被丢弃后归还租约
+                    muxer.submit(lease.frame, lambda lease=lease: release_lease(lease))
+                else:
+                    # 带标注输出或租约已达上限：复制到复用的缓冲区后立即归还租约（在副本上绘制）；编码后缓冲区回到池中
+                    frame = lease.frame
+                    buffer = frame_pool.pop() if frame_pool and frame_pool[-1].shape == frame.shape else np.empty_like(frame)
+                    np.copyto(buffer, frame)
+                    lease.release()
+                    if draw:
+                        draw_results(buffer, detection_result, stream_id=stream_id)
+                    muxer.submit(buffer, lambda buffer=buffer: frame_pool.append(buffer))
                 
-                # 释放帧引用
-                ipc_manager.memory_manager.release_frame(frame_ref)
+                # 网络背压时写出队列丢弃最旧的帧，丢帧数写入状态表
+                if muxer.dropped != reported_dropped:
+                    reported_dropped = muxer.dropped
+                    status_table.update('output', key, {'dropped_count': reported_dropped})
                 
             except Exception as e:
                 log_exception("streaming_process", f"{stream_id}_{algo_id}", e)
-                output_status['errors'] = output_status.get('errors', 0) + 1
+                ipc_manager.increment_shared_status('output', key, 'errors')
                 time.sleep(0.1)
                 retry_delay = min(retry_delay * 2, 30)
                 logger.warning(f"推流重试，{retry_delay}s后重试")
                 time.sleep(retry_delay)
                 continue
         
-        # 关闭FFmpeg进程
-        try:
-            if ffmpeg_process and ffmpeg_process.poll() is None:
-                ffmpeg_process.stdin.close()
-                try:
-                    ffmpeg_process.wait(timeout=5)
-                except subprocess.TimeoutExpired:
-                    ffmpeg_process.terminate()
-                    try:
-                        ffmpeg_process.wait(timeout=2)
-                    except subprocess.TimeoutExpired:
-                        ffmpeg_process.kill()
-        except Exception as e:
-            logger.error(f"关闭FFmpeg进程异常: {e}")
+        # 停止编码器和所有输出端
+        muxer.stop()
+        logger.info(f"推流输出统计: {key}, {muxer.get_stats()}, 标注: {get_renderer().get_stats()}")
         
-        output_status['status'] = 'stopped'
+        ipc_manager.set_shared_status('output', key, {'status': 'stopped'})
         logger.info(f"推流进程结束: {stream_id}, 算法: {algo_id}")
     
     except Exception as e:
         logger.error(f"推流进程整体异常: {e}", exc_info=True)
         key = f"{stream_id}_{algo_id}"
-        if key in ipc_manager.output_status:
-            ipc_manager.output_status[key]['status'] = 'error'
-            ipc_manager.output_status[key]['errors'] = ipc_manager.output_status[key].get('errors', 0) + 1
+        ipc_manager.set_shared_status('output', key, {'status': 'error'})
+        ipc_manager.increment_shared_status('output', key, 'errors')
 
 
 # 4. 告警进程
@@ -786,7 +809,6 @@ def alarm_process(ipc_manager, websocket_url: str, stop_event) -> None:
         try:
             import websocket
             import json
-            import base64
         except ImportError:
             logger.error("无法导入websocket模块，请安装websocket-client库")
             return
@@ -797,7 +819,8 @@ def alarm_process(ipc_manager, websocket_url: str, stop_event) -> None:
         
         def connect_websocket():
             try:
-                ws = websocket.create_connection(websocket_url)
+                # 以告警进程身份连接：服务端不向本连接广播（本进程从不读取连接）
+                ws = websocket.create_connection(producer_url(websocket_url))
                 logger.info(f"WebSocket连接成功: {websocket_url}")
                 return ws
             except Exception as e:
@@ -821,38 +844,22 @@ def alarm_process(ipc_manager, websocket_url: str, stop_event) -> None:
                 continue
             
             try:
-                # 读取告警图片
-                original_img_path = alarm_data.get('original_img_path')
-                processed_img_path = alarm_data.get('processed_img_path')
-                
-                # 将图片编码为base64
-                original_img_base64 = ""
-                processed_img_base64 = ""
-                
-                if original_img_path and os.path.exists(original_img_path):
-                    with open(original_img_path, "rb") as img_file:
-                        original_img_base64 = base64.b64encode(img_file.read()).decode('utf-8')
-                
-                if processed_img_path and os.path.exists(processed_img_path):
-                    with open(processed_img_path, "rb") as img_file:
-                        processed_img_base64 = base64.b64encode(img_file.read()).decode('utf-8')
-                
-                # 构建WebSocket消息
-                message = {
-                    'type': 'alarm',
-                    'alarm_id': alarm_data.get('alarm_id'),
-                    'stream_id': alarm_data.get('stream_id'),
-                    'algo_id': alarm_data.get('algo_id'),
-                    'timestamp': alarm_data.get('timestamp'),
-                    'original_img': original_img_base64,
-                    'processed_img': processed_img_base64,
-                    'detection_result': alarm_data.get('detection_result')
-                }
+                # 告警图片：使用写出线程池编码好的字节，旧格式告警数据才从磁盘读取
+                media = {}
+                for kind in MEDIA_KINDS:
+                    data = alarm_data.get(f'{kind}_jpeg')
+                    if not data and kind in FULL_KINDS:
+                        data = read_file_bytes(alarm_data.get(f'{kind}_img_path'))
+                    if data:
+                        media[kind] = data
                 
-                # 发送WebSocket消息
+                # 元数据为紧凑JSON文本帧，图片为独立二进制帧（不再base64编码）
+                metadata = build_alarm_metadata(alarm_data, media)
                 try:
-                    ws.send(json.dumps(message))
-                    logger.info(f"告警消息已发送: {alarm_data.get('alarm_id')}")
+                    ws.send(json.dumps(metadata, ensure_ascii=False, separators=(',', ':')))
+                    for kind, data in media.items():
+                        ws.send_binary(pack_media_frame(metadata['alarm_id'], kind, data))
+                    logger.info(f"告警消息已发送: {alarm_data.get('alarm_id')}, 图片字节数: {sum(map(len, media.values()))}")
                 except Exception as e:
                     logger.error(f"WebSocket发送消息失败: {e}")
                     ws.close()
@@ -875,16 +882,24 @@ def alarm_process(ipc_manager, websocket_url: str, stop_event) -> None:
 
 
 # 5. 辅助函数
-def get_next_frame(ipc_manager, stream_id: str) -> Tuple[Optional[Any], Optional[Any]]:
+def read_file_bytes(path: Optional[str]) -> bytes:
+    """读取文件内容，路径为空或不存在时返回空字节"""
+    if not path or not os.path.exists(path):
+        return b''
+    with open(path, "rb") as f:
+        return f.read()
+
+def get_next_frame(ipc_manager, stream_id: str, consumer_id: str = 'default') -> Tuple[Optional[Any], Optional[Any]]:
     """
-    从共享队列获取下一帧。
+    从帧广播通道获取下一帧。
     Args:
         ipc_manager: IPC管理器实例
         stream_id: 流ID
+        consumer_id: 消费者ID，不同消费者各自看到每一帧
     Returns:
         (帧引用, 帧数据)
     """
-    frame_ref = ipc_manager.get_frame(stream_id)
+    frame_ref = ipc_manager.get_frame(stream_id, consumer_id=consumer_id)
     if not frame_ref:
         return None, None
     frame = ipc_manager.memory_manager.get_frame(frame_ref)
@@ -906,45 +921,59 @@ def process_frame(model: Any, postprocessor, frame: Any) -> Tuple[Dict, Any]:
     draw_results(processed_frame, post_result)
     return post_result, processed_frame
 
-def handle_alarm(ipc_manager, stream_id: str, algo_id: str, frame: Any, processed_frame: Any, post_result: Dict, temp_dir: str, last_alarm_time: float, alarm_cooldown: int, save_alarm: bool = True) -> float:
+def handle_alarm(ipc_manager, stream_id: str, algo_id: str, frame: Any, processed_frame: Optional[Any], post_result: Dict, temp_dir: str, last_alarm_time: float, alarm_cooldown: int, save_alarm: bool = True, frame_ref: Any = None, media_writer: Optional[AlarmMediaWriter] = None) -> float:
     """
     处理告警逻辑，检查是否触发告警并保存图片。
+    有告警媒体写出线程池时，绘制、JPEG编码和落盘都交给线程池，本函数只租用帧后立即返回。
     Args:
         ipc_manager: IPC管理器实例
         stream_id: 流ID
         algo_id: 算法ID
-        frame: 原始帧
-        processed_frame: 处理后的帧
+        frame: 原始帧（可为只读租约视图）
+        processed_frame: 处理后的帧，为None时仅在触发告警时复制原始帧并绘制
         post_result: 后处理结果
         temp_dir: 临时文件目录
         last_alarm_time: 上次告警时间
         alarm_cooldown: 告警冷却时间(秒)
         save_alarm: 是否保存告警图片
+        frame_ref: 帧引用，提供时为线程池另行租用该帧（零拷贝）
+        media_writer: 告警媒体写出线程池，为None时在当前线程同步编码写出
     Returns:
         更新后的上次告警时间
     """
     current_time = time.time()
     has_alarm = check_alarm(post_result)
     if has_alarm and (current_time - last_alarm_time > alarm_cooldown) and save_alarm:
-        from datetime import datetime
-        import uuid
         last_alarm_time = current_time
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         alarm_id = f"alarm_{timestamp}_{uuid.uuid4().hex[:8]}"
-        original_img_path = os.path.join(temp_dir, f"{alarm_id}_original.jpg")
-        processed_img_path = os.path.join(temp_dir, f"{alarm_id}_processed.jpg")
-        import cv2
-        cv2.imwrite(original_img_path, frame)
-        cv2.imwrite(processed_img_path, processed_frame)
         alarm_data = {
             'alarm_id': alarm_id,
+            'frame_id': frame_ref.seq if frame_ref is not None else None,
             'stream_id': stream_id,
             'algo_id': algo_id,
             'timestamp': current_time,
-            'original_img_path': original_img_path,
-            'processed_img_path': processed_img_path,
             'detection_result': post_result
         }
+        if media_writer is not None:
+            lease = ipc_manager.memory_manager.lease_frame(frame_ref) if frame_ref is not None else None
+            if lease is None:
+                # 调用方的帧在返回后可能被覆盖，交给线程池前先复制
+                frame = frame.copy()
+            media_writer.submit(alarm_data, temp_dir, frame=frame, lease=lease,
+                                processed_frame=processed_frame, post_result=post_result)
+            return last_alarm_time
+        
+        # 同步路径：每张图只编码一次，字节随告警数据发送
+        if processed_frame is None:
+            processed_frame = draw_results(frame.copy(), post_result, stream_id=stream_id)
+        for kind, image in (('original', frame), ('processed', processed_frame)):
+            data = encode_jpeg(image, DEFAULT_JPEG_QUALITY)
+            path = os.path.join(temp_dir, f"{alarm_id}_{kind}.jpg")
+            with open(path, 'wb') as f:
+                f.write(data)
+            alarm_data[f'{kind}_jpeg'] = data
+            alarm_data[f'{kind}_img_path'] = path
         ipc_manager.put_alarm(alarm_data)
     return last_alarm_time
 
@@ -965,36 +994,24 @@ def put_result(ipc_manager, stream_id: str, algo_id: str, frame_ref: Any, post_r
     }
     ipc_manager.put_result(stream_id, algo_id, frame_ref, result_data)
 
-def draw_results(frame: Any, results: Dict, draw_strategy: Optional[Callable[[Any, Dict], Any]] = None) -> Any:
+def draw_results(frame: Any, results: Dict, draw_strategy: Optional[Callable[[Any, Dict], Any]] = None, stream_id: str = '-') -> Any:
     """
     在图像上绘制检测结果，支持自定义绘制策略。
+    ROI多边形按(流, 分辨率)缓存为静态叠加层，每帧只混合一次并绘制动态检测框。
     Args:
-        frame: 输入帧
+        frame: 输入帧（原地绘制）
         results: 检测结果字典
         draw_strategy: 可选，自定义绘制函数
+        stream_id: 流ID，用于静态叠加层缓存
     Returns:
         绘制后的帧
     """
     if draw_strategy:
         return draw_strategy(frame, results)
     try:
-        for rect in results['data']['bbox']['rectangles']:
-            x1, y1, x2, y2 = rect['xyxy']
-            color = rect['color']
-            label = rect.get('label', '')
-            conf = rect.get('conf', 0)
-            import cv2
-            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-            text = f"{label} {conf:.2f}"
-            cv2.putText(frame, text, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-        for poly_id, poly_data in results['data']['bbox']['polygons'].items():
-            import numpy as np
-            points = np.array(poly_data['polygon'], np.int32)
-            points = points.reshape((-1, 1, 2))
-            color = poly_data.get('color', [0, 255, 0])
-            cv2.polylines(frame, [points], True, color, 2)
+        get_renderer().render(frame, results, stream_id)
     except Exception as e:
-        log_exception("draw_results", "-", e)
+        log_exception("draw_results", stream_id, e)
     return frame
 
 def check_alarm(results: Dict, alarm_strategy: Optional[Callable[[Dict], bool]] = None, threshold: float = 0.6) -> bool:
@@ -322,6 +322,87 @@ class TestAlarmModule(unittest.TestCase):
         self.assertEqual(processed_count, 3)
         self.assertEqual(new_count, 2)
     
+    def test_get_alarms_cursor(self):
+        """测试告警列表游标分页（复合索引由应用启动时补建，见test_pagination）"""
+        from app.db.pagination import encode_cursor
+        for i in range(7):
+            self.alarm_module._save_alarm({
+                "alarm_id": f"alarm_page_{i}", "task_id": "test_task_page", "stream_id": "test_stream_001",
+                "label": "person", "confidence": 0.9, "bbox": [0, 0, 1, 1], "frame_id": i,
+                "timestamp": "2024-12-19T10:30:00", "created_at": 1734575400 + i // 3,
+                "status": "new", "level": "high"
+            })
+        
+        ids, cursor = [], None
+        while True:
+            filters = {"task_id": "test_task_page", "limit": 3}
+            if cursor:
+                filters["cursor"] = cursor
+            page = self.alarm_module.get_alarms(filters)
+            ids.extend(alarm["alarm_id"] for alarm in page)
+            if len(page) < 3:
+                break
+            cursor = encode_cursor(page[-1]["created_at"], page[-1]["alarm_id"])
+        
+        expected = [a["alarm_id"] for a in self.alarm_module.get_alarms({"task_id": "test_task_page"})]
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(set(ids)), 7)
+    
+    def _create_task(self, task_id, alarm_config):
+        """创建带告警配置的任务记录"""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE IF NOT EXISTS tasks (task_id TEXT PRIMARY KEY, alarm_config TEXT)")
+        conn.execute("INSERT OR REPLACE INTO tasks (task_id, alarm_config) VALUES (?, ?)",
+                     (task_id, json.dumps(alarm_config) if alarm_config is not None else None))
+        conn.commit()
+        conn.close()
+    
+    def test_alarm_rule_evaluation(self):
+        """测试一帧结果一次判断阈值、类别与冷却"""
+        self.alarm_module.rule_cache.invalidate()
+        self.alarm_module.alarm_cache.clear()
+        self._create_task("test_task_rule", {"confidence_threshold": 0.6, "classes": ["person", "car"], "cooldown": 60})
+        
+        objects = [{"label": "person", "confidence": 0.9}] * 30 + [
+            {"label": "car", "confidence": 0.5},
+            {"label": "dog", "confidence": 0.95},
+            {"label": "car", "confidence": 0.7}
+        ]
+        triggered = self.alarm_module._evaluate_alarms("test_task_rule", objects)
+        self.assertEqual([obj["label"] for obj in triggered], ["person", "car"])
+        self.assertEqual(triggered[1]["confidence"], 0.7)
+        
+        # 冷却期内不再触发；未配置的任务不触发
+        self.assertEqual(self.alarm_module._evaluate_alarms("test_task_rule", objects), [])
+        self.assertFalse(self.alarm_module._should_trigger_alarm("test_task_missing", objects[0]))
+        
+        # 空配置使用默认配置（所有类别、默认阈值）
+        self._create_task("test_task_default", None)
+        self.assertTrue(self.alarm_module._should_trigger_alarm("test_task_default", {"label": "dog", "confidence": 0.55}))
+    
+    def test_alarm_rule_cache(self):
+        """测试告警规则按任务缓存，任务更新事件使缓存失效"""
+        from app.core.analyzer.event_bus import Event
+        cache = self.alarm_module.rule_cache
+        cache.invalidate()
+        self.alarm_module.alarm_cache.clear()
+        self._create_task("test_task_cache", {"confidence_threshold": 0.9})
+        
+        stats = cache.get_stats()
+        obj = {"label": "person", "confidence": 0.8}
+        for _ in range(5):
+            self.assertFalse(self.alarm_module._should_trigger_alarm("test_task_cache", obj))
+        after = cache.get_stats()
+        self.assertEqual(after["misses"] - stats["misses"], 1)
+        self.assertEqual(after["hits"] - stats["hits"], 4)
+        
+        # 修改数据库后缓存仍生效，收到任务更新事件后重新加载
+        self._create_task("test_task_cache", {"confidence_threshold": 0.5})
+        self.assertFalse(self.alarm_module._should_trigger_alarm("test_task_cache", obj))
+        self.alarm_module._handle_task_changed(Event("task.updated", "test", {"task_id": "test_task_cache"}))
+        self.assertTrue(self.alarm_module._should_trigger_alarm("test_task_cache", obj))
+        self.assertGreater(self.alarm_module.get_rule_cache_stats()["invalidations"], 0)
+    
     @patch('app.core.analyzer.alarm_module.logger')
     def test_error_handling(self, mock_logger):
         """测试错误处理"""
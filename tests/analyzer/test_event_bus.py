@@ -11,7 +11,9 @@ import threading
 # 添加项目路径
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
-from app.core.analyzer.event.event_bus import Event, EventBus
+from app.core.analyzer.event.event_bus import (
+    Event, EventBus, OVERFLOW_DROP_NEW, OVERFLOW_DROP_OLDEST, _ShardQueue
+)
 
 class TestEventBus(unittest.TestCase):
     """事件总线测试类"""
@@ -164,5 +166,129 @@ class TestEventBus(unittest.TestCase):
         self.assertEqual(stats["subscriber_count"], 1)
         self.assertIn("test_event", stats["event_types"])
 
+    def test_stream_ordering_and_isolation(self):
+        """测试同一视频流的事件按顺序处理，慢回调不阻塞其他分片"""
+        release = threading.Event()
+        done = threading.Event()
+
+        bus = EventBus()
+        bus.start(thread_count=2)
+        # 按主题+stream_id分片，选取分到不同分片的两个视频流
+        slow_id = "stream_0"
+        fast_id = next(f"stream_{i}" for i in range(1, 100)
+                       if bus.shard_index(Event("frame", "test", {"stream_id": f"stream_{i}"}))
+                       != bus.shard_index(Event("frame", "test", {"stream_id": slow_id})))
+        received = {slow_id: [], fast_id: []}
+
+        def callback(event):
+            stream_id = event.data["stream_id"]
+            if stream_id == slow_id and event.data["seq"] == 0:
+                release.wait(timeout=5.0)  # 模拟慢回调
+            received[stream_id].append(event.data["seq"])
+            if len(received[slow_id]) == 20:
+                done.set()
+
+        try:
+            bus.subscribe("frame", callback)
+            for seq in range(20):
+                bus.publish(Event("frame", "test", {"stream_id": slow_id, "seq": seq}))
+                bus.publish(Event("frame", "test", {"stream_id": fast_id, "seq": seq}))
+
+            deadline = time.time() + 2.0
+            while len(received[fast_id]) < 20 and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(received[fast_id], list(range(20)))
+            self.assertEqual(received[slow_id], [])
+
+            release.set()
+            self.assertTrue(done.wait(timeout=2.0))
+            self.assertEqual(received[slow_id], list(range(20)))
+        finally:
+            release.set()
+            bus.stop()
+
+    def test_prefix_subscription(self):
+        """测试前缀订阅接收同一主题的全部事件"""
+        self.event_bus.subscribe("task.*", lambda event: self.results.append(event.event_type))
+        self.event_bus.publish_immediate(Event("task.started", "sender", {"task_id": "t1"}))
+        self.event_bus.publish_immediate(Event("task.stopped", "sender", {"task_id": "t1", "stream_id": "s1"}))
+        self.event_bus.publish_immediate(Event("stream.started", "sender", {"stream_id": "s1"}))
+        self.assertEqual(self.results, ["task.started", "task.stopped"])
+
+    def test_overflow_policies(self):
+        """测试队列满时的溢出策略"""
+        release = threading.Event()
+        bus = EventBus(queue_size=2, overflow_policy=OVERFLOW_DROP_NEW)
+        bus.start(thread_count=1)
+        try:
+            started = threading.Event()
+
+            def callback(event):
+                started.set()
+                release.wait(timeout=5.0)
+
+            bus.subscribe("test_event", callback)
+            self.assertTrue(bus.publish(Event("test_event", "sender", 0)))
+            started.wait(timeout=2.0)  # 第一个事件处理中，队列为空
+            self.assertTrue(bus.publish(Event("test_event", "sender", 1)))
+            self.assertTrue(bus.publish(Event("test_event", "sender", 2)))
+            self.assertFalse(bus.publish(Event("test_event", "sender", 3)))
+            self.assertEqual(bus.get_stats()["events_dropped"], 1)
+        finally:
+            release.set()
+            bus.stop()
+
+        # 丢弃优先级最低且最早的事件，新事件优先级更低时丢弃新事件
+        shard = _ShardQueue(2)
+        self.assertTrue(shard.put(Event("low1", "sender", priority=1), OVERFLOW_DROP_OLDEST, 0))
+        self.assertTrue(shard.put(Event("low2", "sender", priority=1), OVERFLOW_DROP_OLDEST, 0))
+        self.assertTrue(shard.put(Event("high", "sender", priority=5), OVERFLOW_DROP_OLDEST, 0))
+        self.assertFalse(shard.put(Event("lowest", "sender", priority=0), OVERFLOW_DROP_OLDEST, 0))
+        self.assertEqual([shard.get(0).event_type, shard.get(0).event_type], ["high", "low2"])
+        self.assertEqual(shard.stats["evicted"], 1)
+        self.assertEqual(shard.stats["dropped"], 2)
+
+    def test_subscriber_timing(self):
+        """测试按订阅者统计耗时分布"""
+        def slow_callback(event):
+            time.sleep(0.02)
+
+        def failing_callback(event):
+            raise RuntimeError("boom")
+
+        self.event_bus.subscribe("test_event", slow_callback)
+        self.event_bus.subscribe("*", failing_callback)
+        self.event_bus.publish_immediate(Event("test_event", "sender"))
+
+        subscribers = self.event_bus.get_stats()["subscribers"]
+        slow = next(stats for name, stats in subscribers.items() if name.endswith("slow_callback"))
+        failing = next(stats for name, stats in subscribers.items() if name.endswith("failing_callback"))
+        self.assertEqual(slow["calls"], 1)
+        self.assertGreaterEqual(slow["max_ms"], 15)
+        self.assertEqual(slow["histogram"]["<=50ms"], 1)
+        self.assertEqual(failing["errors"], 1)
+
+    def test_subscriber_timing_per_callback(self):
+        """测试不同实例的同名方法分别统计耗时，取消订阅后移除统计"""
+        class Handler:
+            def __init__(self, delay):
+                self.delay = delay
+
+            def on_event(self, event):
+                time.sleep(self.delay)
+
+        slow, fast = Handler(0.02), Handler(0)
+        self.event_bus.subscribe("test_event", slow.on_event)
+        self.event_bus.subscribe("test_event", fast.on_event)
+        self.event_bus.publish_immediate(Event("test_event", "sender"))
+
+        subscribers = self.event_bus.get_stats()["subscribers"]
+        self.assertEqual(len(subscribers), 2)
+        self.assertEqual(sorted(stats["calls"] for stats in subscribers.values()), [1, 1])
+        self.assertEqual(sorted(stats["histogram"]["<=50ms"] for stats in subscribers.values()), [0, 1])
+
+        self.event_bus.unsubscribe("test_event", slow.on_event)
+        self.assertEqual(len(self.event_bus.get_stats()["subscribers"]), 1)
+
 if __name__ == "__main__":
     unittest.main() 
\ No newline at end of file
@@ -304,6 +304,70 @@ class TestOutputModule(unittest.TestCase):
             success, error = self.output_module.stop_output(output_id)
             self.assertTrue(success)
     
+    def test_outputs_share_encoder(self):
+        """测试同一任务的多个输出共用一个编码器，停止输出只卸载输出端"""
+        task_id = "task_shared_encoder_001"
+        config = {"width": 320, "height": 240, "fps": 25}
+        
+        success, _ = self.output_module.create_output("output_shared_rtmp", task_id, "rtmp://test.example.com/live/a", "rtmp", config)
+        self.assertTrue(success)
+        success, _ = self.output_module.create_output("output_shared_preview", task_id, "", "preview", config)
+        self.assertTrue(success)
+        
+        # 两个输出挂载在同一个编码器上
+        encoder_key = (task_id, 320, 240, 25)
+        self.assertEqual(len([key for key in self.output_module.encoders if key[0] == task_id]), 1)
+        encoder = self.output_module.encoders[encoder_key]
+        self.assertEqual(encoder["outputs"], {"output_shared_rtmp", "output_shared_preview"})
+        muxer = encoder["muxer"]
+        
+        # 停止一个输出不影响编码器
+        success, _ = self.output_module.stop_output("output_shared_rtmp")
+        self.assertTrue(success)
+        self.assertIs(self.output_module.encoders[encoder_key]["muxer"], muxer)
+        self.assertEqual(muxer.sink_ids(), ["output_shared_preview"])
+        
+        # 最后一个输出停止后编码器随之停止
+        success, _ = self.output_module.stop_output("output_shared_preview")
+        self.assertTrue(success)
+        self.assertNotIn(encoder_key, self.output_module.encoders)
+    
+    def test_encoder_joined_outside_lock(self):
+        """测试停止最后一个输出时在释放锁后等待编码线程退出"""
+        task_id = "task_join_outside_lock_001"
+        config = {"width": 320, "height": 240, "fps": 25}
+        success, _ = self.output_module.create_output("output_join_preview", task_id, "", "preview", config)
+        self.assertTrue(success)
+
+        encoder = self.output_module.encoders[(task_id, 320, 240, 25)]
+        thread = encoder["thread"]
+        lock_free = []
+
+        def probe():
+            acquired = self.output_module.lock.acquire(timeout=1.0)
+            lock_free.append(acquired)
+            if acquired:
+                self.output_module.lock.release()
+
+        def join(timeout=None):
+            # 其他线程此时应能获取输出模块的锁
+            prober = threading.Thread(target=probe)
+            prober.start()
+            prober.join()
+            thread.join(timeout)
+
+        encoder["thread"] = Mock(join=join, is_alive=thread.is_alive)
+        success, _ = self.output_module.stop_output("output_join_preview")
+        self.assertTrue(success)
+        self.assertEqual(lock_free, [True])
+        self.assertFalse(thread.is_alive())
+
+    def test_unsupported_output_type(self):
+        """测试不支持的输出类型"""
+        success, error = self.output_module.create_output("output_bad_type", "task_bad_type", "x", "hls")
+        self.assertFalse(success)
+        self.assertIsNotNone(error)
+    
     @patch('app.core.analyzer.output_module.logger')
     def test_error_handling(self, mock_logger):
         """测试错误处理"""
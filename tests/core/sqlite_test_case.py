@@ -0,0 +1,41 @@
+"""
+内存SQLite测试基类
+每个用例使用独立的内存数据库，建表后可记录执行的SQL语句，用于断言缓存命中时不再查询
+"""
+
+import os
+import sys
+import unittest
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.db.database import Base
+
+
+class SQLiteTestCase(unittest.TestCase):
+    """内存SQLite测试基类，子类通过models指定要建的表"""
+
+    models = ()
+    metadata = Base.metadata
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        self.metadata.create_all(self.engine, tables=[model.__table__ for model in self.models])
+        self.db = sessionmaker(bind=self.engine)()
+        self.queries = []
+
+    def tearDown(self):
+        if event.contains(self.engine, "before_cursor_execute", self._record):
+            event.remove(self.engine, "before_cursor_execute", self._record)
+        self.db.close()
+
+    def record_queries(self) -> None:
+        """开始记录执行的SQL语句（准备数据之后调用）"""
+        event.listen(self.engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, *args):
+        self.queries.append(statement)
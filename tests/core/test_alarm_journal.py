@@ -0,0 +1,98 @@
+"""
+告警写入日志单元测试
+测试分组提交、Future结果、刷新与失败隔离
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.core.alarm_journal import AlarmJournal, get_alarm_journal, flush_alarm_journal
+
+
+class TestAlarmJournal(unittest.TestCase):
+    """告警写入日志测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'alarms.db')
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE alarms (alarm_id TEXT PRIMARY KEY, label TEXT, image_path TEXT)")
+        conn.commit()
+        conn.close()
+        self.journal = AlarmJournal(self.db_path, batch_interval=0.2, batch_size=50, idle_timeout=1.0)
+
+    def tearDown(self):
+        import shutil
+        self.journal.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _count(self):
+        conn = sqlite3.connect(self.db_path)
+        count = conn.execute("SELECT COUNT(*) FROM alarms").fetchone()[0]
+        conn.close()
+        return count
+
+    def test_group_commit(self):
+        """测试多条语句分组到少量事务中提交"""
+        futures = [self.journal.submit("INSERT INTO alarms (alarm_id, label) VALUES (?, ?)", (f"alarm_{i}", "person"))
+                   for i in range(120)]
+        self.assertTrue(self.journal.flush())
+        self.assertTrue(all(future.result(1.0) == 1 for future in futures))
+        self.assertEqual(self._count(), 120)
+
+        stats = self.journal.get_stats()
+        self.assertEqual(stats["committed"], 120)
+        self.assertLessEqual(stats["batches"], 4)
+        self.assertLessEqual(stats["max_batch"], 50)
+
+    def test_ordering_and_wal(self):
+        """测试插入与更新按提交顺序执行，连接使用WAL模式"""
+        self.journal.submit("INSERT INTO alarms (alarm_id, label) VALUES (?, ?)", ("alarm_1", "car"))
+        update = self.journal.submit("UPDATE alarms SET image_path = ? WHERE alarm_id = ?", ("a.jpg", "alarm_1"))
+        self.assertEqual(update.result(2.0), 1)
+
+        conn = sqlite3.connect(self.db_path)
+        self.assertEqual(conn.execute("SELECT image_path FROM alarms").fetchone()[0], "a.jpg")
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        conn.close()
+
+    def test_statement_failure_isolated(self):
+        """测试单条语句失败不影响同批其他语句"""
+        first = self.journal.submit("INSERT INTO alarms (alarm_id) VALUES (?)", ("alarm_1",))
+        duplicate = self.journal.submit("INSERT INTO alarms (alarm_id) VALUES (?)", ("alarm_1",))
+        second = self.journal.submit("INSERT INTO alarms (alarm_id) VALUES (?)", ("alarm_2",))
+        self.journal.flush()
+
+        self.assertEqual(first.result(), 1)
+        self.assertIsInstance(duplicate.exception(), sqlite3.IntegrityError)
+        self.assertEqual(second.result(), 1)
+        self.assertEqual(self._count(), 2)
+        self.assertEqual(self.journal.get_stats()["failed"], 1)
+
+    def test_writer_restarts_after_close(self):
+        """测试关闭后再次提交会重启写线程"""
+        self.journal.submit("INSERT INTO alarms (alarm_id) VALUES (?)", ("alarm_1",))
+        self.journal.close()
+        self.assertFalse(self.journal.get_stats()["running"])
+        self.assertEqual(self._count(), 1)
+
+        future = self.journal.submit("INSERT INTO alarms (alarm_id) VALUES (?)", ("alarm_2",))
+        self.assertEqual(future.result(2.0), 1)
+
+    def test_registry(self):
+        """测试同一数据库文件共用一个写入日志"""
+        relative = os.path.relpath(self.db_path)
+        journal = get_alarm_journal(self.db_path)
+        self.assertIs(get_alarm_journal(relative), journal)
+        self.assertIsNone(get_alarm_journal(os.path.join(self.temp_dir, 'other.db'), create=False))
+        self.assertTrue(flush_alarm_journal(os.path.join(self.temp_dir, 'other.db')))
+        journal.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+"""
+告警媒体写出线程池单元测试
+测试一次编码同时得到字节与文件、租约归还、租约上限时复制帧以及队列满时丢弃
+"""
+
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import time
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from core.alarm_media import AlarmMediaWriter
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class FakeLease:
+    """帧租约替身（只读视图、复制、归还）"""
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.frame.flags.writeable = False
+        self.released = 0
+
+    def copy(self):
+        return self.frame.copy()
+
+    def release(self):
+        self.released += 1
+
+
+def draw_box(frame, result):
+    frame[10:20, 10:20] = 255
+    return frame
+
+
+class TestAlarmMediaWriter(unittest.TestCase):
+    """告警媒体写出线程池测试类"""
+
+    def setUp(self):
+        """测试前设置"""
+        self.save_dir = tempfile.mkdtemp()
+        self.published = []
+        self.frame = np.random.randint(0, 255, (360, 640, 3), dtype=np.uint8)
+
+    def tearDown(self):
+        """测试后清理"""
+        shutil.rmtree(self.save_dir, ignore_errors=True)
+
+    def test_encode_once_and_publish_bytes(self):
+        """测试每张图编码一次，文件内容与随告警发布的字节一致，缩略图更小"""
+        writer = AlarmMediaWriter(self.published.append, draw_box, workers=1, thumbnail_width=160)
+        lease = FakeLease(self.frame)
+        self.assertTrue(writer.submit({'alarm_id': 'a1'}, self.save_dir, lease=lease, post_result={}))
+        self.assertTrue(wait_for(lambda: len(self.published) == 1))
+        writer.stop()
+
+        alarm = self.published[0]
+        self.assertEqual(lease.released, 1)
+        for kind in ('original', 'processed'):
+            with open(alarm[f'{kind}_img_path'], 'rb') as f:
+                self.assertEqual(f.read(), alarm[f'{kind}_jpeg'])
+            self.assertLess(len(alarm[f'{kind}_thumb_jpeg']), len(alarm[f'{kind}_jpeg']))
+        self.assertTrue(os.path.exists(alarm['processed_thumb_path']))
+        self.assertNotEqual(alarm['original_jpeg'], alarm['processed_jpeg'])
+        # 租约帧只读，绘制在副本上进行
+        self.assertFalse(self.frame.flags.writeable)
+        self.assertEqual(writer.get_stats()['held_leases'], 0)
+
+    def test_copy_beyond_max_leases(self):
+        """测试持有租约达到上限时复制帧并立即归还租约"""
+        gate = threading.Event()
+        writer = AlarmMediaWriter(lambda data: gate.wait(5), draw_box, workers=1, max_leases=1,
+                                  thumbnail_width=0, save=False)
+        first, second = FakeLease(self.frame), FakeLease(self.frame.copy())
+        writer.submit({'alarm_id': 'a1'}, self.save_dir, lease=first, post_result={})
+        self.assertTrue(wait_for(lambda: first.released == 1))
+        # 写出线程阻塞在发布回调中，租约已归还，可继续持有新租约
+        third = FakeLease(self.frame.copy())
+        writer.submit({'alarm_id': 'a2'}, self.save_dir, lease=second, post_result={})
+        writer.submit({'alarm_id': 'a3'}, self.save_dir, lease=third, post_result={})
+        self.assertEqual(third.released, 1)
+        self.assertEqual(second.released, 0)
+        self.assertEqual(writer.get_stats()['copied'], 1)
+        gate.set()
+        writer.stop()
+        self.assertEqual(second.released, 1)
+        self.assertEqual(os.listdir(self.save_dir), [])
+
+    def test_full_queue_drops_and_releases(self):
+        """测试队列满时丢弃新告警并归还租约，提交方不阻塞"""
+        gate = threading.Event()
+        writer = AlarmMediaWriter(lambda data: gate.wait(5), draw_box, workers=1, queue_size=1,
+                                  max_leases=8, thumbnail_width=0)
+        leases = [FakeLease(self.frame.copy()) for _ in range(4)]
+        writer.submit({'alarm_id': 'a0'}, self.save_dir, lease=leases[0], post_result={})
+        self.assertTrue(wait_for(lambda: leases[0].released == 1))
+        results = [writer.submit({'alarm_id': f'a{i}'}, self.save_dir, lease=leases[i], post_result={})
+                   for i in range(1, 4)]
+        self.assertEqual(results, [True, False, False])
+        self.assertEqual([lease.released for lease in leases[2:]], [1, 1])
+        self.assertEqual(writer.get_stats()['dropped'], 2)
+        gate.set()
+        writer.stop()
+        self.assertEqual(writer.get_stats()['written'], 2)
+        self.assertEqual(writer.get_stats()['held_leases'], 0)
+
+    def test_concurrent_submit_counts(self):
+        """测试多个提交线程与写出线程并发更新计数时不丢失"""
+        writer = AlarmMediaWriter(self.published.append, draw_box, workers=2, queue_size=4,
+                                  max_leases=1, thumbnail_width=0, save=False)
+        frame = np.zeros((32, 32, 3), dtype=np.uint8)
+
+        def submit_many(index):
+            for i in range(50):
+                writer.submit({'alarm_id': f'a{index}_{i}'}, self.save_dir,
+                              lease=FakeLease(frame.copy()), post_result={})
+
+        threads = [threading.Thread(target=submit_many, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        writer.stop()
+
+        stats = writer.get_stats()
+        self.assertEqual(stats['submitted'] + stats['dropped'], 200)
+        self.assertEqual(stats['written'], stats['submitted'])
+        self.assertEqual(stats['written'], len(self.published))
+        self.assertEqual(stats['held_leases'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -141,16 +141,16 @@ class TestAlarmProcessor(unittest.TestCase):
         finally:
             loop.close()
     
-    @patch('app.core.alarm_processor.SessionLocal')
+    @patch('app.core.alarm_processor.get_alarm_journal')
     @patch('app.utils.utils.generate_unique_id')
-    def test_create_alarm_record(self, mock_generate_id, mock_session_local):
+    def test_create_alarm_record(self, mock_generate_id, mock_get_journal):
         """测试创建告警记录"""
         # 模拟ID生成
         mock_generate_id.return_value = "alarm_test_001"
         
-        # 模拟数据库连接
-        mock_session = Mock()
-        mock_session_local.return_value = mock_session
+        # 模拟告警写入日志
+        mock_journal = Mock()
+        mock_get_journal.return_value = mock_journal
         
         # 测试数据
         detection_result = {
@@ -170,14 +170,103 @@ class TestAlarmProcessor(unittest.TestCase):
                 self.alarm_processor._create_alarm_record("test_task_001", detection_result)
             )
             
-            # 验证结果
+            # 验证结果：提交到写入日志后立即返回告警ID
             self.assertIsNotNone(alarm_id)
             self.assertTrue(alarm_id.startswith("alarm"))
-            mock_session.add.assert_called_once()
-            mock_session.commit.assert_called_once()
+            mock_journal.submit.assert_called_once()
+            sql, params = mock_journal.submit.call_args[0]
+            self.assertTrue(sql.startswith("INSERT INTO alarms"))
+            self.assertEqual(params[0], alarm_id)
+            self.assertEqual(params[1], "test_task_001")
+        finally:
+            loop.close()
+    
+    def test_alarm_record_journal(self):
+        """测试告警记录经写入日志落库，媒体路径更新按提交顺序执行"""
+        from app.core.alarm_journal import get_alarm_journal
+        # 与Alarm模型一致的告警表
+        db_path = os.path.join(self.temp_dir, 'journal.db')
+        conn = sqlite3.connect(db_path)
+        conn.execute("""
+            CREATE TABLE alarms (
+                alarm_id TEXT PRIMARY KEY, task_id TEXT, alarm_type TEXT, confidence REAL, bbox TEXT,
+                original_image TEXT, processed_image TEXT, video_clip TEXT, status TEXT, level TEXT,
+                processed BOOLEAN, severity TEXT, created_at DATETIME
+            )
+        """)
+        conn.commit()
+        conn.close()
+        
+        self.alarm_processor.db_path = db_path
+        detection_result = {
+            "task_id": "test_task_001",
+            "detections": [{"class": "person", "confidence": 0.9, "bbox": [1, 2, 3, 4]}]
+        }
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            alarm_id = loop.run_until_complete(
+                self.alarm_processor._create_alarm_record("test_task_001", detection_result)
+            )
+            loop.run_until_complete(
+                self.alarm_processor._update_alarm_media_paths(alarm_id, {"original_image": "a.jpg"})
+            )
         finally:
             loop.close()
+        
+        journal = get_alarm_journal(db_path)
+        self.assertTrue(journal.flush())
+        journal.close()
+        conn = sqlite3.connect(db_path)
+        row = conn.execute("SELECT alarm_type, original_image, status FROM alarms WHERE alarm_id = ?",
+                           (alarm_id,)).fetchone()
+        conn.close()
+        self.assertEqual(row, ("person", "a.jpg", "new"))
     
+    def test_alarm_record_float_timestamp(self):
+        """测试时间戳为float时按本地时间落库，ORM可正常读回"""
+        from datetime import datetime
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from app.core.alarm_journal import get_alarm_journal
+        from app.db.database import Base
+        from app.db.models import Alarm
+
+        db_path = os.path.join(self.temp_dir, 'orm.db')
+        engine = create_engine(f"sqlite:///{db_path}")
+        Base.metadata.create_all(engine, tables=[Alarm.__table__])
+        self.alarm_processor.db_path = db_path
+        timestamp = 1697456789.123
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            alarm_id = loop.run_until_complete(self.alarm_processor._create_alarm_record("test_task_001", {
+                "timestamp": timestamp,
+                "detections": [{"class": "person", "confidence": 0.9, "bbox": [1, 2, 3, 4]}]
+            }))
+        finally:
+            loop.close()
+
+        journal = get_alarm_journal(db_path)
+        self.assertTrue(journal.flush())
+        journal.close()
+        db = sessionmaker(bind=engine)()
+        try:
+            alarm = db.query(Alarm).filter(Alarm.alarm_id == alarm_id).first()
+            self.assertEqual(alarm.created_at, datetime.fromtimestamp(timestamp))
+        finally:
+            db.close()
+            engine.dispose()
+
+    def test_format_db_time(self):
+        """测试告警时间格式转换，无法识别的值抛出异常"""
+        from app.core.alarm_processor import _format_db_time
+        self.assertEqual(_format_db_time("2024-12-19T10:30:00"), "2024-12-19 10:30:00.000000")
+        with self.assertRaises(ValueError):
+            _format_db_time("yesterday")
+        with self.assertRaises(ValueError):
+            _format_db_time([1, 2])
+
     @patch('app.core.alarm_processor.AlarmProcessor._save_alarm_images')
     @patch('app.core.alarm_processor.AlarmProcessor._save_alarm_video')
     @patch('app.core.alarm_processor.AlarmProcessor._update_alarm_media_paths')
@@ -0,0 +1,138 @@
+"""
+告警通知协议单元测试
+测试二进制图片帧编解码、按媒体模式生成发送帧、接收端组装以及按客户端模式广播
+"""
+
+import unittest
+import asyncio
+import json
+import os
+import sys
+from unittest.mock import Mock, AsyncMock
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from core.alarm_protocol import (AlarmAssembler, AlarmNotification, build_alarm_metadata, pack_media_frame,
+                                 unpack_media_frame)
+from app.core.alarm_media_cache import AlarmMediaCache
+from app.core.websocket_manager import UnifiedWebSocketManager, WebSocketType
+
+MEDIA = {
+    'original': b'\xff\xd8' + b'o' * 1000,
+    'processed': b'\xff\xd8' + b'p' * 1000,
+    'original_thumb': b'\xff\xd8' + b'o' * 50,
+    'processed_thumb': b'\xff\xd8' + b'p' * 50,
+}
+
+ALARM = {'alarm_id': 'alarm_1', 'stream_id': 'cam1', 'algo_id': 'algo1', 'timestamp': 1.5,
+         'detection_result': {'data': {}}, 'original_jpeg': MEDIA['original']}
+
+
+def mock_websocket():
+    websocket = Mock()
+    websocket.accept = AsyncMock()
+    websocket.send_text = AsyncMock()
+    websocket.send_bytes = AsyncMock()
+    return websocket
+
+
+class TestAlarmProtocol(unittest.TestCase):
+    """告警通知协议测试类"""
+
+    def test_media_frame_roundtrip(self):
+        """测试图片二进制帧打包/解析，错误帧抛出ValueError"""
+        header, payload = unpack_media_frame(pack_media_frame('alarm_1', 'processed', MEDIA['processed']))
+        self.assertEqual(header, {'alarm_id': 'alarm_1', 'kind': 'processed'})
+        self.assertEqual(bytes(payload), MEDIA['processed'])
+        with self.assertRaises(ValueError):
+            unpack_media_frame(b'XXXX\x00\x02{}')
+
+    def test_metadata_has_no_image_bytes(self):
+        """测试元数据只包含图片字节数"""
+        metadata = build_alarm_metadata(ALARM, MEDIA)
+        self.assertNotIn('original_jpeg', metadata)
+        self.assertEqual(metadata['media']['original'], len(MEDIA['original']))
+        self.assertLess(len(json.dumps(metadata)), 400)
+
+    def test_frames_per_media_mode(self):
+        """测试各媒体模式的发送帧，同一模式只序列化一次"""
+        notification = AlarmNotification(build_alarm_metadata(ALARM, MEDIA), MEDIA)
+
+        thumb = notification.frames('thumbnail')
+        self.assertIs(notification.frames('thumbnail'), thumb)
+        self.assertEqual([unpack_media_frame(f)[0]['kind'] for f in thumb[1:]], ['original_thumb', 'processed_thumb'])
+        message = json.loads(thumb[0])
+        self.assertTrue(message['images']['original_thumb']['inline'])
+        self.assertEqual(message['images']['original']['url'], '/api/analyzer/alarms/alarm_1/download/original')
+
+        full = notification.frames('full')
+        self.assertEqual([unpack_media_frame(f)[0]['kind'] for f in full[1:]], ['original', 'processed'])
+        self.assertEqual(len(notification.frames('url')), 1)
+        # 未知模式按默认的缩略图模式处理
+        self.assertIs(notification.frames('bogus'), thumb)
+
+        # 没有缩略图时缩略图模式退回原图
+        no_thumbs = {kind: MEDIA[kind] for kind in ('original', 'processed')}
+        notification = AlarmNotification(build_alarm_metadata(ALARM, no_thumbs), no_thumbs)
+        self.assertEqual(len(notification.frames('thumbnail')), 3)
+
+    def test_assembler(self):
+        """测试接收端收齐元数据声明的图片后返回"""
+        assembler = AlarmAssembler()
+        metadata = json.loads(json.dumps(build_alarm_metadata(ALARM, MEDIA)))
+        self.assertIsNone(assembler.begin(metadata))
+        kinds = list(MEDIA)
+        for kind in kinds[:-1]:
+            self.assertIsNone(assembler.add(pack_media_frame('alarm_1', kind, MEDIA[kind])))
+        completed_metadata, media = assembler.add(pack_media_frame('alarm_1', kinds[-1], MEDIA[kinds[-1]]))
+        self.assertEqual(completed_metadata['alarm_id'], 'alarm_1')
+        self.assertEqual(media, MEDIA)
+        self.assertEqual(assembler.pending, 0)
+        # 未知告警的图片帧忽略
+        self.assertIsNone(assembler.add(pack_media_frame('other', 'original', b'x')))
+
+    def test_media_cache_evicts_by_size(self):
+        """测试媒体缓存按总字节数淘汰最久未使用的告警"""
+        cache = AlarmMediaCache(max_bytes=2500)
+        cache.put('a', {'original': b'x' * 1000})
+        cache.put('b', {'original': b'x' * 1000})
+        self.assertIsNotNone(cache.get('a', 'original'))
+        cache.put('c', {'original': b'x' * 1000})
+        self.assertIsNone(cache.get('b', 'original'))
+        self.assertIsNotNone(cache.get('a', 'original'))
+        self.assertEqual(cache.get_stats()['evicted'], 1)
+
+
+class TestBroadcastAlarm(unittest.TestCase):
+    """按客户端媒体模式广播告警测试类"""
+
+    def test_broadcast_by_media_mode(self):
+        """测试每个客户端按协商的媒体模式接收，流订阅者不重复接收"""
+        manager = UnifiedWebSocketManager()
+        full, thumb, url = mock_websocket(), mock_websocket(), mock_websocket()
+
+        async def run():
+            await manager.connect(full, WebSocketType.ALARMS.value, stream_id='cam1', media_mode='full')
+            await manager.connect(thumb, WebSocketType.ALARMS.value)
+            await manager.connect(url, WebSocketType.ALARMS.value)
+            manager.set_media_mode(url, 'url')
+            metadata = {key: value for key, value in ALARM.items() if key != 'original_jpeg'}
+            sent = await manager.broadcast_alarm(metadata, MEDIA)
+            await manager.flush()
+            return sent
+
+        self.assertEqual(asyncio.run(run()), 3)
+        self.assertEqual(full.send_text.await_count, 1)
+        self.assertEqual([call.args[0] for call in full.send_bytes.await_args_list],
+                         [pack_media_frame('alarm_1', kind, MEDIA[kind]) for kind in ('original', 'processed')])
+        self.assertEqual(thumb.send_bytes.await_count, 2)
+        self.assertLess(len(thumb.send_bytes.await_args_list[0].args[0]), 200)
+        url.send_bytes.assert_not_awaited()
+        message = json.loads(url.send_text.await_args.args[0])
+        self.assertEqual(message['media_mode'], 'url')
+        self.assertFalse(message['images']['processed']['inline'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+标注渲染器单元测试
+测试静态叠加层缓存、与逐帧绘制结果一致以及无内容时跳过渲染
+"""
+
+import unittest
+import os
+import sys
+import cv2
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from core.annotation_renderer import AnnotationRenderer, needs_annotation
+
+
+def make_results(polygons=None, rectangles=None):
+    return {'data': {'bbox': {'rectangles': rectangles or [], 'polygons': polygons or {}}}}
+
+
+ROI = {'roi': {'polygon': [[10, 10], [100, 12], [90, 70], [15, 60]], 'color': [255, 0, 0]}}
+
+
+class TestAnnotationRenderer(unittest.TestCase):
+    """标注渲染器测试类"""
+
+    def setUp(self):
+        """测试前设置"""
+        self.frame = np.random.randint(0, 255, (80, 120, 3), dtype=np.uint8)
+
+    def test_static_layer_matches_direct_drawing(self):
+        """测试缓存的静态层与直接cv2绘制的像素一致"""
+        expected = self.frame.copy()
+        points = np.array(ROI['roi']['polygon'], np.int32).reshape((-1, 1, 2))
+        cv2.polylines(expected, [points], True, [255, 0, 0], 2)
+
+        renderer = AnnotationRenderer()
+        rendered = renderer.render(self.frame.copy(), make_results(ROI), 'cam1')
+        np.testing.assert_array_equal(rendered, expected)
+
+        # 非连续帧（如裁剪视图）结果一致
+        canvas = np.zeros((80, 240, 3), dtype=np.uint8)
+        view = canvas[:, ::2]
+        view[:] = self.frame
+        renderer.render(view, make_results(ROI), 'cam1')
+        np.testing.assert_array_equal(view, expected)
+
+    def test_layer_cached_per_stream_and_resolution(self):
+        """测试静态层按(流, 分辨率)缓存，多边形变化时重建"""
+        renderer = AnnotationRenderer()
+        for _ in range(3):
+            renderer.render(self.frame.copy(), make_results(ROI), 'cam1')
+        stats = renderer.get_stats()
+        self.assertEqual((stats['layer_misses'], stats['layer_hits']), (1, 2))
+
+        renderer.render(np.zeros((40, 60, 3), dtype=np.uint8), make_results(ROI), 'cam1')
+        renderer.render(self.frame.copy(), make_results(ROI), 'cam2')
+        self.assertEqual(renderer.get_stats()['cached_layers'], 3)
+
+        moved = {'roi': dict(ROI['roi'], polygon=[[20, 20], [60, 20], [60, 60]])}
+        frame = renderer.render(np.zeros_like(self.frame), make_results(moved), 'cam1')
+        self.assertEqual(renderer.get_stats()['layer_misses'], 4)
+        self.assertEqual(frame[20, 40].tolist(), [255, 0, 0])
+        self.assertEqual(frame[10, 50].tolist(), [0, 0, 0])
+
+        renderer.invalidate('cam1')
+        self.assertEqual(renderer.get_stats()['cached_layers'], 1)
+
+    def test_dynamic_boxes_drawn_over_static_layer(self):
+        """测试动态检测框逐帧绘制"""
+        renderer = AnnotationRenderer()
+        rect = {'xyxy': [30, 30, 70, 70], 'color': [0, 255, 0], 'label': 'person', 'conf': 0.9}
+        frame = renderer.render(np.zeros_like(self.frame), make_results(ROI, [rect]), 'cam1')
+        self.assertEqual(frame[50, 30].tolist(), [0, 255, 0])
+        self.assertEqual(renderer.get_stats()['renders'], 1)
+
+    def test_skip_when_nothing_to_draw(self):
+        """测试结果中没有可绘制内容时跳过渲染"""
+        renderer = AnnotationRenderer()
+        frame = self.frame.copy()
+        self.assertIs(renderer.render(frame, make_results()), frame)
+        np.testing.assert_array_equal(frame, self.frame)
+        self.assertEqual(renderer.get_stats()['skipped'], 1)
+
+        self.assertFalse(needs_annotation(None))
+        self.assertFalse(needs_annotation(make_results()))
+        self.assertFalse(needs_annotation({'data': {}}))
+        self.assertTrue(needs_annotation(make_results(ROI)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+"""
+认证缓存单元测试
+测试令牌缓存命中、黑名单同步、用户停用/角色变更失效与统计
+"""
+
+import os
+import sys
+import time
+import unittest
+from datetime import timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.core.auth_cache import AuthCache, auth_cache
+from app.core.security import create_access_token
+from app.db.database import Base
+from app.db.models import BlacklistedToken, Role, User
+from app.utils.utils import get_current_user
+
+
+class TestAuthCache(unittest.TestCase):
+    """认证缓存测试类"""
+
+    def test_ttl_and_lru(self):
+        """测试条目过期与最近使用淘汰"""
+        cache = AuthCache(max_entries=2, ttl=60.0)
+        cache.put("t1", {"id": "u1"})
+        cache.put("t2", {"id": "u2"}, token_expires_at=time.time() - 1)
+        self.assertIsNone(cache.get("t2"))  # 令牌已过期
+
+        cache.put("t2", {"id": "u2"})
+        cache.get("t1")
+        cache.put("t3", {"id": "u3"})
+        self.assertIsNone(cache.get("t2"))  # 最久未使用被淘汰
+        self.assertEqual(cache.get("t1"), {"id": "u1"})
+
+        stats = cache.get_stats()
+        self.assertEqual(stats["evicted"], 1)
+        self.assertEqual(stats["expired"], 1)
+        self.assertEqual(stats["entries"], 2)
+        self.assertGreater(stats["hit_rate"], 0)
+
+    def test_generation_guard(self):
+        """测试查询期间发生失效时不写入缓存"""
+        cache = AuthCache()
+        generation = cache.generation
+        cache.invalidate_user("u1")
+        cache.put("t1", {"id": "u1"}, generation=generation)
+        self.assertIsNone(cache.get("t1"))
+
+
+class TestGetCurrentUser(unittest.TestCase):
+    """get_current_user缓存集成测试"""
+
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine, tables=[User.__table__, Role.__table__, BlacklistedToken.__table__])
+        self.db = sessionmaker(bind=engine)()
+        self.db.add(User(id="user_1", username="alice", hashed_password="x", role="R_ADMIN", is_active=True))
+        self.db.add(Role(role_id="role_1", role_code="R_ADMIN", role_name="管理员"))
+        self.db.commit()
+        self.token = create_access_token(subject="user_1", expires_delta=timedelta(minutes=5))
+        auth_cache.reset()
+
+    def tearDown(self):
+        self.db.close()
+        auth_cache.reset()
+
+    def test_cache_hit_skips_database(self):
+        """测试命中缓存时不查询用户表"""
+        user = get_current_user(self.token, self.db)
+        self.assertEqual(user.username, "alice")
+
+        queries = []
+        from sqlalchemy import event
+        listener = lambda *args: queries.append(args[2])
+        event.listen(self.db.get_bind(), "before_cursor_execute", listener)
+        try:
+            cached = get_current_user(self.token, self.db)
+        finally:
+            event.remove(self.db.get_bind(), "before_cursor_execute", listener)
+        self.assertEqual(cached.id, "user_1")
+        self.assertTrue(cached.has_role("R_ADMIN"))
+        self.assertFalse(any("FROM users" in sql for sql in queries))
+        self.assertEqual(auth_cache.get_stats()["hits"], 1)
+
+    def test_blacklist(self):
+        """测试登出加入黑名单后令牌立即失效，其他进程写入的黑名单按同步读取"""
+        get_current_user(self.token, self.db)
+        auth_cache.blacklist(self.token)
+        with self.assertRaises(HTTPException) as ctx:
+            get_current_user(self.token, self.db)
+        self.assertEqual(ctx.exception.status_code, 403)
+
+        other = create_access_token(subject="user_1", expires_delta=timedelta(minutes=5), extra_data={"n": 2})
+        get_current_user(other, self.db)
+        self.db.add(BlacklistedToken(token=other))
+        self.db.commit()
+        auth_cache.sync_blacklist(self.db, force=True)
+        with self.assertRaises(HTTPException):
+            get_current_user(other, self.db)
+
+    def test_deactivation_and_role_change_invalidate(self):
+        """测试用户停用与角色变更使缓存失效"""
+        get_current_user(self.token, self.db)
+        user = self.db.query(User).filter(User.id == "user_1").first()
+        user.role = "R_USER"
+        self.db.commit()
+        self.assertEqual(auth_cache.get_stats()["entries"], 0)
+        self.assertEqual(get_current_user(self.token, self.db).role, "R_USER")
+
+        user.is_active = False
+        self.db.commit()
+        with self.assertRaises(HTTPException) as ctx:
+            get_current_user(self.token, self.db)
+        self.assertEqual(ctx.exception.status_code, 403)
+
+    def test_role_definition_change_clears(self):
+        """测试角色定义变更清空缓存"""
+        get_current_user(self.token, self.db)
+        role = self.db.query(Role).first()
+        role.is_enabled = False
+        self.db.commit()
+        self.assertEqual(auth_cache.get_stats()["entries"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
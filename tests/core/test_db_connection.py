@@ -0,0 +1,123 @@
+"""
+SQLite连接层单元测试
+测试PRAGMA、连接复用、归还回滚、等待超时与统计
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.db.connection import ConnectionPool, connect, get_connection_pool, get_pool_stats
+
+
+class TestConnectionPool(unittest.TestCase):
+    """连接池测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'test.db')
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.commit()
+        conn.close()
+        self.pool = ConnectionPool(self.db_path, max_connections=2, max_overflow=0, timeout=0.2)
+
+    def tearDown(self):
+        self.pool.close_all()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_pragmas(self):
+        """测试连接使用WAL与调优PRAGMA"""
+        conn = self.pool.connect()
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)  # NORMAL
+        self.assertEqual(conn.execute("PRAGMA busy_timeout").fetchone()[0], 5000)
+        conn.close()
+
+    def test_connection_reuse_and_rollback(self):
+        """测试连接归还后复用，未提交的事务归还时回滚"""
+        conn = self.pool.connect()
+        raw = conn._conn
+        conn.execute("INSERT INTO items (name) VALUES (?)", ("uncommitted",))
+        conn.close()
+        self.assertTrue(conn.closed)
+
+        conn = self.pool.connect()
+        self.assertIs(conn._conn, raw)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM items").fetchone()[0], 0)
+        conn.execute("INSERT INTO items (name) VALUES (?)", ("committed",))
+        conn.commit()
+        conn.close()
+        self.assertEqual(self.pool.get_stats()["connections_created"], 1)
+
+    def test_row_factory_per_checkout(self):
+        """测试每次借出可指定行工厂，归还后不影响其他使用方"""
+        conn = self.pool.connect()
+        conn.execute("INSERT INTO items (name) VALUES (?)", ("a",))
+        conn.commit()
+        conn.close()
+
+        conn = self.pool.connect(sqlite3.Row)
+        self.assertEqual(dict(conn.execute("SELECT name FROM items").fetchone()), {"name": "a"})
+        conn.close()
+        conn = self.pool.connect()
+        self.assertEqual(conn.execute("SELECT name FROM items").fetchone(), ("a",))
+        conn.close()
+
+    def test_wait_timeout_and_stats(self):
+        """测试连接全部占用时等待，超时抛出异常并计入统计"""
+        first, second = self.pool.connect(), self.pool.connect()
+        with self.assertRaises(sqlite3.OperationalError):
+            self.pool.connect()
+
+        # 另一线程归还后等待方拿到连接
+        timer = threading.Timer(0.05, first.close)
+        timer.start()
+        third = self.pool.connect()
+        timer.join()
+        third.close()
+        second.close()
+
+        stats = self.pool.get_stats()
+        self.assertEqual(stats["timeouts"], 1)
+        self.assertEqual(stats["waits"], 1)
+        self.assertEqual(stats["in_use"], 0)
+
+    def test_query_stats(self):
+        """测试语句执行耗时统计"""
+        conn = self.pool.connect()
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1")
+        conn.executemany("INSERT INTO items (name) VALUES (?)", [("a",), ("b",)])
+        conn.commit()
+        conn.close()
+        stats = self.pool.get_stats()
+        self.assertEqual(stats["queries"], 2)
+        self.assertGreaterEqual(stats["query_ms_max"], 0.0)
+
+    def test_shared_pool_registry(self):
+        """测试同一数据库文件共用连接池"""
+        pool = get_connection_pool(self.db_path)
+        self.assertIs(get_connection_pool(os.path.relpath(self.db_path)), pool)
+        conn = connect(self.db_path)
+        conn.close()
+        self.assertIn(os.path.abspath(self.db_path), get_pool_stats())
+        pool.close_all()
+
+    def test_invalid_path(self):
+        """测试无法打开数据库时抛出异常且不占用连接数"""
+        pool = ConnectionPool("/invalid/path/database.db", max_connections=1, max_overflow=0, timeout=0.1)
+        for _ in range(2):
+            with self.assertRaises(sqlite3.OperationalError):
+                pool.connect()
+        self.assertEqual(pool.get_stats()["in_use"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
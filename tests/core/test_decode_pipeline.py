@@ -0,0 +1,142 @@
+"""
+解码流水线单元测试
+测试最新帧信箱与解码线程的核心功能
+"""
+
+import unittest
+import os
+import sys
+import time
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from core.decode_pipeline import (LatestFrameMailbox, DecodeThread, is_live_source, resolve_decode_interval, consumer_step,
+                                  stream_consumer_intervals)
+
+
+class FakeCapture:
+    """按序号生成帧的模拟视频源，超过帧数后读取失败"""
+
+    def __init__(self, num_frames=None):
+        self.num_frames = num_frames
+        self.read_count = 0
+        self.retrieve_count = 0
+        self.released = False
+
+    def grab(self):
+        if self.num_frames is not None and self.read_count >= self.num_frames:
+            return False
+        self.read_count += 1
+        return True
+
+    def retrieve(self):
+        self.retrieve_count += 1
+        return True, np.full((2, 2, 3), self.read_count % 256, dtype=np.uint8)
+
+    def release(self):
+        self.released = True
+
+
+class TestLatestFrameMailbox(unittest.TestCase):
+    """最新帧信箱测试类"""
+
+    def test_latest_frame_wins(self):
+        """测试新帧覆盖未取走的旧帧并计数"""
+        mailbox = LatestFrameMailbox()
+        for i in range(3):
+            mailbox.put(i, timestamp=float(i))
+        self.assertEqual(mailbox.get(timeout=0), (2, 2.0))
+        self.assertIsNone(mailbox.get(timeout=0))
+        self.assertEqual(mailbox.get_stats(), {'decoded': 3, 'dropped': 2, 'delivered': 1})
+
+    def test_get_times_out(self):
+        """测试无新帧时等待超时"""
+        mailbox = LatestFrameMailbox()
+        start = time.time()
+        self.assertIsNone(mailbox.get(timeout=0.05))
+        self.assertGreaterEqual(time.time() - start, 0.04)
+
+
+class TestDecodeThread(unittest.TestCase):
+    """解码线程测试类"""
+
+    def test_slow_consumer_does_not_block_decoder(self):
+        """测试消费者不取帧时解码持续进行，只保留最新帧"""
+        cap = FakeCapture(num_frames=50)
+        mailbox = LatestFrameMailbox()
+        decoder = DecodeThread(cap, mailbox, max_consecutive_failures=1)
+        decoder.start()
+        decoder.join(2.0)
+
+        self.assertFalse(decoder.is_alive())
+        self.assertTrue(decoder.failed)
+        self.assertTrue(cap.released)
+        stats = mailbox.get_stats()
+        self.assertEqual(stats['decoded'], 50)
+        self.assertEqual(stats['dropped'], 49)
+        frame, _ = mailbox.get(timeout=0)
+        self.assertEqual(frame[0, 0, 0], 50)
+
+    def test_file_source_is_paced(self):
+        """测试非实时源按帧率节流，停止后释放视频源"""
+        cap = FakeCapture()
+        decoder = DecodeThread(cap, LatestFrameMailbox(), realtime_fps=50)
+        decoder.start()
+        time.sleep(0.2)
+        decoder.stop()
+
+        self.assertFalse(decoder.is_alive())
+        self.assertTrue(cap.released)
+        self.assertLess(cap.read_count, 20)
+
+    def test_skipped_frames_are_not_retrieved(self):
+        """测试跳过的帧只grab不retrieve"""
+        cap = FakeCapture(num_frames=20)
+        mailbox = LatestFrameMailbox()
+        interval = [5]
+        decoder = DecodeThread(cap, mailbox, max_consecutive_failures=1, skip_interval=lambda: interval[0])
+        decoder.start()
+        decoder.join(2.0)
+
+        self.assertEqual(cap.read_count, 20)
+        self.assertEqual(cap.retrieve_count, 4)
+        stats = decoder.get_stats()
+        self.assertEqual(stats['grabbed'], 20)
+        self.assertEqual(stats['skipped'], 16)
+        self.assertEqual(stats['decoded'], 4)
+        frame, _ = mailbox.get(timeout=0)
+        self.assertEqual(frame[0, 0, 0], 20)
+
+    def test_most_demanding_consumer_sets_rate(self):
+        """测试要求最高的消费者决定解码间隔，其他消费者按步长取帧"""
+        self.assertEqual(resolve_decode_interval([5, 2, 10]), 2)
+        self.assertEqual(resolve_decode_interval([], default=3), 3)
+        self.assertEqual(resolve_decode_interval([0, None], default=0), 1)
+        self.assertEqual(consumer_step(10, 2), 5)
+        self.assertEqual(consumer_step(2, 2), 1)
+        self.assertEqual(consumer_step(1, 2), 1)
+
+    def test_consumers_of_prefixed_stream_ids(self):
+        """测试流ID互为前缀时只统计本流的消费者"""
+        consumers = {
+            'cam1_algo_a': {'skip_interval': 4},
+            'cam1_backup_algo_b': {'skip_interval': 1},
+            'cam10_algo_c': {'skip_interval': 2},
+        }
+        streams = ['cam1', 'cam1_backup', 'cam10']
+        self.assertEqual(stream_consumer_intervals('cam1', consumers, streams), [4])
+        self.assertEqual(stream_consumer_intervals('cam1_backup', consumers, streams), [1])
+        self.assertEqual(stream_consumer_intervals('cam10', consumers, streams), [2])
+        self.assertEqual(resolve_decode_interval(stream_consumer_intervals('cam1', consumers, streams), 2), 4)
+
+    def test_is_live_source(self):
+        """测试实时源判断"""
+        self.assertTrue(is_live_source("rtsp://127.0.0.1/live"))
+        self.assertTrue(is_live_source("0"))
+        self.assertFalse(is_live_source("/data/test.mp4"))
+
+
+if __name__ == "__main__":
+    unittest.main()
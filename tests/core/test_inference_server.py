@@ -0,0 +1,151 @@
+"""
+推理服务单元测试
+测试跨流动态批处理与结果分发的核心功能
+"""
+
+import unittest
+import os
+import sys
+import uuid
+import queue
+import threading
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from core.ipc_manager import IPCManager
+from core.inference_server import InferenceServer, InferenceClient, InferenceRequest, ExecutorPool, MSG_REGISTER
+
+
+class BatchModel:
+    """记录批大小的测试模型"""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def infer_batch(self, images):
+        self.batch_sizes.append(len(images))
+        return [(int(image[0, 0, 0]), []) for image in images]
+
+
+class EchoPostprocessor:
+    """原样返回推理结果的测试后处理器"""
+
+    def process(self, model_results):
+        return {'value': model_results['default']['engine_result']}
+
+
+class TestInferenceServer(unittest.TestCase):
+    """推理服务测试类"""
+
+    def setUp(self):
+        """测试前设置"""
+        self.ipc = IPCManager(max_queue_size=4, manager_id=f"test_{uuid.uuid4().hex[:8]}", ring_slots=4)
+        self.model = BatchModel()
+        self.server = InferenceServer(self.model, EchoPostprocessor(), self.ipc.memory_manager,
+                                      max_batch_size=3, max_wait_ms=20)
+        self.request_queue = queue.Queue()
+
+    def tearDown(self):
+        """测试后清理"""
+        self.ipc.cleanup()
+
+    def _submit(self, client_id, stream_id, value, request_id=1):
+        self.ipc.memory_manager.create_ring(stream_id, 2, 2)
+        frame_ref = self.ipc.memory_manager.create_shared_frame(stream_id, np.full((2, 2, 3), value, dtype=np.uint8))
+        self.request_queue.put(InferenceRequest(client_id, request_id, frame_ref))
+        return frame_ref
+
+    def test_batches_across_streams(self):
+        """测试不同流的请求合并为一批并按客户端分发结果"""
+        responses = {f"s{i}_a1": queue.Queue() for i in range(4)}
+        for client_id, response_queue in responses.items():
+            self.request_queue.put((MSG_REGISTER, client_id, response_queue))
+        for i in range(4):
+            self._submit(f"s{i}_a1", f"s{i}", i + 1)
+
+        first = self.server.collect_batch(self.request_queue)
+        self.assertEqual(len(first), 3)
+        self.assertEqual(self.server.process_batch(first), 3)
+        self.server.process_batch(self.server.collect_batch(self.request_queue))
+
+        self.assertEqual(self.model.batch_sizes, [3, 1])
+        for i in range(4):
+            self.assertEqual(responses[f"s{i}_a1"].get_nowait(), (1, {'value': i + 1}))
+        self.assertEqual(self.server.get_stats()['avg_batch_size'], 2.0)
+
+    def test_max_wait_flushes_partial_batch(self):
+        """测试等待超时后执行不满的批次"""
+        self.server.register_client('s1_a1', queue.Queue())
+        self._submit('s1_a1', 's1', 5)
+        batch = self.server.collect_batch(self.request_queue)
+        self.assertEqual(len(batch), 1)
+        self.assertEqual(self.server.collect_batch(self.request_queue, poll_timeout=0.01), [])
+
+    def test_stale_frame_returns_none(self):
+        """测试帧已被覆盖时返回空结果，不参与推理"""
+        response_queue = queue.Queue()
+        self.server.register_client('s1_a1', response_queue)
+        self._submit('s1_a1', 's1', 1)
+        for _ in range(4):
+            self.ipc.memory_manager.create_shared_frame('s1', np.zeros((2, 2, 3), dtype=np.uint8))
+
+        self.server.process_batch(self.server.collect_batch(self.request_queue))
+        self.assertEqual(response_queue.get_nowait(), (1, None))
+        self.assertEqual(self.model.batch_sizes, [])
+        self.assertEqual(self.server.get_stats()['stale_frames'], 1)
+
+    def test_client_round_trip(self):
+        """测试客户端提交帧引用并取回对应结果，完成后归还队列深度"""
+        pool = ExecutorPool(num_executors=1, queue_size=8)
+        self.server.executor_pool = pool
+        response_queue = queue.Queue()
+        client = InferenceClient('s1_a1', pool, response_queue, timeout=2.0)
+        # 线程内队列不可跨进程传递，这里直接在服务端登记
+        self.server.register_client('s1_a1', response_queue)
+        # 上一次超时请求的迟到结果应被丢弃
+        response_queue.put((0, {'value': -1}))
+
+        self.ipc.memory_manager.create_ring('s1', 2, 2)
+        frame_ref = self.ipc.memory_manager.create_shared_frame('s1', np.full((2, 2, 3), 9, dtype=np.uint8))
+
+        stop_event = threading.Event()
+        worker = threading.Thread(target=self.server.serve, args=(pool.request_queues[0], stop_event))
+        worker.start()
+        try:
+            self.assertEqual(client.infer(frame_ref), {'value': 9})
+            self.assertEqual(pool.get_depths(), [0])
+        finally:
+            stop_event.set()
+            worker.join()
+
+
+class TestExecutorPool(unittest.TestCase):
+    """推理执行器池测试类"""
+
+    def test_dispatch_to_least_loaded(self):
+        """测试按在途请求数分发到最空闲的执行器"""
+        pool = ExecutorPool(num_executors=3, queue_size=4)
+        self.assertEqual([pool.select() for _ in range(3)], [0, 1, 2])
+        pool.done(1)
+        self.assertEqual(pool.select(), 1)
+        pool.done(0)
+        pool.done(2)
+        self.assertEqual(pool.get_depths(), [0, 1, 0])
+        self.assertEqual(pool.select(), 0)
+
+        pool.reset(1)
+        pool.done(0, count=5)
+        self.assertEqual(pool.get_depths(), [0, 0, 0])
+
+    def test_broadcast_reaches_all_executors(self):
+        """测试控制消息发送到每个执行器"""
+        pool = ExecutorPool(num_executors=2, queue_size=4)
+        pool.broadcast((MSG_REGISTER, 's1_a1', None))
+        for request_queue in pool.request_queues:
+            self.assertEqual(request_queue.get(timeout=1.0), (MSG_REGISTER, 's1_a1', None))
+
+
+if __name__ == "__main__":
+    unittest.main()
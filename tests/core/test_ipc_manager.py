@@ -0,0 +1,243 @@
+"""
+进程间通信模块单元测试
+测试环形缓冲区帧共享与帧租约的核心功能
+"""
+
+import unittest
+import os
+import sys
+import uuid
+import multiprocessing as mp
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from core.ipc_manager import IPCManager, FrameReference, SharedMemoryManager, DROP_LATEST, DROP_OLDEST
+
+
+def _lease_in_child(manager_id, stream_id, frame_ref, lock_pool, start, done, results):
+    """子进程：附加到环形缓冲区并租用帧，报告认领到的租约行"""
+    manager = SharedMemoryManager(manager_id, lock_pool=lock_pool)
+    try:
+        start.wait(5)
+        lease = manager.lease_frame(frame_ref)
+        results.put((manager.get_ring(stream_id)._holder_row, lease is not None))
+        done.wait(5)
+        if lease is not None:
+            lease.release()
+    finally:
+        manager.close()
+
+
+class TestFrameRingBuffer(unittest.TestCase):
+    """环形缓冲区测试类"""
+
+    def setUp(self):
+        """测试前设置"""
+        self.ipc = IPCManager(max_queue_size=4, manager_id=f"test_{uuid.uuid4().hex[:8]}", ring_slots=3)
+        self.stream_id = "stream_test"
+
+    def tearDown(self):
+        """测试后清理"""
+        self.ipc.cleanup()
+
+    def test_ring_allocated_once(self):
+        """测试环形缓冲区按流分辨率一次性分配"""
+        self.ipc.create_stream_queue(self.stream_id, width=8, height=6)
+        ring = self.ipc.memory_manager.rings[self.stream_id]
+        self.assertEqual(ring.shape, (6, 8, 3))
+        self.assertEqual(ring.num_slots, 3)
+
+        for i in range(5):
+            self.ipc.put_frame(self.stream_id, np.full((6, 8, 3), i, dtype=np.uint8))
+        self.assertIs(self.ipc.memory_manager.rings[self.stream_id], ring)
+
+    def test_frame_reference_round_trip(self):
+        """测试帧引用只携带槽位与序列号并可取回帧"""
+        self.ipc.create_stream_queue(self.stream_id, width=4, height=4)
+        frame = np.random.randint(0, 255, (4, 4, 3), dtype=np.uint8)
+        self.assertTrue(self.ipc.put_frame(self.stream_id, frame))
+
+        frame_ref = self.ipc.get_frame(self.stream_id, timeout=1.0)
+        self.assertIsInstance(frame_ref, FrameReference)
+        self.assertEqual(frame_ref.slot, 0)
+        self.assertEqual(frame_ref.seq, 1)
+        self.assertEqual(frame_ref.frame_id, f"{self.stream_id}:1")
+        np.testing.assert_array_equal(self.ipc.memory_manager.get_frame(frame_ref), frame)
+
+    def test_overwritten_frame_is_dropped(self):
+        """测试被覆盖的旧帧引用失效"""
+        manager = self.ipc.memory_manager
+        manager.create_ring(self.stream_id, 2, 2)
+        first = manager.create_shared_frame(self.stream_id, np.zeros((2, 2, 3), dtype=np.uint8))
+        for _ in range(3):
+            manager.create_shared_frame(self.stream_id, np.ones((2, 2, 3), dtype=np.uint8))
+        self.assertIsNone(manager.get_frame(first))
+
+    def test_resolution_change_rebuilds_ring(self):
+        """测试分辨率变化时重建环形缓冲区"""
+        self.ipc.put_frame(self.stream_id, np.zeros((4, 4, 3), dtype=np.uint8))
+        self.ipc.put_frame(self.stream_id, np.zeros((8, 6, 3), dtype=np.uint8))
+        self.assertEqual(self.ipc.memory_manager.rings[self.stream_id].shape, (8, 6, 3))
+
+    def test_attach_from_other_manager(self):
+        """测试其他进程侧的管理器按名称附加到环形缓冲区"""
+        self.ipc.create_stream_queue(self.stream_id, width=4, height=2)
+        frame = np.arange(24, dtype=np.uint8).reshape(2, 4, 3)
+        frame_ref = self.ipc.memory_manager.create_shared_frame(self.stream_id, frame)
+
+        reader = SharedMemoryManager(self.ipc.manager_id)
+        try:
+            np.testing.assert_array_equal(reader.get_frame(frame_ref), frame)
+        finally:
+            reader.close()
+
+
+class TestFrameLease(unittest.TestCase):
+    """帧租约测试类"""
+
+    def setUp(self):
+        """测试前设置"""
+        self.ipc = IPCManager(max_queue_size=4, manager_id=f"test_{uuid.uuid4().hex[:8]}", ring_slots=2)
+        self.stream_id = "stream_lease"
+        self.ipc.create_stream_queue(self.stream_id, width=4, height=4)
+        self.manager = self.ipc.memory_manager
+
+    def tearDown(self):
+        """测试后清理"""
+        self.ipc.cleanup()
+
+    def test_lease_is_read_only_view(self):
+        """测试租约返回只读零拷贝视图"""
+        frame_ref = self.manager.create_shared_frame(self.stream_id, np.full((4, 4, 3), 7, dtype=np.uint8))
+        lease = self.manager.lease_frame(frame_ref)
+        self.assertIsNotNone(lease)
+        self.assertFalse(lease.frame.flags.writeable)
+        self.assertFalse(lease.frame.flags.owndata)
+        with self.assertRaises(ValueError):
+            lease.frame[0, 0, 0] = 1
+
+        annotated = lease.copy()
+        annotated[0, 0, 0] = 1
+        self.assertEqual(lease.frame[0, 0, 0], 7)
+        lease.release()
+        self.assertIsNone(lease.frame)
+
+    def test_writer_skips_leased_slot(self):
+        """测试写者跳过被租用的槽位"""
+        leased_ref = self.manager.create_shared_frame(self.stream_id, np.full((4, 4, 3), 1, dtype=np.uint8))
+        with self.manager.lease_frame(leased_ref) as lease:
+            for i in range(4):
+                frame_ref = self.manager.create_shared_frame(self.stream_id, np.full((4, 4, 3), 2, dtype=np.uint8))
+                self.assertNotEqual(frame_ref.slot, leased_ref.slot)
+            self.assertEqual(lease.frame[0, 0, 0], 1)
+
+        # 归还后槽位可被复用
+        slots = {self.manager.create_shared_frame(self.stream_id, np.zeros((4, 4, 3), dtype=np.uint8)).slot for _ in range(2)}
+        self.assertIn(leased_ref.slot, slots)
+
+    def test_all_slots_leased_drops_frame(self):
+        """测试所有槽位均被租用时丢弃新帧"""
+        refs = [self.manager.create_shared_frame(self.stream_id, np.zeros((4, 4, 3), dtype=np.uint8)) for _ in range(2)]
+        leases = [self.manager.lease_frame(ref) for ref in refs]
+        self.assertIsNone(self.manager.create_shared_frame(self.stream_id, np.zeros((4, 4, 3), dtype=np.uint8)))
+        for lease in leases:
+            lease.release()
+        self.assertIsNotNone(self.manager.create_shared_frame(self.stream_id, np.zeros((4, 4, 3), dtype=np.uint8)))
+
+    def test_concurrent_holders_get_distinct_rows(self):
+        """测试多个进程同时附加租用时各自认领不同的租约行，租约互不覆盖"""
+        frame_ref = self.manager.create_shared_frame(self.stream_id, np.full((4, 4, 3), 3, dtype=np.uint8))
+        start, done, results = mp.Event(), mp.Event(), mp.Queue()
+        processes = [mp.Process(target=_lease_in_child,
+                                args=(self.ipc.manager_id, self.stream_id, frame_ref, self.ipc.lock_pool,
+                                      start, done, results))
+                     for _ in range(4)]
+        for process in processes:
+            process.start()
+        try:
+            start.set()
+            reported = [results.get(timeout=10) for _ in processes]
+            self.assertEqual(len({row for row, _ in reported}), 4)
+            self.assertTrue(all(leased for _, leased in reported))
+            ring = self.manager.rings[self.stream_id]
+            self.assertEqual(int(ring.leases[:, frame_ref.slot].sum()), 4)
+        finally:
+            done.set()
+            for process in processes:
+                process.join(timeout=10)
+        self.assertEqual(int(ring.leases[:, frame_ref.slot].sum()), 0)
+
+    def test_lease_stale_reference(self):
+        """测试已被覆盖的帧无法租用"""
+        stale_ref = self.manager.create_shared_frame(self.stream_id, np.zeros((4, 4, 3), dtype=np.uint8))
+        for _ in range(2):
+            self.manager.create_shared_frame(self.stream_id, np.zeros((4, 4, 3), dtype=np.uint8))
+        self.assertIsNone(self.manager.lease_frame(stale_ref))
+
+
+class TestFrameBroadcast(unittest.TestCase):
+    """帧广播通道测试类"""
+
+    def setUp(self):
+        """测试前设置"""
+        self.ipc = IPCManager(max_queue_size=4, manager_id=f"test_{uuid.uuid4().hex[:8]}", ring_slots=4)
+        self.stream_id = "stream_fanout"
+        self.ipc.create_stream_queue(self.stream_id, width=2, height=2)
+
+    def tearDown(self):
+        """测试后清理"""
+        self.ipc.cleanup()
+
+    def _put(self, count):
+        for i in range(count):
+            self.ipc.put_frame(self.stream_id, np.full((2, 2, 3), i, dtype=np.uint8))
+
+    def test_every_consumer_sees_every_frame(self):
+        """测试同一路流的多个消费者各自收到每一帧，互不争抢"""
+        helmet = self.ipc.subscribe_frames(self.stream_id, 'helmet', DROP_OLDEST)
+        fire = self.ipc.subscribe_frames(self.stream_id, 'fire', DROP_OLDEST)
+        self._put(3)
+
+        for subscriber in (helmet, fire):
+            seqs = [subscriber.poll().seq for _ in range(3)]
+            self.assertEqual(seqs, [1, 2, 3])
+            self.assertIsNone(subscriber.poll())
+            self.assertEqual(subscriber.get_stats()['delivered'], 3)
+        self.assertIs(self.ipc.subscribe_frames(self.stream_id, 'helmet'), helmet)
+
+    def test_latest_policy_skips_backlog(self):
+        """测试latest策略跳过积压，只取最新帧"""
+        subscriber = self.ipc.subscribe_frames(self.stream_id, 'intrusion', DROP_LATEST)
+        self._put(1)
+        self.assertEqual(subscriber.poll().seq, 1)
+        self._put(3)
+        frame_ref = subscriber.poll()
+        self.assertEqual(frame_ref.seq, 4)
+        self.assertEqual(self.ipc.memory_manager.get_frame(frame_ref)[0, 0, 0], 2)
+        self.assertIsNone(subscriber.poll())
+        self.assertEqual(subscriber.dropped, 2)
+
+    def test_oldest_policy_counts_overwritten_frames(self):
+        """测试oldest策略按序读取，落后超过缓冲区容量的帧计入丢帧"""
+        subscriber = self.ipc.subscribe_frames(self.stream_id, 'slow', DROP_OLDEST)
+        self._put(1)
+        self.assertEqual(subscriber.poll().seq, 1)
+        self._put(6)
+        self.assertEqual([subscriber.poll().seq for _ in range(4)], [4, 5, 6, 7])
+        self.assertEqual(subscriber.dropped, 2)
+
+    def test_ring_rebuild_resets_cursor(self):
+        """测试缓冲区重建后读游标归零，继续收到新帧"""
+        subscriber = self.ipc.subscribe_frames(self.stream_id, 'fire')
+        self._put(3)
+        self.assertEqual(subscriber.poll().seq, 3)
+        self.ipc.put_frame(self.stream_id, np.zeros((4, 4, 3), dtype=np.uint8))
+        self.assertEqual(subscriber.poll().seq, 1)
+        self.assertIsNone(self.ipc.get_frame(self.stream_id, timeout=0, consumer_id='fire'))
+        self.assertEqual(self.ipc.unsubscribe_frames(self.stream_id, 'fire')['delivered'], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+"""
+菜单缓存单元测试
+测试按角色过滤建树、响应与原模型序列化一致、ETag/304、菜单/角色变更失效以及有效期
+"""
+
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.api.endpoints.menu import get_all_menus, get_menu_list
+from app.core.menu_cache import menu_cache
+from app.db.models import Menu, Role, User
+from app.schemas.menu import MenuItemOut, MenuResponse
+from sqlite_test_case import SQLiteTestCase
+
+
+class TestMenuCache(SQLiteTestCase):
+    """菜单缓存测试类"""
+
+    models = (Menu, Role)
+
+    def setUp(self):
+        super().setUp()
+        auth_list = json.dumps([{"title": "新增", "authMark": "add"}])
+        for menu_id, parent_id, roles, sort in (
+            ("m_dashboard", None, None, 1),
+            ("m_console", "m_dashboard", None, 1),
+            ("m_system", None, "R_SUPER,R_ADMIN", 2),
+            ("m_user", "m_system", "R_SUPER,R_ADMIN", 1),
+            ("m_menu", "m_system", "R_SUPER", 2),
+        ):
+            self.db.add(Menu(menu_id=menu_id, name=menu_id, path=f"/{menu_id}", meta_title=menu_id,
+                             parent_id=parent_id, roles=roles, sort=sort, auth_list=auth_list))
+        self.db.commit()
+        menu_cache.invalidate()
+        self.ttl = menu_cache.ttl
+        self.record_queries()
+
+    def tearDown(self):
+        super().tearDown()
+        menu_cache.ttl = self.ttl
+        menu_cache.invalidate()
+
+    @staticmethod
+    def _names(menu_list):
+        return {item["name"]: TestMenuCache._names(item["children"]) for item in menu_list}
+
+    def test_role_filtering(self):
+        """测试按角色过滤菜单，超级管理员可见全部"""
+        admin = json.loads(menu_cache.get(self.db, ["R_ADMIN"]).body)
+        self.assertEqual(self._names(admin["data"]["menuList"]),
+                         {"m_dashboard": {"m_console": {}}, "m_system": {"m_user": {}}})
+        user = json.loads(menu_cache.get(self.db, ["R_USER"]).body)
+        self.assertEqual(self._names(user["data"]["menuList"]), {"m_dashboard": {"m_console": {}}})
+        super_menus = json.loads(menu_cache.get(self.db, ["R_USER", "R_SUPER"]).body)
+        self.assertEqual(self._names(super_menus["data"]["menuList"])["m_system"], {"m_user": {}, "m_menu": {}})
+        # 全部菜单只查询一次
+        self.assertEqual(len(self.queries), 1)
+
+    def test_matches_response_model(self):
+        """测试缓存响应与按响应模型序列化的结果一致"""
+        body = json.loads(menu_cache.get(self.db, ["R_USER"]).body)
+        menus = self.db.query(Menu).order_by(Menu.sort).all()
+        dashboard = next(menu for menu in menus if menu.menu_id == "m_dashboard")
+        expected = MenuResponse(code=200, msg="获取菜单成功", data={"menuList": [MenuItemOut(
+            id="m_dashboard", name=dashboard.name, path=dashboard.path,
+            meta={"title": dashboard.meta_title, "keepAlive": True, "showBadge": False, "isHide": False,
+                  "isHideTab": False, "isFullPage": False, "fixedTab": False, "isIframe": False,
+                  "isFirstLevel": False, "authList": [{"title": "新增", "authMark": "add"}]},
+            children=[]
+        )]}).model_dump(mode="json", by_alias=True)
+        body["data"]["menuList"][0]["children"] = []
+        self.assertEqual(body, expected)
+
+    def test_etag_not_modified(self):
+        """测试ETag未变化时返回304且不查询数据库"""
+        user = User(id="u1", username="admin", role="R_ADMIN", is_active=True)
+        response = get_menu_list(if_none_match=None, db=self.db, current_user=user)
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers["etag"]
+
+        self.queries.clear()
+        response = get_menu_list(if_none_match=etag, db=self.db, current_user=user)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.body, b"")
+        self.assertEqual(self.queries, [])
+
+        response = get_all_menus(if_none_match=etag, db=self.db,
+                                 current_user=User(id="u2", username="root", role="R_SUPER", is_active=True))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["etag"], etag)
+        self.assertEqual(json.loads(response.body)["msg"], "获取所有菜单成功")
+
+    def test_menu_and_role_changes(self):
+        """测试菜单修改与角色变更后重建缓存"""
+        etag = menu_cache.get(self.db, ["R_ADMIN"]).etag
+        menu = self.db.query(Menu).filter(Menu.menu_id == "m_user").first()
+        menu.meta_title = "用户管理"
+        self.db.commit()
+        payload = menu_cache.get(self.db, ["R_ADMIN"])
+        self.assertNotEqual(payload.etag, etag)
+        self.assertIn("用户管理", payload.body.decode("utf-8"))
+
+        self.db.add(Role(role_id="role_1", role_code="R_ADMIN", role_name="管理员"))
+        self.db.commit()
+        self.assertEqual(menu_cache.get_stats()["entries"], 0)
+
+    def test_expired_after_ttl(self):
+        """测试绕过ORM的修改（其他进程/直接SQL）在有效期过后生效"""
+        etag = menu_cache.get(self.db, ["R_ADMIN"]).etag
+        with self.engine.begin() as conn:
+            conn.execute(Menu.__table__.update().where(Menu.__table__.c.menu_id == "m_user")
+                         .values(meta_title="用户管理"))
+        self.assertEqual(menu_cache.get(self.db, ["R_ADMIN"]).etag, etag)
+
+        menu_cache.ttl = 0.0
+        payload = menu_cache.get(self.db, ["R_ADMIN"])
+        self.assertNotEqual(payload.etag, etag)
+        self.assertIn("用户管理", payload.body.decode("utf-8"))
+        self.assertEqual(menu_cache.get_stats()["expirations"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+组织层级服务单元测试
+测试组织树缓存与失效、平铺列表、子树视频流查询与移动时的路径改写
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.api.endpoints.organizations import move_organization
+from app.core.org_hierarchy import get_streams, list_organizations, org_hierarchy
+from app.db.models import Organization, OrganizationBinding, VideoStream
+from app.schemas.organization import OrganizationMoveRequest
+from sqlite_test_case import SQLiteTestCase
+
+
+class TestOrgHierarchy(SQLiteTestCase):
+    """组织层级服务测试类"""
+
+    models = (Organization, OrganizationBinding, VideoStream)
+
+    def setUp(self):
+        super().setUp()
+        # root ─┬─ a ── a1
+        #       └─ b
+        for org_id, parent_id, path, sort_order in (
+            ("root", None, "/root/", 0),
+            ("b", "root", "/root/b/", 2),
+            ("a", "root", "/root/a/", 1),
+            ("a1", "a", "/root/a/a1/", 0),
+        ):
+            self.db.add(Organization(org_id=org_id, name=f"组织{org_id}", parent_id=parent_id,
+                                     path=path, sort_order=sort_order))
+        for stream_id, org_id in (("s1", "a"), ("s2", "a1"), ("s3", "b")):
+            self.db.add(VideoStream(stream_id=stream_id, name=stream_id, url=f"rtsp://{stream_id}"))
+            self.db.add(OrganizationBinding(binding_id=f"bind_{stream_id}", org_id=org_id, stream_id=stream_id))
+        self.db.commit()
+        org_hierarchy.invalidate()
+        self.record_queries()
+
+    def tearDown(self):
+        super().tearDown()
+        org_hierarchy.invalidate()
+
+    def test_tree_cached(self):
+        """测试组织树两次查询构建，之后命中缓存不再查询"""
+        tree, total = org_hierarchy.get_tree(self.db)
+        self.assertEqual(total, 4)
+        self.assertEqual(len(self.queries), 2)
+        root = tree[0]
+        self.assertEqual([child["org_id"] for child in root["children"]], ["a", "b"])
+        self.assertEqual(root["children"][0]["stream_count"], 1)
+        self.assertEqual(root["children"][0]["children"][0]["org_id"], "a1")
+
+        subtree, count = org_hierarchy.get_tree(self.db, "a")
+        self.assertEqual(count, 2)
+        self.assertEqual(subtree[0]["org_id"], "a")
+        self.assertEqual(len(self.queries), 2)
+
+    def test_organization_and_binding_changes(self):
+        """测试新增组织与绑定变更后缓存失效"""
+        org_hierarchy.get_tree(self.db)
+        self.db.add(Organization(org_id="c", name="组织c", parent_id="root", path="/root/c/", sort_order=3))
+        self.db.commit()
+        tree, total = org_hierarchy.get_tree(self.db)
+        self.assertEqual(total, 5)
+        self.assertEqual(tree[0]["children"][-1]["org_id"], "c")
+
+        self.db.add(OrganizationBinding(binding_id="bind_c", org_id="c", stream_id="s1"))
+        self.db.commit()
+        tree, _ = org_hierarchy.get_tree(self.db)
+        self.assertEqual(tree[0]["children"][-1]["stream_count"], 1)
+
+    def test_list_constant_queries(self):
+        """测试平铺列表的查询次数与行数无关"""
+        items, total = list_organizations(self.db, limit=10)
+        self.assertEqual(total, 4)
+        self.assertEqual(len(self.queries), 2)
+        by_id = {item["org_id"]: item for item in items}
+        self.assertEqual(by_id["a1"]["parent_name"], "组织a")
+        self.assertEqual(by_id["a"]["stream_count"], 1)
+        self.assertEqual(by_id["root"]["stream_count"], 0)
+        self.assertIsNone(by_id["root"]["parent_name"])
+
+        items, total = list_organizations(self.db, parent_id="root")
+        self.assertEqual([item["org_id"] for item in items], ["a", "b"])
+
+    def test_subtree_streams(self):
+        """测试组织自身与子树绑定的视频流"""
+        org = self.db.query(Organization).filter(Organization.org_id == "a").first()
+        self.assertEqual([stream.stream_id for stream in get_streams(self.db, org)], ["s1"])
+        self.assertEqual(sorted(stream.stream_id for stream in get_streams(self.db, org, include_children=True)),
+                         ["s1", "s2"])
+
+    def test_move_rewrites_descendant_paths(self):
+        """测试移动组织时下级组织路径一并改写"""
+        org_hierarchy.get_tree(self.db)
+        move_organization(OrganizationMoveRequest(org_id="a", new_parent_id="b"), db=self.db, current_user=None)
+        paths = dict(self.db.query(Organization.org_id, Organization.path).all())
+        self.assertEqual(paths["a"], "/root/b/a/")
+        self.assertEqual(paths["a1"], "/root/b/a/a1/")
+
+        tree, _ = org_hierarchy.get_tree(self.db)
+        self.assertEqual([child["org_id"] for child in tree[0]["children"]], ["b"])
+        self.assertEqual(tree[0]["children"][0]["children"][0]["org_id"], "a")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+ORM数据缓存公共部分单元测试
+测试模型变更、回滚、字段过滤时的失效，构建期间失效时丢弃结果，以及有效期
+"""
+
+import os
+import sys
+import unittest
+
+from sqlalchemy import Column, Integer, String
+from sqlalchemy.orm import declarative_base
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.core.orm_cache import InvalidatingCache, invalidate_on_change
+from sqlite_test_case import SQLiteTestCase
+
+LocalBase = declarative_base()
+
+
+class Item(LocalBase):
+    __tablename__ = "orm_cache_items"
+    item_id = Column(Integer, primary_key=True)
+    name = Column(String(50))
+    note = Column(String(50))
+
+
+class ItemCache(InvalidatingCache):
+    """缓存全部条目名称"""
+
+    def __init__(self, ttl: float = 300.0):
+        super().__init__(ttl)
+        self._names = None
+
+    def _clear(self) -> None:
+        self._names = None
+
+    def names(self, db, before_store=None):
+        with self._lock:
+            if self._names is not None:
+                return self._names
+            generation = self._generation
+        names = sorted(name for name, in db.query(Item.name))
+        if before_store:
+            before_store()
+        with self._lock:
+            if generation == self._generation:
+                self._names = names
+        return names
+
+
+item_cache = ItemCache()
+invalidate_on_change(item_cache, "item_cache_changed", (Item,), update_fields={Item: ("name",)})
+
+
+class TestOrmCache(SQLiteTestCase):
+    """ORM数据缓存测试类"""
+
+    models = (Item,)
+    metadata = LocalBase.metadata
+
+    def setUp(self):
+        super().setUp()
+        self.db.add(Item(item_id=1, name="a"))
+        self.db.commit()
+        item_cache.ttl = 300.0
+        item_cache.invalidate()
+
+    def test_insert_and_field_filter(self):
+        """测试新增失效，只有监听的字段变更时修改才失效"""
+        self.assertEqual(item_cache.names(self.db), ["a"])
+        self.db.add(Item(item_id=2, name="b"))
+        self.db.commit()
+        self.assertEqual(item_cache.names(self.db), ["a", "b"])
+
+        invalidations = item_cache.stats["invalidations"]
+        item = self.db.get(Item, 1)
+        item.note = "备注"
+        self.db.commit()
+        self.assertEqual(item_cache.stats["invalidations"], invalidations)
+
+        item.name = "c"
+        self.db.commit()
+        self.assertEqual(item_cache.names(self.db), ["b", "c"])
+
+    def test_rollback(self):
+        """测试按未提交数据重建的缓存在回滚后失效"""
+        self.db.add(Item(item_id=2, name="b"))
+        self.db.flush()
+        self.assertEqual(item_cache.names(self.db), ["a", "b"])
+        self.db.rollback()
+        self.assertEqual(item_cache.names(self.db), ["a"])
+
+    def test_invalidated_while_building(self):
+        """测试构建期间发生失效时不写入缓存"""
+        self.record_queries()
+        item_cache.names(self.db, before_store=item_cache.invalidate)
+        item_cache.names(self.db)
+        self.assertEqual(len(self.queries), 2)
+
+    def test_clear_required(self):
+        """测试未实现_clear()的子类在实例化时报错"""
+        class Incomplete(InvalidatingCache):
+            pass
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+    def test_expired(self):
+        """测试有效期判断"""
+        self.assertFalse(item_cache._expired(float("inf")))
+        item_cache.ttl = 0.0
+        self.assertTrue(item_cache._expired(0.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,220 @@
+"""
+推流输出流水线单元测试
+测试FFmpeg写出线程的丢帧、零拷贝写入与后台重启，以及输出复用器的一次编码多端分发
+"""
+
+import unittest
+import os
+import sys
+import time
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from core.output_pipeline import (FFmpegWriter, OutputMultiplexer, PreviewSink, RemuxSink, write_frame,
+                                  build_encoder_cmd, build_remux_cmd, TS_PACKET_SIZE)
+
+# 读取并丢弃stdin的替身进程（代替FFmpeg）
+SINK_CMD = [sys.executable, '-c', 'import sys\nwhile sys.stdin.buffer.read(65536): pass']
+
+# 把stdin原样输出到stdout的替身编码器
+ECHO_CMD = [sys.executable, '-c', 'import sys\nfor data in iter(lambda: sys.stdin.buffer.read1(65536), b""):\n'
+            '    sys.stdout.buffer.write(data)\n    sys.stdout.buffer.flush()']
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class ChunkedPipe:
+    """每次最多接受chunk字节的管道替身，记录写入的对象类型"""
+
+    def __init__(self, chunk):
+        self.chunk = chunk
+        self.data = bytearray()
+        self.types = set()
+        self.flushed = 0
+
+    def write(self, data):
+        self.types.add(type(data))
+        accepted = bytes(data[:self.chunk])
+        self.data.extend(accepted)
+        return len(accepted)
+
+    def flush(self):
+        self.flushed += 1
+
+
+class TestWriteFrame(unittest.TestCase):
+    """缓冲区协议写入测试类"""
+
+    def test_partial_writes_without_tobytes(self):
+        """测试按memoryview写入，部分写入时续写剩余数据"""
+        frame = np.arange(4 * 5 * 3, dtype=np.uint8).reshape(4, 5, 3)
+        pipe = ChunkedPipe(chunk=7)
+        self.assertEqual(write_frame(pipe, frame), frame.nbytes)
+        self.assertEqual(bytes(pipe.data), frame.tobytes())
+        self.assertEqual(pipe.types, {memoryview})
+        self.assertEqual(pipe.flushed, 1)
+
+    def test_non_contiguous_frame(self):
+        """测试非连续数组（如裁剪视图）按行优先顺序写出"""
+        frame = np.arange(6 * 6 * 3, dtype=np.uint8).reshape(6, 6, 3)[1:5, ::2]
+        pipe = ChunkedPipe(chunk=1 << 20)
+        write_frame(pipe, frame)
+        self.assertEqual(bytes(pipe.data), frame.tobytes())
+
+
+class TestFFmpegWriter(unittest.TestCase):
+    """FFmpeg写出线程测试类"""
+
+    def test_full_queue_drops_oldest(self):
+        """测试队列满时丢弃最旧帧并归还，停止时归还未写出的帧"""
+        writer = FFmpegWriter(SINK_CMD, queue_size=2)
+        released = []
+        for i in range(5):
+            self.assertTrue(writer.submit(np.zeros(1, dtype=np.uint8), lambda i=i: released.append(i)))
+        self.assertEqual(released, [0, 1, 2])
+        self.assertEqual(writer.get_stats()['queued'], 2)
+
+        writer.stop()
+        self.assertEqual(sorted(released), [0, 1, 2, 3, 4])
+        self.assertEqual(writer.dropped, 3)
+        # 停止后提交的帧立即归还
+        self.assertFalse(writer.submit(np.zeros(1, dtype=np.uint8), lambda: released.append(5)))
+        self.assertEqual(released[-1], 5)
+
+    def test_writes_frames_on_own_thread(self):
+        """测试写出线程写入帧、回调并归还"""
+        written = []
+        released = []
+        writer = FFmpegWriter(SINK_CMD, queue_size=8, on_write=lambda: written.append(time.time()))
+        writer.start()
+        frame = np.ones((16, 16, 3), dtype=np.uint8)
+        for _ in range(5):
+            writer.submit(frame, lambda: released.append(1))
+
+        deadline = time.time() + 5
+        while writer.written < 5 and time.time() < deadline:
+            time.sleep(0.01)
+        writer.stop()
+
+        self.assertFalse(writer.is_alive())
+        self.assertEqual(writer.written, 5)
+        self.assertEqual(writer.bytes_written, 5 * frame.nbytes)
+        self.assertEqual(len(written), 5)
+        self.assertEqual(len(released), 5)
+        self.assertFalse(writer.failed)
+
+    def test_restarts_then_fails(self):
+        """测试FFmpeg反复退出时按上限重启后标记失败，不阻塞提交方"""
+        writer = FFmpegWriter([sys.executable, '-c', 'pass'], max_restarts=2, restart_delay=0.01)
+        writer.start()
+        start = time.time()
+        while writer.is_alive() and time.time() - start < 5:
+            writer.submit(np.zeros(8, dtype=np.uint8))
+            time.sleep(0.005)
+        writer.join(1)
+
+        self.assertTrue(writer.failed)
+        self.assertEqual(writer.restarts, 2)
+        self.assertEqual(writer.get_stats()['queued'], 0)
+
+
+class TestOutputMultiplexer(unittest.TestCase):
+    """输出复用器测试类"""
+
+    def test_runtime_attach_and_detach(self):
+        """测试运行时挂载/卸载输出端，编码器不重启，各输出端收到同一份编码数据"""
+        muxer = OutputMultiplexer(ECHO_CMD, queue_size=16)
+        muxer.start()
+        first = PreviewSink()
+        muxer.attach('first', first)
+        self.assertTrue(wait_for(lambda: muxer.encoder.process is not None))
+        encoder_pid = muxer.encoder.process.pid
+
+        muxer.submit(np.full(TS_PACKET_SIZE * 2, 1, dtype=np.uint8))
+        self.assertTrue(wait_for(lambda: first.bytes_received == TS_PACKET_SIZE * 2))
+
+        second = PreviewSink()
+        muxer.attach('second', second)
+        muxer.submit(np.full(TS_PACKET_SIZE, 2, dtype=np.uint8))
+        self.assertTrue(wait_for(lambda: second.bytes_received == TS_PACKET_SIZE
+                                 and first.bytes_received == TS_PACKET_SIZE * 3))
+
+        self.assertIs(muxer.detach('first'), first)
+        self.assertFalse(first.alive)
+        muxer.submit(np.full(TS_PACKET_SIZE, 3, dtype=np.uint8))
+        self.assertTrue(wait_for(lambda: second.bytes_received == TS_PACKET_SIZE * 2))
+        self.assertEqual(first.bytes_received, TS_PACKET_SIZE * 3)
+
+        self.assertEqual(muxer.encoder.process.pid, encoder_pid)
+        stats = muxer.get_stats()
+        muxer.stop()
+        self.assertEqual(stats['encoded_bytes'], TS_PACKET_SIZE * 4)
+        self.assertEqual(list(stats['sinks']), ['second'])
+        self.assertEqual(stats['restarts'], 0)
+        self.assertFalse(second.alive)
+
+    def test_remux_sink_receives_stream(self):
+        """测试转封装输出端通过独立进程写出编码数据"""
+        sink = RemuxSink(SINK_CMD)
+        muxer = OutputMultiplexer(ECHO_CMD)
+        muxer.start()
+        muxer.attach('remux', sink)
+        muxer.submit(np.zeros(TS_PACKET_SIZE * 20, dtype=np.uint8))
+        self.assertTrue(wait_for(lambda: sink.writer.bytes_written == TS_PACKET_SIZE * 20))
+        self.assertTrue(sink.alive)
+        muxer.stop()
+        self.assertFalse(sink.writer.is_alive())
+
+    def test_output_aligned_to_ts_packets(self):
+        """测试编码输出按TS包对齐后分发，不足一个包的部分与下次读取拼接"""
+        preview = PreviewSink()
+        muxer = OutputMultiplexer(ECHO_CMD)
+        muxer.start()
+        muxer.attach('preview', preview)
+        packets = bytes(range(TS_PACKET_SIZE)) * 3
+        muxer.submit(np.frombuffer(packets[:100], dtype=np.uint8))
+        muxer.submit(np.frombuffer(packets[100:300], dtype=np.uint8))
+        self.assertTrue(wait_for(lambda: preview.bytes_received == TS_PACKET_SIZE))
+        muxer.submit(np.frombuffer(packets[300:], dtype=np.uint8))
+        self.assertTrue(wait_for(lambda: preview.bytes_received == len(packets)))
+        _, data = preview.read(0, timeout=0)
+        muxer.stop()
+        self.assertEqual(data, packets)
+        self.assertTrue(all(len(chunk) % TS_PACKET_SIZE == 0 for _, chunk in preview._chunks))
+
+    def test_preview_reader_cursor(self):
+        """测试预览读者按游标增量读取，落后超过保留范围时计入跳过数"""
+        preview = PreviewSink(max_chunks=2)
+        for chunk in (b'a', b'b', b'c'):
+            preview.write(chunk)
+        cursor, data = preview.read(0, timeout=0)
+        self.assertEqual((cursor, data), (3, b'bc'))
+        self.assertEqual(preview.read(cursor, timeout=0.01), (3, b''))
+
+        for chunk in (b'd', b'e', b'f'):
+            preview.write(chunk)
+        self.assertEqual(preview.read(cursor, timeout=0), (6, b'ef'))
+        self.assertEqual(preview.get_stats()['skipped'], 1)
+
+    def test_commands(self):
+        """测试编码器输出MPEG-TS到stdout，转封装按协议选择封装格式且不重新编码"""
+        encoder = build_encoder_cmd(640, 360, 25)
+        self.assertEqual(encoder[encoder.index('-s') + 1], '640x360')
+        self.assertEqual(encoder[-4:], ['-f', 'mpegts', '-muxdelay', '0', 'pipe:1'][-4:])
+        self.assertEqual(encoder[-1], 'pipe:1')
+        rtmp = build_remux_cmd('rtmp://host/live/a')
+        self.assertIn('copy', rtmp)
+        self.assertEqual(rtmp[rtmp.index('-f', rtmp.index('copy')) + 1], 'flv')
+        self.assertIn('-rtsp_transport', build_remux_cmd('rtsp://host/live/a'))
+        self.assertNotIn('-f', build_remux_cmd('/tmp/out.mp4')[6:])
+
+
+if __name__ == "__main__":
+    unittest.main()
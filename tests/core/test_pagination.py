@@ -0,0 +1,157 @@
+"""
+分页工具单元测试
+测试游标编解码、总数缓存、复合索引补建与告警列表游标分页
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+import unittest
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.db.database import Base
+from app.db.models import ALARM_INDEXES, Alarm, Task
+from app.db.pagination import CountCache, decode_cursor, encode_cursor, ensure_indexes, next_cursor
+
+
+class TestPagination(unittest.TestCase):
+    """分页工具测试类"""
+
+    def test_cursor_roundtrip(self):
+        """测试游标编解码"""
+        created_at = datetime(2024, 12, 19, 10, 30, 0, 123456)
+        cursor = encode_cursor(created_at, "alarm_1")
+        self.assertEqual(decode_cursor(cursor), ("2024-12-19 10:30:00.123456", "alarm_1"))
+        self.assertEqual(decode_cursor(encode_cursor("2024-12-19 10:30:00", "a")), ("2024-12-19 10:30:00", "a"))
+        with self.assertRaises(ValueError):
+            decode_cursor("not-a-cursor")
+
+    def test_next_cursor(self):
+        """测试仅在本页已满时返回下一页游标"""
+        rows = [("2024-01-02", "b"), ("2024-01-01", "a")]
+        self.assertIsNone(next_cursor(rows, 3, lambda r: r[0], lambda r: r[1]))
+        self.assertEqual(decode_cursor(next_cursor(rows, 2, lambda r: r[0], lambda r: r[1])), ("2024-01-01", "a"))
+
+    def test_count_cache(self):
+        """测试相同过滤条件在有效期内复用总数"""
+        cache = CountCache(ttl=60.0)
+        calls = []
+        compute = lambda: calls.append(1) or 42
+        self.assertEqual(cache.get(("task_1", None), compute), 42)
+        self.assertEqual(cache.get(("task_1", None), compute), 42)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.get_stats()["hits"], 1)
+
+    def test_ensure_indexes_skips_missing_columns(self):
+        """测试只为存在的列创建索引"""
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE alarms (alarm_id TEXT PRIMARY KEY, task_id TEXT, stream_id TEXT, created_at TEXT)")
+        created = ensure_indexes(conn, "alarms", ALARM_INDEXES)
+        self.assertEqual(set(created), {"ix_alarms_created_at_id", "ix_alarms_task_created", "ix_alarms_stream_created"})
+        plan = " ".join(row[3] for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT alarm_id FROM alarms WHERE task_id = ? "
+            "AND (created_at, alarm_id) < (?, ?) ORDER BY created_at DESC, alarm_id DESC", ("t", "z", "z")))
+        self.assertIn("ix_alarms_task_created", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+        conn.close()
+
+
+class TestAlarmListKeyset(unittest.TestCase):
+    """告警列表游标分页测试"""
+
+    @classmethod
+    def setUpClass(cls):
+        from app.api.endpoints import analyzer
+        cls.analyzer = analyzer
+
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine, tables=[Task.__table__, Alarm.__table__])
+        self.db = sessionmaker(bind=engine)()
+        base = datetime(2024, 12, 19, 10, 0, 0)
+        for i in range(25):
+            # 每两条告警共用一个时间，检验同一时间的告警按alarm_id稳定分页
+            self.db.add(Alarm(alarm_id=f"alarm_{i:03d}", task_id="task_1" if i % 2 else "task_2",
+                              created_at=base + timedelta(seconds=i // 2), processed=False))
+        self.db.commit()
+        self.analyzer.alarm_count_cache.clear()
+
+    def tearDown(self):
+        self.db.close()
+
+    def _list(self, **kwargs):
+        params = dict(task_id=None, stream_id=None, status=None, page=1, page_size=10,
+                      cursor=None, count_mode="exact", db=self.db, current_user=None)
+        params.update(kwargs)
+        return asyncio.run(self.analyzer.get_alarm_list(**params))["data"]
+
+    def test_keyset_matches_offset(self):
+        """测试游标分页与页码分页结果一致且不重复"""
+        offset_ids = [a["alarm_id"] for page in (1, 2, 3) for a in self._list(page=page)["alarms"]]
+
+        keyset_ids, cursor = [], None
+        while True:
+            data = self._list(cursor=cursor, count_mode="none")
+            keyset_ids.extend(a["alarm_id"] for a in data["alarms"])
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(keyset_ids, offset_ids)
+        self.assertEqual(len(set(keyset_ids)), 25)
+        self.assertIsNone(data["total"])
+
+    def test_keyset_with_default_created_at(self):
+        """测试func.now()默认写入的秒级时间（多条同一秒）下游标逐页前进且不重复"""
+        self.db.query(Alarm).delete()
+        for i in range(6):
+            self.db.add(Alarm(alarm_id=f"alarm_{i:03d}", task_id="task_1", processed=False))
+        self.db.commit()
+
+        keyset_ids, cursor = [], None
+        for _ in range(10):
+            data = self._list(cursor=cursor, page_size=2, count_mode="none")
+            keyset_ids.extend(a["alarm_id"] for a in data["alarms"])
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+        self.assertIsNone(cursor)
+        self.assertEqual(sorted(keyset_ids), [f"alarm_{i:03d}" for i in range(6)])
+        self.assertEqual(len(keyset_ids), 6)
+
+    def test_count_modes(self):
+        """测试总数统计模式"""
+        self.assertEqual(self._list()["total"], 25)
+        self.assertEqual(self._list(count_mode="estimate")["total"], 25)
+        self.assertEqual(self._list(task_id="task_1", count_mode="cached")["total"], 12)
+
+        # 缓存有效期内新增告警不影响cached模式的总数
+        self.db.add(Alarm(alarm_id="alarm_new", task_id="task_1", created_at=datetime(2024, 12, 20)))
+        self.db.commit()
+        self.assertEqual(self._list(task_id="task_1", count_mode="cached")["total"], 12)
+        self.assertEqual(self._list(task_id="task_1")["total"], 13)
+
+    def test_estimate_after_delete(self):
+        """测试删除告警后estimate模式仍返回精确总数（不按最大rowid估算）"""
+        self.db.query(Alarm).filter(Alarm.alarm_id.in_(["alarm_000", "alarm_001"])).delete(synchronize_session=False)
+        self.db.commit()
+        self.assertEqual(self._list(count_mode="estimate")["total"], 23)
+        self.assertEqual(self._list(task_id="task_1", count_mode="estimate")["total"], 11)
+
+    def test_invalid_arguments(self):
+        """测试无效游标与统计模式"""
+        with self.assertRaises(HTTPException):
+            self._list(cursor="bad")
+        with self.assertRaises(HTTPException):
+            self._list(count_mode="bogus")
+
+
+if __name__ == '__main__':
+    unittest.main()
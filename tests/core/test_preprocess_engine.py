@@ -0,0 +1,105 @@
+"""
+预处理引擎单元测试
+测试融合预处理结果、缓冲区复用与批量输入的核心功能
+"""
+
+import unittest
+import os
+import sys
+import cv2
+import numpy as np
+
+# 添加项目根目录和算法目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'algorithms')))
+
+from preprocess_engine import PreprocessEngine
+
+
+def reference_letterbox(image, size, color=114):
+    """原实现：逐步分配数组的letterbox预处理，输出(3, H, W)归一化张量"""
+    img_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    shape = img_rgb.shape[:2]
+    ratio = min(size / shape[0], size / shape[1])
+    new_unpad = (int(round(shape[1] * ratio)), int(round(shape[0] * ratio)))
+    img_resized = cv2.resize(img_rgb, new_unpad, interpolation=cv2.INTER_LINEAR)
+    dw, dh = (size - new_unpad[0]) / 2, (size - new_unpad[1]) / 2
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    img_padded = cv2.copyMakeBorder(img_resized, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(color,) * 3)
+    return img_padded.transpose(2, 0, 1).astype(np.float32) / 255.0, ratio, left, top
+
+
+class TestPreprocessEngine(unittest.TestCase):
+    """预处理引擎测试类"""
+
+    def setUp(self):
+        """测试前设置"""
+        self.image = np.random.randint(0, 255, (90, 160, 3), dtype=np.uint8)
+
+    def test_matches_reference_letterbox(self):
+        """测试融合预处理与原逐步实现结果一致"""
+        engine = PreprocessEngine(img_size=64)
+        tensor, meta = engine.process_one(self.image)
+        expected, ratio, padw, padh = reference_letterbox(self.image, 64)
+
+        self.assertEqual(tensor.shape, (1, 3, 64, 64))
+        self.assertEqual(tensor.dtype, np.float32)
+        np.testing.assert_allclose(tensor[0], expected, atol=1e-6)
+        self.assertEqual((meta.ratio_x, meta.pad_x, meta.pad_y), (ratio, padw, padh))
+
+    def test_buffers_reused_across_calls(self):
+        """测试同分辨率重复调用复用输出张量，不再分配新数组"""
+        engine = PreprocessEngine(img_size=64, max_batch_size=2)
+        first, _ = engine.process_one(self.image)
+        second, _ = engine.process_one(np.zeros_like(self.image))
+        self.assertTrue(np.shares_memory(first, second))
+        # 填充区保持不变，图像区被新帧覆盖
+        self.assertAlmostEqual(float(second[0, 0, 0, 0]), 114 / 255.0, places=6)
+        self.assertEqual(float(second[0, :, 32, 32].max()), 0.0)
+
+        # 批大小超过预分配时扩容
+        batch, metas = engine.process([self.image] * 3)
+        self.assertEqual(batch.shape[0], 3)
+        self.assertEqual(len(metas), 3)
+
+    def test_batch_with_mixed_resolutions(self):
+        """测试批内不同分辨率的帧各自填充并能映射回原图坐标"""
+        engine = PreprocessEngine(img_size=64, max_batch_size=2)
+        tall = np.random.randint(0, 255, (160, 90, 3), dtype=np.uint8)
+        batch, (wide_meta, tall_meta) = engine.process([self.image, tall])
+
+        np.testing.assert_allclose(batch[0], reference_letterbox(self.image, 64)[0], atol=1e-6)
+        np.testing.assert_allclose(batch[1], reference_letterbox(tall, 64)[0], atol=1e-6)
+        # 模型输入坐标中的整幅图像区域映射回原图边界
+        self.assertEqual(wide_meta.to_original(0, wide_meta.pad_y, 64, 64 - wide_meta.pad_y), (0, 0, 160, 90))
+        self.assertEqual(tall_meta.orig_shape, (160, 90))
+
+    def test_crop_and_half_precision(self):
+        """测试中心裁剪模式、灰度输入和FP16输出"""
+        engine = PreprocessEngine(img_size=32, mode='crop', half=True)
+        gray = np.full((40, 80), 255, dtype=np.uint8)
+        tensor, meta = engine.process_one(gray)
+        self.assertEqual(tensor.dtype, np.float16)
+        self.assertTrue(np.all(tensor == 1.0))
+        self.assertEqual((meta.crop_x, meta.crop_y), (20, 0))
+        self.assertEqual(meta.to_original(0, 0, 32, 32), (20.0, 0.0, 60.0, 40.0))
+
+        with self.assertRaises(ValueError):
+            PreprocessEngine(mode='stretch')
+
+    def test_stage_timings(self):
+        """测试记录各阶段耗时"""
+        engine = PreprocessEngine(img_size=64)
+        for _ in range(3):
+            engine.process_one(self.image)
+        stats = engine.get_stats()
+        self.assertEqual(stats['frames'], 3)
+        self.assertEqual(stats['resolutions'], 1)
+        for stage in ('resize', 'pack', 'pad', 'total'):
+            self.assertEqual(stats[stage]['count'], 3)
+            self.assertGreaterEqual(stats[stage]['p95_ms'], stats[stage]['p50_ms'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+"""
+跨进程锁池单元测试
+测试按名称取锁与持锁进程被强制结束后的恢复
+"""
+
+import os
+import sys
+import time
+import unittest
+import multiprocessing as mp
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from core.process_lock import LockPool
+
+
+def _hold_forever(pool, name, acquired):
+    """子进程：获取锁后不再释放"""
+    pool.get(name).acquire()
+    acquired.set()
+    time.sleep(60)
+
+
+class TestLockPool(unittest.TestCase):
+    """跨进程锁池测试类"""
+
+    def test_same_name_same_lock(self):
+        """测试同一名称总是得到同一把锁"""
+        pool = LockPool(stripes=8)
+        lock = pool.get("vring_a")
+        self.assertEqual(lock._index, pool.get("vring_a")._index)
+        with lock:
+            self.assertEqual(pool._owners[lock._index], os.getpid())
+        self.assertEqual(pool._owners[lock._index], 0)
+
+    def test_recover_from_killed_holder(self):
+        """测试持锁进程被kill后等待者代为释放"""
+        pool = LockPool(stripes=4, timeout=0.1)
+        acquired = mp.Event()
+        process = mp.Process(target=_hold_forever, args=(pool, "vring_a", acquired))
+        process.start()
+        try:
+            self.assertTrue(acquired.wait(10))
+        finally:
+            process.kill()
+            process.join(5)
+
+        start = time.monotonic()
+        with pool.get("vring_a"):
+            pass
+        self.assertLess(time.monotonic() - start, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+"""
+进程管理器单元测试
+测试主进程与工作进程共用状态表、拉流进程启动
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from core.ipc_manager import IPCManager
+from core.process_manager import ProcessManager, stream_process_worker
+
+
+class TestProcessManager(unittest.TestCase):
+    """进程管理器测试类"""
+
+    def setUp(self):
+        """测试前设置"""
+        self.manager = ProcessManager()
+
+    def tearDown(self):
+        """测试后清理"""
+        self.manager.shutdown()
+
+    def test_worker_status_in_snapshot(self):
+        """测试工作进程写入的状态出现在主进程快照中"""
+        # 工作进程按manager_id附加到同一张状态表
+        worker_ipc = IPCManager(max_queue_size=4, manager_id=self.manager.manager_id)
+        try:
+            self.assertTrue(worker_ipc.set_shared_status('stream', 'stream_1', {'status': 'running', 'frame_count': 42}))
+
+            status = self.manager.get_status()
+            self.assertIn('stream_1', status['streams'])
+            self.assertEqual(status['streams']['stream_1']['status'], 'running')
+            self.assertEqual(status['streams']['stream_1']['frame_count'], 42)
+
+            # 主进程停止任务时删除的是同一张表中的行
+            self.manager.ipc_manager.remove_shared_status('stream', 'stream_1')
+            self.assertIsNone(worker_ipc.get_shared_status('stream', 'stream_1'))
+        finally:
+            worker_ipc.cleanup()
+
+    @patch('core.process_manager.mp.Process')
+    def test_start_stream_process(self, mock_process):
+        """测试启动拉流进程并记录进程信息"""
+        self.assertTrue(self.manager.start_stream_process("stream_1", "rtsp://camera/1", skip_frame_interval=2))
+
+        mock_process.assert_called_once_with(
+            target=stream_process_worker,
+            args=(self.manager.manager_id, "stream_1", "rtsp://camera/1", 2),
+            kwargs={'lock_pool': self.manager.lock_pool}
+        )
+        mock_process.return_value.start.assert_called_once()
+        info = self.manager.processes["stream_stream_1"]
+        self.assertEqual(info['type'], 'stream')
+        self.assertEqual(info['skip_frame_interval'], 2)
+
+        # 重复启动返回False
+        self.assertFalse(self.manager.start_stream_process("stream_1", "rtsp://camera/1"))
+        self.manager.processes.clear()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+"""
+状态推送服务单元测试
+测试快照增量比较、事件驱动的节拍合并计算以及无订阅者时不计算
+"""
+
+import unittest
+import asyncio
+import os
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.core.analyzer.event_bus import Event, EventBus
+from app.core.status_publisher import StatusPublisher, diff_snapshot
+
+
+def make_snapshot(tasks, streams=None):
+    return {
+        'summary': {'total_tasks': len(tasks)},
+        'tasks': {task_id: {'task_id': task_id, 'status': status} for task_id, status in tasks.items()},
+        'streams': streams or {}
+    }
+
+
+class TestDiffSnapshot(unittest.TestCase):
+    """快照比较测试类"""
+
+    def test_only_changed_items(self):
+        """测试只包含变化、新增和移除的任务/流"""
+        before = make_snapshot({'t1': 'running', 't2': 'running'}, {'s1': {'status': 'online'}})
+        after = make_snapshot({'t1': 'running', 't2': 'stopped'}, {'s1': {'status': 'online'}})
+        self.assertEqual(diff_snapshot(before, after), {'tasks': {'t2': {'task_id': 't2', 'status': 'stopped'}}})
+
+        after = make_snapshot({'t1': 'running'}, {})
+        delta = diff_snapshot(before, after)
+        self.assertEqual((delta['removed_tasks'], delta['removed_streams']), (['t2'], ['s1']))
+        self.assertEqual(delta['summary'], {'total_tasks': 1})
+        self.assertEqual(diff_snapshot(after, after), {})
+
+
+class TestStatusPublisher(unittest.TestCase):
+    """状态推送服务测试类"""
+
+    def setUp(self):
+        """测试前设置"""
+        self.state = {'t1': 'created'}
+        self.computes = 0
+        self.messages = []
+        self.subscribers = True
+        self.bus = EventBus()
+        self.bus.start()
+
+    def tearDown(self):
+        """测试后清理"""
+        self.bus.stop()
+
+    def snapshot(self):
+        self.computes += 1
+        return make_snapshot(dict(self.state))
+
+    async def broadcast(self, message):
+        self.messages.append(message)
+        return 1
+
+    def publisher(self):
+        publisher = StatusPublisher(self.snapshot, self.broadcast, lambda: self.subscribers,
+                                    min_interval=0.05, resync_interval=5.0)
+        publisher.attach(self.bus)
+        return publisher
+
+    async def wait_for(self, condition, timeout=2.0):
+        deadline = asyncio.get_running_loop().time() + timeout
+        while not condition() and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(0.01)
+        return condition()
+
+    def test_events_coalesced_into_one_delta(self):
+        """测试突发事件合并为一次计算，只推送变化的任务"""
+        async def run():
+            publisher = self.publisher()
+            task = asyncio.create_task(publisher.run())
+            initial = await publisher.current_snapshot()
+            self.assertEqual((initial['seq'], self.computes), (0, 1))
+            # 全量状态保持原有结构：计数在顶层，任务为列表
+            self.assertEqual(initial['total_tasks'], 1)
+            self.assertEqual(initial['tasks'], [{'task_id': 't1', 'status': 'created'}])
+            self.assertEqual(initial['streams'], {})
+
+            # 突发事件在同一轮事件循环内到达，必然落在同一个合并窗口
+            self.state['t1'] = 'running'
+            self.state['t2'] = 'created'
+            for event_type in ('task.started', 'task.created', 'stream.started'):
+                publisher.on_event(Event(event_type, 'test', {}))
+            self.assertTrue(await self.wait_for(lambda: publisher.get_stats()['deltas_sent'] == 1))
+
+            stats = publisher.get_stats()
+            self.assertEqual((stats['events'], stats['ticks']), (3, 1))
+            self.assertEqual((len(self.messages), self.computes), (1, 2))
+            message = self.messages[0]
+            self.assertEqual((message['type'], message['seq']), ('status_delta', 1))
+            self.assertEqual(set(message['data']['tasks']), {'t1', 't2'})
+
+            # 心跳事件不计数也不标记状态变化
+            publisher.on_event(Event('stream.heartbeat', 'test', {}))
+            self.assertEqual(publisher.get_stats()['events'], 3)
+
+            # 经事件总线到达的事件触发计算；状态没有变化时不推送
+            self.bus.publish(Event('task.properties_updated', 'test', {}))
+            self.assertTrue(await self.wait_for(lambda: publisher.get_stats()['empty_ticks'] == 1))
+            stats = publisher.get_stats()
+            self.assertEqual((stats['events'], stats['ticks'], stats['deltas_sent']), (4, 2, 1))
+            self.assertEqual((len(self.messages), self.computes), (1, 3))
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        asyncio.run(run())
+
+    def test_snapshot_before_run_sets_baseline(self):
+        """测试推送循环启动前获取的全量状态也作为增量基线"""
+        async def run():
+            publisher = self.publisher()
+            initial = await publisher.current_snapshot()
+            self.assertEqual((initial['seq'], self.computes), (0, 1))
+            self.assertIsNotNone(publisher.current)
+
+            self.state['t2'] = 'created'
+            task = asyncio.create_task(publisher.run())
+            await asyncio.sleep(0)
+            publisher.on_event(Event('task.created', 'test', {}))
+            self.assertTrue(await self.wait_for(lambda: publisher.get_stats()['deltas_sent'] == 1))
+            self.assertEqual(set(self.messages[0]['data']['tasks']), {'t2'})
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        asyncio.run(run())
+
+    def test_no_subscribers_skips_compute(self):
+        """测试没有状态连接时不计算状态"""
+        async def run():
+            self.subscribers = False
+            publisher = self.publisher()
+            task = asyncio.create_task(publisher.run())
+            # 让推送循环运行到首次等待
+            await asyncio.sleep(0)
+            self.bus.publish(Event('task.stopped', 'test', {}))
+            self.assertTrue(await self.wait_for(lambda: publisher.get_stats()['skipped_ticks'] == 1))
+            self.assertEqual(publisher.get_stats()['ticks'], 0)
+            self.assertEqual((self.computes, self.messages), (0, []))
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
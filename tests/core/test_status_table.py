@@ -0,0 +1,171 @@
+"""
+共享内存状态表单元测试
+测试StatusTable及IPCManager状态接口的核心功能
+"""
+
+import unittest
+import os
+import sys
+import uuid
+import multiprocessing as mp
+from multiprocessing.queues import Empty as MPQueueEmpty
+from multiprocessing.queues import Full as MPQueueFull
+from unittest import mock
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from core.status_table import StatusTable
+from core.ipc_manager import FrameReference, IPCManager
+
+
+def _register_in_child(manager_id, lock, start, prefix, count):
+    """子进程：同时登记多行，每行写入各自的计数"""
+    table = StatusTable.open(manager_id, rows_per_type=64, lock=lock)
+    try:
+        start.wait(5)
+        for i in range(count):
+            table.update('stream', f"{prefix}_{i}", {'status': 'running', 'frame_count': i})
+    finally:
+        table.close()
+
+
+class TestStatusTable(unittest.TestCase):
+    """状态表测试类"""
+
+    def setUp(self):
+        """测试前设置"""
+        self.manager_id = f"test_{uuid.uuid4().hex[:8]}"
+        self.table = StatusTable.open(self.manager_id, rows_per_type=4)
+
+    def tearDown(self):
+        """测试后清理"""
+        self.table.close()
+
+    def test_update_and_get(self):
+        """测试写入与读取状态"""
+        self.table.update('stream', 'stream_1', {'status': 'running', 'fps': 25.0, 'width': 1920, 'unknown_field': 1})
+        status = self.table.get('stream', 'stream_1')
+        self.assertEqual(status['status'], 'running')
+        self.assertEqual(status['fps'], 25.0)
+        self.assertEqual(status['width'], 1920)
+        self.assertNotIn('unknown_field', status)
+        self.assertIsNone(self.table.get('stream', 'missing'))
+
+    def test_counters_visible_to_other_attachments(self):
+        """测试计数器对附加到同一张表的其他实例可见"""
+        reader = StatusTable.open(self.manager_id, rows_per_type=4)
+        try:
+            self.assertFalse(reader.owner)
+            for _ in range(3):
+                self.table.tick('algo', 's1_a1', 'processed_count', 'last_process_time', 123.0)
+            self.table.increment('algo', 's1_a1', 'errors')
+            snapshot = reader.snapshot('algo')
+            self.assertEqual(snapshot['s1_a1']['processed_count'], 3)
+            self.assertEqual(snapshot['s1_a1']['last_process_time'], 123.0)
+            self.assertEqual(snapshot['s1_a1']['errors'], 1)
+        finally:
+            reader.close()
+
+    def test_snapshot_per_type_fields(self):
+        """测试快照按类型输出字段"""
+        self.table.update('output', 's1_a1', {'status': 'starting'})
+        self.table.update('stream', 's1', {'status': 'initialized'})
+        outputs = self.table.snapshot('output')
+        self.assertEqual(list(outputs.keys()), ['s1_a1'])
+        self.assertIn('last_push_time', outputs['s1_a1'])
+        self.assertNotIn('processed_count', outputs['s1_a1'])
+
+    def test_remove_and_capacity(self):
+        """测试删除行与容量限制"""
+        for i in range(4):
+            self.assertTrue(self.table.update('stream', f"s{i}", {'status': 'running'}))
+        self.assertFalse(self.table.update('stream', 's4', {'status': 'running'}))
+        self.assertTrue(self.table.remove('stream', 's0'))
+        self.assertTrue(self.table.update('stream', 's4', {'status': 'running'}))
+        self.assertEqual(self.table.get('stream', 's4')['frame_count'], 0)
+        self.assertNotIn('s0', self.table.snapshot('stream'))
+
+    def test_overlong_key_rejected(self):
+        """测试超长键不予登记，快照中只出现原始键"""
+        long_key = 's' * 97
+        self.assertFalse(self.table.update('algo', long_key, {'status': 'running'}))
+        self.assertIsNone(self.table.increment('algo', long_key, 'errors'))
+        self.assertIsNone(self.table.get('algo', long_key))
+        self.assertTrue(self.table.update('algo', 's' * 96, {'status': 'running'}))
+        self.assertEqual(list(self.table.snapshot('algo').keys()), ['s' * 96])
+
+    def test_concurrent_register_distinct_rows(self):
+        """测试多个进程同时登记时每个键独占一行"""
+        manager_id = f"test_{uuid.uuid4().hex[:8]}"
+        lock = mp.RLock()
+        table = StatusTable.open(manager_id, rows_per_type=64, lock=lock)
+        start = mp.Event()
+        processes = [mp.Process(target=_register_in_child, args=(manager_id, lock, start, f"p{n}", 8))
+                     for n in range(4)]
+        try:
+            for process in processes:
+                process.start()
+            start.set()
+            for process in processes:
+                process.join(timeout=10)
+            snapshot = table.snapshot('stream')
+            self.assertEqual(len(snapshot), 32)
+            for n in range(4):
+                for i in range(8):
+                    self.assertEqual(snapshot[f"p{n}_{i}"]['frame_count'], i)
+        finally:
+            table.close()
+
+
+class TestIPCManagerStatus(unittest.TestCase):
+    """IPC管理器状态接口测试类"""
+
+    def setUp(self):
+        """测试前设置"""
+        self.ipc = IPCManager(max_queue_size=4, manager_id=f"test_{uuid.uuid4().hex[:8]}")
+
+    def tearDown(self):
+        """测试后清理"""
+        self.ipc.cleanup()
+
+    def test_put_frame_updates_status(self):
+        """测试放入帧时更新流计数"""
+        self.ipc.create_stream_queue('s1', width=4, height=4)
+        for _ in range(3):
+            self.ipc.put_frame('s1', np.zeros((4, 4, 3), dtype=np.uint8))
+        snapshot = self.ipc.get_status_snapshot()
+        self.assertEqual(snapshot['streams']['s1']['frame_count'], 3)
+        self.assertGreater(snapshot['streams']['s1']['last_frame_time'], 0)
+        self.assertEqual(snapshot['algorithms'], {})
+
+    def test_set_shared_status_keeps_local_reference(self):
+        """测试设置共享状态时原地更新本地状态字典"""
+        self.ipc.create_result_queue('s1', 'a1')
+        local_status = self.ipc.algo_status['s1_a1']
+        self.ipc.set_shared_status('algo', 's1_a1', {'status': 'ready'})
+        self.assertEqual(local_status['status'], 'ready')
+        self.assertEqual(self.ipc.get_shared_status('algo', 's1_a1')['status'], 'ready')
+
+        self.ipc.remove_shared_status('algo', 's1_a1')
+        self.assertIsNone(self.ipc.get_shared_status('algo', 's1_a1'))
+
+    def test_put_result_counts_only_enqueued(self):
+        """测试结果未能放入队列时不计入处理数，计入丢弃数"""
+        frame_ref = FrameReference('s1', 0, 1, 0.0)
+        self.assertTrue(self.ipc.put_result('s1', 'a1', frame_ref, {}))
+        self.assertEqual(self.ipc.get_shared_status('algo', 's1_a1')['processed_count'], 1)
+
+        # 模拟mp.Queue后台线程尚未写出：放入报满、取出为空
+        self.ipc.result_queues['s1_a1'] = mock.Mock(
+            put_nowait=mock.Mock(side_effect=MPQueueFull), get_nowait=mock.Mock(side_effect=MPQueueEmpty))
+        with mock.patch.object(self.ipc.memory_manager, 'release_frame') as release_frame:
+            self.assertFalse(self.ipc.put_result('s1', 'a1', frame_ref, {}))
+        release_frame.assert_called_once_with(frame_ref)
+        self.assertEqual(self.ipc.get_shared_status('algo', 's1_a1')['processed_count'], 1)
+        self.assertEqual(self.ipc.dropped_results['s1_a1'], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
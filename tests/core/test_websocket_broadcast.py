@@ -0,0 +1,157 @@
+"""
+WebSocket广播发送队列单元测试
+测试每连接写出任务并发发送、消息只序列化一次、队列溢出降级与慢客户端断开
+"""
+
+import unittest
+import asyncio
+import json
+import os
+import sys
+from unittest.mock import Mock, AsyncMock
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.core.websocket_manager import UnifiedWebSocketManager, WebSocketType
+from core.alarm_protocol import producer_url
+
+
+def mock_websocket(delay=0.0, block=None):
+    """模拟连接：每条消息发送耗时delay秒，block为Event时发送阻塞到其被设置"""
+    websocket = Mock()
+    websocket.accept = AsyncMock()
+    websocket.close = AsyncMock()
+    websocket.sent = []
+
+    async def send_text(message):
+        if block is not None:
+            await block.wait()
+        await asyncio.sleep(delay)
+        websocket.sent.append(message)
+
+    websocket.send_text = send_text
+    websocket.send_bytes = send_text
+    return websocket
+
+
+class TestWebSocketBroadcast(unittest.TestCase):
+    """WebSocket广播测试类"""
+
+    def test_slow_client_does_not_delay_others(self):
+        """测试慢客户端不拖慢其他连接，字典消息只序列化一次且各连接共享"""
+        async def run():
+            manager = UnifiedWebSocketManager()
+            block = asyncio.Event()
+            slow, fast = mock_websocket(block=block), mock_websocket()
+            await manager.connect(slow, WebSocketType.STATUS.value)
+            await manager.connect(fast, WebSocketType.STATUS.value)
+
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            for i in range(3):
+                self.assertEqual(await manager.broadcast_to_type({'seq': i}, WebSocketType.STATUS.value), 2)
+            self.assertLess(loop.time() - start, 0.1)
+
+            await asyncio.sleep(0.05)
+            self.assertEqual([json.loads(m)['seq'] for m in fast.sent], [0, 1, 2])
+            self.assertEqual(slow.sent, [])
+            block.set()
+            await manager.flush()
+            self.assertIs(slow.sent[0], fast.sent[0])
+
+            stats = manager.get_connection_stats()['broadcast']
+            self.assertEqual((stats['broadcasts'], stats['messages_sent']), (3, 6))
+            await manager.close_all_connections()
+
+        asyncio.run(run())
+
+    def test_overflow_drops_oldest_then_evicts(self):
+        """测试发送队列满时丢弃最旧消息，持续溢出时断开连接"""
+        async def run():
+            manager = UnifiedWebSocketManager(send_queue_size=2, max_dropped=3)
+            block = asyncio.Event()
+            stuck = mock_websocket(block=block)
+            await manager.connect(stuck, WebSocketType.STATUS.value)
+
+            # 第1条被写出任务取走并阻塞，其后队列容纳2条
+            await manager.broadcast_to_type('0', WebSocketType.STATUS.value)
+            await asyncio.sleep(0)
+            for i in range(1, 5):
+                await manager.broadcast_to_type(str(i), WebSocketType.STATUS.value)
+            self.assertEqual(manager.get_broadcast_stats()['messages_dropped'], 2)
+            self.assertEqual(manager.get_broadcast_stats()['queue_depth_max'], 2)
+
+            for i in range(5, 7):
+                await manager.broadcast_to_type(str(i), WebSocketType.STATUS.value)
+            stats = manager.get_connection_stats()
+            self.assertEqual(stats['broadcast']['slow_consumers_evicted'], 1)
+            self.assertEqual(stats['total_connections'], 0)
+            self.assertEqual(await manager.broadcast_to_type('x', WebSocketType.STATUS.value), 0)
+            await asyncio.sleep(0)
+            stuck.close.assert_awaited()
+
+        asyncio.run(run())
+
+    def test_send_timeout_evicts(self):
+        """测试发送超时的慢客户端被断开"""
+        async def run():
+            manager = UnifiedWebSocketManager(send_timeout=0.05)
+            slow = mock_websocket(delay=1.0)
+            await manager.connect(slow, WebSocketType.ALARMS.value, stream_id='cam1')
+            await manager.send_personal_message('hello', slow)
+            await asyncio.sleep(0.2)
+            stats = manager.get_connection_stats()
+            self.assertEqual(stats['broadcast']['slow_consumers_evicted'], 1)
+            self.assertEqual(stats['stream_subscriptions'], 0)
+            self.assertNotIn(slow, manager.senders)
+
+        asyncio.run(run())
+
+    def test_alarm_broadcast_skips_source(self):
+        """测试告警广播不回发给推送告警的连接，慢客户端不阻塞广播"""
+        async def run():
+            manager = UnifiedWebSocketManager()
+            block = asyncio.Event()
+            source, slow, fast = mock_websocket(), mock_websocket(block=block), mock_websocket()
+            for websocket in (source, slow, fast):
+                await manager.connect(websocket, WebSocketType.ALARMS.value)
+
+            sent = await manager.broadcast_alarm({'alarm_id': 'a1', 'stream_id': 'cam1'}, {}, exclude=source)
+            self.assertEqual(sent, 2)
+            await asyncio.sleep(0.05)
+            self.assertEqual(json.loads(fast.sent[0])['alarm_id'], 'a1')
+            self.assertEqual((source.sent, slow.sent), ([], []))
+            block.set()
+            await manager.flush()
+            self.assertEqual(len(slow.sent), 1)
+            await manager.close_all_connections()
+
+        asyncio.run(run())
+
+    def test_producer_excluded_from_broadcasts(self):
+        """测试告警进程连接不接收告警、视频保存与全局广播"""
+        async def run():
+            manager = UnifiedWebSocketManager()
+            producer, client = mock_websocket(), mock_websocket()
+            await manager.connect(producer, WebSocketType.ALARM_PRODUCER.value)
+            await manager.connect(client, WebSocketType.ALARMS.value)
+
+            self.assertEqual(await manager.broadcast_alarm({'alarm_id': 'a1', 'stream_id': 'cam1'}, {}), 1)
+            self.assertEqual(await manager.broadcast_to_type({'type': 'alarm_video_saved'}, WebSocketType.ALARMS.value), 1)
+            self.assertEqual(await manager.broadcast_to_all({'type': 'notice'}), 1)
+            await manager.flush()
+            self.assertEqual((len(producer.sent), len(client.sent)), (0, 3))
+            self.assertEqual(manager.get_connection_stats()['connections_by_type'][WebSocketType.ALARM_PRODUCER.value], 1)
+            await manager.close_all_connections()
+
+        asyncio.run(run())
+
+    def test_producer_url(self):
+        """测试告警进程连接地址附加身份参数"""
+        self.assertEqual(producer_url("ws://host/api/ws/alarms"), "ws://host/api/ws/alarms?role=producer")
+        self.assertEqual(producer_url("ws://host/alarms?media=full"), "ws://host/alarms?media=full&role=producer")
+
+
+if __name__ == "__main__":
+    unittest.main()